@@ -1,60 +1,118 @@
 from django.contrib import admin
-from .models import Post, Comment, Vote, SavedPost, Notification, CommentVote, Feedback
+from .admin_performance import LargeTableAdmin
+from .models import (
+    Post, Comment, Vote, SavedPost, Notification, ArchivedNotification, CommentVote, Feedback, PostActivity,
+    OutboxEvent, ConsumerOffset, ImportRun, RelatedPostsBuild,
+)
+
+# Search prefixes: ^ = istartswith (uses the column's index), = exact,
+# @ = full-text search (FULLTEXT index on MySQL, see community.lookups).
 
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(LargeTableAdmin):
     list_display = ('id', 'title', 'author', 'votes', 'created_at', 'is_edited')
-    search_fields = ('title', 'content', 'author__username')
+    list_select_related = ('author',)
+    search_fields = ('^title', '@content', '^author__username')
     list_filter = ('created_at', 'is_edited')
-    ordering = ('-created_at',)
+    autocomplete_fields = ('author',)
 
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(LargeTableAdmin):
     list_display = ('id', 'post', 'author', 'created_at', 'is_edited', 'parent')
-    search_fields = ('text', 'author__username', 'post__title')
+    # __str__ shows the author and post title, for the comment and for its parent
+    list_select_related = ('post', 'author', 'parent__post', 'parent__author')
+    search_fields = ('@text', '^author__username', '^post__title')
     list_filter = ('created_at', 'is_edited')
-    ordering = ('-created_at',)
+    autocomplete_fields = ('post', 'author', 'parent')
 
 
 @admin.register(Vote)
-class VoteAdmin(admin.ModelAdmin):
+class VoteAdmin(LargeTableAdmin):
     list_display = ('id', 'user', 'post', 'value', 'created_at')
+    list_select_related = ('user', 'post')
     list_filter = ('value', 'created_at')
-    search_fields = ('user__username', 'post__title')
-    ordering = ('-created_at',)
+    search_fields = ('^user__username', '^post__title')
+    autocomplete_fields = ('user', 'post')
 
 
 @admin.register(SavedPost)
-class SavedPostAdmin(admin.ModelAdmin):
+class SavedPostAdmin(LargeTableAdmin):
     list_display = ('id', 'user', 'post', 'saved_at')
-    search_fields = ('user__username', 'post__title')
-    ordering = ('-saved_at',)
+    list_select_related = ('user', 'post')
+    search_fields = ('^user__username', '^post__title')
+    autocomplete_fields = ('user', 'post')
 
 
 @admin.register(Notification)
-class NotificationAdmin(admin.ModelAdmin):
+class NotificationAdmin(LargeTableAdmin):
     list_display = ('id', 'user', 'notification_type', 'post', 'comment', 'actor', 'read', 'created_at')
+    list_select_related = ('user', 'post', 'comment__post', 'comment__author', 'actor')
     list_filter = ('notification_type', 'read', 'created_at')
-    search_fields = ('user__username', 'actor__username', 'post__title')
-    ordering = ('-created_at',)
+    search_fields = ('^user__username', '^actor__username', '^post__title')
+    autocomplete_fields = ('user', 'post', 'comment', 'actor')
+
+
+@admin.register(ArchivedNotification)
+class ArchivedNotificationAdmin(LargeTableAdmin):
+    list_display = ('id', 'user', 'notification_type', 'post', 'actor', 'created_at', 'archived_at')
+    list_select_related = ('user', 'post', 'actor')
+    list_filter = ('notification_type', 'archived_at')
+    search_fields = ('^user__username', '^actor__username')
+    autocomplete_fields = ('user', 'post', 'comment', 'actor')
+
+
+@admin.register(PostActivity)
+class PostActivityAdmin(LargeTableAdmin):
+    list_display = ('id', 'post', 'period', 'bucket', 'upvotes', 'downvotes', 'comments', 'saves')
+    list_select_related = ('post',)
+    list_filter = ('period', 'bucket')
+    search_fields = ('=post__id', '^post__title')
+    autocomplete_fields = ('post',)
 
 
 @admin.register(CommentVote)
-class CommentVoteAdmin(admin.ModelAdmin):
+class CommentVoteAdmin(LargeTableAdmin):
     list_display = ('id', 'user', 'comment', 'value', 'created_at')
+    list_select_related = ('user', 'comment__post', 'comment__author')
     list_filter = ('value', 'created_at')
-    search_fields = ('user__username', 'comment__id')
-    ordering = ('-created_at',)
+    search_fields = ('^user__username', '=comment__id')
+    autocomplete_fields = ('user', 'comment')
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(LargeTableAdmin):
+    list_display = ('id', 'topic', 'key', 'action', 'created_at')
+    list_filter = ('topic', 'action', 'created_at')
+    search_fields = ('=key',)
+
+
+@admin.register(ConsumerOffset)
+class ConsumerOffsetAdmin(admin.ModelAdmin):
+    list_display = ('name', 'position', 'updated_at')
+
+
+@admin.register(ImportRun)
+class ImportRunAdmin(admin.ModelAdmin):
+    list_display = ('name', 'source', 'lines', 'started_at', 'updated_at', 'finished_at')
+    readonly_fields = ('counts',)
+
+
+@admin.register(RelatedPostsBuild)
+class RelatedPostsBuildAdmin(admin.ModelAdmin):
+    list_display = ('started_at', 'full', 'posts', 'updated', 'last_post_id', 'finished_at')
+    list_filter = ('full',)
 
 
 @admin.register(Feedback)
 class FeedbackAdmin(admin.ModelAdmin):
     list_display = ('id', 'type', 'user', 'email', 'subject', 'short_message', 'created_at')
+    list_select_related = ('user',)
     list_filter = ('type', 'created_at')
-    search_fields = ('subject', 'message', 'email', 'user__username')
+    search_fields = ('subject', '@message', 'email', '^user__username')
     ordering = ('-created_at',)
+    autocomplete_fields = ('user',)
 
     def short_message(self, obj):
         if not obj.message:
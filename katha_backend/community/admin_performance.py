@@ -0,0 +1,121 @@
+"""
+Admin building blocks for tables with millions of rows.
+
+- EstimatedCountPaginator: unfiltered changelists use the database's row estimate
+  instead of an exact COUNT(*); filtered ones count at most ADMIN_COUNT_CAP rows.
+- KeysetChangeList: when sorted newest-first by id, pages with ``WHERE id < cursor``
+  instead of OFFSET, so page 10,000 costs the same as page 1.
+- LargeTableAdmin: ModelAdmin wiring both together (plus no full-table count).
+"""
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+CURSOR_VAR = 'after'
+
+
+def estimated_row_count(model, using):
+    """Row estimate from the database's table statistics, or None if unavailable."""
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute(
+                'SELECT TABLE_ROWS FROM information_schema.TABLES '
+                'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s', [table])
+        elif connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE relname = %s', [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    return int(row[0]) if row and row[0] is not None else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator whose count never scans a large table."""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        threshold = getattr(settings, 'ADMIN_ESTIMATED_COUNT_THRESHOLD', 100000)
+        self.estimated = False
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= threshold:
+                self.estimated = True
+                return estimate
+        cap = getattr(settings, 'ADMIN_COUNT_CAP', 10000)
+        # COUNT(*) over a LIMITed subquery stops after `cap` matching rows
+        count = queryset.order_by()[:cap + 1].count()
+        if count > cap:
+            self.estimated = True
+            return cap
+        return count
+
+
+class KeysetChangeList(ChangeList):
+    """ChangeList that pages by primary key when ordered by descending id."""
+
+    def __init__(self, request, *args, **kwargs):
+        self.cursor = request.GET.get(CURSOR_VAR)
+        self.keyset = False
+        self.next_page_url = self.first_page_url = None
+        self.result_count_estimated = False
+        super().__init__(request, *args, **kwargs)
+        # Filter, search and sort links start again from the first page
+        self.params.pop(CURSOR_VAR, None)
+        self.filter_params.pop(CURSOR_VAR, None)
+
+    def get_filters_params(self, params=None):
+        params = super().get_filters_params(params)
+        params.pop(CURSOR_VAR, None)
+        return params
+
+    def uses_keyset(self):
+        ordering = list(self.queryset.query.order_by)
+        return not self.show_all and bool(ordering) and ordering[0] in ('-id', '-pk')
+
+    def get_results(self, request):
+        if not self.uses_keyset():
+            super().get_results(request)
+            self.result_count_estimated = getattr(self.paginator, 'estimated', False)
+            return
+
+        self.keyset = True
+        paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        queryset = self.queryset
+        if self.cursor:
+            try:
+                queryset = queryset.filter(pk__lt=int(self.cursor))
+            except ValueError:
+                pass
+        result_list = queryset[:self.list_per_page]
+        rows = list(result_list)
+        if len(rows) == self.list_per_page and queryset.filter(pk__lt=rows[-1].pk).exists():
+            self.next_page_url = self.get_query_string({CURSOR_VAR: rows[-1].pk})
+        if self.cursor:
+            self.first_page_url = self.get_query_string(remove=[CURSOR_VAR])
+
+        self.result_count = paginator.count
+        self.result_count_estimated = getattr(paginator, 'estimated', False)
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.full_result_count = None
+        self.result_list = result_list
+        self.can_show_all = False
+        self.multi_page = self.next_page_url is not None or self.cursor is not None
+        self.paginator = paginator
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """ModelAdmin for big tables: keyset pages, estimated counts, no full COUNT(*)."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    ordering = ('-id',)
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class CommunityConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'community'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from . import consumers  # noqa: F401  (registers the outbox consumers)
+        from . import lookups  # noqa: F401  (registers TextField.search)
+        from .middleware import install_query_collection
+
+        # Lets async requests count the queries they run on other threads
+        connection_created.connect(install_query_collection, dispatch_uid='community.query_collection')
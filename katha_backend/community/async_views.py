@@ -0,0 +1,189 @@
+"""
+Async read path for the hottest endpoints: the feed (posts/), post detail,
+notifications/ and notifications/unread_count/.
+
+Under ASGI the sync DRF views hold a thread for the whole request, including every
+round-trip to MySQL. These views await the ORM instead, and queries that do not
+depend on each other (a post, its comments, the viewer's vote and save) run at the
+same time on the ASYNC_READ_WORKERS pool, each on its own connection. Responses
+match the DRF serializers field for field (see tests/test_async_views.py); the
+unfiltered feed may come from its snapshot (community.feeds) on either path.
+
+Only GET is served here; writes, HEAD/OPTIONS, the browsable API and batch
+sub-requests go to the sync viewset, which builds the same payload from the same
+queries (community.feeds.feed_data), one after another. Compare both paths with
+``python manage.py benchmark_async``.
+"""
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db import close_old_connections
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from .batch import outside_transaction
+from .feeds import post_comments, post_queryset, posts_data, served_feed, timestamp, viewer_saves, viewer_votes
+from .serializers import excerpt
+from .views import NotificationViewSet, PostViewSet, notification_inbox, notification_queryset
+
+_renderer = JSONRenderer()
+
+
+# --- Concurrent reads ---
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'ASYNC_READ_WORKERS', 8), thread_name_prefix='async-read')
+        return _executor
+
+
+def shutdown_executor():
+    """Stop the pool; the next concurrent read starts one sized by the settings at that time."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown()
+            _executor = None
+
+
+def read_in_worker(query):
+    # Worker threads hold their own connections; close them as at the end of a request
+    close_old_connections()
+    try:
+        return query()
+    finally:
+        close_old_connections()
+
+
+async def gather_reads(*queries):
+    """Results of the zero-argument callables ``queries``, run concurrently when that is safe.
+
+    Django's async ORM runs a request's queries one at a time on its thread, so
+    independent ones go to the worker pool instead (sync_to_async carries the
+    replica routing and query instrumentation along).
+    """
+    if getattr(settings, 'ASYNC_READ_WORKERS', 8) >= 2 and await sync_to_async(outside_transaction)():
+        run = sync_to_async(read_in_worker, thread_sensitive=False, executor=executor())
+        return await asyncio.gather(*(run(query) for query in queries))
+    return [await sync_to_async(query)() for query in queries]
+
+
+# --- Responses ---
+def json_response(data, status=200):
+    """Same bytes and headers as a DRF Response rendered as JSON."""
+    response = HttpResponse(_renderer.render(data), status=status, content_type='application/json')
+    patch_vary_headers(response, ('Accept',))
+    return response
+
+
+def error_response(exc, request):
+    """What DRF's exception handler answers for ``exc``."""
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    response = json_response(data, status=exc.status_code)
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        response['WWW-Authenticate'] = JWTAuthentication().authenticate_header(request)
+    return response
+
+
+async def viewer(request, required=False):
+    """The JWT-authenticated user or AnonymousUser, checked as the sync views' DRF stack would."""
+    # Credentials forced by DRF's test client skip the authenticators, as in DRF's Request
+    user = getattr(request, '_force_auth_user', None)
+    if user is None:
+        result = await sync_to_async(JWTAuthentication().authenticate)(request)
+        user = result[0] if result else AnonymousUser()
+    if required and not user.is_authenticated:
+        raise exceptions.NotAuthenticated()
+    # The replica router reads the user off the request (pinning after writes)
+    request.user = user
+    return user
+
+
+def async_get(sync_view):
+    """Serve GET with the decorated coroutine and everything else with the sync DRF ``sync_view``."""
+    fallback = sync_to_async(sync_view)
+
+    def decorator(view):
+        @csrf_exempt
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            browsable = 'text/html' in request.headers.get('Accept', '') or 'format' in request.GET
+            if request.method != 'GET' or browsable:
+                return await fallback(request, *args, **kwargs)
+            try:
+                return await view(request, *args, **kwargs)
+            except exceptions.APIException as exc:
+                return error_response(exc, request)
+        # For callers that are already on a thread (batch sub-requests)
+        wrapper.sync_view = sync_view
+        return wrapper
+    return decorator
+
+
+# --- Posts ---
+@async_get(PostViewSet.as_view({'get': 'list', 'post': 'create'}, basename='post', detail=False, suffix='List'))
+async def post_list(request):
+    user = await viewer(request)
+    snapshot = await sync_to_async(served_feed)(request.GET, user)
+    if snapshot is not None:
+        return json_response(snapshot)
+    posts = [post async for post in post_queryset(request.GET).select_related('author')]
+    ids = [post.id for post in posts]
+    comments, votes, saved = await gather_reads(
+        lambda: post_comments(ids), lambda: viewer_votes(user, ids), lambda: viewer_saves(user, ids))
+    return json_response(posts_data(posts, comments, votes, saved))
+
+
+@async_get(PostViewSet.as_view({'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'},
+                               basename='post', detail=True, suffix='Instance'))
+async def post_detail(request, pk):
+    user = await viewer(request)
+    # Everything keys on the id, so the post itself is fetched alongside the rest
+    posts, comments, votes, saved = await gather_reads(
+        lambda: list(post_queryset(request.GET).select_related('author').filter(pk=pk).order_by()),
+        lambda: post_comments([pk]), lambda: viewer_votes(user, [pk]), lambda: viewer_saves(user, [pk]))
+    if not posts:
+        raise exceptions.NotFound('No Post matches the given query.')
+    return json_response(posts_data(posts, comments, votes, saved)[0])
+
+
+# --- Notifications ---
+def notification_data(row):
+    data = {'id': row['id'], 'notification_type': row['notification_type']}
+    # As NotificationInboxSerializer, which leaves out an empty post or comment
+    if row['post_id'] is not None:
+        data.update(post_id=row['post_id'], post_title=row['post__title'])
+    if row['comment_id'] is not None:
+        data.update(comment_id=row['comment_id'], comment_text=excerpt(row['comment_excerpt']))
+    data.update(actor_username=row['actor__username'], read=row['read'], created_at=timestamp(row['created_at']))
+    return data
+
+
+@async_get(NotificationViewSet.as_view({'get': 'list'}, basename='notification', detail=False, suffix='List'))
+async def notification_list(request):
+    user = await viewer(request, required=True)
+    rows = notification_inbox(user, request.GET)
+    return json_response([notification_data(row) async for row in rows])
+
+
+@async_get(NotificationViewSet.as_view({'get': 'unread_count'}, basename='notification', detail=False,
+                                       **NotificationViewSet.unread_count.kwargs))
+async def notification_unread_count(request):
+    user = await viewer(request, required=True)
+    return json_response({'count': await notification_queryset(user).filter(read=False).acount()})
@@ -0,0 +1,223 @@
+"""
+Batch requests: run several API calls in one round-trip.
+
+POST /api/v1/batch/ with
+
+    {"requests": [{"id": "me", "method": "GET", "path": "user/me/"},
+                  {"id": "vote", "method": "POST", "path": "posts/7/vote/", "body": {"value": 1}}]}
+
+answers {"responses": [{"id": "me", "status": 200, "body": {...}}, ...]} in the same
+order. Paths are relative to /api/v1/ (or absolute below it). Each sub-request is
+dispatched in-process to the regular DRF view, so permissions, validation and
+throttles apply as usual; the caller's JWT is checked once and reused for all.
+
+Sub-requests run in the order given. Runs of consecutive reads (GET) go to a small
+thread pool and run concurrently, each on its own connection; a write is a barrier,
+so later reads see it. Writes are not atomic as a group: each commits on its own.
+"""
+
+import io
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+from rest_framework.response import Response
+
+from .metrics import registry
+from .routers import SAFE_METHODS, pin_to_primary, request_routing
+
+logger = logging.getLogger('community.perf')
+
+API_PREFIX = '/api/v1/'
+METHODS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+# Nested batches would recurse; exports stream and do not fit in a JSON payload
+BLOCKED_ROUTES = {'batch', 'export'}
+FORWARDED_HEADERS = ('Retry-After', 'Location')
+
+BATCH_SUBREQUESTS = registry.counter(
+    'katha_batch_subrequests_total', 'Sub-requests run through the batch endpoint.', ('method', 'status'))
+
+
+class BatchError(ValueError):
+    """The batch payload itself is malformed."""
+
+
+def max_requests():
+    return getattr(settings, 'BATCH_MAX_REQUESTS', 20)
+
+
+@dataclass
+class SubRequest:
+    id: object
+    method: str
+    path: str
+    query: str = ''
+    body: object = None
+    error: tuple = None  # (status, message) when the entry cannot be dispatched
+    match: object = field(default=None, repr=False)
+
+    @property
+    def safe(self):
+        return self.error is None and self.method in SAFE_METHODS
+
+
+def parse(payload):
+    """Validate the batch payload and resolve each entry to a view."""
+    entries = payload.get('requests') if isinstance(payload, dict) else None
+    if not isinstance(entries, list) or not entries:
+        raise BatchError('Expected {"requests": [...]} with at least one request.')
+    if len(entries) > max_requests():
+        raise BatchError(f'At most {max_requests()} requests per batch.')
+
+    subrequests = []
+    for index, entry in enumerate(entries):
+        if not isinstance(entry, dict) or not isinstance(entry.get('path'), str):
+            raise BatchError(f'Request {index} needs a "path".')
+        method = str(entry.get('method', 'GET')).upper()
+        if method not in METHODS:
+            raise BatchError(f'Request {index}: method must be one of {", ".join(METHODS)}.')
+        url = urlsplit(entry['path'])
+        path = url.path if url.path.startswith('/') else API_PREFIX + url.path
+        sub = SubRequest(entry.get('id', index), method, path, url.query, entry.get('body'))
+        subrequests.append(sub)
+
+        if not path.startswith(API_PREFIX):
+            sub.error = (400, f'Only {API_PREFIX} paths can be batched.')
+            continue
+        try:
+            sub.match = resolve(path)
+        except Resolver404:
+            sub.error = (404, 'Not found.')
+            continue
+        if sub.match.url_name in BLOCKED_ROUTES or not hasattr(sync_view(sub.match), 'cls'):
+            sub.error = (400, f'{path} cannot be batched.')
+    return subrequests
+
+
+def sync_view(match):
+    # Sub-requests run on threads: async views (community.async_views) hand over their DRF view
+    return getattr(match.func, 'sync_view', match.func)
+
+
+def build_request(outer, sub):
+    """A Django request for ``sub`` that carries the caller's headers and identity."""
+    request = HttpRequest()
+    request.method = sub.method
+    request.path = request.path_info = sub.path
+    request.META = {key: value for key, value in outer.META.items() if not key.startswith('wsgi.')}
+    payload = b'' if sub.body is None else json.dumps(sub.body).encode()
+    request.META.update({
+        'REQUEST_METHOD': sub.method,
+        'PATH_INFO': sub.path,
+        'QUERY_STRING': sub.query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(payload)),
+    })
+    request.GET = QueryDict(sub.query)
+    request.COOKIES = outer.COOKIES
+    request._stream = io.BytesIO(payload)
+    request._read_started = False
+    request.resolver_match = sub.match
+    user = getattr(outer, 'user', None)
+    if user is not None and user.is_authenticated:
+        # DRF skips its authenticators for forced credentials: no second token check
+        request._force_auth_user = user
+        request._force_auth_token = getattr(outer, 'auth', None)
+    return request
+
+
+def dispatch(outer, sub):
+    """Run one sub-request and return its entry of the batch response."""
+    if sub.error is not None:
+        status, message = sub.error
+        return {'id': sub.id, 'status': status, 'body': {'error': message}}
+
+    request = build_request(outer, sub)
+    try:
+        with request_routing(request) as state:
+            response = sync_view(sub.match)(request, *sub.match.args, **sub.match.kwargs)
+    except Exception:
+        logger.exception('Batch sub-request %s %s failed', sub.method, sub.path)
+        BATCH_SUBREQUESTS.inc(method=sub.method, status=500)
+        return {'id': sub.id, 'status': 500, 'body': {'error': 'Internal server error.'}}
+    # Pin right away so reads later in the same batch already go to the primary
+    if state.wrote and state.user_id is not None and response.status_code < 400:
+        pin_to_primary(state.user_id)
+
+    BATCH_SUBREQUESTS.inc(method=sub.method, status=response.status_code)
+    result = {'id': sub.id, 'status': response.status_code, 'body': response_body(response)}
+    headers = {name: response[name] for name in FORWARDED_HEADERS if response.has_header(name)}
+    if headers:
+        result['headers'] = headers
+    return result
+
+
+def response_body(response):
+    if isinstance(response, Response):
+        return response.data
+    content = getattr(response, 'content', b'')
+    try:
+        return json.loads(content) if content else None
+    except ValueError:
+        return content.decode(errors='replace')
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'BATCH_MAX_WORKERS', 4), thread_name_prefix='batch')
+        return _executor
+
+
+def dispatch_in_worker(outer, sub):
+    # Worker threads hold their own connections; treat each sub-request like a request cycle
+    close_old_connections()
+    try:
+        return dispatch(outer, sub)
+    finally:
+        close_old_connections()
+
+
+def outside_transaction():
+    # Other connections cannot see rows written inside an open transaction
+    return not any(conn.in_atomic_block for conn in connections.all(initialized_only=True))
+
+
+def can_run_concurrently():
+    return getattr(settings, 'BATCH_MAX_WORKERS', 4) >= 2 and outside_transaction()
+
+
+def run_batch(outer, subrequests):
+    """Run ``subrequests`` in order, reads concurrently between writes; returns the responses."""
+    results = []
+    concurrent = can_run_concurrently()
+    index = 0
+    while index < len(subrequests):
+        sub = subrequests[index]
+        if not (concurrent and sub.safe):
+            results.append(dispatch(outer, sub))
+            index += 1
+            continue
+        end = index
+        while end < len(subrequests) and subrequests[end].safe:
+            end += 1
+        reads = subrequests[index:end]
+        if len(reads) == 1:
+            results.append(dispatch(outer, sub))
+        else:
+            results.extend(executor().map(lambda s: dispatch_in_worker(outer, s), reads))
+        index = end
+    return results
@@ -0,0 +1,16 @@
+"""
+Outbox consumers (community.outbox) that keep derived data up to date.
+
+Run them with ``python manage.py run_consumers``. Each handler gets a batch of
+OutboxEvents at least once, so it must be idempotent.
+"""
+
+from . import feeds
+from .outbox import consumer
+
+
+@consumer('feed-snapshots', topics=('post', 'comment', 'vote'))
+def mark_feed_snapshots_stale(events):
+    """Any change to what the feed shows makes its snapshots stale (one mark per batch)."""
+    if feeds.enabled():
+        feeds.mark_stale()
@@ -0,0 +1,49 @@
+"""
+MySQL backend that borrows connections from a process-wide pool.
+
+Use it with ``'ENGINE': 'community.db.backends.mysql'`` and a ``'POOL'`` dict in the
+database settings. Django "closes" the connection at the end of every request
+(CONN_MAX_AGE = 0), which here returns it to the pool instead of hanging up.
+"""
+
+from django.db.backends.mysql.base import DatabaseWrapper as MySQLDatabaseWrapper
+
+from community.db.pool import ConnectionPool, get_pool
+
+
+class DatabaseWrapper(MySQLDatabaseWrapper):
+
+    @property
+    def pool(self):
+        options = self.settings_dict.get('POOL') or {}
+        if not options.get('MAX_SIZE'):
+            return None
+        return get_pool(self.alias, lambda: ConnectionPool(
+            self.alias,
+            connect=lambda: super(DatabaseWrapper, self).get_new_connection(self.get_connection_params()),
+            ping=lambda conn: conn.ping(False),
+            max_size=options['MAX_SIZE'],
+            timeout=options.get('TIMEOUT', 5),
+            recycle=options.get('RECYCLE', 1800),
+            pre_ping_idle=options.get('PRE_PING_IDLE', 30),
+        ))
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+        return pool.checkout()
+
+    def _close(self):
+        pool = self.pool
+        if pool is None or self.connection is None:
+            return super()._close()
+        connection = self.connection
+        broken = False
+        if not self.autocommit:
+            try:
+                # Never hand a connection with an open transaction to the next request
+                connection.rollback()
+            except Exception:
+                broken = True
+        pool.checkin(connection, broken=broken or (self.errors_occurred and not self.is_usable()))
@@ -0,0 +1,181 @@
+"""
+Process-wide pool of raw DB-API connections.
+
+Django keeps persistent connections per thread, which does not help under ASGI
+where sync work runs on threads that come and go. The pool hands connections to
+whichever thread asks, caps how many exist, pings connections that sat idle
+before reuse and recycles them after a maximum lifetime.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+
+from ..metrics import registry
+
+logger = logging.getLogger('community.db')
+
+CHECKOUT_WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+CHECKOUTS = registry.counter(
+    'katha_db_connection_checkouts_total',
+    'Connections handed to a request; reused="true" when no new connection had to be opened.',
+    ('alias', 'reused'))
+CHECKOUT_WAIT = registry.histogram(
+    'katha_db_pool_checkout_wait_seconds', 'Time spent waiting for a pooled connection.', ('alias',),
+    buckets=CHECKOUT_WAIT_BUCKETS)
+POOL_CONNECTIONS = registry.gauge(
+    'katha_db_pool_connections', 'Connections held by the pool, by state.', ('alias', 'state'))
+DISCARDED = registry.counter(
+    'katha_db_pool_discarded_total', 'Pooled connections closed instead of reused, by reason.', ('alias', 'reason'))
+
+
+class PoolTimeout(Exception):
+    """No connection became available within the checkout timeout."""
+
+
+class _Entry:
+    __slots__ = ('connection', 'created_at', 'returned_at')
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.created_at = self.returned_at = time.monotonic()
+
+
+class ConnectionPool:
+    """
+    Bounded LIFO pool. ``connect`` opens a new raw connection; ``ping`` raises if
+    a connection is dead.
+    """
+
+    def __init__(self, alias, connect, ping, max_size=10, timeout=5.0, recycle=1800, pre_ping_idle=30):
+        self.alias = alias
+        self._connect = connect
+        self._ping = ping
+        self.max_size = max_size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.pre_ping_idle = pre_ping_idle
+        self._idle = deque()
+        self._in_use = {}
+        self._condition = threading.Condition()
+        self._opening = 0
+
+    @property
+    def size(self):
+        return len(self._idle) + len(self._in_use) + self._opening
+
+    def _update_gauges(self):
+        POOL_CONNECTIONS.set(len(self._idle), alias=self.alias, state='idle')
+        POOL_CONNECTIONS.set(len(self._in_use), alias=self.alias, state='in_use')
+
+    def checkout(self):
+        start = time.monotonic()
+        deadline = start + self.timeout
+        with self._condition:
+            while True:
+                entry = self._take_idle()
+                if entry is not None:
+                    self._in_use[id(entry.connection)] = entry
+                    self._update_gauges()
+                    break
+                if self.size < self.max_size:
+                    self._opening += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    CHECKOUT_WAIT.observe(time.monotonic() - start, alias=self.alias)
+                    raise PoolTimeout(f'No connection available for {self.alias!r} within {self.timeout}s')
+                self._condition.wait(remaining)
+
+        if entry is None:
+            # Open outside the lock so a slow handshake does not block other checkouts
+            try:
+                entry = _Entry(self._connect())
+            finally:
+                with self._condition:
+                    self._opening -= 1
+                    self._condition.notify()
+            with self._condition:
+                self._in_use[id(entry.connection)] = entry
+                self._update_gauges()
+            reused = 'false'
+        else:
+            reused = 'true'
+
+        CHECKOUT_WAIT.observe(time.monotonic() - start, alias=self.alias)
+        CHECKOUTS.inc(alias=self.alias, reused=reused)
+        return entry.connection
+
+    def _take_idle(self):
+        """Pop the most recently returned healthy connection (called with the lock held)."""
+        now = time.monotonic()
+        while self._idle:
+            entry = self._idle.pop()
+            if self.recycle is not None and now - entry.created_at > self.recycle:
+                self._discard(entry, 'recycled')
+                continue
+            # Pinging under the lock is acceptable: it only happens after a quiet period
+            if self.pre_ping_idle is not None and now - entry.returned_at > self.pre_ping_idle:
+                try:
+                    self._ping(entry.connection)
+                except Exception:
+                    self._discard(entry, 'failed_ping')
+                    continue
+            return entry
+        return None
+
+    def checkin(self, connection, broken=False):
+        with self._condition:
+            entry = self._in_use.pop(id(connection), None)
+            if entry is None:
+                # Not ours (e.g. pool was reset); just close it
+                self._close(connection)
+                return
+            if broken:
+                self._discard(entry, 'broken')
+            else:
+                entry.returned_at = time.monotonic()
+                self._idle.append(entry)
+            self._update_gauges()
+            self._condition.notify()
+
+    def _discard(self, entry, reason):
+        DISCARDED.inc(alias=self.alias, reason=reason)
+        self._close(entry.connection)
+
+    def _close(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            logger.debug('Error closing pooled connection for %s', self.alias, exc_info=True)
+
+    def close_idle(self):
+        """Close every idle connection (e.g. at shutdown)."""
+        with self._condition:
+            while self._idle:
+                self._close(self._idle.pop().connection)
+            self._update_gauges()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, factory):
+    """Return the pool for ``alias``, creating it with ``factory()`` on first use."""
+    pool = _pools.get(alias)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(alias)
+            if pool is None:
+                pool = _pools[alias] = factory()
+    return pool
+
+
+def close_all_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close_idle()
+        _pools.clear()
@@ -0,0 +1,115 @@
+"""
+Streaming CSV / NDJSON exports of feedback, posts and comments for staff.
+
+Rows are read in primary-key batches (``WHERE id > last ORDER BY id LIMIT n``)
+and written out as they arrive, so memory stays flat however large the table is.
+Batching by key rather than relying on QuerySet.iterator() matters on MySQL:
+PyMySQL's default cursor buffers the whole result set client-side.
+"""
+
+import csv
+import json
+from datetime import datetime, time, timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Comment, Feedback, Post
+
+BATCH_SIZE = 2000
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+# dataset -> (model, exported columns); related columns are joined in the same query
+DATASETS = {
+    'feedback': (Feedback, (
+        'id', 'created_at', 'type', 'user_id', 'user__username', 'email', 'subject', 'message')),
+    'posts': (Post, (
+        'id', 'created_at', 'author_id', 'author__username', 'title', 'slug', 'votes',
+        'is_edited', 'edited_at', 'deleted_at', 'content')),
+    'comments': (Comment, (
+        'id', 'created_at', 'post_id', 'parent_id', 'author_id', 'author__username', 'votes',
+        'is_edited', 'edited_at', 'deleted_at', 'text')),
+}
+
+
+class ExportFilterError(ValueError):
+    """A filter query parameter could not be parsed."""
+
+
+def parse_bound(value, name, end=False):
+    """Parse an ISO date or datetime; a bare ``until`` date includes that whole day."""
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ExportFilterError(f"'{name}' must be an ISO date or datetime, got {value!r}.")
+        parsed = datetime.combine(day + timedelta(days=1) if end else day, time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def filtered_queryset(dataset, params, using):
+    """QuerySet of ``dataset`` narrowed by the since/until/type query parameters."""
+    model, _ = DATASETS[dataset]
+    queryset = model._default_manager.using(using)
+    if params.get('since'):
+        queryset = queryset.filter(created_at__gte=parse_bound(params['since'], 'since'))
+    if params.get('until'):
+        queryset = queryset.filter(created_at__lt=parse_bound(params['until'], 'until', end=True))
+    if params.get('type'):
+        if model is not Feedback:
+            raise ExportFilterError("'type' only applies to the feedback export.")
+        queryset = queryset.filter(type=params['type'])
+    return queryset
+
+
+def iter_rows(queryset, columns, batch_size=None):
+    """Yield value tuples in id order, one short keyset query per batch."""
+    batch_size = batch_size or BATCH_SIZE
+    queryset = queryset.order_by('id').values_list(*columns)
+    last_id = 0
+    while True:
+        batch = list(queryset.filter(id__gt=last_id)[:batch_size])
+        yield from batch
+        if len(batch) < batch_size:
+            return
+        last_id = batch[-1][0]
+
+
+class _Echo:
+    """File-like object whose write() hands the formatted line back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def stream_csv(rows, columns):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([_csv_value(value) for value in row])
+
+
+def stream_ndjson(rows, columns):
+    for row in rows:
+        yield json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+def stream_export(dataset, fmt, queryset, batch_size=None):
+    _, columns = DATASETS[dataset]
+    rows = iter_rows(queryset, columns, batch_size)
+    headers = [column.replace('__', '_') for column in columns]
+    return stream_csv(rows, headers) if fmt == 'csv' else stream_ndjson(rows, headers)
@@ -0,0 +1,399 @@
+"""
+The feed (posts/): its query, its payload and precomputed snapshots of it.
+
+The unfiltered feed of each sort mode is the same for every viewer except for the
+viewer's own vote and save, so with FEED_SNAPSHOT_SECONDS set it is served from a
+snapshot in the cache: the PostSerializer payload of the first FEED_SNAPSHOT_MAX_POSTS
+posts in that order, built by one query for the posts and one for their comments,
+and the ids of the rest in order. Readers fetch the rest by id (rest_of_feed()),
+which needs no sorting or comment counts, so a long feed still never runs the feed
+query outside a rebuild. The viewer's votes and saves are overlaid per request
+(nothing for anonymous viewers).
+
+- Fresh for FEED_SNAPSHOT_SECONDS. After that, or once a write has marked it
+  stale (the feed-snapshots outbox consumer, community.consumers), it is still
+  served while one worker rebuilds it in the background (stale-while-revalidate),
+  at most every FEED_SNAPSHOT_MIN_SECONDS.
+- Single flight: a rebuild holds a cache lock per sort mode (cache.add), so only
+  one worker or process recomputes a given snapshot. With no snapshot at all the
+  others wait for it instead of all querying the database.
+- Snapshots expire after FEED_SNAPSHOT_STALE_SECONDS; the refresh_feeds command
+  rebuilds them on a schedule so readers rarely see one that old or missing.
+
+Viewers pinned to the primary after a write (community.routers) and filtered
+feeds (author, date_from, date_to) are always queried live.
+"""
+
+import logging
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections
+from django.db.models import Case, Count, F, IntegerField, Q, When
+from django.utils import timezone
+from rest_framework import serializers
+
+from .metrics import registry
+from .models import Comment, Post, SavedPost, Vote
+from .routers import is_pinned
+
+logger = logging.getLogger('community.perf')
+
+SORTS = ('newest', 'oldest', 'most_voted', 'most_comments', 'trending')
+FILTERS = ('author', 'date_from', 'date_to')
+GENERATION_KEY = 'feed-snapshot:generation'
+# How often a reader with no snapshot to serve checks whether the rebuild it waits on is done
+WAIT_INTERVAL = 0.02
+
+FEED_SNAPSHOT_READS = registry.counter(
+    'katha_feed_snapshot_reads_total', 'Feed requests by how the snapshot answered them.', ('sort', 'result'))
+FEED_SNAPSHOT_BUILDS = registry.counter(
+    'katha_feed_snapshot_builds_total', 'Feed snapshots rebuilt.', ('sort', 'trigger'))
+
+_datetime = serializers.DateTimeField()
+
+
+# --- Feed query and payload ---
+def post_queryset(params):
+    """Live posts filtered and sorted by the feed's query parameters."""
+    queryset = Post.objects.alive().annotate(
+        comment_count=Count('comments', filter=Q(comments__parent__isnull=True, comments__deleted_at__isnull=True))
+    )
+
+    # Filtering
+    author = params.get('author', None)
+    if author:
+        queryset = queryset.filter(author__username__icontains=author)
+
+    date_from = params.get('date_from', None)
+    if date_from:
+        try:
+            date_from = datetime.fromisoformat(date_from.replace('Z', '+00:00'))
+            queryset = queryset.filter(created_at__gte=date_from)
+        except (ValueError, AttributeError):
+            pass
+
+    date_to = params.get('date_to', None)
+    if date_to:
+        try:
+            date_to = datetime.fromisoformat(date_to.replace('Z', '+00:00'))
+            queryset = queryset.filter(created_at__lte=date_to)
+        except (ValueError, AttributeError):
+            pass
+
+    # Sorting
+    sort_by = params.get('sort', 'newest')
+
+    if sort_by == 'oldest':
+        queryset = queryset.order_by('created_at')
+    elif sort_by == 'most_voted':
+        queryset = queryset.order_by('-votes', '-created_at')
+    elif sort_by == 'most_comments':
+        queryset = queryset.order_by('-comment_count', '-created_at')
+    elif sort_by == 'trending':
+        # Trending: combination of votes, comments, and recency
+        # Weight recent posts more heavily (posts from last 7 days get bonus)
+        week_ago = timezone.now() - timedelta(days=7)
+        queryset = queryset.annotate(
+            trending_score=(
+                F('votes') * 2 +
+                F('comment_count') * 3 +
+                Case(
+                    When(created_at__gte=week_ago, then=5),
+                    default=0,
+                    output_field=IntegerField()
+                )
+            )
+        ).order_by('-trending_score', '-created_at')
+    else:  # 'newest' or default
+        queryset = queryset.order_by('-created_at')
+
+    return queryset
+
+
+def timestamp(value):
+    return _datetime.to_representation(value)
+
+
+def post_comments(post_ids):
+    """Live comments of the posts, oldest first (sorted here: no index orders them across posts)."""
+    comments = list(Comment.objects.alive().filter(post_id__in=post_ids).select_related('author').order_by())
+    comments.sort(key=lambda comment: (comment.created_at, comment.id))
+    return comments
+
+
+def viewer_votes(user, post_ids):
+    if not user.is_authenticated:
+        return {}
+    return dict(Vote.objects.filter(user=user, post_id__in=post_ids).order_by().values_list('post_id', 'value'))
+
+
+def viewer_saves(user, post_ids):
+    if not user.is_authenticated:
+        return set()
+    return set(SavedPost.objects.filter(user=user, post_id__in=post_ids).order_by().values_list('post_id', flat=True))
+
+
+def comment_data(comment, replies):
+    return {
+        'id': comment.id,
+        'post': comment.post_id,
+        'author': comment.author_id,
+        'author_username': comment.author.username,
+        'text': comment.text,
+        'created_at': timestamp(comment.created_at),
+        'edited_at': timestamp(comment.edited_at),
+        'is_edited': comment.is_edited,
+        'parent': comment.parent_id,
+        'votes': comment.votes,
+        # PostSerializer nests comments without the request, so this is always 0 there too
+        'user_vote': 0,
+        'replies': [comment_data(reply, replies) for reply in replies[comment.id]],
+    }
+
+
+def posts_data(posts, comments, votes, saved):
+    """PostSerializer output for ``posts`` from their prefetched comments and the viewer's state."""
+    top_level, replies = defaultdict(list), defaultdict(list)
+    for comment in comments:
+        if comment.parent_id is None:
+            top_level[comment.post_id].append(comment)
+        else:
+            replies[comment.parent_id].append(comment)
+    return [{
+        'id': post.id,
+        'title': post.title,
+        'content': post.content,
+        'author': post.author_id,
+        'author_username': post.author.username,
+        'created_at': timestamp(post.created_at),
+        'edited_at': timestamp(post.edited_at),
+        'is_edited': post.is_edited,
+        'votes': post.votes,
+        'comment_count': len(top_level[post.id]),
+        'comments': [comment_data(comment, replies) for comment in top_level[post.id]],
+        'user_vote': votes.get(post.id, 0),
+        'is_saved': post.id in saved,
+    } for post in posts]
+
+
+def feed_data(posts, user):
+    """posts_data for ``posts`` as ``user`` sees them: one query each for comments, votes and saves."""
+    ids = [post.id for post in posts]
+    return posts_data(posts, post_comments(ids), viewer_votes(user, ids), viewer_saves(user, ids))
+
+
+# --- Snapshots ---
+def enabled():
+    return getattr(settings, 'FEED_SNAPSHOT_SECONDS', 0) > 0
+
+
+def payload_limit():
+    return max(getattr(settings, 'FEED_SNAPSHOT_MAX_POSTS', 1000), 1)
+
+
+def snapshot_cache():
+    return caches[getattr(settings, 'FEED_SNAPSHOT_CACHE', 'default')]
+
+
+def snapshot_key(sort):
+    return f'feed-snapshot:{sort}'
+
+
+def lock_key(sort):
+    return f'feed-snapshot-lock:{sort}'
+
+
+def snapshot_sort(params):
+    """The sort mode whose snapshot answers a feed request with ``params``, or None to query live."""
+    if not enabled() or any(params.get(name) for name in FILTERS):
+        return None
+    sort = params.get('sort', 'newest')
+    # post_queryset sorts anything it does not know as newest
+    return sort if sort in SORTS else 'newest'
+
+
+def generation():
+    """Bumped by every write that changes what the feed shows."""
+    return snapshot_cache().get(GENERATION_KEY, 0)
+
+
+def mark_stale():
+    cache = snapshot_cache()
+    cache.add(GENERATION_KEY, 0, None)
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        # Evicted between the add and the incr
+        cache.set(GENERATION_KEY, 1, None)
+
+
+def acquire(sort):
+    """Take the rebuild lock for ``sort``; returns its token, or None when another worker holds it."""
+    token = uuid.uuid4().hex
+    if snapshot_cache().add(lock_key(sort), token, getattr(settings, 'FEED_SNAPSHOT_LOCK_SECONDS', 30)):
+        return token
+    return None
+
+
+def release(sort, token):
+    cache = snapshot_cache()
+    # Only our own lock: after a rebuild that outlived the lock another worker may hold it
+    if cache.get(lock_key(sort)) == token:
+        cache.delete(lock_key(sort))
+
+
+def build(sort, trigger='read'):
+    """Query the feed for ``sort`` and store its snapshot; call with the rebuild lock held."""
+    # Read before querying, so a write that lands during the build leaves the snapshot stale
+    current = generation()
+    limit = payload_limit()
+    queryset = post_queryset({'sort': sort})
+    posts = list(queryset.select_related('author')[:limit])
+    more = []
+    if len(posts) == limit:
+        # Past the payload only the order is kept; a post that moved into the first page since is not repeated
+        head = {post.id for post in posts}
+        more = [pk for pk in queryset.values_list('id', flat=True)[limit:] if pk not in head]
+    data = posts_data(posts, post_comments([post.id for post in posts]), {}, set())
+    snapshot = {'sort': sort, 'generation': current, 'built_at': time.time(), 'posts': data, 'more': more}
+    snapshot_cache().set(snapshot_key(sort), snapshot, getattr(settings, 'FEED_SNAPSHOT_STALE_SECONDS', 600))
+    FEED_SNAPSHOT_BUILDS.inc(sort=sort, trigger=trigger)
+    return snapshot
+
+
+def rebuild(sort, trigger='schedule'):
+    """Rebuild ``sort`` now unless another worker already is; returns the snapshot or None."""
+    token = acquire(sort)
+    if token is None:
+        return None
+    try:
+        return build(sort, trigger)
+    finally:
+        release(sort, token)
+
+
+def is_stale(snapshot, current_generation, now=None):
+    age = (now or time.time()) - snapshot['built_at']
+    if age >= settings.FEED_SNAPSHOT_SECONDS:
+        return True
+    return snapshot['generation'] != current_generation and age >= getattr(settings, 'FEED_SNAPSHOT_MIN_SECONDS', 2)
+
+
+# --- Background rebuilds ---
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=len(SORTS), thread_name_prefix='feed-snapshot')
+        return _executor
+
+
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown()
+            _executor = None
+
+
+def build_in_background(sort, token):
+    close_old_connections()
+    try:
+        build(sort, trigger='stale')
+    except Exception:
+        logger.exception('Rebuilding the %s feed snapshot failed', sort)
+    finally:
+        release(sort, token)
+        close_old_connections()
+
+
+def revalidate(sort):
+    """Start a background rebuild of ``sort`` unless one is already running; returns its future."""
+    token = acquire(sort)
+    if token is None:
+        return None
+    return executor().submit(build_in_background, sort, token)
+
+
+def wait_for_snapshot(sort):
+    """A snapshot for ``sort`` when none is cached: built here, or by the worker already building it.
+
+    None when that worker does not finish within FEED_SNAPSHOT_LOCK_SECONDS;
+    the caller then queries the database itself.
+    """
+    cache = snapshot_cache()
+    deadline = time.monotonic() + getattr(settings, 'FEED_SNAPSHOT_LOCK_SECONDS', 30)
+    while True:
+        token = acquire(sort)
+        if token is not None:
+            try:
+                return build(sort, trigger='miss')
+            finally:
+                release(sort, token)
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(WAIT_INTERVAL)
+        snapshot = cache.get(snapshot_key(sort))
+        if snapshot is not None:
+            return snapshot
+
+
+def snapshot(sort):
+    """The snapshot to answer ``sort`` with now, starting a background rebuild when it is stale."""
+    cached = snapshot_cache().get_many([snapshot_key(sort), GENERATION_KEY])
+    current = cached.get(snapshot_key(sort))
+    if current is None:
+        FEED_SNAPSHOT_READS.inc(sort=sort, result='miss')
+        return wait_for_snapshot(sort)
+    if is_stale(current, cached.get(GENERATION_KEY, 0)):
+        FEED_SNAPSHOT_READS.inc(sort=sort, result='stale')
+        revalidate(sort)
+    else:
+        FEED_SNAPSHOT_READS.inc(sort=sort, result='fresh')
+    return current
+
+
+def rest_of_feed(ids):
+    """Payloads of the posts past a snapshot's first page, by id in the snapshot's order.
+
+    Fetched a page at a time; posts deleted since the snapshot was built drop out.
+    """
+    limit = payload_limit()
+    data = []
+    for start in range(0, len(ids), limit):
+        page = ids[start:start + limit]
+        found = Post.objects.alive().select_related('author').in_bulk(page)
+        posts = [found[pk] for pk in page if pk in found]
+        data.extend(posts_data(posts, post_comments(list(found)), {}, set()))
+    return data
+
+
+def served_feed(params, user):
+    """The feed for ``params`` and ``user`` from its snapshot, or None when it must be queried live."""
+    sort = snapshot_sort(params)
+    if sort is None:
+        return None
+    # Read-your-writes: right after a write the viewer sees the database, not a snapshot
+    if user.is_authenticated and is_pinned(user.pk):
+        FEED_SNAPSHOT_READS.inc(sort=sort, result='pinned')
+        return None
+    current = snapshot(sort)
+    if current is None:
+        return None
+    posts = current['posts'] + rest_of_feed(current['more']) if current['more'] else current['posts']
+    if not user.is_authenticated:
+        return posts
+    ids = [post['id'] for post in posts]
+    votes, saved = viewer_votes(user, ids), viewer_saves(user, ids)
+    return [{**post, 'user_vote': votes.get(post['id'], 0), 'is_saved': post['id'] in saved} for post in posts]
@@ -0,0 +1,444 @@
+"""
+Bulk import of posts, comments and votes from NDJSON (the import_community command).
+
+One JSON object per line, each with a ``type``. Every reference is to an id from
+the source, never to an id in this database:
+
+    {"type": "post", "id": "p1", "author": "maria", "title": "...", "content": "...", "created_at": "..."}
+    {"type": "comment", "id": "c1", "post": "p1", "parent": null, "author": "juan", "text": "..."}
+    {"type": "vote", "post": "p1", "user": "juan", "value": 1}
+    {"type": "comment_vote", "comment": "c1", "user": "maria", "value": -1}
+
+The columns of the NDJSON exports (author__username, post_id, parent_id) are read as
+well, so an export of posts followed by one of comments imports as is. Posts must
+come before their comments and parents before their replies. edited_at, is_edited
+and deleted_at are kept.
+
+Lines are imported in chunks, one transaction each. Within a chunk, authors are
+resolved with one query (and created with --create-users), slugs are allocated with
+one query instead of probing per post as Post.save does, ids and thread paths are
+assigned here, and rows go in with bulk_create. The source -> new id maps live in
+memory and in ImportedObject, and ImportRun records the byte offset reached. Both
+commit with the chunk, so a run that stops resumes at the first chunk not committed.
+A user's later vote on a post or comment replaces an earlier one, as re-voting through
+the API does (the vote count in the run's counts includes the replaced ones). Vote
+counters are recomputed once at the end.
+
+Imported rows do not go through the outbox (community.outbox) or the engagement
+rollups: rebuild derived data afterwards (e.g. compact_activity --backfill-days).
+"""
+
+import json
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.db.models import Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.text import slugify
+
+from .models import (
+    MAX_THREAD_DEPTH, PATH_STEP, Comment, CommentVote, ImportedObject, Notification, Post, SavedPost, Vote,
+    path_step,
+)
+
+logger = logging.getLogger('community.db')
+
+RECORD_TYPES = ('post', 'comment', 'vote', 'comment_vote')
+SLUG_MAX_LENGTH = Post._meta.get_field('slug').max_length
+TITLE_MAX_LENGTH = Post._meta.get_field('title').max_length
+SOURCE_ID_MAX_LENGTH = ImportedObject._meta.get_field('source_id').max_length
+# Chunks that collide with rows inserted concurrently are retried with fresh ids and slugs
+CHUNK_ATTEMPTS = 3
+
+# Fields with auto_now_add that an import or the benchmark seed fills in itself
+TIMESTAMP_FIELDS = [
+    (Post, 'created_at'),
+    (Comment, 'created_at'),
+    (Vote, 'created_at'),
+    (CommentVote, 'created_at'),
+    (SavedPost, 'saved_at'),
+    (Notification, 'created_at'),
+]
+
+
+@contextmanager
+def explicit_timestamps():
+    """Temporarily disable auto_now_add so bulk_create keeps the timestamps we set."""
+    fields = [model._meta.get_field(name) for model, name in TIMESTAMP_FIELDS]
+    for field_ in fields:
+        field_.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field_ in fields:
+            field_.auto_now_add = True
+
+
+def next_id(model):
+    return (model.objects.aggregate(m=Max('id'))['m'] or 0) + 1
+
+
+class RecordError(ValueError):
+    """A record is malformed or refers to something that was not imported."""
+
+
+def reference(record, *names):
+    """The first of ``names`` set in ``record``, as a source id string."""
+    for name in names:
+        if record.get(name) is not None:
+            return str(record[name])
+    return None
+
+
+def timestamp(record, name, default=None):
+    value = record.get(name)
+    if value is None:
+        return default
+    parsed = parse_datetime(str(value))
+    if parsed is None:
+        raise RecordError(f'{name} is not an ISO datetime: {value!r}')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def vote_value(record):
+    value = record.get('value')
+    if value not in (1, -1):
+        raise RecordError(f'vote value must be 1 or -1, got {value!r}')
+    return value
+
+
+def base_slug(title):
+    return slugify(title)[:SLUG_MAX_LENGTH] or 'post'
+
+
+def slug_candidate(base, counter):
+    # Same scheme as Post.save (base, base-1, base-2, ...), cut to fit the column
+    if not counter:
+        return base
+    suffix = f'-{counter}'
+    return base[:SLUG_MAX_LENGTH - len(suffix)] + suffix
+
+
+def allocate_slugs(titles, query_size=500):
+    """A unique slug for each title, checking all the candidates of a round in a few queries."""
+    bases = [base_slug(title) for title in titles]
+    needed = Counter(bases)
+    found = {base: [] for base in needed}
+    tried = dict.fromkeys(needed, 0)
+    chosen = set()
+    while any(len(found[base]) < count for base, count in needed.items()):
+        candidates = []
+        for base, count in needed.items():
+            missing = count - len(found[base])
+            if missing > 0:
+                # A little headroom: the first suffixes are usually taken when a base is
+                candidates += [(base, slug_candidate(base, n)) for n in range(tried[base], tried[base] + missing + 2)]
+                tried[base] += missing + 2
+        taken = set()
+        slugs = [slug for _, slug in candidates]
+        for start in range(0, len(slugs), query_size):
+            taken.update(Post.objects.filter(slug__in=slugs[start:start + query_size]).values_list('slug', flat=True))
+        for base, slug in candidates:
+            if len(found[base]) < needed[base] and slug not in taken and slug not in chosen:
+                found[base].append(slug)
+                chosen.add(slug)
+    return [found[base].pop(0) for base in bases]
+
+
+@dataclass
+class ImportStats:
+    rows: Counter = field(default_factory=Counter)  # kind -> rows written
+    skipped: Counter = field(default_factory=Counter)  # record type -> records left out
+    lines: int = 0
+    chunks: int = 0
+    seconds: float = 0.0
+
+    def as_dict(self):
+        return {'rows': dict(self.rows), 'skipped': dict(self.skipped)}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(rows=Counter(data.get('rows', {})), skipped=Counter(data.get('skipped', {})))
+
+
+class Chunk:
+    """Rows built from one chunk of lines; merged into the importer's maps after they commit."""
+
+    def __init__(self):
+        self.posts, self.comments = [], []
+        self.votes, self.comment_votes = {}, {}  # (user id, post or comment id) -> vote
+        self.post_ids, self.comment_ids = {}, {}  # source id -> new id
+        self.comment_info = {}  # new id -> (post id, path) of comments in this chunk
+        self.skipped = Counter()
+        self.users_created = 0
+
+
+class Importer:
+    """Imports NDJSON lines into ``run``, ``chunk_size`` lines per transaction."""
+
+    def __init__(self, run, create_users=False, chunk_size=5000, batch_size=1000, default_type=None,
+                 progress=None, warn=None, max_warnings=20):
+        self.run = run
+        self.create_users = create_users
+        self.chunk_size = chunk_size
+        self.batch_size = batch_size
+        self.default_type = default_type
+        self.progress = progress or (lambda importer: None)
+        self.warn = warn or logger.warning
+        self.warnings_left = max_warnings
+        self.stats = ImportStats.from_dict(run.counts)
+        self.written = 0  # rows written by this process, for throughput
+        self.user_ids = {}  # username -> id
+        # Resuming: the maps of everything committed so far
+        self.post_ids, self.comment_ids = {}, {}
+        for kind, source_id, object_id in run.imported.values_list('kind', 'source_id', 'object_id').iterator():
+            (self.post_ids if kind == 'post' else self.comment_ids)[source_id] = object_id
+
+    # --- Reading ---
+    def import_file(self, fh):
+        """Import from the binary file ``fh`` starting at the run's offset, then recompute counters."""
+        started = time.perf_counter()
+        fh.seek(self.run.offset)
+        lines = []
+        for line in fh:
+            lines.append(line)
+            if len(lines) >= self.chunk_size:
+                self.import_chunk(lines, fh.tell())
+                lines = []
+                self.stats.seconds = time.perf_counter() - started
+                self.progress(self)
+        if lines:
+            self.import_chunk(lines, fh.tell())
+        self.recompute_counters()
+        self.run.finished_at = timezone.now()
+        self.run.save(update_fields=['finished_at', 'updated_at'])
+        self.stats.seconds = time.perf_counter() - started
+        self.progress(self)
+        return self.stats
+
+    def parse(self, lines, chunk):
+        records = []
+        for number, line in enumerate(lines, start=self.run.lines + 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise RecordError('not a JSON object')
+                record.setdefault('type', self.default_type)
+                if record['type'] not in RECORD_TYPES:
+                    raise RecordError(f'unknown type {record["type"]!r}')
+            except (ValueError, RecordError) as e:
+                self.skip(chunk, 'invalid', number, e)
+                continue
+            records.append((number, record))
+        return records
+
+    def skip(self, chunk, kind, number, reason):
+        chunk.skipped[kind] += 1
+        if self.warnings_left > 0:
+            self.warnings_left -= 1
+            self.warn(f'Line {number}: skipped {kind}: {reason}')
+
+    # --- One chunk ---
+    def import_chunk(self, lines, offset):
+        for attempt in range(1, CHUNK_ATTEMPTS + 1):
+            warnings_left, user_ids = self.warnings_left, dict(self.user_ids)
+            try:
+                with transaction.atomic():
+                    chunk = self.build(lines)
+                    self.write(chunk, len(lines), offset)
+                break
+            except IntegrityError:
+                # A concurrent insert took one of the ids or slugs; build the chunk again
+                self.warnings_left, self.user_ids = warnings_left, user_ids
+                if attempt == CHUNK_ATTEMPTS:
+                    raise
+        self.post_ids.update(chunk.post_ids)
+        self.comment_ids.update(chunk.comment_ids)
+        self.stats.lines = self.run.lines
+        self.stats.chunks += 1
+
+    def build(self, lines):
+        chunk = Chunk()
+        records = self.parse(lines, chunk)
+        self.resolve_users(records, chunk)
+        parents = self.parent_paths(records)
+        next_post, next_comment = next_id(Post), next_id(Comment)
+        for number, record in records:
+            builder = getattr(self, f'build_{record["type"]}')
+            try:
+                if record['type'] == 'post':
+                    builder(record, chunk, next_post + len(chunk.posts))
+                elif record['type'] == 'comment':
+                    builder(record, chunk, next_comment + len(chunk.comments), parents)
+                else:
+                    builder(record, chunk)
+            except RecordError as e:
+                self.skip(chunk, record['type'], number, e)
+        for post, slug in zip(chunk.posts, allocate_slugs([post.title for post in chunk.posts])):
+            post.slug = slug
+        return chunk
+
+    def resolve_users(self, records, chunk):
+        names = {reference(record, 'author', 'author__username', 'user', 'user__username') for _, record in records}
+        missing = {name for name in names if name is not None and name not in self.user_ids}
+        if not missing:
+            return
+        self.user_ids.update(User.objects.filter(username__in=missing).values_list('username', 'id'))
+        missing -= self.user_ids.keys()
+        if missing and self.create_users:
+            # Imported accounts cannot log in until they reset their password
+            User.objects.bulk_create([User(username=name, password=make_password(None)) for name in sorted(missing)],
+                                     batch_size=self.batch_size)
+            self.user_ids.update(User.objects.filter(username__in=missing).values_list('username', 'id'))
+            chunk.users_created += len(missing)
+
+    def parent_paths(self, records):
+        """(post id, path) of the committed comments this chunk's replies answer."""
+        ids = {self.comment_ids[ref] for _, record in records if record['type'] == 'comment'
+               for ref in [reference(record, 'parent', 'parent_id')] if ref in self.comment_ids}
+        return {pk: (post_id, path) for pk, post_id, path in
+                Comment.objects.filter(id__in=ids).values_list('id', 'post_id', 'path')}
+
+    def source_id(self, record):
+        source_id = reference(record, 'id')
+        if source_id is None:
+            raise RecordError('no id')
+        if len(source_id) > SOURCE_ID_MAX_LENGTH:
+            raise RecordError(f'id longer than {SOURCE_ID_MAX_LENGTH} characters')
+        return source_id
+
+    def user_id(self, record, *names):
+        name = reference(record, *names)
+        if name is None:
+            raise RecordError(f'no {names[0]}')
+        if name not in self.user_ids:
+            raise RecordError(f'unknown user {name!r} (pass --create-users to create it)')
+        return self.user_ids[name]
+
+    def post_id(self, record, chunk):
+        ref = reference(record, 'post', 'post_id')
+        post_id = chunk.post_ids.get(ref) or self.post_ids.get(ref)
+        if post_id is None:
+            raise RecordError(f'post {ref!r} was not imported')
+        return post_id
+
+    def build_post(self, record, chunk, pk):
+        source_id = self.source_id(record)
+        if source_id in self.post_ids or source_id in chunk.post_ids:
+            raise RecordError(f'post {source_id!r} was imported already')
+        edited_at = timestamp(record, 'edited_at')
+        post = Post(
+            id=pk,
+            author_id=self.user_id(record, 'author', 'author__username'),
+            title=str(record.get('title') or '')[:TITLE_MAX_LENGTH],
+            content=str(record.get('content') or ''),
+            created_at=timestamp(record, 'created_at', timezone.now()),
+            edited_at=edited_at,
+            is_edited=bool(record.get('is_edited', edited_at is not None)),
+            deleted_at=timestamp(record, 'deleted_at'),
+        )
+        chunk.posts.append(post)
+        chunk.post_ids[source_id] = pk
+        return post
+
+    def build_comment(self, record, chunk, pk, parents):
+        source_id = self.source_id(record)
+        if source_id in self.comment_ids or source_id in chunk.comment_ids:
+            raise RecordError(f'comment {source_id!r} was imported already')
+        post_id = self.post_id(record, chunk)
+        path = ''
+        parent_ref = reference(record, 'parent', 'parent_id')
+        parent_id = None
+        if parent_ref is not None:
+            parent_id = chunk.comment_ids.get(parent_ref) or self.comment_ids.get(parent_ref)
+            parent = chunk.comment_info.get(parent_id) or parents.get(parent_id)
+            if parent is None:
+                raise RecordError(f'parent comment {parent_ref!r} was not imported')
+            if parent[0] != post_id:
+                raise RecordError(f'parent comment {parent_ref!r} is on another post')
+            path = parent[1]
+        path += path_step(pk)
+        depth = len(path) // PATH_STEP - 1
+        if depth > MAX_THREAD_DEPTH:
+            raise RecordError(f'replies nest deeper than {MAX_THREAD_DEPTH} levels')
+        edited_at = timestamp(record, 'edited_at')
+        chunk.comments.append(Comment(
+            id=pk,
+            post_id=post_id,
+            parent_id=parent_id,
+            author_id=self.user_id(record, 'author', 'author__username'),
+            text=str(record.get('text') or ''),
+            created_at=timestamp(record, 'created_at', timezone.now()),
+            edited_at=edited_at,
+            is_edited=bool(record.get('is_edited', edited_at is not None)),
+            deleted_at=timestamp(record, 'deleted_at'),
+            path=path,
+            depth=depth,
+        ))
+        chunk.comment_ids[source_id] = pk
+        chunk.comment_info[pk] = (post_id, path)
+
+    def build_vote(self, record, chunk):
+        vote = Vote(user_id=self.user_id(record, 'user', 'user__username'), post_id=self.post_id(record, chunk),
+                    value=vote_value(record), created_at=timestamp(record, 'created_at', timezone.now()))
+        chunk.votes[vote.user_id, vote.post_id] = vote
+
+    def build_comment_vote(self, record, chunk):
+        ref = reference(record, 'comment', 'comment_id')
+        comment_id = chunk.comment_ids.get(ref) or self.comment_ids.get(ref)
+        if comment_id is None:
+            raise RecordError(f'comment {ref!r} was not imported')
+        vote = CommentVote(user_id=self.user_id(record, 'user', 'user__username'), comment_id=comment_id,
+                           value=vote_value(record), created_at=timestamp(record, 'created_at', timezone.now()))
+        chunk.comment_votes[vote.user_id, vote.comment_id] = vote
+
+    def write(self, chunk, line_count, offset):
+        with explicit_timestamps():
+            Post.objects.bulk_create(chunk.posts, batch_size=self.batch_size)
+            Comment.objects.bulk_create(chunk.comments, batch_size=self.batch_size)
+            # A user's later vote on the same post or comment replaces the earlier one, as in the API
+            Vote.objects.bulk_create(chunk.votes.values(), batch_size=self.batch_size, update_conflicts=True,
+                                     unique_fields=['user', 'post'], update_fields=['value', 'created_at'])
+            CommentVote.objects.bulk_create(chunk.comment_votes.values(), batch_size=self.batch_size,
+                                            update_conflicts=True, unique_fields=['user', 'comment'],
+                                            update_fields=['value', 'created_at'])
+        ImportedObject.objects.bulk_create([
+            *(ImportedObject(run=self.run, kind='post', source_id=source_id, object_id=pk)
+              for source_id, pk in chunk.post_ids.items()),
+            *(ImportedObject(run=self.run, kind='comment', source_id=source_id, object_id=pk)
+              for source_id, pk in chunk.comment_ids.items()),
+        ], batch_size=self.batch_size)
+
+        stats = ImportStats.from_dict(self.run.counts)
+        stats.rows.update(post=len(chunk.posts), comment=len(chunk.comments), vote=len(chunk.votes),
+                          comment_vote=len(chunk.comment_votes), user=chunk.users_created)
+        stats.skipped.update(chunk.skipped)
+        self.written += len(chunk.posts) + len(chunk.comments) + len(chunk.votes) + len(chunk.comment_votes)
+        self.run.counts = stats.as_dict()
+        self.run.lines += line_count
+        self.run.offset = offset
+        self.run.save(update_fields=['counts', 'lines', 'offset', 'updated_at'])
+        self.stats.rows, self.stats.skipped = stats.rows, stats.skipped
+
+    # --- Counters ---
+    def recompute_counters(self):
+        """Set votes on every imported post and comment from its vote rows, ``batch_size`` rows per UPDATE."""
+        for kind, model, vote_model, fk in (('post', Post, Vote, 'post'), ('comment', Comment, CommentVote, 'comment')):
+            total = vote_model.objects.filter(**{fk: OuterRef('pk')}).values(fk).annotate(s=Sum('value')).values('s')
+            ids = list(self.run.imported.filter(kind=kind).order_by('object_id').values_list('object_id', flat=True))
+            for start in range(0, len(ids), self.batch_size):
+                with transaction.atomic():
+                    model.objects.filter(id__in=ids[start:start + self.batch_size]).update(
+                        votes=Coalesce(Subquery(total), Value(0)))
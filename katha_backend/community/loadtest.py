@@ -0,0 +1,274 @@
+"""
+Asyncio load generator for the Katha API (see the loadtest management command).
+
+Every virtual user logs in through token/ and then loops over a traffic mix
+modelled on the frontend: the post feed in each sort mode, post detail,
+notification polling and, with probability ``write_ratio``, a vote or a comment.
+Post ids come from the feeds the user has read, so runs need nothing but a
+running server and accounts to log in with.
+
+The HTTP client is a minimal keep-alive HTTP/1.1 client on asyncio streams (one
+connection per virtual user), so the harness has no dependencies of its own.
+"""
+
+import asyncio
+import json
+import random
+import ssl
+import statistics
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
+
+SORTS = ('newest', 'oldest', 'most_voted', 'most_comments', 'trending')
+
+# Relative weights of read actions, and of write actions once a write is chosen
+READ_MIX = {'feed': 35, 'detail': 30, 'unread_count': 25, 'notifications': 10}
+WRITE_MIX = {'vote': 70, 'comment': 30}
+
+
+class HTTPError(Exception):
+    pass
+
+
+class Connection:
+    """One keep-alive HTTP/1.1 connection; reconnects when the server closes it."""
+
+    def __init__(self, base_url, timeout=30.0):
+        url = urlsplit(base_url)
+        self.host = url.hostname
+        self.tls = url.scheme == 'https'
+        self.port = url.port or (443 if self.tls else 80)
+        self.prefix = url.path.rstrip('/')
+        self.timeout = timeout
+        self.reader = self.writer = None
+
+    async def connect(self):
+        context = ssl.create_default_context() if self.tls else None
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port, ssl=context)
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except (ConnectionError, ssl.SSLError):
+                pass
+            self.reader = self.writer = None
+
+    async def request(self, method, path, body=None, token=None):
+        """Send one request and return (status, parsed JSON body or None)."""
+        payload = b'' if body is None else json.dumps(body).encode()
+        lines = [
+            f'{method} {self.prefix}{path} HTTP/1.1',
+            f'Host: {self.host}:{self.port}',
+            'Accept: application/json',
+            'Connection: keep-alive',
+            f'Content-Length: {len(payload)}',
+        ]
+        if body is not None:
+            lines.append('Content-Type: application/json')
+        if token:
+            lines.append(f'Authorization: Bearer {token}')
+        message = ('\r\n'.join(lines) + '\r\n\r\n').encode() + payload
+
+        for attempt in (1, 2):
+            if self.writer is None:
+                await self.connect()
+            try:
+                self.writer.write(message)
+                await self.writer.drain()
+                return await asyncio.wait_for(self.read_response(), self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError) as e:
+                # The server dropped an idle keep-alive connection: retry once on a new one
+                await self.close()
+                if attempt == 2:
+                    raise HTTPError(f'connection failed: {e}') from e
+            except asyncio.TimeoutError as e:
+                # The late response would be read as the next request's: drop the connection, don't retry
+                await self.close()
+                raise HTTPError(f'no response within {self.timeout:g}s') from e
+
+    async def read_response(self):
+        status_line = await self.reader.readuntil(b'\r\n')
+        status = int(status_line.split()[1])
+        headers = {}
+        while (line := await self.reader.readuntil(b'\r\n')) != b'\r\n':
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            content = bytearray()
+            while size := int((await self.reader.readuntil(b'\r\n')).split(b';')[0], 16):
+                content += await self.reader.readexactly(size)
+                await self.reader.readexactly(2)
+            await self.reader.readuntil(b'\r\n')
+        elif 'content-length' in headers:
+            content = await self.reader.readexactly(int(headers['content-length']))
+        else:
+            content = await self.reader.read()
+            headers['connection'] = 'close'
+        if headers.get('connection', '').lower() == 'close':
+            await self.close()
+
+        if content and headers.get('content-type', '').startswith('application/json'):
+            return status, json.loads(content)
+        return status, None
+
+
+@dataclass
+class EndpointStats:
+    latencies: list = field(default_factory=list)
+    statuses: dict = field(default_factory=lambda: defaultdict(int))
+    failures: int = 0  # No response at all (connection errors, timeouts)
+
+    @property
+    def requests(self):
+        return len(self.latencies) + self.failures
+
+    @property
+    def errors(self):
+        return self.failures + sum(n for code, n in self.statuses.items() if code >= 400)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method='inclusive')[pct - 1]
+
+
+@dataclass
+class LoadTestConfig:
+    base_url: str
+    credentials: list  # [(username, password)], one per virtual user, reused round-robin
+    users: int = 10
+    duration: float = 60.0
+    ramp_up: float = 5.0
+    write_ratio: float = 0.1
+    think_time: float = 0.0
+    timeout: float = 30.0
+    seed: int = None
+
+
+class LoadTest:
+    def __init__(self, config):
+        self.config = config
+        self.stats = defaultdict(EndpointStats)
+        self.rng = random.Random(config.seed)
+        self.started = self.finished = None
+
+    async def call(self, conn, label, method, path, body=None, token=None):
+        stats = self.stats[label]
+        start = time.perf_counter()
+        try:
+            status, data = await conn.request(method, path, body, token)
+        except (HTTPError, OSError, asyncio.TimeoutError, ValueError):
+            stats.failures += 1
+            return None, None
+        stats.latencies.append(time.perf_counter() - start)
+        stats.statuses[status] += 1
+        return status, data
+
+    async def login(self, conn, username, password):
+        status, data = await self.call(conn, 'POST token/', 'POST', '/api/token/',
+                                       {'username': username, 'password': password})
+        return data['access'] if status == 200 else None
+
+    async def virtual_user(self, index, deadline):
+        config = self.config
+        username, password = config.credentials[index % len(config.credentials)]
+        conn = Connection(config.base_url, config.timeout)
+        post_ids = []
+        # Spread logins over the ramp-up period
+        await asyncio.sleep(config.ramp_up * index / max(1, config.users))
+        try:
+            token = await self.login(conn, username, password)
+            while token and time.monotonic() < deadline:
+                status = await self.step(conn, token, post_ids)
+                if status == 401:
+                    # The access token expired mid-run
+                    token = await self.login(conn, username, password)
+                if config.think_time:
+                    await asyncio.sleep(self.rng.expovariate(1 / config.think_time))
+        finally:
+            await conn.close()
+
+    def choose(self, mix):
+        return self.rng.choices(list(mix), weights=list(mix.values()))[0]
+
+    async def step(self, conn, token, post_ids):
+        """Run one action of the traffic mix; returns its status code."""
+        write = post_ids and self.rng.random() < self.config.write_ratio
+        action = self.choose(WRITE_MIX if write else READ_MIX)
+        if action in ('detail', 'vote', 'comment') and not post_ids:
+            action = 'feed'
+        post_id = self.rng.choice(post_ids) if post_ids else None
+
+        if action == 'feed':
+            sort = self.rng.choice(SORTS)
+            status, data = await self.call(conn, f'GET posts/?sort={sort}', 'GET', f'/api/v1/posts/?sort={sort}',
+                                           token=token)
+            if status == 200 and isinstance(data, list):
+                post_ids[:] = [post['id'] for post in data[:50]] or post_ids
+        elif action == 'detail':
+            status, _ = await self.call(conn, 'GET posts/{id}/', 'GET', f'/api/v1/posts/{post_id}/', token=token)
+        elif action == 'unread_count':
+            status, _ = await self.call(conn, 'GET notifications/unread_count/', 'GET',
+                                        '/api/v1/notifications/unread_count/', token=token)
+        elif action == 'notifications':
+            status, _ = await self.call(conn, 'GET notifications/', 'GET', '/api/v1/notifications/', token=token)
+        elif action == 'vote':
+            status, _ = await self.call(conn, 'POST posts/{id}/vote/', 'POST', f'/api/v1/posts/{post_id}/vote/',
+                                        {'value': self.rng.choice((1, -1, 0))}, token)
+        else:
+            status, _ = await self.call(conn, 'POST comments/', 'POST', '/api/v1/comments/',
+                                        {'post': post_id, 'text': 'Load test comment'}, token)
+        return status
+
+    async def run(self):
+        self.started = time.monotonic()
+        deadline = self.started + self.config.ramp_up + self.config.duration
+        await asyncio.gather(*(self.virtual_user(i, deadline) for i in range(self.config.users)))
+        self.finished = time.monotonic()
+        return self.report()
+
+    def report(self):
+        """Per-endpoint and overall throughput, latency percentiles (ms) and error rates."""
+        elapsed = max(self.finished - self.started, 1e-9)
+
+        def summarize(stats):
+            latencies = [s * 1000 for s in stats.latencies]
+            return {
+                'requests': stats.requests,
+                'rps': round(stats.requests / elapsed, 2),
+                'errors': stats.errors,
+                'error_rate': round(stats.errors / stats.requests, 4) if stats.requests else 0.0,
+                'statuses': {str(code): n for code, n in sorted(stats.statuses.items())},
+                'p50_ms': round(percentile(latencies, 50), 2),
+                'p95_ms': round(percentile(latencies, 95), 2),
+                'p99_ms': round(percentile(latencies, 99), 2),
+                'max_ms': round(max(latencies, default=0.0), 2),
+            }
+
+        overall = EndpointStats()
+        for stats in self.stats.values():
+            overall.latencies += stats.latencies
+            overall.failures += stats.failures
+            for code, n in stats.statuses.items():
+                overall.statuses[code] += n
+        config = self.config
+        return {
+            'config': {'base_url': config.base_url, 'users': config.users, 'duration': config.duration,
+                       'ramp_up': config.ramp_up, 'write_ratio': config.write_ratio,
+                       'think_time': config.think_time, 'seed': config.seed},
+            'elapsed_seconds': round(elapsed, 2),
+            'total': summarize(overall),
+            'endpoints': {label: summarize(stats) for label, stats in sorted(self.stats.items())},
+        }
+
+
+def run_load_test(config):
+    return asyncio.run(LoadTest(config).run())
@@ -0,0 +1,35 @@
+"""
+``__search`` lookup for long text columns (what the admin's ``@field`` search prefix uses).
+
+On MySQL it becomes ``MATCH ... AGAINST`` in boolean mode, served by the FULLTEXT
+indexes from migration 0008; elsewhere it falls back to a case-insensitive LIKE.
+"""
+
+import re
+
+from django.db.models import Lookup, TextField
+from django.db.models.lookups import IContains
+
+# Characters with a meaning in MySQL's boolean full-text syntax
+_BOOLEAN_OPERATORS = re.compile(r'[+\-<>()~*"@]+')
+
+
+def boolean_query(value):
+    """Turn free text into a boolean-mode query requiring every word as a prefix."""
+    words = _BOOLEAN_OPERATORS.sub(' ', str(value)).split()
+    return ' '.join(f'+{word}*' for word in words)
+
+
+@TextField.register_lookup
+class FullTextSearch(Lookup):
+    lookup_name = 'search'
+
+    def as_sql(self, compiler, connection):
+        return IContains(self.lhs, self.rhs).as_sql(compiler, connection)
+
+    def as_mysql(self, compiler, connection):
+        query = boolean_query(self.rhs)
+        if not query:
+            return self.as_sql(compiler, connection)
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        return f'MATCH ({lhs}) AGAINST (%s IN BOOLEAN MODE)', (*lhs_params, query)
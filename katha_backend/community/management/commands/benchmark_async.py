@@ -0,0 +1,187 @@
+"""
+Django management command comparing the sync and async read views under the same worker count.
+
+--clients clients each send requests back to back until --requests have been
+served, against one of the endpoints in community.async_views:
+
+  sync   the DRF viewset on a pool of --workers threads, one request per thread
+         at a time (a gthread WSGI worker); waiting for a free thread counts
+  async  the async view on one event loop, each request in its own thread-sensitive
+         context as under Django's ASGI handler, with ASYNC_READ_WORKERS = --workers
+
+Views are called directly, without middleware. A local database answers in
+microseconds, so --db-latency-ms adds a sleep to every query to stand in for the
+round-trip to MySQL; that wait is where the sync views hold their thread. The
+report gives the queries per request of each mode: the comparison is only about
+concurrency when they are equal.
+
+Usage:
+    python manage.py benchmark_async
+    python manage.py benchmark_async --workers 4 --clients 64 --requests 1000 --db-latency-ms 2
+    python manage.py benchmark_async --path /api/v1/notifications/ --username bench_user_1
+"""
+
+import asyncio
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+from django.db.backends.signals import connection_created
+from django.test import AsyncRequestFactory, RequestFactory, override_settings
+from django.urls import Resolver404, resolve
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from community import async_views
+from community.loadtest import percentile
+
+
+class QueryDelay:
+    """execute_wrapper that counts every query and sleeps before it; installed on each connection that opens."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.installed = []
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self.lock:
+            self.count += 1
+        if self.seconds:
+            time.sleep(self.seconds)
+        return execute(sql, params, many, context)
+
+    def install(self, sender=None, connection=None, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+            self.installed.append(connection)
+
+    def __enter__(self):
+        connection_created.connect(self.install, weak=False)
+        for connection in connections.all(initialized_only=True):
+            self.install(connection=connection)
+        return self
+
+    def __exit__(self, *exc):
+        connection_created.disconnect(self.install)
+        for connection in self.installed:
+            connection.execute_wrappers.remove(self)
+
+
+class Run:
+    def __init__(self):
+        self.latencies = []
+        self.statuses = Counter()
+        self.peak_threads = threading.active_count()
+        self.queries = 0
+
+    def record(self, start, response):
+        self.latencies.append(time.perf_counter() - start)
+        self.statuses[response.status_code] += 1
+        self.peak_threads = max(self.peak_threads, threading.active_count())
+
+
+class Command(BaseCommand):
+    help = 'Compare throughput and latency of the sync and async read views with the same worker count'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/api/v1/posts/', help='GET path served by an async view')
+        parser.add_argument('--username', help='Send a JWT for this user (default: anonymous)')
+        parser.add_argument('--workers', type=int, default=4, help='Threads available to either mode')
+        parser.add_argument('--clients', type=int, default=32, help='Concurrent clients')
+        parser.add_argument('--requests', type=int, default=400, help='Requests per mode')
+        parser.add_argument('--db-latency-ms', type=float, default=1.0,
+                            help='Simulated network round-trip added to every query')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            match = resolve(path.split('?')[0])
+        except Resolver404:
+            raise CommandError(f'{path} does not resolve.')
+        if not hasattr(match.func, 'sync_view'):
+            raise CommandError(f'{path} is not served by community.async_views.')
+        headers = {}
+        if options['username']:
+            user = User.objects.filter(username=options['username']).first()
+            if user is None:
+                raise CommandError(f'No user {options["username"]!r}.')
+            headers['Authorization'] = f'Bearer {RefreshToken.for_user(user).access_token}'
+        workers, clients, total = options['workers'], options['clients'], options['requests']
+
+        self.stdout.write(f'GET {path}: {total} requests from {clients} clients, {workers} workers, '
+                          f'{options["db_latency_ms"]:g} ms simulated DB latency\n')
+        self.stdout.write(f'{"mode":<6} {"reqs":>6} {"errors":>6} {"queries":>8} {"rps":>8} {"p50 ms":>8} '
+                          f'{"p95 ms":>8} {"p99 ms":>8} {"threads":>8}')
+        with QueryDelay(options['db_latency_ms'] / 1000) as queries:
+            for mode in ('sync', 'async'):
+                view = match.func.sync_view if mode == 'sync' else match.func
+                runner = self.run_sync if mode == 'sync' else self.run_async
+                before = queries.count
+                with override_settings(ASYNC_READ_WORKERS=workers):
+                    run, wall_time = asyncio.run(self.timed(runner, view, path, headers, match.kwargs,
+                                                            workers, clients, total))
+                run.queries = queries.count - before
+                self.report(mode, run, wall_time)
+
+    async def timed(self, runner, view, path, headers, kwargs, workers, clients, total):
+        run = Run()
+        start = time.perf_counter()
+        await runner(run, view, path, headers, kwargs, workers, clients, total)
+        return run, time.perf_counter() - start
+
+    async def clients(self, count, total, send):
+        remaining = iter(range(total))
+
+        async def client():
+            for _ in remaining:
+                await send()
+        await asyncio.gather(*(client() for _ in range(count)))
+
+    async def run_sync(self, run, view, path, headers, kwargs, workers, clients, total):
+        factory = RequestFactory()
+
+        def handle():
+            try:
+                response = view(factory.get(path, headers=headers), **kwargs)
+                response.render()
+                return response
+            finally:
+                close_old_connections()
+
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='sync-worker') as pool:
+            async def send():
+                start = time.perf_counter()
+                run.record(start, await loop.run_in_executor(pool, handle))
+            await self.clients(clients, total, send)
+
+    async def run_async(self, run, view, path, headers, kwargs, workers, clients, total):
+        factory = AsyncRequestFactory()
+        # The read pool is sized when it starts: start a fresh one with --workers threads
+        async_views.shutdown_executor()
+
+        async def send():
+            start = time.perf_counter()
+            async with ThreadSensitiveContext():
+                response = await view(factory.get(path, headers=headers), **kwargs)
+                await sync_to_async(close_old_connections)()
+            run.record(start, response)
+        try:
+            await self.clients(clients, total, send)
+        finally:
+            async_views.shutdown_executor()
+
+    def report(self, mode, run, wall_time):
+        latencies = [value * 1000 for value in run.latencies]
+        errors = sum(count for status, count in run.statuses.items() if status >= 400)
+        self.stdout.write(
+            f'{mode:<6} {len(latencies):>6} {errors:>6} {run.queries / max(len(latencies), 1):>8.1f} '
+            f'{len(latencies) / wall_time:>8.1f} '
+            f'{percentile(latencies, 50):>8.1f} {percentile(latencies, 95):>8.1f} '
+            f'{percentile(latencies, 99):>8.1f} {run.peak_threads:>8}')
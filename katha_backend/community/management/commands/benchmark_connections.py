@@ -0,0 +1,126 @@
+"""
+Django management command comparing per-request latency across connection strategies.
+
+Each request goes through the full Django handler stack, followed by the same
+close_old_connections() call Django makes when a real request finishes (the test
+client skips it), so connections are closed or kept exactly as in production:
+
+  fresh                 CONN_MAX_AGE = 0, a new connection per request
+  persistent            CONN_MAX_AGE > 0, requests on one long-lived thread (WSGI worker)
+  persistent-new-thread CONN_MAX_AGE > 0, every request on a new thread (ASGI-style churn)
+  pooled-new-thread     pooled backend, every request on a new thread (MySQL pooled backend only)
+
+Usage:
+    python manage.py benchmark_connections
+    python manage.py benchmark_connections --requests 500 --path /api/v1/posts/1/
+"""
+
+import statistics
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+from django.db.backends.signals import connection_created
+from django.test import Client, override_settings
+
+from community.db.pool import CHECKOUTS, close_all_pools
+
+
+class Command(BaseCommand):
+    help = 'Compare per-request latency with fresh, persistent and pooled database connections'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests per mode')
+        parser.add_argument('--path', help='GET path to request (default: profile of the first user)')
+        parser.add_argument('--database', default='default', help='Database alias to tune')
+
+    def handle(self, *args, **options):
+        alias = options['database']
+        path = options['path']
+        if not path:
+            user = User.objects.order_by('id').first()
+            if user is None:
+                raise CommandError('No users yet: pass --path or run seed_benchmark_data first.')
+            path = f'/api/v1/user/{user.username}/'
+
+        settings_dict = connections.settings[alias]
+        original = {key: settings_dict.get(key) for key in ('CONN_MAX_AGE', 'POOL')}
+        supports_pool = hasattr(connections[alias], 'pool')
+
+        modes = [
+            ('fresh', {'CONN_MAX_AGE': 0, 'POOL': {}}, False),
+            ('persistent', {'CONN_MAX_AGE': 600, 'POOL': {}}, False),
+            ('persistent-new-thread', {'CONN_MAX_AGE': 600, 'POOL': {}}, True),
+        ]
+        if supports_pool:
+            pool = dict(original['POOL'] or {})
+            pool['MAX_SIZE'] = pool.get('MAX_SIZE') or 4
+            modes.append(('pooled-new-thread', {'CONN_MAX_AGE': 0, 'POOL': pool}, True))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f'{alias!r} does not use the pooled backend (set DB_POOL_SIZE on MySQL); skipping pooled mode.'))
+
+        self.stdout.write(f'GET {path}, {options["requests"]} requests per mode, database {alias!r}\n')
+        self.stdout.write(f'{"mode":<24}{"mean ms":>10}{"p50 ms":>10}{"p95 ms":>10}{"opened":>10}')
+        try:
+            with override_settings(ALLOWED_HOSTS=['testserver']):
+                for name, overrides, new_thread in modes:
+                    settings_dict.update(overrides)
+                    connections.close_all()
+                    close_all_pools()
+                    pooled_opens = CHECKOUTS.value(alias=alias, reused='false')
+                    timings, connects = self.run_mode(path, options['requests'], new_thread)
+                    if overrides['POOL']:
+                        # With the pool, Django "connects" on every checkout; count real handshakes instead
+                        connects = CHECKOUTS.value(alias=alias, reused='false') - pooled_opens
+                    timings.sort()
+                    self.stdout.write(
+                        f'{name:<24}{statistics.mean(timings):>10.2f}{timings[len(timings) // 2]:>10.2f}'
+                        f'{timings[int(len(timings) * 0.95) - 1]:>10.2f}{connects:>10}'
+                    )
+        finally:
+            settings_dict.update(original)
+            connections.close_all()
+            close_all_pools()
+
+    def run_mode(self, path, count, new_thread):
+        """Return (per-request latencies in ms, connections set up by Django)."""
+        client = Client()
+        timings = []
+        connects = 0
+
+        def on_connect(**kwargs):
+            nonlocal connects
+            connects += 1
+
+        def one_request():
+            start = time.perf_counter()
+            response = client.get(path)
+            close_old_connections()
+            timings.append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 400:
+                raise CommandError(f'GET {path} returned {response.status_code}')
+
+        def one_request_then_exit():
+            one_request()
+            # A thread that ends takes its persistent connection with it
+            connections.close_all()
+
+        connection_created.connect(on_connect)
+        # Warm up imports, URL resolution and the pool outside the measurement
+        one_request()
+        timings.clear()
+        connects = 0
+        try:
+            for _ in range(count):
+                if new_thread:
+                    thread = threading.Thread(target=one_request_then_exit)
+                    thread.start()
+                    thread.join()
+                else:
+                    one_request()
+        finally:
+            connection_created.disconnect(on_connect)
+        return timings, connects
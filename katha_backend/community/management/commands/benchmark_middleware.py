@@ -0,0 +1,133 @@
+"""
+Django management command measuring the per-request cost of the middleware stack.
+
+Requests go through settings.MIDDLEWARE to a view that does nothing, so the time
+per request is the middleware's. The stack is built twice:
+
+  stock  with Django's session, CSRF, auth and messages middleware, as before
+         LEAN_MIDDLEWARE_PATHS
+  lean   as configured, where those four skip API paths
+
+Each stack serves --requests requests per round, alternating, for --rounds rounds,
+against an API path and a browser path (whose cost should not change). The median
+round is reported. --session-cookie sends a session cookie, as a browser that has
+logged into the admin does with every API call; its view then reads request.user,
+which loads the session and the user on the stock stack.
+
+Usage:
+    python manage.py benchmark_middleware
+    python manage.py benchmark_middleware --requests 20000 --rounds 7
+    python manage.py benchmark_middleware --session-cookie  # needs the session and user tables
+"""
+
+import statistics
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.core.handlers.base import BaseHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.urls import re_path
+
+# Django's own classes behind community.middleware's browser-only ones
+STOCK_MIDDLEWARE = {
+    'community.middleware.SessionMiddleware': 'django.contrib.sessions.middleware.SessionMiddleware',
+    'community.middleware.CsrfViewMiddleware': 'django.middleware.csrf.CsrfViewMiddleware',
+    'community.middleware.AuthenticationMiddleware': 'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'community.middleware.MessageMiddleware': 'django.contrib.messages.middleware.MessageMiddleware',
+}
+
+
+def noop(request):
+    # Reading request.user is where the stock stack loads the session and the user
+    user = getattr(request, 'user', None)
+    if user is not None:
+        user.is_authenticated
+    return HttpResponse(b'{}', content_type='application/json')
+
+
+# The requests resolve against this module instead of config.urls
+urlpatterns = [re_path(r'', noop)]
+
+
+def build_handler(middleware):
+    with override_settings(MIDDLEWARE=middleware):
+        handler = BaseHandler()
+        handler.load_middleware()
+    return handler
+
+
+def time_requests(handler, factory, path, count, cookies):
+    requests = []
+    for _ in range(count):
+        request = factory.get(path, secure=True)
+        request.COOKIES.update(cookies)
+        request.urlconf = __name__
+        requests.append(request)
+    started = time.perf_counter()
+    for request in requests:
+        handler.get_response(request)
+    return (time.perf_counter() - started) / count
+
+
+class Command(BaseCommand):
+    help = 'Compare per-request middleware overhead with and without the lean API middleware'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=5000, help='Requests per stack per round')
+        parser.add_argument('--rounds', type=int, default=5, help='Rounds; the median is reported')
+        parser.add_argument('--api-path', default='/api/v1/posts/', help='A path under LEAN_MIDDLEWARE_PATHS')
+        parser.add_argument('--browser-path', default='/admin/', help='A path that keeps the full stack')
+        parser.add_argument('--session-cookie', action='store_true',
+                            help='Send the cookie of a logged-in session with every request')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['rounds'] < 1:
+            raise CommandError('--requests and --rounds must be positive.')
+        lean = list(settings.MIDDLEWARE)
+        stock = [STOCK_MIDDLEWARE.get(path, path) for path in lean]
+        if stock == lean:
+            raise CommandError('settings.MIDDLEWARE has none of the browser-only middleware to compare.')
+        stacks = {'stock': build_handler(stock), 'lean': build_handler(lean)}
+        session = self.logged_in_session() if options['session_cookie'] else None
+        cookies = {settings.SESSION_COOKIE_NAME: session.session_key} if session else {}
+
+        try:
+            results = self.compare(stacks, cookies, options)
+        finally:
+            if session is not None:
+                session.delete()
+
+        self.stdout.write(f'{len(lean)} middleware, {options["requests"]} requests x {options["rounds"]} rounds'
+                          f'{", with a session cookie" if cookies else ""}')
+        self.stdout.write(f'  {"path":<24} {"stock µs":>10} {"lean µs":>10} {"saved":>8}')
+        for path, times in results.items():
+            saved = 1 - times['lean'] / times['stock']
+            self.stdout.write(f'  {path:<24} {times["stock"] * 1e6:>10.1f} {times["lean"] * 1e6:>10.1f} {saved:>8.0%}')
+
+    def compare(self, stacks, cookies, options):
+        factory = RequestFactory()
+        results = {}
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            for path in (options['api_path'], options['browser_path']):
+                for handler in stacks.values():
+                    time_requests(handler, factory, path, min(options['requests'], 100), cookies)  # warm up
+                rounds = {name: [] for name in stacks}
+                for _ in range(options['rounds']):
+                    for name, handler in stacks.items():
+                        rounds[name].append(time_requests(handler, factory, path, options['requests'], cookies))
+                results[path] = {name: statistics.median(times) for name, times in rounds.items()}
+        return results
+
+    def logged_in_session(self):
+        user = get_user_model().objects.order_by('pk').first()
+        if user is None:
+            raise CommandError('--session-cookie needs at least one user to log in as.')
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session.update({SESSION_KEY: str(user.pk), BACKEND_SESSION_KEY: settings.AUTHENTICATION_BACKENDS[0],
+                        HASH_SESSION_KEY: user.get_session_auth_hash()})
+        session.create()
+        return session
@@ -0,0 +1,42 @@
+"""
+Django management command that precomputes each post's related posts.
+
+See community.related. Without options every list is rebuilt; --incremental only
+computes the lists of posts created or edited since the last build and folds them
+into their matches' lists (it does a full build when there has been none). Meant to
+run from cron, e.g.:
+
+    */10 * * * * python manage.py build_related_posts --incremental
+    15 3 * * *   python manage.py build_related_posts
+
+Needs numpy and scipy.
+
+Usage:
+    python manage.py build_related_posts
+    python manage.py build_related_posts --incremental
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from community import related
+
+
+class Command(BaseCommand):
+    help = "Precompute every post's most similar posts by text"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--incremental', action='store_true',
+                            help='Only fold in posts created or edited since the last build')
+
+    def handle(self, *args, **options):
+        try:
+            result = related.build(full=not options['incremental'], progress=self.report)
+        except ImportError as exc:
+            raise CommandError(str(exc)) from exc
+        run = result.build
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Full" if run.full else "Incremental"} build: {run.updated} related lists written '
+            f'for {run.posts} posts in {result.seconds:.1f}s.'))
+
+    def report(self, done, total):
+        self.stdout.write(f'  {done}/{total} posts')
@@ -0,0 +1,58 @@
+"""
+Django management command that folds hourly engagement rollups into daily ones.
+
+Hourly PostActivity rows of days older than --days are summed into one daily row
+per post and day, in short chunked transactions. Meant to run from cron, e.g.:
+
+    30 0 * * * python manage.py compact_activity --max-minutes 20
+
+--backfill-days rebuilds the rollups of the last N days from votes, comments and
+saves first (after the first deploy, or to repair drift), then compacts.
+
+Usage:
+    python manage.py compact_activity
+    python manage.py compact_activity --days 3 --batch-size 500 --pause 0.1
+    python manage.py compact_activity --backfill-days 90
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from community.rollups import backfill, compact
+
+
+class Command(BaseCommand):
+    help = 'Compact hourly engagement rollups into daily buckets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=getattr(settings, 'ACTIVITY_HOURLY_RETENTION_DAYS', 7),
+                            help='Keep hourly rows for this many days')
+        parser.add_argument('--backfill-days', type=int,
+                            help='First rebuild the rollups of this many days from the source tables')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Hourly rows in the first chunk')
+        parser.add_argument('--target-ms', type=int, default=500,
+                            help='Chunk size adapts so one chunk transaction takes about this long')
+        parser.add_argument('--pause', type=float, default=0.05, help='Seconds to sleep between chunks')
+        parser.add_argument('--max-minutes', type=float, help='Stop after this long; the next run carries on')
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError('--days must be at least 1.')
+        now = timezone.now()
+
+        if options['backfill_days']:
+            rows = backfill(now - timedelta(days=options['backfill_days']))
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} hourly rollup rows.'))
+
+        result = compact(
+            now - timedelta(days=options['days']),
+            batch_size=options['batch_size'],
+            target_seconds=options['target_ms'] / 1000,
+            pause=options['pause'],
+            max_seconds=options['max_minutes'] * 60 if options['max_minutes'] else None,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Compacted {result.rows} hourly rows in {result.chunks} chunks ({result.seconds:.1f}s).'))
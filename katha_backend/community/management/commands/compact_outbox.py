@@ -0,0 +1,48 @@
+"""
+Django management command that compacts the outbox event log (community.outbox).
+
+Of the events every consumer has processed, drops those a later event for the same
+row supersedes, and delete events older than --tombstone-days, in short chunked
+transactions. What remains is the latest state of every row, enough to replay.
+Meant to run from cron, e.g. nightly:
+
+    45 3 * * * python manage.py compact_outbox --max-minutes 20
+
+Usage:
+    python manage.py compact_outbox
+    python manage.py compact_outbox --tombstone-days 30 --batch-size 500 --pause 0.1
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from community import outbox
+from community.models import OutboxEvent
+
+
+class Command(BaseCommand):
+    help = 'Drop superseded and expired events from the outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tombstone-days', type=int,
+                            default=getattr(settings, 'OUTBOX_TOMBSTONE_RETENTION_DAYS', 7),
+                            help='Keep delete events for this many days')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Events in the first chunk')
+        parser.add_argument('--target-ms', type=int, default=500,
+                            help='Chunk size adapts so one chunk transaction takes about this long')
+        parser.add_argument('--pause', type=float, default=0.05, help='Seconds to sleep between chunks')
+        parser.add_argument('--max-minutes', type=float, help='Stop after this long; the next run carries on')
+
+    def handle(self, *args, **options):
+        if options['tombstone_days'] < 0:
+            raise CommandError('--tombstone-days cannot be negative.')
+        result = outbox.compact(
+            tombstone_days=options['tombstone_days'],
+            batch_size=options['batch_size'],
+            target_seconds=options['target_ms'] / 1000,
+            pause=options['pause'],
+            max_seconds=options['max_minutes'] * 60 if options['max_minutes'] else None,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Dropped {result.rows} outbox events in {result.chunks} chunks ({result.seconds:.1f}s); '
+            f'{OutboxEvent.objects.count()} left, consumers are past event {outbox.horizon()}.'))
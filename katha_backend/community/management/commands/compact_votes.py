@@ -0,0 +1,97 @@
+"""
+Django management command reporting on, and compacting, the vote tables.
+
+Without options it reports the size of each vote table and its indexes and the
+median and p95 latency of a viewer's votes on a page of --page-size targets and of
+one target's vote total, sampled --samples times over recent votes.
+
+--apply (MySQL only) makes (user, post) and (user, comment) the tables' primary
+keys with an online rebuild, then reports again; --revert undoes it. This is what
+shrinks the tables: the migrated schema alone is slightly larger than before
+migration 0017. See community.vote_storage for what changes and when to revert.
+
+Usage:
+    python manage.py compact_votes
+    python manage.py compact_votes --table vote --samples 1000
+    python manage.py compact_votes --apply --dry-run   # print the ALTER statements
+    python manage.py compact_votes --apply --lock-wait-timeout 2
+    python manage.py compact_votes --revert            # before migrating the vote tables
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+from community import vote_storage
+
+
+def megabytes(size):
+    return f'{size / 2 ** 20:.1f} MB'
+
+
+class Command(BaseCommand):
+    help = 'Report vote table sizes and lookup latency; optionally cluster them by (user, target)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--table', choices=sorted(vote_storage.VOTE_TABLES), action='append',
+                            help='Only this table (repeatable; default: both)')
+        action = parser.add_mutually_exclusive_group()
+        action.add_argument('--apply', action='store_true', help='Cluster the tables by (user, target) (MySQL)')
+        action.add_argument('--revert', action='store_true', help='Cluster the tables by id again (MySQL)')
+        parser.add_argument('--dry-run', action='store_true', help='Print the statements --apply/--revert would run')
+        parser.add_argument('--lock-wait-timeout', type=int, default=5,
+                            help='Seconds the rebuild waits for the metadata lock before giving up')
+        parser.add_argument('--samples', type=int, default=200, help='Lookups timed per query')
+        parser.add_argument('--page-size', type=int, default=25, help='Targets per viewer lookup')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        if options['samples'] < 1 or options['page_size'] < 1:
+            raise CommandError('--samples and --page-size must be positive.')
+        names = options['table'] or sorted(vote_storage.VOTE_TABLES)
+        using = options['database']
+        vendor = connections[using].vendor
+        rebuilding = options['apply'] or options['revert']
+        if rebuilding and vendor != 'mysql':
+            raise CommandError(f'Only MySQL clusters tables by their primary key; nothing to change on {vendor}.')
+        if options['dry_run'] and not rebuilding:
+            raise CommandError('--dry-run goes with --apply or --revert.')
+
+        if not options['dry_run']:
+            self.report(names, using, options, 'Before' if rebuilding else None)
+        if not rebuilding:
+            return
+        for name in names:
+            try:
+                sql = vote_storage.rebuild(name, clustered=options['apply'], using=using, dry_run=options['dry_run'],
+                                           lock_wait_timeout=options['lock_wait_timeout'])
+            except DatabaseError as exc:
+                raise CommandError(f'{name}: {exc}') from exc
+            if sql is None:
+                self.stdout.write(f'{name}: already clustered by {"(user, target)" if options["apply"] else "id"}.')
+            elif options['dry_run']:
+                self.stdout.write(f'{sql};')
+            else:
+                self.stdout.write(self.style.SUCCESS(f'{name}: rebuilt.'))
+        if not options['dry_run']:
+            self.report(names, using, options, 'After')
+
+    def report(self, names, using, options, heading):
+        if heading:
+            self.stdout.write(f'{heading}:')
+        for name in names:
+            model, target, *_ = vote_storage.VOTE_TABLES[name]
+            self.stdout.write(f'{name} ({model._meta.db_table}), {model.objects.using(using).count()} rows')
+            sizes = vote_storage.storage_sizes(model, using)
+            if sizes is None:
+                self.stdout.write('  sizes: not available on this database')
+            else:
+                for index, size in sorted(sizes.items(), key=lambda item: -item[1]):
+                    self.stdout.write(f'  {index:<56} {megabytes(size):>10}')
+                self.stdout.write(f'  {"total":<56} {megabytes(sum(sizes.values())):>10}')
+            latency = vote_storage.lookup_latency(model, target, options['samples'], options['page_size'], using)
+            if latency is None:
+                self.stdout.write('  latency: no votes to sample')
+                continue
+            for query, (p50, p95) in latency.items():
+                label = f'viewer votes on {options["page_size"]} {target}s' if query == 'viewer' else f'one {target} total'
+                self.stdout.write(f'  {label:<56} p50 {p50:.3f} ms  p95 {p95:.3f} ms')
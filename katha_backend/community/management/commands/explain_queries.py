@@ -0,0 +1,49 @@
+"""
+Django management command that EXPLAINs the hot read queries against the configured database.
+
+Requests every case in community.query_plans.PLAN_CASES in-process, EXPLAINs each
+SELECT the endpoint ran and prints the plans per endpoint, marking full scans and
+sorts. Exits with an error when a plan has an issue its case does not allow, so it
+can gate a deploy against a MySQL copy seeded with seed_benchmark_data.
+
+Usage:
+    python manage.py explain_queries
+    python manage.py explain_queries --case post-list --output plans.txt
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from community.query_plans import PLAN_CASES, format_report, run_cases
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the SQL of the hot endpoints and fail on unexpected full scans or sorts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--case', help='Only cases whose label contains this text')
+        parser.add_argument('--output', help='Write the report to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        cases = [case for case in PLAN_CASES if not options['case'] or options['case'] in case.label]
+        if not cases:
+            raise CommandError(f'No plan case matches {options["case"]!r}.')
+        # The in-process test client calls itself 'testserver'
+        try:
+            with override_settings(ALLOWED_HOSTS=['testserver'], THROTTLE_POLICIES={}):
+                results = run_cases(cases)
+        except LookupError as e:
+            raise CommandError(str(e))
+        report = format_report(results, connection.vendor)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                fh.write(report)
+            self.stdout.write(f'Report written to {options["output"]}')
+        else:
+            self.stdout.write(report)
+
+        failed = [result.case.label for result in results if result.unexpected]
+        if failed:
+            raise CommandError(f'Unexpected full scans or sorts in: {", ".join(failed)}')
+        self.stdout.write(self.style.SUCCESS(f'{len(results)} cases, every hot query uses an index.'))
@@ -0,0 +1,78 @@
+"""
+Django management command that bulk imports posts, comments and votes from NDJSON.
+
+See community.imports for the record format. Each chunk of --chunk-size lines is
+one transaction, written with bulk_create in batches of --batch-size rows, and
+commits the run's progress with it. Run the same command again (same --name) after
+an interruption and it carries on from the first chunk that did not commit.
+
+Usage:
+    python manage.py import_community dump.ndjson
+    python manage.py import_community posts.ndjson --type post --create-users
+    python manage.py import_community dump.ndjson --chunk-size 20000 --batch-size 2000
+    python manage.py import_community dump.ndjson --name forum-2024  # resumes forum-2024 if it stopped
+"""
+
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from community import feeds
+from community.imports import RECORD_TYPES, Importer
+from community.models import ImportRun
+
+
+class Command(BaseCommand):
+    help = 'Bulk import posts, comments and votes from an NDJSON file, resuming where a previous run stopped'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='NDJSON file, one record per line')
+        parser.add_argument('--name', help='Name of the run, used to resume it (default: the file name)')
+        parser.add_argument('--type', choices=RECORD_TYPES, help='Type of the records that have none')
+        parser.add_argument('--create-users', action='store_true',
+                            help='Create authors and voters that do not exist (with unusable passwords)')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Input lines per transaction')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk_create INSERT')
+        parser.add_argument('--restart', action='store_true', help='Forget the progress of a run with this name')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.isfile(path):
+            raise CommandError(f'No such file: {path}')
+        if options['chunk_size'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--chunk-size and --batch-size must be positive.')
+        name = options['name'] or os.path.basename(path)
+        if options['restart']:
+            ImportRun.objects.filter(name=name).delete()
+        run, created = ImportRun.objects.get_or_create(name=name, defaults={'source': path})
+        if run.finished_at:
+            raise CommandError(f'Import {name} finished at {run.finished_at:%Y-%m-%d %H:%M}; '
+                               'pass --restart to import the file again.')
+        if not created:
+            self.stdout.write(f'Resuming {name} after line {run.lines}.')
+
+        self.size = os.path.getsize(path) or 1
+        importer = Importer(
+            run,
+            create_users=options['create_users'],
+            chunk_size=options['chunk_size'],
+            batch_size=options['batch_size'],
+            default_type=options['type'],
+            progress=self.report,
+            warn=lambda message: self.stderr.write(message),
+        )
+        with open(path, 'rb') as fh:
+            stats = importer.import_file(fh)
+        if feeds.enabled():
+            feeds.mark_stale()
+
+        rows = ', '.join(f'{count} {kind}s' for kind, count in sorted(stats.rows.items())) or 'nothing'
+        skipped = ', '.join(f'{count} {kind}' for kind, count in sorted(stats.skipped.items())) or 'none'
+        self.stdout.write(self.style.SUCCESS(f'Imported {rows} from {run.lines} lines; skipped: {skipped}.'))
+
+    def report(self, importer):
+        stats = importer.stats
+        rows = sum(stats.rows.values())
+        rate = importer.written / stats.seconds if stats.seconds else 0
+        self.stdout.write(f'  {stats.lines} lines ({importer.run.offset / self.size:.0%}), '
+                          f'{rows} rows, {rate:,.0f} rows/s')
@@ -0,0 +1,94 @@
+"""
+Django management command that load-tests a running Katha server over HTTP.
+
+Virtual users log in and replay a frontend-like traffic mix (feeds in every sort
+mode, post detail, notification polling, votes and comments) for --duration
+seconds; see community.loadtest. Seed accounts first, e.g. with
+seed_benchmark_data, and point --base-url at a server running the real stack
+(gunicorn + MySQL), not at production.
+
+Prints throughput, p50/p95/p99 latency and error rates per endpoint; --output
+writes the same report as JSON and --baseline compares against an earlier one.
+
+Usage:
+    python manage.py loadtest --base-url http://127.0.0.1:8000 --users 50 --duration 120
+    python manage.py loadtest --write-ratio 0.3 --think-ms 500 --output run.json
+    python manage.py loadtest --username alice --username bob --password secret
+    python manage.py loadtest --output after.json --baseline before.json
+"""
+
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from community.loadtest import LoadTestConfig, run_load_test
+
+
+class Command(BaseCommand):
+    help = 'Drive a running server with concurrent virtual users and report latency percentiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000', help='Server to load')
+        parser.add_argument('--users', type=int, default=10, help='Concurrent virtual users')
+        parser.add_argument('--duration', type=float, default=60, help='Seconds of load after ramp-up')
+        parser.add_argument('--ramp-up', type=float, default=5, help='Seconds over which users log in')
+        parser.add_argument('--write-ratio', type=float, default=0.1,
+                            help='Share of actions that vote or comment (0-1)')
+        parser.add_argument('--think-ms', type=float, default=0,
+                            help='Mean pause between a user\'s actions (exponentially distributed)')
+        parser.add_argument('--timeout', type=float, default=30, help='Seconds before a request counts as failed')
+        parser.add_argument('--seed', type=int, help='Random seed for a repeatable traffic mix')
+        parser.add_argument('--username', action='append', default=[],
+                            help='Account to log in with (repeatable); default: seeded bench_* users')
+        parser.add_argument('--user-prefix', default='bench_', help='Prefix of accounts looked up locally')
+        parser.add_argument('--password', default='benchpass123', help='Password of the accounts')
+        parser.add_argument('--output', help='Write the report as JSON to this file')
+        parser.add_argument('--baseline', help='JSON report of an earlier run to compare against')
+
+    def handle(self, *args, **options):
+        if not 0 <= options['write_ratio'] <= 1:
+            raise CommandError('--write-ratio must be between 0 and 1.')
+        usernames = options['username'] or list(
+            User.objects.filter(username__startswith=options['user_prefix'])
+            .order_by('id').values_list('username', flat=True)[:options['users']])
+        if not usernames:
+            raise CommandError('No accounts to log in with: pass --username or run seed_benchmark_data first.')
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as fh:
+                baseline = json.load(fh)
+
+        config = LoadTestConfig(
+            base_url=options['base_url'],
+            credentials=[(username, options['password']) for username in usernames],
+            users=options['users'],
+            duration=options['duration'],
+            ramp_up=options['ramp_up'],
+            write_ratio=options['write_ratio'],
+            think_time=options['think_ms'] / 1000,
+            timeout=options['timeout'],
+            seed=options['seed'],
+        )
+        self.stdout.write(f'{config.users} users against {config.base_url} for {config.duration:.0f}s '
+                          f'(+{config.ramp_up:.0f}s ramp-up), {config.write_ratio:.0%} writes')
+        report = run_load_test(config)
+        self.print_report(report, baseline)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(f'Report written to {options["output"]}')
+
+    def print_report(self, report, baseline=None):
+        rows = [*report['endpoints'].items(), ('TOTAL', report['total'])]
+        before = dict(baseline['endpoints'], TOTAL=baseline['total']) if baseline else {}
+        self.stdout.write(f'\n{"endpoint":<36} {"reqs":>7} {"rps":>8} {"err%":>6} '
+                          f'{"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8}')
+        for label, row in rows:
+            line = (f'{label:<36} {row["requests"]:>7} {row["rps"]:>8.1f} {row["error_rate"]:>6.1%} '
+                    f'{row["p50_ms"]:>8.1f} {row["p95_ms"]:>8.1f} {row["p99_ms"]:>8.1f}')
+            if label in before:
+                old = before[label]
+                line += f'   rps {row["rps"] - old["rps"]:+.1f}, p95 {row["p95_ms"] - old["p95_ms"]:+.1f} ms'
+            style = self.style.ERROR if row['error_rate'] > 0.01 else (lambda text: text)
+            self.stdout.write(style(line))
@@ -0,0 +1,85 @@
+"""
+Django management command to inspect request profiles (see community.profiling).
+
+Without arguments it lists the stored profiles, newest first. With an id it shows
+the profile's hottest functions and the SQL the request ran. --hot shows the
+frames most often on the stack in sampled requests, per endpoint.
+
+Usage:
+    python manage.py profiles
+    python manage.py profiles 20260310-142501-1a2b3c4d --limit 40
+    python manage.py profiles --hot --endpoint post-list
+    python manage.py profiles --clear
+"""
+
+import io
+import json
+import pstats
+import shutil
+
+from django.core.management.base import BaseCommand, CommandError
+
+from community.profiling import SAMPLED_DIR, hot_frames, parse_collapsed, profile_dir, sampled_stacks
+
+
+class Command(BaseCommand):
+    help = 'List and show stored request profiles and sampled hot frames'
+
+    def add_arguments(self, parser):
+        parser.add_argument('profile_id', nargs='?', help='Profile to show')
+        parser.add_argument('--limit', type=int, default=25, help='Functions or frames to show')
+        parser.add_argument('--sort', default='cumulative', help='pstats sort key for cProfile profiles')
+        parser.add_argument('--hot', action='store_true', help='Show hot frames of sampled requests')
+        parser.add_argument('--endpoint', help='With --hot: only this endpoint (e.g. post-list)')
+        parser.add_argument('--clear', action='store_true', help='Delete every stored profile and sample')
+
+    def handle(self, *args, **options):
+        root = profile_dir()
+        if options['clear']:
+            shutil.rmtree(root, ignore_errors=True)
+            self.stdout.write(self.style.SUCCESS(f'Cleared {root}.'))
+        elif options['hot']:
+            self.show_hot(options['endpoint'], options['limit'])
+        elif options['profile_id']:
+            self.show(root / options['profile_id'], options['limit'], options['sort'])
+        else:
+            self.list(root)
+
+    def list(self, root):
+        metas = sorted(root.glob('*/meta.json'), reverse=True) if root.is_dir() else []
+        if not metas:
+            self.stdout.write('No stored profiles.')
+        for path in metas:
+            meta = json.loads(path.read_text())
+            self.stdout.write(f'{meta["id"]}  {meta["mode"]:<8} {meta["status"]} {meta["method"]:<6} '
+                              f'{meta["path"]}  {meta["wall_ms"]:.1f} ms, {len(meta["queries"])} queries')
+
+    def show(self, path, limit, sort):
+        if path.name == SAMPLED_DIR or not (path / 'meta.json').is_file():
+            raise CommandError(f'No profile {path.name!r} in {path.parent}.')
+        meta = json.loads((path / 'meta.json').read_text())
+        self.stdout.write(f'{meta["method"]} {meta["path"]} ({meta["view"]}) -> {meta["status"]}: '
+                          f'{meta["wall_ms"]:.1f} ms, {len(meta["queries"])} queries in {meta["db_ms"]:.1f} ms\n')
+        if meta['mode'] == 'cprofile':
+            out = io.StringIO()
+            pstats.Stats(str(path / 'profile.pstats'), stream=out).sort_stats(sort).print_stats(limit)
+            self.stdout.write(out.getvalue())
+        else:
+            self.print_frames(parse_collapsed((path / 'stacks.collapsed').read_text()), limit)
+        self.stdout.write('\nSQL:')
+        for query in meta['queries']:
+            self.stdout.write(f'  [{query["alias"]}] {query["ms"]:8.2f} ms  {query["sql"]}')
+
+    def show_hot(self, endpoint, limit):
+        stacks = sampled_stacks(endpoint)
+        if not stacks:
+            self.stdout.write('No sampled requests yet (is PROFILING_SAMPLE_RATE set?).')
+        for name, endpoint_stacks in sorted(stacks.items()):
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{name} ({sum(endpoint_stacks.values())} samples)'))
+            self.print_frames(endpoint_stacks, limit)
+
+    def print_frames(self, stacks, limit):
+        samples = sum(stacks.values()) or 1
+        self.stdout.write(f'  {"self":>6} {"total":>6}  frame')
+        for frame, own, total in hot_frames(stacks, limit):
+            self.stdout.write(f'  {own / samples:>6.1%} {total / samples:>6.1%}  {frame}')
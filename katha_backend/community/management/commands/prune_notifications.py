@@ -0,0 +1,77 @@
+"""
+Django management command that keeps the Notification table small.
+
+Read notifications older than --days are moved to ArchivedNotification (or
+deleted with --delete) in short chunked transactions; archived rows older than
+--purge-archived-days are dropped. Meant to run from cron, e.g. nightly:
+
+    15 3 * * * python manage.py prune_notifications --max-minutes 30
+
+Usage:
+    python manage.py prune_notifications
+    python manage.py prune_notifications --days 30 --batch-size 500 --pause 0.2
+    python manage.py prune_notifications --delete  # Drop instead of archiving
+    python manage.py prune_notifications --purge-archived-days 365
+    python manage.py prune_notifications --dry-run
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from community.models import ArchivedNotification, Notification
+from community.retention import archive_read_notifications, purge_archived_notifications
+
+
+class Command(BaseCommand):
+    help = 'Archive or delete old read notifications in small chunked transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=getattr(settings, 'NOTIFICATION_RETENTION_DAYS', 90),
+                            help='Keep read notifications newer than this many days in the hot table')
+        parser.add_argument('--delete', action='store_true', help='Delete expired notifications instead of archiving')
+        parser.add_argument('--purge-archived-days', type=int,
+                            default=getattr(settings, 'NOTIFICATION_ARCHIVE_RETENTION_DAYS', None),
+                            help='Also delete archived notifications archived more than this many days ago')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows in the first chunk')
+        parser.add_argument('--target-ms', type=int, default=500,
+                            help='Chunk size adapts so one chunk transaction takes about this long')
+        parser.add_argument('--pause', type=float, default=0.05, help='Seconds to sleep between chunks')
+        parser.add_argument('--max-minutes', type=float, help='Stop after this long; the next run carries on')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many rows would be handled')
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError('--days must be at least 1.')
+        now = timezone.now()
+        cutoff = now - timedelta(days=options['days'])
+        archive_cutoff = None
+        if options['purge_archived_days'] is not None:
+            archive_cutoff = now - timedelta(days=options['purge_archived_days'])
+
+        if options['dry_run']:
+            expired = Notification.objects.filter(read=True, created_at__lt=cutoff).count()
+            verb = 'delete' if options['delete'] else 'archive'
+            self.stdout.write(f'Would {verb} {expired} read notifications created before {cutoff:%Y-%m-%d %H:%M}.')
+            if archive_cutoff is not None:
+                purged = ArchivedNotification.objects.filter(archived_at__lt=archive_cutoff).count()
+                self.stdout.write(f'Would purge {purged} archived notifications.')
+            return
+
+        chunking = {
+            'batch_size': options['batch_size'],
+            'target_seconds': options['target_ms'] / 1000,
+            'pause': options['pause'],
+            'max_seconds': options['max_minutes'] * 60 if options['max_minutes'] else None,
+        }
+        result = archive_read_notifications(cutoff, archive=not options['delete'], **chunking)
+        verb = 'Deleted' if options['delete'] else 'Archived'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {result.rows} notifications in {result.chunks} chunks ({result.seconds:.1f}s).'))
+
+        if archive_cutoff is not None:
+            result = purge_archived_notifications(archive_cutoff, **chunking)
+            self.stdout.write(self.style.SUCCESS(
+                f'Purged {result.rows} archived notifications in {result.chunks} chunks ({result.seconds:.1f}s).'))
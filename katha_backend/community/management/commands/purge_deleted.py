@@ -0,0 +1,48 @@
+"""
+Django management command that removes soft-deleted posts and comments.
+
+Deleting a post or comment through the API only sets deleted_at. This command
+removes those rows and everything under them (comment replies, votes, saves,
+notifications) in short chunked transactions. Run it from cron, or keep it
+running as a worker with --loop.
+
+Usage:
+    python manage.py purge_deleted
+    python manage.py purge_deleted --chunk-size 200 --pause 0.05
+    python manage.py purge_deleted --loop --interval 10
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from community.tombstones import purge_deleted
+
+
+class Command(BaseCommand):
+    help = 'Purge soft-deleted posts and comments with their dependents in small chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Rows per DELETE / transaction')
+        parser.add_argument('--pause', type=float, default=0.0, help='Seconds to sleep between chunks')
+        parser.add_argument('--grace-seconds', type=int,
+                            help='Only purge rows deleted at least this long ago (default TOMBSTONE_GRACE_SECONDS)')
+        parser.add_argument('--limit', type=int, help='Purge at most this many posts and comments per pass')
+        parser.add_argument('--loop', action='store_true', help='Keep running, one pass every --interval seconds')
+        parser.add_argument('--interval', type=float, default=10, help='Seconds between passes with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            result = purge_deleted(
+                chunk_size=options['chunk_size'], pause=options['pause'],
+                grace_seconds=options['grace_seconds'], limit=options['limit'],
+            )
+            if result.posts or result.comments or not options['loop']:
+                rows = ', '.join(f'{count} {name}' for name, count in sorted(result.rows.items())) or 'no dependents'
+                self.stdout.write(self.style.SUCCESS(
+                    f'Purged {result.posts} posts and {result.comments} comment threads '
+                    f'({rows}) in {time.monotonic() - started:.1f}s.'))
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,61 @@
+"""
+Django management command that rebuilds the feed snapshots (community.feeds).
+
+Rebuilds the snapshot of every sort mode (or those given with --sort) under the same
+single-flight lock the web workers use, so a rebuild already running elsewhere is
+skipped rather than repeated. Run it from cron, or keep it running with --every, so
+readers are served a recent snapshot instead of rebuilding one themselves:
+
+    * * * * * python manage.py refresh_feeds
+
+The snapshots must live in a cache the web workers share (FEED_SNAPSHOT_CACHE); with
+the default per-process local-memory cache this only warms the command's own process.
+
+Usage:
+    python manage.py refresh_feeds
+    python manage.py refresh_feeds --sort trending --sort newest
+    python manage.py refresh_feeds --every 15
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from community import feeds
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the precomputed feed snapshots'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sort', action='append', choices=feeds.SORTS,
+                            help='Only this sort mode (repeatable; default: all)')
+        parser.add_argument('--every', type=float, help='Keep running, rebuilding every this many seconds')
+
+    def handle(self, *args, **options):
+        if not feeds.enabled():
+            raise CommandError('Feed snapshots are disabled; set FEED_SNAPSHOT_SECONDS.')
+        sorts = options['sort'] or feeds.SORTS
+        if options['every'] is not None and options['every'] <= 0:
+            raise CommandError('--every must be positive.')
+
+        while True:
+            started = time.monotonic()
+            self.refresh(sorts)
+            if options['every'] is None:
+                return
+            close_old_connections()
+            time.sleep(max(0.0, options['every'] - (time.monotonic() - started)))
+
+    def refresh(self, sorts):
+        for sort in sorts:
+            started = time.monotonic()
+            snapshot = feeds.rebuild(sort)
+            elapsed = (time.monotonic() - started) * 1000
+            if snapshot is None:
+                self.stdout.write(f'{sort}: skipped, another worker is rebuilding it')
+            else:
+                more = f', {len(snapshot["more"])} more by id' if snapshot['more'] else ''
+                self.stdout.write(self.style.SUCCESS(
+                    f'{sort}: {len(snapshot["posts"])} posts{more} ({elapsed:.0f} ms)'))
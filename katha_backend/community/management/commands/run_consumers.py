@@ -0,0 +1,61 @@
+"""
+Django management command that runs the outbox consumers (community.consumers).
+
+Polls every consumer (or those given with --consumer) for the outbox events after
+its offset and hands them over in batches, until interrupted. A failing batch is
+logged and retried on the next poll. Run one per deployment, e.g. as a worker
+process next to the web process:
+
+    worker: python manage.py run_consumers
+
+--replay starts a consumer over from the first event, clearing what it built, so
+its derived data is rebuilt from the (compacted) log.
+
+Usage:
+    python manage.py run_consumers
+    python manage.py run_consumers --consumer feed-snapshots --batch-size 200
+    python manage.py run_consumers --once          # Drain what is there and exit
+    python manage.py run_consumers --status
+    python manage.py run_consumers --replay feed-snapshots --once
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from community import outbox
+
+
+class Command(BaseCommand):
+    help = 'Run the outbox consumers that maintain derived data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--consumer', action='append', help='Only this consumer (repeatable; default: all)')
+        parser.add_argument('--batch-size', type=int, help='Events per batch (default: OUTBOX_BATCH_SIZE)')
+        parser.add_argument('--poll-seconds', type=float, help='Sleep between polls when idle (default: OUTBOX_POLL_SECONDS)')
+        parser.add_argument('--once', action='store_true', help='Stop once every consumer is caught up')
+        parser.add_argument('--replay', action='append', default=[], metavar='CONSUMER',
+                            help='Reset this consumer to the first event before running (repeatable)')
+        parser.add_argument('--status', action='store_true', help='Only print each consumer\'s offset and lag')
+
+    def handle(self, *args, **options):
+        try:
+            consumers = [outbox.get_consumer(name) for name in options['consumer'] or sorted(outbox.CONSUMERS)]
+            replayed = [outbox.get_consumer(name) for name in options['replay']]
+        except LookupError as e:
+            raise CommandError(str(e))
+        if options['batch_size'] is not None and options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+
+        if options['status']:
+            for consumer in consumers:
+                self.stdout.write(f'{consumer.name}: {outbox.lag(consumer)} events behind')
+            return
+
+        for consumer in replayed:
+            outbox.replay(consumer)
+            self.stdout.write(f'{consumer.name}: replaying from the first event')
+        try:
+            delivered = outbox.run(consumers, limit=options['batch_size'], poll_seconds=options['poll_seconds'],
+                                   once=options['once'])
+        except KeyboardInterrupt:
+            return
+        self.stdout.write(self.style.SUCCESS(f'Consumers caught up after {delivered} events.'))
@@ -0,0 +1,307 @@
+"""
+Django management command to generate synthetic community data for benchmarks.
+
+Rows are built in memory and written with bulk_create in batches, each batch in
+its own transaction, so even very large volumes stream through with flat memory.
+
+Usage:
+    python manage.py seed_benchmark_data
+    python manage.py seed_benchmark_data --users 50000 --posts 1000000 --votes 10000000
+    python manage.py seed_benchmark_data --clear  # Remove previously seeded bench_* data
+"""
+
+import random
+import time
+from array import array
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from community.models import (
+    Post, Comment, Vote, SavedPost, Notification, CommentVote, ArchivedNotification, PostActivity, MAX_THREAD_DEPTH,
+    RelatedPost, path_step,
+)
+from community.imports import explicit_timestamps, next_id
+
+BENCH_USER_PREFIX = 'bench_'
+
+
+class Command(BaseCommand):
+    help = 'Generate synthetic users, posts, comment trees, votes, saves and notifications for benchmarking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help='Number of users to create')
+        parser.add_argument('--posts', type=int, default=10000, help='Number of posts to create')
+        parser.add_argument('--comments', type=int, default=50000, help='Number of comments to create')
+        parser.add_argument('--max-depth', type=int, default=8, help='Maximum reply depth of comment trees')
+        parser.add_argument('--reply-ratio', type=float, default=0.7,
+                            help='Share of comments that are replies rather than top-level')
+        parser.add_argument('--votes', type=int, default=100000, help='Number of post votes to create')
+        parser.add_argument('--comment-votes', type=int, default=100000, help='Number of comment votes to create')
+        parser.add_argument('--saves', type=int, default=20000, help='Number of saved posts to create')
+        parser.add_argument('--notifications', type=int, default=50000,
+                            help='Maximum number of notifications to create (one per comment at most)')
+        parser.add_argument('--read-ratio', type=float, default=0.7, help='Share of notifications already read')
+        parser.add_argument('--days', type=int, default=90, help='Spread created_at over this many days')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk_create / transaction')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for reproducible data')
+        parser.add_argument('--password', default='benchpass123', help='Password for every generated user')
+        parser.add_argument('--clear', action='store_true', help='Delete previously generated bench_* data and exit')
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            self.clear()
+            return
+
+        self.batch_size = options['batch_size']
+        self.rng = random.Random(options['seed'])
+        self.now = timezone.now()
+        self.span = timedelta(days=options['days'])
+        self.start_time = self.now - self.span
+
+        n_users, n_posts = options['users'], options['posts']
+        if n_users < 2 or n_posts < 1:
+            raise CommandError('Need at least 2 users and 1 post.')
+        if options['max_depth'] >= MAX_THREAD_DEPTH:
+            raise CommandError(f'--max-depth must be below {MAX_THREAD_DEPTH} (comment path length limit).')
+        self.check_pairs('votes', options['votes'], n_users * n_posts)
+        self.check_pairs('saves', options['saves'], n_users * n_posts)
+        self.check_pairs('comment votes', options['comment_votes'], n_users * options['comments'])
+
+        started = time.perf_counter()
+        with explicit_timestamps():
+            self.user_ids = self.seed_users(n_users, options['password'])
+            self.seed_posts(n_posts)
+            self.seed_comments(options)
+            self.seed_pairs(Vote, 'post', options['votes'], self.first_post_id, n_posts)
+            self.seed_pairs(CommentVote, 'comment', options['comment_votes'], self.first_comment_id, self.n_comments)
+            self.seed_pairs(SavedPost, 'post', options['saves'], self.first_post_id, n_posts)
+        self.recompute_counters(n_posts)
+
+        self.stdout.write(self.style.SUCCESS(f'Done in {time.perf_counter() - started:.1f}s'))
+
+    def check_pairs(self, label, requested, available):
+        if requested > available:
+            raise CommandError(f'Cannot create {requested} unique {label}: only {available} user/object pairs exist.')
+
+    # --- Writing helpers ---
+    def write(self, model, rows):
+        with transaction.atomic():
+            model.objects.bulk_create(rows, batch_size=self.batch_size)
+
+    def stream(self, model, label, rows):
+        """Consume a generator of unsaved instances, writing one batch per transaction."""
+        started = time.perf_counter()
+        batch, total = [], 0
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                self.write(model, batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            self.write(model, batch)
+            total += len(batch)
+        elapsed = time.perf_counter() - started
+        rate = total / elapsed if elapsed else total
+        self.stdout.write(f'  {label}: {total} rows in {elapsed:.1f}s ({rate:,.0f} rows/s)')
+        return total
+
+    def random_time_after(self, moment):
+        return moment + (self.now - moment) * self.rng.random()
+
+    def random_user(self):
+        return self.user_ids[self.rng.randrange(len(self.user_ids))]
+
+    # --- Generators ---
+    def seed_users(self, count, password):
+        # Hash once: every bench user shares the same password
+        password_hash = make_password(password)
+        first_id = next_id(User)
+
+        def rows():
+            for user_id in range(first_id, first_id + count):
+                yield User(
+                    id=user_id,
+                    username=f'{BENCH_USER_PREFIX}{user_id}',
+                    email=f'{BENCH_USER_PREFIX}{user_id}@example.com',
+                    password=password_hash,
+                )
+
+        self.stream(User, 'users', rows())
+        return array('q', range(first_id, first_id + count))
+
+    def post_time(self, index):
+        return self.start_time + self.span * (index / self.n_posts)
+
+    def seed_posts(self, count):
+        self.first_post_id = next_id(Post)
+        self.n_posts = count
+        # Authors are needed later to address comment notifications
+        self.post_authors = array('q')
+
+        def rows():
+            for index in range(count):
+                post_id = self.first_post_id + index
+                author_id = self.random_user()
+                self.post_authors.append(author_id)
+                yield Post(
+                    id=post_id,
+                    title=f'Benchmark katha {post_id}',
+                    content=f'Synthetic content for post {post_id}. ' * self.rng.randint(1, 20),
+                    author_id=author_id,
+                    slug=f'bench-{post_id}',
+                    created_at=self.post_time(index),
+                )
+
+        self.stream(Post, 'posts', rows())
+
+    def seed_comments(self, options):
+        self.first_comment_id = next_id(Comment)
+        self.n_comments = options['comments']
+        started = time.perf_counter()
+        comments, notifications = [], []
+        n_comments = n_notifications = 0
+        for comment, notification in self.comment_rows(options):
+            comments.append(comment)
+            if notification is not None:
+                notifications.append(notification)
+            if len(comments) >= self.batch_size:
+                self.write_comment_batch(comments, notifications)
+                n_comments += len(comments)
+                n_notifications += len(notifications)
+                comments, notifications = [], []
+        self.write_comment_batch(comments, notifications)
+        n_comments += len(comments)
+        n_notifications += len(notifications)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'  comments: {n_comments} rows, notifications: {n_notifications} rows in {elapsed:.1f}s')
+
+    def write_comment_batch(self, comments, notifications):
+        # Notifications point at the comments, so both go in the same transaction
+        with transaction.atomic():
+            Comment.objects.bulk_create(comments, batch_size=self.batch_size)
+            Notification.objects.bulk_create(notifications, batch_size=self.batch_size)
+
+    def comment_rows(self, options):
+        """Yield (comment, notification or None) pairs, growing one reply tree per post."""
+        max_depth = options['max_depth']
+        reply_ratio = options['reply_ratio']
+        notification_budget = options['notifications']
+        notification_id = next_id(Notification)
+        comment_id = self.first_comment_id
+        per_post, remainder = divmod(self.n_comments, self.n_posts)
+
+        for index in range(self.n_posts):
+            post_id = self.first_post_id + index
+            moment = self.post_time(index)
+            # (id, author_id, depth, path) of comments already in this post's tree
+            thread = []
+            for _ in range(per_post + (1 if index < remainder else 0)):
+                parent = None
+                if thread and self.rng.random() < reply_ratio:
+                    # Favour the newest comment to grow deep chains
+                    candidate = thread[-1] if self.rng.random() < 0.5 else self.rng.choice(thread)
+                    if candidate[2] < max_depth:
+                        parent = candidate
+                author_id = self.random_user()
+                moment = self.random_time_after(moment)
+                depth = parent[2] + 1 if parent else 0
+                path = (parent[3] if parent else '') + path_step(comment_id)
+                comment = Comment(
+                    id=comment_id,
+                    post_id=post_id,
+                    author_id=author_id,
+                    parent_id=parent[0] if parent else None,
+                    text=f'Synthetic comment {comment_id}',
+                    created_at=moment,
+                    path=path,
+                    depth=depth,
+                )
+
+                # Same rule as CommentViewSet.perform_create: notify the parent or post author
+                notification = None
+                recipient = parent[1] if parent else self.post_authors[index]
+                if notification_budget > 0 and recipient != author_id:
+                    notification = Notification(
+                        id=notification_id,
+                        user_id=recipient,
+                        notification_type='reply' if parent else 'comment',
+                        post_id=post_id,
+                        comment_id=comment_id,
+                        actor_id=author_id,
+                        read=self.rng.random() < options['read_ratio'],
+                        created_at=moment,
+                    )
+                    notification_id += 1
+                    notification_budget -= 1
+
+                yield comment, notification
+                thread.append((comment_id, author_id, depth, path))
+                comment_id += 1
+
+    def seed_pairs(self, model, target, count, first_target_id, n_targets):
+        """Create ``count`` rows with unique (user, target) pairs spread evenly over targets."""
+        n_users = len(self.user_ids)
+        has_value = model is not SavedPost
+        timestamp = 'saved_at' if model is SavedPost else 'created_at'
+
+        def rows():
+            for k in range(count):
+                fields = {
+                    'user_id': self.user_ids[(k // n_targets) % n_users],
+                    f'{target}_id': first_target_id + k % n_targets,
+                    timestamp: self.random_time_after(self.start_time),
+                }
+                if has_value:
+                    fields['value'] = 1 if self.rng.random() < 0.8 else -1
+                yield model(**fields)
+
+        self.stream(model, model._meta.verbose_name_plural.lower(), rows())
+
+    def recompute_counters(self, n_posts):
+        """Set Post.votes / Comment.votes from the generated vote rows, one id range at a time."""
+        started = time.perf_counter()
+        for model, vote_model, fk, first_id, count in (
+            (Post, Vote, 'post', self.first_post_id, n_posts),
+            (Comment, CommentVote, 'comment', self.first_comment_id, self.n_comments),
+        ):
+            total = vote_model.objects.filter(**{fk: OuterRef('pk')}).values(fk).annotate(s=Sum('value')).values('s')
+            for low in range(first_id, first_id + count, self.batch_size):
+                with transaction.atomic():
+                    model.objects.filter(id__gte=low, id__lt=low + self.batch_size).update(
+                        votes=Coalesce(Subquery(total), Value(0))
+                    )
+        self.stdout.write(f'  vote counters recomputed in {time.perf_counter() - started:.1f}s')
+
+    def clear(self):
+        """Delete all rows owned by bench_* users with raw, dependency-ordered deletes."""
+        users = User.objects.filter(username__startswith=BENCH_USER_PREFIX)
+        with transaction.atomic():
+            for model, field in (
+                (Notification, 'user__in'),
+                (ArchivedNotification, 'user__in'),
+                (CommentVote, 'user__in'),
+                (Vote, 'user__in'),
+                (SavedPost, 'user__in'),
+                (PostActivity, 'post__author__in'),
+                (RelatedPost, 'post__author__in'),
+                (RelatedPost, 'related__author__in'),
+            ):
+                qs = model.objects.filter(**{field: users})
+                deleted = qs._raw_delete(qs.db)
+                self.stdout.write(f'  {model._meta.verbose_name_plural.lower()}: {deleted} deleted')
+            comments = Comment.objects.filter(author__in=users)
+            # Break the self-referencing FK first so rows can go in one statement
+            comments.update(parent=None)
+            self.stdout.write(f'  comments: {comments._raw_delete(comments.db)} deleted')
+            posts = Post.objects.filter(author__in=users)
+            self.stdout.write(f'  posts: {posts._raw_delete(posts.db)} deleted')
+            self.stdout.write(f'  users: {users._raw_delete(users.db)} deleted')
+        self.stdout.write(self.style.SUCCESS('Benchmark data cleared.'))
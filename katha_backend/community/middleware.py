@@ -0,0 +1,293 @@
+"""
+Request instrumentation: per-view query counts, DB time, wall time,
+N+1 detection and connection reuse, exported through the /metrics endpoint.
+
+Sync requests install a QueryCollector on the request thread's connections. Async
+requests run their queries on other threads, so they activate the collector in a
+context variable instead; sync_to_async carries it into those threads, where
+collect_queries (installed on every connection when it opens) feeds it.
+
+HybridMiddleware lets this module's middleware, the replica router's and the
+profiler's (and WhiteNoise, through StaticFilesMiddleware) run natively under ASGI.
+
+The session, CSRF, authentication and messages middleware here are Django's, skipped
+for paths under LEAN_MIDDLEWARE_PATHS (the JWT-only API): see BrowserOnlyMixin.
+"""
+
+import contextvars
+import logging
+import re
+import time
+from collections import Counter as FingerprintCounter
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth import middleware as auth_middleware
+from django.contrib.messages import middleware as messages_middleware
+from django.contrib.sessions import middleware as sessions_middleware
+from django.db import connections
+from django.middleware import csrf
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from .db.pool import CHECKOUTS
+from .metrics import registry
+
+logger = logging.getLogger('community.perf')
+
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+REQUEST_DURATION = registry.histogram(
+    'katha_request_duration_seconds', 'Wall time spent handling a request.', ('view', 'method'))
+REQUEST_QUERIES = registry.histogram(
+    'katha_request_db_queries', 'Number of SQL queries executed per request.', ('view', 'method'),
+    buckets=QUERY_COUNT_BUCKETS)
+REQUEST_DB_DURATION = registry.histogram(
+    'katha_request_db_duration_seconds', 'Total time spent in the database per request.', ('view', 'method'))
+REQUESTS_TOTAL = registry.counter(
+    'katha_requests_total', 'Requests handled, by view and status code.', ('view', 'method', 'status'))
+N_PLUS_ONE_TOTAL = registry.counter(
+    'katha_request_n_plus_one_total', 'Requests that repeated one query shape past the N+1 threshold.',
+    ('view', 'method'))
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN\s*\((?:\s*(?:%s|\?)\s*,?)+\)', re.IGNORECASE)
+
+
+def fingerprint(sql):
+    """Normalize a SQL statement so that queries differing only in parameters compare equal."""
+    sql = _STRING_LITERAL.sub('?', sql)
+    sql = _NUMBER_LITERAL.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return ' '.join(sql.split())
+
+
+class QueryCollector:
+    """execute_wrapper hook that records every query run while it is installed."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.add(context['connection'].alias, sql, time.perf_counter() - start)
+
+    def add(self, alias, sql, duration):
+        self.queries.append({'alias': alias, 'sql': sql, 'duration': duration})
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def total_time(self):
+        return sum(q['duration'] for q in self.queries)
+
+    def duplicates(self, threshold):
+        """Return {fingerprint: count} for query shapes repeated at least ``threshold`` times."""
+        counts = FingerprintCounter(fingerprint(q['sql']) for q in self.queries)
+        return {fp: n for fp, n in counts.most_common() if n >= threshold}
+
+
+# Collectors of the async request being handled in this task
+_active_collectors = contextvars.ContextVar('query_collectors', default=())
+
+
+@contextmanager
+def collecting(collector):
+    """Feed ``collector`` every query this task runs, on whichever thread sync_to_async picks."""
+    token = _active_collectors.set((*_active_collectors.get(), collector))
+    try:
+        yield collector
+    finally:
+        _active_collectors.reset(token)
+
+
+def collect_queries(execute, sql, params, many, context):
+    collectors = _active_collectors.get()
+    if not collectors:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - start
+        for collector in collectors:
+            collector.add(context['connection'].alias, sql, duration)
+
+
+def install_query_collection(sender, connection, **kwargs):
+    """connection_created receiver (see CommunityConfig.ready)."""
+    if collect_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(collect_queries)
+
+
+class HybridMiddleware:
+    """Base for middleware that runs natively in both WSGI and ASGI stacks.
+
+    Subclasses implement ``sync_call`` and ``async_call``; Django picks the mode by
+    whether the next handler is a coroutine, so an async view keeps its thread free.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.async_call(request)
+        return self.sync_call(request)
+
+
+class StaticFilesMiddleware(HybridMiddleware, WhiteNoiseMiddleware):
+    """WhiteNoise, minus its sync-only restriction, which would put every async view back on a thread."""
+
+    def __init__(self, get_response):
+        WhiteNoiseMiddleware.__init__(self, get_response)
+        HybridMiddleware.__init__(self, get_response)
+
+    def sync_call(self, request):
+        return WhiteNoiseMiddleware.__call__(self, request)
+
+    async def async_call(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
+
+
+# --- Browser-only middleware ---
+class BrowserOnlyMixin:
+    """
+    Passes requests under LEAN_MIDDLEWARE_PATHS straight through. DRF authenticates
+    API requests from their JWT, so loading the session, the user it points to and
+    flash messages, and checking and rotating the CSRF cookie, is wasted on them;
+    the admin and other browser pages still get all of it.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.lean_paths = tuple(getattr(settings, 'LEAN_MIDDLEWARE_PATHS', ('/api/',)))
+
+    def is_lean(self, request):
+        return request.path_info.startswith(self.lean_paths)
+
+    def __call__(self, request):
+        # In async mode get_response returns the coroutine the caller awaits
+        if self.is_lean(request):
+            return self.get_response(request)
+        return super().__call__(request)
+
+
+class SessionMiddleware(BrowserOnlyMixin, sessions_middleware.SessionMiddleware):
+    pass
+
+
+class CsrfViewMiddleware(BrowserOnlyMixin, csrf.CsrfViewMiddleware):
+    def process_view(self, request, callback, callback_args, callback_kwargs):
+        if self.is_lean(request):
+            return None
+        return super().process_view(request, callback, callback_args, callback_kwargs)
+
+
+class AuthenticationMiddleware(BrowserOnlyMixin, auth_middleware.AuthenticationMiddleware):
+    pass
+
+
+class MessageMiddleware(BrowserOnlyMixin, messages_middleware.MessageMiddleware):
+    pass
+
+
+def view_label(request):
+    """Name of the resolved view (e.g. 'post-list', 'post-vote'), or 'unresolved'."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return match.view_name or match._func_path
+
+
+class QueryInstrumentationMiddleware(HybridMiddleware):
+    """
+    Records query count, DB time, duplicate query fingerprints and wall time for
+    every request, labelled by resolved view and HTTP method.
+
+    Requests slower than ``SLOW_REQUEST_MS`` are logged to ``community.perf``
+    together with the queries they ran.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.enabled = getattr(settings, 'METRICS_ENABLED', True)
+        self.slow_request_ms = getattr(settings, 'SLOW_REQUEST_MS', None)
+        self.n_plus_one_threshold = getattr(settings, 'N_PLUS_ONE_THRESHOLD', 5)
+        self.exclude_paths = tuple(getattr(settings, 'METRICS_EXCLUDE_PATHS', ('/metrics', '/static/')))
+
+    def sync_call(self, request):
+        if not self.enabled or request.path.startswith(self.exclude_paths):
+            return self.get_response(request)
+
+        collector = QueryCollector()
+        # Connections still open from an earlier request are persistent-connection reuses
+        already_open = {conn.alias for conn in connections.all(initialized_only=True) if conn.connection is not None}
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(collector))
+            response = self.get_response(request)
+        wall_time = time.perf_counter() - start
+
+        self.record(request, response, collector, wall_time)
+        self.record_connection_reuse(collector, already_open)
+        return response
+
+    async def async_call(self, request):
+        if not self.enabled or request.path.startswith(self.exclude_paths):
+            return await self.get_response(request)
+
+        # Connection reuse is not recorded: the queries ran on threads this one cannot see
+        start = time.perf_counter()
+        with collecting(QueryCollector()) as collector:
+            response = await self.get_response(request)
+        self.record(request, response, collector, time.perf_counter() - start)
+        return response
+
+    def record_connection_reuse(self, collector, already_open):
+        for alias in {q['alias'] for q in collector.queries}:
+            # The pooled backend counts its own checkouts
+            if getattr(connections[alias], 'pool', None) is None:
+                CHECKOUTS.inc(alias=alias, reused=str(alias in already_open).lower())
+
+    def record(self, request, response, collector, wall_time):
+        labels = {'view': view_label(request), 'method': request.method}
+        REQUEST_DURATION.observe(wall_time, **labels)
+        REQUEST_QUERIES.observe(collector.count, **labels)
+        REQUEST_DB_DURATION.observe(collector.total_time, **labels)
+        REQUESTS_TOTAL.inc(status=response.status_code, **labels)
+
+        duplicates = collector.duplicates(self.n_plus_one_threshold)
+        if duplicates:
+            N_PLUS_ONE_TOTAL.inc(**labels)
+            logger.warning(
+                'Possible N+1 in %s %s (%s): %s',
+                request.method, request.path, labels['view'],
+                '; '.join(f'{count}x {fp}' for fp, count in duplicates.items()),
+            )
+
+        if self.slow_request_ms is not None and wall_time * 1000 >= self.slow_request_ms:
+            logger.warning(
+                'Slow request %s %s (%s): %.1f ms, %d queries, %.1f ms in DB\n%s',
+                request.method, request.path, labels['view'], wall_time * 1000,
+                collector.count, collector.total_time * 1000,
+                '\n'.join(f"  [{q['alias']}] {q['duration'] * 1000:.2f} ms  {q['sql']}" for q in collector.queries),
+            )
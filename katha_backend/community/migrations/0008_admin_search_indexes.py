@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:36
+
+from django.db import migrations, models
+
+# FULLTEXT indexes backing the admin's @ search (community.lookups); MySQL only.
+FULLTEXT_INDEXES = [
+    ('community_post', 'community_post_content_ft', 'content'),
+    ('community_comment', 'community_comment_text_ft', 'text'),
+    ('community_feedback', 'community_feedback_message_ft', 'message'),
+]
+
+
+def create_fulltext_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    for table, name, column in FULLTEXT_INDEXES:
+        schema_editor.execute(f'CREATE FULLTEXT INDEX `{name}` ON `{table}` (`{column}`)')
+
+
+def drop_fulltext_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    for table, name, column in FULLTEXT_INDEXES:
+        schema_editor.execute(f'DROP INDEX `{name}` ON `{table}`')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0007_feedback'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='title',
+            field=models.CharField(db_index=True, max_length=200),
+        ),
+        migrations.RunPython(create_fulltext_indexes, drop_fulltext_indexes),
+    ]
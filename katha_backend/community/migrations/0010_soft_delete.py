@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0009_notification_retention'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='Set when deleted; the row is purged later', null=True),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='Set when deleted; the row is purged later', null=True),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:47
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Q
+
+BATCH_SIZE = 1000
+
+
+def path_step(pk):
+    # Frozen copy of community.models.path_step
+    digits = '0123456789abcdefghijklmnopqrstuvwxyz'
+    step = ''
+    while pk:
+        pk, digit = divmod(pk, 36)
+        step = digits[digit] + step
+    return step.rjust(7, '0')
+
+
+def backfill_paths(apps, schema_editor):
+    """Fill path/depth top-down: each pass handles comments whose parent already has a path."""
+    Comment = apps.get_model('community', 'Comment')
+    ready = Comment.objects.filter(path='').filter(Q(parent__isnull=True) | ~Q(parent__path=''))
+    while True:
+        rows = list(ready.order_by('id').values_list('id', 'parent__path', 'parent__depth')[:BATCH_SIZE])
+        if not rows:
+            break
+        Comment.objects.bulk_update([
+            Comment(
+                id=pk,
+                path=(parent_path or '') + path_step(pk),
+                depth=parent_depth + 1 if parent_path else 0,
+            )
+            for pk, parent_path, parent_depth in rows
+        ], ['path', 'depth'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0010_soft_delete'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, help_text='0 for top-level comments'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, editable=False, help_text='Materialized thread path (see path_step)', max_length=511),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'path'], name='comment_thread_idx'),
+        ),
+        migrations.RunPython(backfill_paths, migrations.RunPython.noop),
+    ]
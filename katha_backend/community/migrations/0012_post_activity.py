@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0011_comment_thread_paths'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4)),
+                ('bucket', models.DateTimeField(help_text='Start of the hour or day (UTC)')),
+                ('upvotes', models.IntegerField(default=0)),
+                ('downvotes', models.IntegerField(default=0)),
+                ('comments', models.IntegerField(default=0)),
+                ('saves', models.IntegerField(default=0)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity', to='community.post')),
+            ],
+            options={
+                'verbose_name': 'Post Activity',
+                'verbose_name_plural': 'Post Activity',
+                'ordering': ['bucket'],
+                'indexes': [models.Index(fields=['period', 'bucket'], name='post_activity_period_idx')],
+                'constraints': [models.UniqueConstraint(fields=('post', 'period', 'bucket'), name='post_activity_bucket_uniq')],
+            },
+        ),
+    ]
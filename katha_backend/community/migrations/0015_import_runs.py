@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0014_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('source', models.CharField(help_text='File the run reads', max_length=500)),
+                ('lines', models.BigIntegerField(default=0, help_text='Input lines imported so far')),
+                ('offset', models.BigIntegerField(default=0, help_text='Byte offset of the next line to import')),
+                ('counts', models.JSONField(default=dict, help_text='Rows imported and records skipped, by kind')),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Import Run',
+                'verbose_name_plural': 'Import Runs',
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ImportedObject',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('post', 'Post'), ('comment', 'Comment')], max_length=8)),
+                ('source_id', models.CharField(max_length=64)),
+                ('object_id', models.BigIntegerField()),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='imported', to='community.importrun')),
+            ],
+            options={
+                'verbose_name': 'Imported Object',
+                'verbose_name_plural': 'Imported Objects',
+                'constraints': [models.UniqueConstraint(fields=('run', 'kind', 'source_id'), name='imported_object_source_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,94 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Single-column indexes the new composite ones make redundant. InnoDB keeps one per
+# foreign key whatever db_index says, created with the constraint; MySQL only.
+REDUNDANT_FK_INDEXES = [
+    ('community_vote', 'post_id'),
+    ('community_commentvote', 'comment_id'),
+]
+
+
+def drop_redundant_fk_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for table, column in REDUNDANT_FK_INDEXES:
+            cursor.execute(
+                'SELECT index_name FROM information_schema.statistics'
+                ' WHERE table_schema = DATABASE() AND table_name = %s AND non_unique = 1'
+                ' GROUP BY index_name HAVING COUNT(*) = 1 AND MAX(column_name) = %s',
+                [table, column],
+            )
+            for (name,) in cursor.fetchall():
+                schema_editor.execute(f'DROP INDEX `{name}` ON `{table}`')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0016_notification_unread_inbox_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    # Ordered by hand: the new unique and covering indexes exist before the old ones go,
+    # so uniqueness is never unenforced and MySQL never needs a stopgap index for the
+    # foreign keys.
+    operations = [
+        migrations.AddConstraint(
+            model_name='commentvote',
+            constraint=models.UniqueConstraint(fields=('user', 'comment'), name='comment_vote_user_comment_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='vote',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='vote_user_post_uniq'),
+        ),
+        migrations.AddIndex(
+            model_name='commentvote',
+            index=models.Index(fields=['user', 'comment', 'value'], name='comment_vote_viewer_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vote',
+            index=models.Index(fields=['user', 'post', 'value'], name='vote_viewer_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='commentvote',
+            index=models.Index(fields=['comment', 'value'], name='comment_vote_comment_value_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vote',
+            index=models.Index(fields=['post', 'value'], name='vote_post_value_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='commentvote',
+            unique_together=set(),
+        ),
+        migrations.AlterUniqueTogether(
+            name='vote',
+            unique_together=set(),
+        ),
+        migrations.AlterField(
+            model_name='commentvote',
+            name='comment',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='comment_votes', to='community.comment'),
+        ),
+        migrations.AlterField(
+            model_name='commentvote',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='comment_votes', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='vote',
+            name='post',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='post_votes', to='community.post'),
+        ),
+        migrations.AlterField(
+            model_name='vote',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='votes', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(drop_redundant_fk_indexes, migrations.RunPython.noop),
+    ]
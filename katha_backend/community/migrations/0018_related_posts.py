@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:54
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0017_vote_covering_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedPostsBuild',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('full', models.BooleanField(help_text='Rebuilt every list, rather than folding in new and edited posts')),
+                ('posts', models.IntegerField(default=0, help_text='Posts in the corpus')),
+                ('updated', models.IntegerField(default=0, help_text='Posts whose related list was written')),
+                ('last_post_id', models.BigIntegerField(default=0, help_text='Highest post id in the corpus')),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Related Posts Build',
+                'verbose_name_plural': 'Related Posts Builds',
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RelatedPost',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField(help_text='0 is the most similar')),
+                ('score', models.FloatField(help_text="Cosine similarity of the two posts' term vectors")),
+                ('post', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='related_posts', to='community.post')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='community.post')),
+            ],
+            options={
+                'verbose_name': 'Related Post',
+                'verbose_name_plural': 'Related Posts',
+                'ordering': ['post', 'rank'],
+                'constraints': [models.UniqueConstraint(fields=('post', 'rank'), name='related_post_rank_uniq')],
+            },
+        ),
+    ]
@@ -1,11 +1,54 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils.text import slugify
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
 
+# --- Soft delete ---
+class TombstoneQuerySet(models.QuerySet):
+    """Deleted posts/comments keep their row (deleted_at set) until purge_deleted removes them."""
+
+    def alive(self):
+        return self.filter(deleted_at__isnull=True)
+
+    def tombstoned(self):
+        return self.filter(deleted_at__isnull=False)
+
+
+class CommentQuerySet(TombstoneQuerySet):
+    def subtree(self, comment, include_self=True):
+        """``comment`` and all its replies at any depth, in thread order (one index range scan)."""
+        if not comment.path:
+            raise ValueError(f'Comment {comment.pk} has no thread path.')
+        queryset = self.filter(post_id=comment.post_id, path__startswith=comment.path)
+        if not include_self:
+            queryset = queryset.exclude(pk=comment.pk)
+        return queryset.order_by('path')
+
+    def without_deleted_ancestors(self):
+        """Leave out replies, at any depth, to a deleted comment: those whose path extends one's path."""
+        deleted_ancestors = (self.model.objects.tombstoned()
+                             .filter(post_id=models.OuterRef('post_id'))
+                             .exclude(path='')
+                             .alias(reply_path=models.ExpressionWrapper(models.OuterRef('path'),
+                                                                        output_field=models.CharField()))
+                             .filter(reply_path__startswith=models.F('path')))
+        return self.exclude(models.Exists(deleted_ancestors))
+
+    def with_descendant_counts(self):
+        """Annotate ``descendant_count``: replies at any depth, deleted ones included."""
+        descendants = (self.model.objects
+                       .filter(post_id=models.OuterRef('post_id'), path__startswith=models.OuterRef('path'))
+                       .order_by()
+                       .values('post_id')
+                       .annotate(n=models.Count('*'))
+                       .values('n'))
+        return self.annotate(descendant_count=models.Subquery(descendants) - 1)
+
+
 # --- The Post (Katha) Model ---
 class Post(models.Model):
-    title = models.CharField(max_length=200)
+    title = models.CharField(max_length=200, db_index=True)
     content = models.TextField()
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='posts')
     created_at = models.DateTimeField(auto_now_add=True)
@@ -13,6 +56,9 @@ class Post(models.Model):
     is_edited = models.BooleanField(default=False, help_text='Whether the post has been edited')
     slug = models.SlugField(max_length=200, unique=True, blank=True)
     votes = models.IntegerField(default=0)
+    deleted_at = models.DateTimeField(null=True, blank=True, db_index=True, help_text='Set when deleted; the row is purged later')
+
+    objects = TombstoneQuerySet.as_manager()
 
     class Meta:
         ordering = ['-created_at']
@@ -63,6 +109,24 @@ class Post(models.Model):
                 self.edited_at = timezone.now()
         super().save(*args, **kwargs)
 
+# --- Comment thread paths ---
+# Each comment's path is its ancestors' ids followed by its own, every id as a fixed
+# width base-36 step. Sorting by path gives thread order (replies right after their
+# parent, siblings oldest first) and a subtree is one prefix range on (post, path).
+PATH_STEP = 7  # 36**7 ids
+PATH_MAX_LENGTH = 511  # 73 levels, short enough for a MySQL utf8mb4 index
+PATH_DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+MAX_THREAD_DEPTH = PATH_MAX_LENGTH // PATH_STEP - 1  # deepest allowed depth value
+
+
+def path_step(pk):
+    step = ''
+    while pk:
+        pk, digit = divmod(pk, 36)
+        step = PATH_DIGITS[digit] + step
+    return step.rjust(PATH_STEP, '0')
+
+
 # --- The Comment (Salaysay) Model ---
 class Comment(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments')
@@ -83,28 +147,63 @@ class Comment(models.Model):
     )
     
     votes = models.IntegerField(default=0)
+    deleted_at = models.DateTimeField(null=True, blank=True, db_index=True, help_text='Set when deleted; the row is purged later')
+    path = models.CharField(max_length=PATH_MAX_LENGTH, blank=True, editable=False, help_text='Materialized thread path (see path_step)')
+    depth = models.PositiveSmallIntegerField(default=0, editable=False, help_text='0 for top-level comments')
+
+    objects = CommentQuerySet.as_manager()
 
     class Meta:
         ordering = ['created_at']
         verbose_name = "Salaysay Comment"
         verbose_name_plural = "Salaysay Comments"
+        indexes = [
+            models.Index(fields=['post', 'path'], name='comment_thread_idx'),
+            # Top-level comments of a post and replies of a comment, in display order
+            models.Index(fields=['post', 'parent', 'created_at'], name='comment_post_parent_idx'),
+            models.Index(fields=['parent', 'created_at'], name='comment_replies_idx'),
+        ]
 
     def __str__(self):
         return f'Comment by {self.author} on {self.post.title[:30]}...'
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # The path ends with our own id, so it can only be filled in after the insert
+        if not self.path:
+            parent = self.parent if self.parent_id else None
+            self.depth = parent.depth + 1 if parent else 0
+            self.path = (parent.path if parent else '') + path_step(self.pk)
+            Comment.objects.filter(pk=self.pk).update(path=self.path, depth=self.depth)
+
 # --- The Vote Model ---
 class Vote(models.Model):
-    """Tracks user votes on posts (upvote: 1, downvote: -1)."""
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='votes')
-    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='post_votes')
+    """Tracks user votes on posts (upvote: 1, downvote: -1).
+
+    The FKs have no single-column indexes: the (user, post, value) and (post, value)
+    indexes lead with them and cover the two ways votes are read. With the unique
+    key they take more space than the indexes they replace; see
+    community.vote_storage.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='votes', db_index=False)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='post_votes', db_index=False)
     value = models.SmallIntegerField(choices=[(1, 'Upvote'), (-1, 'Downvote')])
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        unique_together = ['user', 'post']  # One vote per user per post
         ordering = ['-created_at']
         verbose_name = "Vote"
         verbose_name_plural = "Votes"
+        constraints = [
+            # One vote per user per post
+            models.UniqueConstraint(fields=['user', 'post'], name='vote_user_post_uniq'),
+        ]
+        indexes = [
+            # The viewer's votes on a page of posts, without reading the rows
+            models.Index(fields=['user', 'post', 'value'], name='vote_viewer_idx'),
+            # Votes on one post (counter recounts, cascades), likewise
+            models.Index(fields=['post', 'value'], name='vote_post_value_idx'),
+        ]
 
     def __str__(self):
         vote_type = 'Upvote' if self.value == 1 else 'Downvote'
@@ -120,6 +219,9 @@ class SavedPost(models.Model):
     class Meta:
         unique_together = ['user', 'post']  # One save per user per post
         ordering = ['-saved_at']
+        indexes = [
+            models.Index(fields=['user', '-saved_at'], name='saved_post_user_saved_idx'),
+        ]
         verbose_name = "Saved Post"
         verbose_name_plural = "Saved Posts"
 
@@ -128,17 +230,24 @@ class SavedPost(models.Model):
 
 # --- The CommentVote Model ---
 class CommentVote(models.Model):
-    """Tracks user votes on comments (upvote: 1, downvote: -1)."""
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='comment_votes')
-    comment = models.ForeignKey(Comment, on_delete=models.CASCADE, related_name='comment_votes')
+    """Tracks user votes on comments (upvote: 1, downvote: -1). Indexed like Vote."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='comment_votes', db_index=False)
+    comment = models.ForeignKey(Comment, on_delete=models.CASCADE, related_name='comment_votes', db_index=False)
     value = models.SmallIntegerField(choices=[(1, 'Upvote'), (-1, 'Downvote')])
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        unique_together = ['user', 'comment']  # One vote per user per comment
         ordering = ['-created_at']
         verbose_name = "Comment Vote"
         verbose_name_plural = "Comment Votes"
+        constraints = [
+            # One vote per user per comment
+            models.UniqueConstraint(fields=['user', 'comment'], name='comment_vote_user_comment_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'comment', 'value'], name='comment_vote_viewer_idx'),
+            models.Index(fields=['comment', 'value'], name='comment_vote_comment_value_idx'),
+        ]
 
     def __str__(self):
         vote_type = 'Upvote' if self.value == 1 else 'Downvote'
@@ -164,10 +273,80 @@ class Notification(models.Model):
         ordering = ['-created_at']
         verbose_name = "Notification"
         verbose_name_plural = "Notifications"
+        indexes = [
+            # Batched mark_all_read / unread_count for one user, and the ?unread=1 inbox by id
+            models.Index(fields=['user', 'read', '-id'], name='notification_user_read_idx'),
+            # A user's notification list, newest first
+            models.Index(fields=['user', '-created_at'], name='notification_user_created_idx'),
+            # Retention job: read rows older than the cutoff
+            models.Index(fields=['read', 'created_at'], name='notification_retention_idx'),
+        ]
 
     def __str__(self):
         return f'{self.notification_type} notification for {self.user.username}'
 
+# --- The ArchivedNotification Model ---
+class ArchivedNotification(models.Model):
+    """Read notifications moved out of the hot table by the retention job (see community.retention)."""
+    id = models.BigIntegerField(primary_key=True, help_text='Id the row had in Notification')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_notifications')
+    notification_type = models.CharField(max_length=20, choices=Notification.NOTIFICATION_TYPES)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='archived_notifications', null=True, blank=True)
+    comment = models.ForeignKey(Comment, on_delete=models.CASCADE, related_name='archived_notifications', null=True, blank=True)
+    actor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_acted_notifications')
+    read = models.BooleanField(default=True)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Archived Notification"
+        verbose_name_plural = "Archived Notifications"
+        indexes = [
+            models.Index(fields=['user', '-id'], name='archived_notif_user_id_idx'),
+            models.Index(fields=['archived_at'], name='archived_notif_archived_idx'),
+        ]
+
+    def __str__(self):
+        return f'Archived {self.notification_type} notification for {self.user.username}'
+
+# --- The PostActivity Model ---
+class PostActivity(models.Model):
+    """Per-post engagement counts for one hour or one day (see community.rollups).
+
+    Fed by the vote, comment and save write paths; hourly rows are compacted into
+    daily ones by the compact_activity command. Votes and saves are net changes,
+    so removing a vote in the same bucket cancels it out.
+    """
+    PERIODS = [
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+    ]
+
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='activity')
+    period = models.CharField(max_length=4, choices=PERIODS)
+    bucket = models.DateTimeField(help_text='Start of the hour or day (UTC)')
+    upvotes = models.IntegerField(default=0)
+    downvotes = models.IntegerField(default=0)
+    comments = models.IntegerField(default=0)
+    saves = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['bucket']
+        verbose_name = "Post Activity"
+        verbose_name_plural = "Post Activity"
+        constraints = [
+            # Also serves per-post series lookups
+            models.UniqueConstraint(fields=['post', 'period', 'bucket'], name='post_activity_bucket_uniq'),
+        ]
+        indexes = [
+            # Site-wide stats and compaction scan one period by time
+            models.Index(fields=['period', 'bucket'], name='post_activity_period_idx'),
+        ]
+
+    def __str__(self):
+        return f'Activity on post {self.post_id} ({self.period} of {self.bucket:%Y-%m-%d %H:%M})'
+
 # --- The Feedback Model ---
 class Feedback(models.Model):
     FEEDBACK_TYPES = [
@@ -192,4 +371,135 @@ class Feedback(models.Model):
 
     def __str__(self):
         who = self.user.username if self.user else (self.email or 'Guest')
-        return f'Feedback from {who}: {self.type}'
\ No newline at end of file
+        return f'Feedback from {who}: {self.type}'
+# --- The OutboxEvent Model ---
+class OutboxEvent(models.Model):
+    """A change to community data, written in the same transaction as the change (see community.outbox).
+
+    ``data`` is the whole row after the change (before it, for deletes), so the
+    latest event per (topic, key) is enough to rebuild derived data by replay.
+    """
+    TOPICS = [
+        ('post', 'Post'),
+        ('comment', 'Comment'),
+        ('vote', 'Vote'),
+        ('saved_post', 'Saved Post'),
+    ]
+    ACTIONS = [
+        ('upsert', 'Upsert'),
+        ('delete', 'Delete'),
+    ]
+
+    topic = models.CharField(max_length=16, choices=TOPICS)
+    key = models.CharField(max_length=64, help_text='Id of the row; user:post for votes and saved posts')
+    action = models.CharField(max_length=8, choices=ACTIONS)
+    data = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = "Outbox Event"
+        verbose_name_plural = "Outbox Events"
+        indexes = [
+            # Compaction finds the events a later one for the same row supersedes
+            models.Index(fields=['topic', 'key', 'id'], name='outbox_event_key_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.action} {self.topic} {self.key}'
+
+# --- The ConsumerOffset Model ---
+class ConsumerOffset(models.Model):
+    """The last OutboxEvent id an outbox consumer has processed."""
+    name = models.CharField(max_length=100, unique=True)
+    position = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['name']
+        verbose_name = "Consumer Offset"
+        verbose_name_plural = "Consumer Offsets"
+
+    def __str__(self):
+        return f'{self.name} at {self.position}'
+
+# --- The ImportRun Model ---
+class ImportRun(models.Model):
+    """Progress of one import_community run, committed with every chunk so it can resume (see community.imports)."""
+    name = models.CharField(max_length=100, unique=True)
+    source = models.CharField(max_length=500, help_text='File the run reads')
+    lines = models.BigIntegerField(default=0, help_text='Input lines imported so far')
+    offset = models.BigIntegerField(default=0, help_text='Byte offset of the next line to import')
+    counts = models.JSONField(default=dict, help_text='Rows imported and records skipped, by kind')
+    started_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-started_at']
+        verbose_name = "Import Run"
+        verbose_name_plural = "Import Runs"
+
+    def __str__(self):
+        return f'Import {self.name} ({self.lines} lines)'
+
+# --- The ImportedObject Model ---
+class ImportedObject(models.Model):
+    """Maps an id from an import's source to the post or comment created for it."""
+    KINDS = [
+        ('post', 'Post'),
+        ('comment', 'Comment'),
+    ]
+
+    run = models.ForeignKey(ImportRun, on_delete=models.CASCADE, related_name='imported')
+    kind = models.CharField(max_length=8, choices=KINDS)
+    source_id = models.CharField(max_length=64)
+    object_id = models.BigIntegerField()
+
+    class Meta:
+        verbose_name = "Imported Object"
+        verbose_name_plural = "Imported Objects"
+        constraints = [
+            models.UniqueConstraint(fields=['run', 'kind', 'source_id'], name='imported_object_source_uniq'),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} {self.source_id} -> {self.object_id}'
+
+# --- The RelatedPost Model ---
+class RelatedPost(models.Model):
+    """One of a post's most similar posts by text, precomputed by build_related_posts (see community.related)."""
+    # The (post, rank) constraint serves the lookups by post
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='related_posts', db_index=False)
+    related = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField(help_text='0 is the most similar')
+    score = models.FloatField(help_text='Cosine similarity of the two posts\' term vectors')
+
+    class Meta:
+        ordering = ['post', 'rank']
+        verbose_name = "Related Post"
+        verbose_name_plural = "Related Posts"
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'rank'], name='related_post_rank_uniq'),
+        ]
+
+    def __str__(self):
+        return f'{self.post_id} -> {self.related_id} ({self.score:.2f})'
+
+# --- The RelatedPostsBuild Model ---
+class RelatedPostsBuild(models.Model):
+    """One run of build_related_posts; the last finished one is where --incremental carries on from."""
+    full = models.BooleanField(help_text='Rebuilt every list, rather than folding in new and edited posts')
+    posts = models.IntegerField(default=0, help_text='Posts in the corpus')
+    updated = models.IntegerField(default=0, help_text='Posts whose related list was written')
+    last_post_id = models.BigIntegerField(default=0, help_text='Highest post id in the corpus')
+    started_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-started_at']
+        verbose_name = "Related Posts Build"
+        verbose_name_plural = "Related Posts Builds"
+
+    def __str__(self):
+        return f'{"Full" if self.full else "Incremental"} build of {self.started_at:%Y-%m-%d %H:%M}'
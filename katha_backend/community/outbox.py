@@ -0,0 +1,197 @@
+"""
+Transactional outbox: a log of changes to posts, comments, votes and saved posts.
+
+- emit(): called by the write paths inside their transaction, so an OutboxEvent
+  exists exactly when the change it describes was committed. The event carries the
+  whole row, so consumers never have to read the source tables back.
+- Consumers (registered with @consumer, see community.consumers) maintain derived
+  data off the request path. poll() hands a consumer the events after its offset in
+  id order, in batches, and moves the offset in the same transaction as the
+  handler's own writes. A handler that fails leaves the offset where it was and
+  sees the batch again: delivery is at least once, so handlers must be idempotent.
+  Database writes a handler makes commit with the offset, so those happen once.
+- compact(): drops events a later event for the same row supersedes, and deletes
+  older than OUTBOX_TOMBSTONE_RETENTION_DAYS, once every consumer is past them.
+  What is left is the current state of every row, which replay() feeds a consumer
+  from the start to rebuild its data.
+
+Ids are handed out when a transaction inserts, not when it commits, so an id can
+become visible after a higher one. poll() stops at such a gap until the event after
+it is OUTBOX_GAP_SECONDS old; write transactions are expected to be shorter.
+"""
+
+import logging
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .metrics import registry
+from .models import Comment, ConsumerOffset, OutboxEvent, Post, SavedPost, Vote
+from .retention import run_in_chunks
+
+logger = logging.getLogger('community.db')
+
+TOPICS = {Post: 'post', Comment: 'comment', Vote: 'vote', SavedPost: 'saved_post'}
+
+OUTBOX_EVENTS = registry.counter('katha_outbox_events_total', 'Outbox events written.', ('topic', 'action'))
+OUTBOX_DELIVERED = registry.counter(
+    'katha_outbox_delivered_total', 'Outbox events handed to consumers.', ('consumer',))
+OUTBOX_FAILURES = registry.counter(
+    'katha_outbox_consumer_failures_total', 'Consumer batches that raised and will be retried.', ('consumer',))
+
+
+# --- Writing events ---
+def event_key(instance):
+    if isinstance(instance, (Vote, SavedPost)):
+        return f'{instance.user_id}:{instance.post_id}'
+    return str(instance.pk)
+
+
+def row_data(instance):
+    return {field.attname: field.value_from_object(instance) for field in instance._meta.concrete_fields}
+
+
+def emit(instance, deleted=False):
+    """Record that ``instance`` was saved (or is being deleted) in the current transaction."""
+    topic = TOPICS[type(instance)]
+    action = 'delete' if deleted else 'upsert'
+    event = OutboxEvent.objects.create(topic=topic, key=event_key(instance), action=action, data=row_data(instance))
+    OUTBOX_EVENTS.inc(topic=topic, action=action)
+    return event
+
+
+# --- Consumers ---
+@dataclass
+class Consumer:
+    name: str
+    handle: Callable  # (list of OutboxEvent) -> None, inside the offset's transaction
+    topics: tuple = ()  # only these topics (empty: all)
+    reset: Optional[Callable] = None  # () -> None, clears the derived data before a replay
+
+    def wants(self, event):
+        return not self.topics or event.topic in self.topics
+
+
+CONSUMERS = {}
+
+
+def consumer(name, topics=(), reset=None):
+    """Register the decorated ``handle(events)`` as the consumer ``name``."""
+    def decorator(handle):
+        CONSUMERS[name] = Consumer(name, handle, tuple(topics), reset)
+        return handle
+    return decorator
+
+
+def get_consumer(name):
+    try:
+        return CONSUMERS[name]
+    except KeyError:
+        raise LookupError(f'No outbox consumer {name!r}; registered: {", ".join(sorted(CONSUMERS))}.')
+
+
+def batch_size():
+    return getattr(settings, 'OUTBOX_BATCH_SIZE', 500)
+
+
+def deliverable(events, position, now=None):
+    """The leading ``events`` after ``position`` that no still-open transaction can precede."""
+    cutoff = (now or timezone.now()) - timedelta(seconds=getattr(settings, 'OUTBOX_GAP_SECONDS', 5))
+    expected = position + 1
+    for index, event in enumerate(events):
+        if event.id != expected and event.created_at > cutoff:
+            return events[:index]
+        expected = event.id + 1
+    return events
+
+
+def poll(consumer, limit=None):
+    """Hand ``consumer`` its next batch of events; returns how many events its offset moved past."""
+    with transaction.atomic():
+        # The row lock keeps two runners of the same consumer from taking the same batch
+        offset, _ = ConsumerOffset.objects.select_for_update().get_or_create(name=consumer.name)
+        events = list(OutboxEvent.objects.filter(id__gt=offset.position).order_by('id')[:limit or batch_size()])
+        events = deliverable(events, offset.position)
+        if not events:
+            return 0
+        wanted = [event for event in events if consumer.wants(event)]
+        if wanted:
+            consumer.handle(wanted)
+        offset.position = events[-1].id
+        offset.save(update_fields=['position', 'updated_at'])
+    OUTBOX_DELIVERED.inc(len(wanted), consumer=consumer.name)
+    return len(events)
+
+
+def run(consumers, limit=None, poll_seconds=None, once=False, should_stop=lambda: False):
+    """Poll ``consumers`` until ``should_stop()``, sleeping when none had events; ``once`` stops when all are idle."""
+    if poll_seconds is None:
+        poll_seconds = getattr(settings, 'OUTBOX_POLL_SECONDS', 1.0)
+    total = 0
+    while not should_stop():
+        moved = 0
+        for consumer in consumers:
+            try:
+                moved += poll(consumer, limit)
+            except Exception:
+                OUTBOX_FAILURES.inc(consumer=consumer.name)
+                logger.exception('Outbox consumer %s failed; its batch will be retried', consumer.name)
+        total += moved
+        if not moved:
+            if once:
+                break
+            time.sleep(poll_seconds)
+    return total
+
+
+def replay(consumer):
+    """Start ``consumer`` over from the first event, clearing its derived data first."""
+    with transaction.atomic():
+        if consumer.reset is not None:
+            consumer.reset()
+        ConsumerOffset.objects.update_or_create(name=consumer.name, defaults={'position': 0})
+
+
+def lag(consumer):
+    """Events written after ``consumer``'s offset."""
+    position = ConsumerOffset.objects.filter(name=consumer.name).values_list('position', flat=True).first() or 0
+    return OutboxEvent.objects.filter(id__gt=position).count()
+
+
+# --- Compaction ---
+def horizon():
+    """The highest event id every registered consumer has processed."""
+    positions = dict(ConsumerOffset.objects.filter(name__in=CONSUMERS).values_list('name', 'position'))
+    return min((positions.get(name, 0) for name in CONSUMERS), default=0)
+
+
+def compact(tombstone_days=None, batch_size=1000, target_seconds=0.5, pause=0.0, max_seconds=None):
+    """Delete superseded events and old deletes that every consumer has processed; returns a RetentionResult."""
+    if tombstone_days is None:
+        tombstone_days = getattr(settings, 'OUTBOX_TOMBSTONE_RETENTION_DAYS', 7)
+    processed = OutboxEvent.objects.filter(id__lte=horizon())
+    newer = OutboxEvent.objects.filter(topic=OuterRef('topic'), key=OuterRef('key'), id__gt=OuterRef('id'))
+    superseded = processed.filter(Exists(newer))
+    expired = processed.filter(action='delete', created_at__lt=timezone.now() - timedelta(days=tombstone_days))
+
+    def chunks_of(queryset):
+        def process_chunk(limit):
+            with transaction.atomic():
+                ids = list(queryset.order_by('id').values_list('id', flat=True)[:limit])
+                OutboxEvent.objects.filter(id__in=ids).delete()
+            return len(ids)
+        return process_chunk
+
+    result = run_in_chunks(chunks_of(superseded), batch_size, target_seconds, pause, max_seconds)
+    tombstones = run_in_chunks(chunks_of(expired), batch_size, target_seconds, pause, max_seconds)
+    result.rows += tombstones.rows
+    result.chunks += tombstones.chunks
+    result.seconds += tombstones.seconds
+    return result
+
@@ -0,0 +1,142 @@
+"""
+Password hashing for logins and registrations on a small bounded pool.
+
+A hash takes tens to hundreds of milliseconds of CPU. Run on request threads, a burst
+of logins takes every thread of a worker and the rest of the API waits behind it.
+Here hashes and verifications run on PASSWORD_HASH_WORKERS threads, with at most
+PASSWORD_HASH_QUEUE more waiting for one; past that a login or registration fails
+at once with a 429 and Retry-After (HashingBusy) instead of queueing without limit.
+Only the hashing runs on the pool, the queries stay on the request thread. The
+limits are per process.
+
+New hashes use the first of PASSWORD_HASHERS (see PASSWORD_HASHER in settings). A
+login with a password stored by another hasher, or with old parameters, stores it
+again with the preferred one: the first login after a switch upgrades each account.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model, hashers
+from django.contrib.auth.backends import ModelBackend
+from rest_framework.exceptions import Throttled
+
+from .metrics import registry
+
+PASSWORD_HASH_SECONDS = registry.histogram(
+    'katha_password_hash_seconds', 'Time spent hashing or verifying one password.', ('operation',))
+PASSWORD_HASH_WAIT_SECONDS = registry.histogram(
+    'katha_password_hash_wait_seconds', 'Time a password operation waited for a hashing thread.', ('operation',))
+PASSWORD_HASH_PENDING = registry.gauge(
+    'katha_password_hash_pending', 'Password operations running or waiting for a hashing thread.')
+PASSWORD_HASH_REJECTED = registry.counter(
+    'katha_password_hash_rejected_total', 'Password operations refused with a 429 because the queue was full.',
+    ('operation',))
+PASSWORD_REHASHED = registry.counter(
+    'katha_password_rehashed_total', 'Passwords stored again with the preferred hasher on login.', ('algorithm',))
+
+
+class HashingBusy(Throttled):
+    default_detail = 'Too many logins in progress, try again in a moment.'
+    default_code = 'hashing_busy'
+
+
+# --- The pool ---
+_executor = None
+_slots = None
+_executor_lock = threading.Lock()
+
+
+def executor():
+    """The pool and the semaphore bounding what it runs plus what waits for it."""
+    global _executor, _slots
+    with _executor_lock:
+        if _executor is None:
+            workers = getattr(settings, 'PASSWORD_HASH_WORKERS', 2)
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+            _slots = threading.BoundedSemaphore(workers + getattr(settings, 'PASSWORD_HASH_QUEUE', 8))
+        return _executor, _slots
+
+
+def shutdown_executor():
+    """Stop the pool; the next hash starts one sized by the settings at that time."""
+    global _executor, _slots
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown()
+            _executor = _slots = None
+
+
+def run(operation, func, *args):
+    """``func(*args)`` on the hashing pool; raises HashingBusy when the queue is full."""
+    if getattr(settings, 'PASSWORD_HASH_WORKERS', 2) < 1:
+        return func(*args)
+    pool, slots = executor()
+    if not slots.acquire(blocking=False):
+        PASSWORD_HASH_REJECTED.inc(operation=operation)
+        raise HashingBusy(wait=getattr(settings, 'PASSWORD_HASH_RETRY_AFTER', 1))
+    queued = time.perf_counter()
+
+    def timed():
+        started = time.perf_counter()
+        PASSWORD_HASH_WAIT_SECONDS.observe(started - queued, operation=operation)
+        try:
+            return func(*args)
+        finally:
+            PASSWORD_HASH_SECONDS.observe(time.perf_counter() - started, operation=operation)
+
+    def done(future):
+        PASSWORD_HASH_PENDING.dec()
+        slots.release()
+
+    PASSWORD_HASH_PENDING.inc()
+    try:
+        future = pool.submit(timed)
+    except BaseException:
+        PASSWORD_HASH_PENDING.dec()
+        slots.release()
+        raise
+    future.add_done_callback(done)
+    return future.result()
+
+
+# --- Hashing ---
+def make_password(password):
+    """A hash of ``password`` with the preferred hasher, made on the pool."""
+    return run('hash', hashers.make_password, password)
+
+
+def check_password(user, password):
+    """Like ``user.check_password``, verifying on the pool and upgrading an outdated hash."""
+    is_correct, must_update = run('verify', hashers.verify_password, password, user.password)
+    if is_correct and must_update:
+        algorithm = hashers.identify_hasher(user.password).algorithm
+        try:
+            user.password = make_password(password)
+        except HashingBusy:
+            return True  # The password was right; upgrade it on a later login
+        user.save(update_fields=['password'])
+        PASSWORD_REHASHED.inc(algorithm=algorithm)
+    return is_correct
+
+
+class PooledPasswordBackend(ModelBackend):
+    """ModelBackend with the password checked on the hashing pool."""
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Hash anyway, so an unknown username takes as long as a wrong password
+            make_password(password)
+            return None
+        if check_password(user, password) and self.user_can_authenticate(user):
+            return user
+        return None
@@ -0,0 +1,279 @@
+"""
+On-demand request profiling.
+
+Send ``X-Profile: cprofile`` (deterministic, pstats) or ``X-Profile: sample``
+(stack sampling, collapsed-stack format) with a staff JWT or with
+``X-Profile-Token: <PROFILING_SECRET>``, and the request runs under the profiler.
+The result is stored under PROFILING_DIR/<id>/ together with the SQL it ran, and
+the response carries ``X-Profile-Id: <id>``. Other callers' headers are ignored.
+
+With PROFILING_SAMPLE_RATE = N, one request in N per endpoint is also run under
+the sampler; its stacks are added to a per-process, per-endpoint aggregate
+(PROFILING_DIR/sampled/) so the hot frames of each endpoint build up over time.
+
+Inspect both with ``python manage.py profiles``.
+
+Under ASGI the profiler watches the event loop thread while the request is
+awaited, so concurrent requests' coroutines can show up in it, and time in ORM
+calls (run on other threads) appears as waiting; the SQL list is complete.
+"""
+
+import cProfile
+import json
+import logging
+import os
+import shutil
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.urls import Resolver404, resolve
+from django.utils.crypto import constant_time_compare
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from .metrics import registry
+from .middleware import HybridMiddleware, QueryCollector, collecting, view_label
+
+logger = logging.getLogger('community.perf')
+
+MODES = ('cprofile', 'sample')
+SAMPLED_DIR = 'sampled'
+
+PROFILED_REQUESTS = registry.counter(
+    'katha_profiled_requests_total', 'Requests run under a profiler, by trigger.', ('trigger',))
+
+
+def profile_dir():
+    return Path(getattr(settings, 'PROFILING_DIR', None) or Path(settings.BASE_DIR) / 'profiles')
+
+
+def frame_label(code):
+    return f'{os.path.basename(code.co_filename)}:{getattr(code, "co_qualname", code.co_name)}'
+
+
+def collapse(frame):
+    """The stack of ``frame`` as 'outer;...;inner' in collapsed-stack format."""
+    names = []
+    while frame is not None:
+        names.append(frame_label(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class StackSampler:
+    """Samples the stack of one thread every ``interval`` seconds from a helper thread."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self.run, name='profile-sampler', daemon=True)
+
+    def run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse(frame)] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def format_collapsed(stacks):
+    return ''.join(f'{stack} {count}\n' for stack, count in stacks.most_common())
+
+
+def parse_collapsed(text):
+    stacks = Counter()
+    for line in text.splitlines():
+        stack, _, count = line.rpartition(' ')
+        if stack:
+            stacks[stack] += int(count)
+    return stacks
+
+
+def hot_frames(stacks, limit=20):
+    """[(frame, self samples, total samples)] for the frames most often on the sampled stacks."""
+    own, total = Counter(), Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(';')
+        own[frames[-1]] += count
+        for frame in set(frames):
+            total[frame] += count
+    return [(frame, own[frame], total[frame]) for frame, _ in own.most_common(limit)]
+
+
+def staff_token(request):
+    try:
+        result = JWTAuthentication().authenticate(request)
+    except (AuthenticationFailed, InvalidToken, TokenError):
+        return False
+    return result is not None and result[0].is_staff
+
+
+class ProfilingMiddleware(HybridMiddleware):
+    """Runs opted-in and sampled requests under cProfile or the stack sampler."""
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.secret = getattr(settings, 'PROFILING_SECRET', '')
+        self.sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0)
+        self.interval = getattr(settings, 'PROFILING_SAMPLE_INTERVAL_MS', 5) / 1000
+        self.keep = getattr(settings, 'PROFILING_KEEP', 100)
+        self._lock = threading.Lock()
+        self._seen = Counter()  # endpoint -> requests since the last sample
+        self._sampled = defaultdict(Counter)  # endpoint -> aggregated stacks
+
+    def sync_call(self, request):
+        mode = request.headers.get('X-Profile')
+        if mode in MODES and self.allowed(request):
+            PROFILED_REQUESTS.inc(trigger='header')
+            profiler = self.profiler(mode)
+            return self.profile(request, mode, profiler, *self.run(request, profiler))
+        if self.sample_rate:
+            endpoint = self.sample_endpoint(request)
+            if endpoint is not None:
+                PROFILED_REQUESTS.inc(trigger='sampling')
+                sampler = self.profiler('sample')
+                response, _, _ = self.run(request, sampler)
+                self.sample(endpoint, sampler)
+                return response
+        return self.get_response(request)
+
+    async def async_call(self, request):
+        mode = request.headers.get('X-Profile')
+        if mode in MODES and await sync_to_async(self.allowed)(request):
+            PROFILED_REQUESTS.inc(trigger='header')
+            profiler = self.profiler(mode)
+            result = await self.arun(request, profiler)
+            return await sync_to_async(self.profile)(request, mode, profiler, *result)
+        if self.sample_rate:
+            endpoint = self.sample_endpoint(request)
+            if endpoint is not None:
+                PROFILED_REQUESTS.inc(trigger='sampling')
+                sampler = self.profiler('sample')
+                response, _, _ = await self.arun(request, sampler)
+                await sync_to_async(self.sample)(endpoint, sampler)
+                return response
+        return await self.get_response(request)
+
+    def profiler(self, mode):
+        if mode == 'cprofile':
+            return cProfile.Profile()
+        return StackSampler(threading.get_ident(), self.interval)
+
+    def allowed(self, request):
+        supplied = request.headers.get('X-Profile-Token', '')
+        if self.secret and supplied and constant_time_compare(supplied, self.secret):
+            return True
+        return staff_token(request)
+
+    def sample_endpoint(self, request):
+        """The endpoint's name when this request is its 1-in-N sample, else None."""
+        try:
+            endpoint = resolve(request.path_info).view_name
+        except Resolver404:
+            return None
+        with self._lock:
+            self._seen[endpoint] += 1
+            if self._seen[endpoint] < self.sample_rate:
+                return None
+            self._seen[endpoint] = 0
+        return endpoint
+
+    def run(self, request, profiler):
+        collector = QueryCollector()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(collector))
+            stack.enter_context(profiler)
+            response = self.get_response(request)
+        return response, collector, time.perf_counter() - start
+
+    async def arun(self, request, profiler):
+        start = time.perf_counter()
+        with collecting(QueryCollector()) as collector, profiler:
+            response = await self.get_response(request)
+        return response, collector, time.perf_counter() - start
+
+    def profile(self, request, mode, profiler, response, collector, wall_time):
+        profile_id = f'{time.strftime("%Y%m%d-%H%M%S")}-{uuid.uuid4().hex[:8]}'
+        try:
+            self.store(profile_id, request, response, mode, profiler, collector, wall_time)
+        except OSError:
+            logger.exception('Could not store profile %s', profile_id)
+            return response
+        response['X-Profile-Id'] = profile_id
+        return response
+
+    def store(self, profile_id, request, response, mode, profiler, collector, wall_time):
+        path = profile_dir() / profile_id
+        path.mkdir(parents=True)
+        if mode == 'cprofile':
+            profiler.dump_stats(path / 'profile.pstats')
+        else:
+            (path / 'stacks.collapsed').write_text(format_collapsed(profiler.stacks))
+        meta = {
+            'id': profile_id,
+            'mode': mode,
+            'method': request.method,
+            'path': request.get_full_path(),
+            'view': view_label(request),
+            'status': response.status_code,
+            'wall_ms': round(wall_time * 1000, 2),
+            'db_ms': round(collector.total_time * 1000, 2),
+            'queries': [{'alias': q['alias'], 'ms': round(q['duration'] * 1000, 3), 'sql': q['sql']}
+                        for q in collector.queries],
+        }
+        (path / 'meta.json').write_text(json.dumps(meta, indent=2))
+        logger.info('Stored %s profile %s of %s %s', mode, profile_id, request.method, request.path)
+        self.prune()
+
+    def prune(self):
+        """Keep the newest PROFILING_KEEP stored profiles."""
+        profiles = sorted(p for p in profile_dir().iterdir() if p.is_dir() and p.name != SAMPLED_DIR)
+        for old in profiles[:-self.keep] if self.keep else []:
+            shutil.rmtree(old, ignore_errors=True)
+
+    def sample(self, endpoint, sampler):
+        """Add a sampled request's stacks to its endpoint's aggregate."""
+        with self._lock:
+            aggregate = self._sampled[endpoint]
+            aggregate.update(sampler.stacks)
+            text = format_collapsed(aggregate)
+        # One file per process, so workers never overwrite each other's aggregates
+        directory = profile_dir() / SAMPLED_DIR
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+            (directory / f'{endpoint.replace(":", "_")}.{os.getpid()}.collapsed').write_text(text)
+        except OSError:
+            logger.exception('Could not store sampled stacks of %s', endpoint)
+
+
+def sampled_stacks(endpoint=None):
+    """{endpoint: aggregated stacks} merged over every process that wrote samples."""
+    merged = defaultdict(Counter)
+    directory = profile_dir() / SAMPLED_DIR
+    if not directory.is_dir():
+        return merged
+    for path in directory.glob('*.collapsed'):
+        name = path.name.split('.')[0]
+        if endpoint is None or name == endpoint.replace(':', '_'):
+            merged[name].update(parse_collapsed(path.read_text()))
+    return merged
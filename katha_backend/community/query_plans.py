@@ -0,0 +1,224 @@
+"""
+Query-plan checks for the hot read paths.
+
+Each PlanCase is a GET against a real endpoint. Its SELECTs are captured and run
+through EXPLAIN (SQLite: EXPLAIN QUERY PLAN, MySQL: EXPLAIN, PostgreSQL: EXPLAIN)
+and every full table scan, filesort or temporary sort is reported as an issue.
+Issues a case expects, because the query has no index to use by design, are
+listed in its ``allow`` with the reason; anything else is a regression.
+
+Used by community/tests/test_query_plans.py and the explain_queries command.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Callable
+
+from django.db import connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .middleware import fingerprint
+from .models import Comment, Notification, Post, SavedPost
+
+
+@dataclass(frozen=True)
+class PlanIssue:
+    table: str
+    kind: str  # 'full scan' or 'sort'
+    detail: str
+
+
+@dataclass
+class PlanCase:
+    """One endpoint request whose queries must use indexes, except for ``allow``ed issues."""
+    label: str
+    path: Callable[['PlanContext'], str]
+    auth: bool = True
+    allow: dict = field(default_factory=dict)  # (table, kind) -> why it is expected
+
+    def allows(self, issue):
+        return (issue.table, issue.kind) in self.allow
+
+
+@dataclass
+class PlanContext:
+    """Ids to address in the seeded database."""
+    user: object
+    post_id: int
+    comment_id: int
+    author: str
+
+    @classmethod
+    def from_database(cls):
+        notification = Notification.objects.order_by('id').first()
+        saved = SavedPost.objects.order_by('id').first()
+        post = Post.objects.alive().order_by('-id').first()
+        comment = Comment.objects.alive().filter(parent__isnull=True).order_by('-id').first()
+        if not (notification or saved) or post is None or comment is None:
+            raise LookupError('No posts, comments and notifications to query; run seed_benchmark_data first.')
+        user = notification.user if notification else saved.user
+        return cls(user=user, post_id=post.id, comment_id=comment.id, author=post.author.username[:6])
+
+
+SORT_ALLOW = {('community_post', 'sort'): 'computed sort key (votes, comment count or score)'}
+# The feed counts top-level comments per post with a GROUP BY over the post rows
+FEED_ALLOW = {
+    ('community_post', 'full scan'): 'the unpaginated feed reads every live post',
+    ('community_post', 'sort'): 'the comment-count GROUP BY is sorted before ordering',
+}
+
+PLAN_CASES = [
+    *[PlanCase(f'post-list sort={sort}', (lambda sort: lambda c: f'/api/v1/posts/?sort={sort}')(sort),
+               auth=False, allow={**FEED_ALLOW, **SORT_ALLOW})
+      for sort in ('newest', 'oldest', 'most_voted', 'most_comments', 'trending')],
+    PlanCase('post-list author', lambda c: f'/api/v1/posts/?author={c.author}', auth=False, allow={
+        **FEED_ALLOW, ('auth_user', 'full scan'): "icontains on username can't use an index",
+    }),
+    PlanCase('post-list dates', lambda c: '/api/v1/posts/?date_from=2020-01-01T00:00:00&date_to=2100-01-01T00:00:00',
+             auth=False, allow=FEED_ALLOW),
+    PlanCase('post-detail', lambda c: f'/api/v1/posts/{c.post_id}/'),
+    PlanCase('post-saved', lambda c: '/api/v1/posts/saved/'),
+    PlanCase('post-state', lambda c: f'/api/v1/posts/state/?ids={c.post_id},{c.post_id + 1}'),
+    PlanCase('post-thread', lambda c: f'/api/v1/posts/{c.post_id}/thread/'),
+    PlanCase('post-activity', lambda c: f'/api/v1/posts/{c.post_id}/activity/?period=day', auth=False, allow={
+        ('community_postactivity', 'sort'): "day series groups a post's day and hour rows by bucket",
+    }),
+    PlanCase('post-related', lambda c: f'/api/v1/posts/{c.post_id}/related/', auth=False),
+    PlanCase('comment-detail', lambda c: f'/api/v1/comments/{c.comment_id}/'),
+    PlanCase('comment-thread', lambda c: f'/api/v1/comments/{c.comment_id}/thread/'),
+    PlanCase('comment-state', lambda c: f'/api/v1/comments/state/?ids={c.comment_id}'),
+    PlanCase('notification-list', lambda c: '/api/v1/notifications/'),
+    PlanCase('notification-list unread', lambda c: '/api/v1/notifications/?unread=1&limit=20'),
+    PlanCase('notification-unread-count', lambda c: '/api/v1/notifications/unread_count/'),
+    PlanCase('notification-archived', lambda c: '/api/v1/notifications/archived/?limit=20'),
+    PlanCase('activity_stats', lambda c: '/api/v1/stats/activity/', auth=False),
+]
+
+
+# --- EXPLAIN per database ---
+_SQLITE_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?! USING (?:COVERING )?INDEX)(?!.*USING (?:COVERING )?INDEX)')
+_SQLITE_SORT = re.compile(r'USE TEMP B-TREE FOR (ORDER BY|GROUP BY|DISTINCT)')
+_SQLITE_TABLE = re.compile(r'^(?:SCAN|SEARCH) (?:TABLE )?(\w+)')
+_PG_SCAN = re.compile(r'Seq Scan on (\w+)')
+_PG_TABLE = re.compile(r'Scan(?: using \w+)? on (\w+)')
+_PG_SORT = re.compile(r'^\s*(?:->\s*)?Sort\b')
+
+
+def explain(connection, sql):
+    """Plan rows of ``sql`` as text lines, in the database's own EXPLAIN format."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+        cursor.execute(f'EXPLAIN {sql}')
+        if connection.vendor == 'mysql':
+            columns = [col[0] for col in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        return [row[0] for row in cursor.fetchall()]
+
+
+def plan_issues(vendor, plan):
+    """Full scans and sorts in one plan.
+
+    SQLite and PostgreSQL report a sort for the whole statement, so it is put on
+    the statement's driving (first) table, which is where an index would avoid it.
+    """
+    issues = []
+    if vendor == 'mysql':
+        for row in plan:
+            table, extra = row.get('table') or '', row.get('Extra') or ''
+            if row.get('type') == 'ALL':
+                issues.append(PlanIssue(table, 'full scan', f"type=ALL rows={row.get('rows')}"))
+            if 'Using filesort' in extra or 'Using temporary' in extra:
+                issues.append(PlanIssue(table, 'sort', extra))
+        return issues
+
+    tables, sorts = [], []
+    for line in plan:
+        if vendor == 'sqlite':
+            if table := _SQLITE_TABLE.match(line):
+                tables.append(table.group(1))
+            if scan := _SQLITE_SCAN.match(line):
+                issues.append(PlanIssue(scan.group(1), 'full scan', line))
+            if _SQLITE_SORT.search(line):
+                sorts.append(line)
+        else:
+            if table := _PG_TABLE.search(line):
+                tables.append(table.group(1))
+            if scan := _PG_SCAN.search(line):
+                issues.append(PlanIssue(scan.group(1), 'full scan', line.strip()))
+            elif _PG_SORT.match(line):
+                sorts.append(line.strip())
+    driving = tables[0] if tables else ''
+    return issues + [PlanIssue(driving, 'sort', line) for line in sorts]
+
+
+@dataclass
+class QueryPlan:
+    sql: str
+    plan: list
+    issues: list
+    unexpected: list
+
+
+@dataclass
+class CaseResult:
+    case: PlanCase
+    path: str
+    status: int
+    queries: list  # [QueryPlan]
+
+    @property
+    def unexpected(self):
+        return [issue for query in self.queries for issue in query.unexpected]
+
+
+def run_case(case, context, using='default'):
+    """Request the case's endpoint and EXPLAIN every SELECT it ran."""
+    client = Client()
+    headers = {}
+    if case.auth:
+        headers['HTTP_AUTHORIZATION'] = f'Bearer {RefreshToken.for_user(context.user).access_token}'
+    connection = connections[using]
+    path = case.path(context)
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.get(path, **headers)
+
+    queries = []
+    seen = set()
+    for captured in ctx.captured_queries:
+        sql = captured['sql']
+        # SELECTs only, each query shape once (per-row serializer queries differ only in ids)
+        shape = fingerprint(sql)
+        if not sql.lstrip().upper().startswith('SELECT') or shape in seen:
+            continue
+        seen.add(shape)
+        plan = explain(connection, sql)
+        issues = plan_issues(connection.vendor, plan)
+        queries.append(QueryPlan(sql, plan, issues, [i for i in issues if not case.allows(i)]))
+    return CaseResult(case, path, response.status_code, queries)
+
+
+def run_cases(cases=None, using='default'):
+    context = PlanContext.from_database()
+    return [run_case(case, context, using) for case in cases or PLAN_CASES]
+
+
+def format_report(results, vendor):
+    """Plain-text report: every case, its queries and their plans, issues marked."""
+    lines = [f'Query plans ({vendor})', '']
+    for result in results:
+        mark = 'FAIL' if result.unexpected else 'ok'
+        lines.append(f'[{mark}] {result.case.label}: GET {result.path} -> {result.status}, '
+                     f'{len(result.queries)} distinct SELECTs')
+        for query in result.queries:
+            lines.append(f'    {query.sql}')
+            for row in query.plan:
+                lines.append(f'        {row}')
+            for issue in query.issues:
+                note = result.case.allow.get((issue.table, issue.kind))
+                lines.append(f'      ! {issue.kind} on {issue.table}: ' + (f'allowed ({note})' if note else 'UNEXPECTED'))
+        lines.append('')
+    return '\n'.join(lines)
@@ -0,0 +1,205 @@
+"""
+Related posts: each post's most similar posts by text, precomputed.
+
+build() turns the title and content of every live post into a TF-IDF vector over
+hashed terms (RELATED_POSTS_FEATURES buckets, so there is no vocabulary to keep),
+computes cosine similarities as sparse matrix products a batch of rows at a time,
+and stores each post's RELATED_POSTS_K best matches scoring at least
+RELATED_POSTS_MIN_SCORE as RelatedPost rows. Serving posts/{id}/related/ is then
+one indexed lookup (related_posts()); no request does any text work.
+
+build(full=False) folds in the posts created or edited since the last build: their
+lists are computed against the whole corpus, and each of them joins the lists of
+its matches where it beats their weakest entry. The IDF weights of older lists
+drift until the next full build; run one nightly and incremental ones often.
+
+numpy and scipy are only needed to build.
+"""
+
+import math
+import re
+import time
+import zlib
+from collections import Counter
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Post, RelatedPost, RelatedPostsBuild
+
+TOKEN_RE = re.compile(r'\w\w+')
+TITLE_WEIGHT = 2  # A title term counts as often as this many in the content
+
+
+def list_length():
+    return getattr(settings, 'RELATED_POSTS_K', 10)
+
+
+def batch_rows(corpus_size):
+    """Rows whose similarities to the whole corpus fit in RELATED_POSTS_BATCH_CELLS."""
+    return max(1, getattr(settings, 'RELATED_POSTS_BATCH_CELLS', 2 ** 24) // max(corpus_size, 1))
+
+
+# --- Serving ---
+def related_posts(post_id, limit=None):
+    """The post's related posts that are still live, best first, from one joined query."""
+    limit = min(limit or list_length(), list_length())
+    return list(RelatedPost.objects
+                .filter(post_id=post_id, post__deleted_at__isnull=True, related__deleted_at__isnull=True)
+                .order_by('rank')
+                .values('related_id', 'related__title', 'related__author__username', 'related__created_at',
+                        'related__votes', 'score')
+                [:max(limit, 1)])
+
+
+# --- Vectors ---
+def require_numpy():
+    try:
+        import numpy
+        import scipy.sparse
+    except ImportError as exc:
+        raise ImportError('Building related posts needs numpy and scipy (pip install numpy scipy).') from exc
+    return numpy, scipy.sparse
+
+
+def term_counts(title, content, features):
+    """Bucket -> count of the post's terms; crc32 rather than hash(), which differs per process."""
+    counts = Counter()
+    for text, weight in ((title, TITLE_WEIGHT), (content, 1)):
+        for token in TOKEN_RE.findall(text.lower()):
+            counts[zlib.crc32(token.encode()) % features] += weight
+    return counts
+
+
+def corpus():
+    """Ids and L2-normalised TF-IDF rows (a CSR matrix) of every live post, in id order."""
+    np, sparse = require_numpy()
+    features = getattr(settings, 'RELATED_POSTS_FEATURES', 2 ** 18)
+    ids, indptr, indices, data = [], [0], [], []
+    rows = Post.objects.alive().order_by('id').values_list('id', 'title', 'content')
+    for post_id, title, content in rows.iterator(chunk_size=2000):
+        counts = term_counts(title, content, features)
+        ids.append(post_id)
+        indices.extend(counts)
+        data.extend(1 + math.log(count) for count in counts.values())  # Sublinear TF
+        indptr.append(len(indices))
+    matrix = sparse.csr_matrix((np.array(data, dtype=np.float32), np.array(indices, dtype=np.int32), indptr),
+                               shape=(len(ids), features))
+    df = np.bincount(matrix.indices, minlength=features)
+    idf = np.log((1 + len(ids)) / (1 + df)).astype(np.float32) + 1
+    matrix.data *= idf[matrix.indices]
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return np.array(ids, dtype=np.int64), sparse.diags(1 / norms).dot(matrix).tocsr().astype(np.float32)
+
+
+def neighbours(ids, matrix, rows):
+    """``{post id: [(related id, score)]}`` for the given row positions, best first.
+
+    The similarities of a batch of rows to the whole corpus are one dense array, so
+    batch_rows() bounds the memory of a build.
+    """
+    np, _ = require_numpy()
+    limit, min_score = list_length(), getattr(settings, 'RELATED_POSTS_MIN_SCORE', 0.05)
+    n = len(ids)
+    if n < 2:
+        return {int(ids[row]): [] for row in rows}
+    top_k = min(limit, n - 1)
+    batch = batch_rows(n)
+    transposed = matrix.T.tocsc()
+    result = {}
+    for start in range(0, len(rows), batch):
+        chunk = np.asarray(rows[start:start + batch])
+        similarities = matrix[chunk].dot(transposed).toarray()
+        similarities[np.arange(len(chunk)), chunk] = -1  # Not related to itself
+        top = np.argpartition(-similarities, top_k - 1, axis=1)[:, :top_k]
+        scores = np.take_along_axis(similarities, top, axis=1)
+        order = np.argsort(-scores, axis=1, kind='stable')
+        top, scores = np.take_along_axis(top, order, axis=1), np.take_along_axis(scores, order, axis=1)
+        for row, columns, values in zip(chunk, top, scores):
+            result[int(ids[row])] = [(int(ids[column]), float(score))
+                                     for column, score in zip(columns, values) if score >= min_score]
+    return result
+
+
+# --- Storing ---
+def write(lists):
+    """Replace the related lists of these posts, in one transaction."""
+    with transaction.atomic():
+        RelatedPost.objects.filter(post_id__in=list(lists)).delete()
+        RelatedPost.objects.bulk_create(
+            [RelatedPost(post_id=post_id, related_id=related_id, rank=rank, score=score)
+             for post_id, entries in lists.items() for rank, (related_id, score) in enumerate(entries)],
+            batch_size=1000)
+
+
+def merge_into_lists(additions):
+    """Add ``{post id: [(new related id, score)]}`` to existing lists where they make the top k."""
+    current = {}
+    for post_id, related_id, score in (RelatedPost.objects.filter(post_id__in=list(additions))
+                                       .order_by('post_id', 'rank').values_list('post_id', 'related_id', 'score')):
+        current.setdefault(post_id, {})[related_id] = score
+    changed = {}
+    for post_id, entries in additions.items():
+        scores = current.get(post_id, {})
+        weakest = min(scores.values()) if len(scores) >= list_length() else -1
+        if all(score <= weakest or scores.get(related_id) == score for related_id, score in entries):
+            continue
+        scores = {**scores, **dict(entries)}
+        changed[post_id] = sorted(scores.items(), key=lambda entry: -entry[1])[:list_length()]
+    if changed:
+        write(changed)
+    return len(changed)
+
+
+@dataclass
+class BuildResult:
+    build: RelatedPostsBuild
+    seconds: float = 0.0
+
+
+def build(full=True, progress=None):
+    """Compute related lists (all of them, or those of new and edited posts); returns a BuildResult."""
+    np, _ = require_numpy()
+    started = time.perf_counter()
+    previous = RelatedPostsBuild.objects.filter(finished_at__isnull=False).order_by('-started_at').first()
+    run = RelatedPostsBuild.objects.create(full=full or previous is None)
+    ids, matrix = corpus()
+    if run.full:
+        rows = np.arange(len(ids))
+    else:
+        changed = Post.objects.filter(Q(id__gt=previous.last_post_id) | Q(edited_at__gte=previous.started_at))
+        # Posts written since corpus() read the table are left to the next build
+        rows = np.flatnonzero(np.isin(ids, list(changed.values_list('id', flat=True))))
+
+    batch = batch_rows(len(ids))
+    folded = {}
+    for start in range(0, len(rows), batch):
+        lists = neighbours(ids, matrix, rows[start:start + batch])
+        write(lists)
+        run.updated += len(lists)
+        if not run.full:
+            folded.update(lists)
+        if progress:
+            progress(run.updated, len(rows))
+
+    if run.full:
+        # Lists of posts deleted since; purge_deleted removes the rest with the posts
+        RelatedPost.objects.filter(post__deleted_at__isnull=False).delete()
+    else:
+        # Each new or edited post joins the lists of its own matches
+        additions = {}
+        for post_id, entries in folded.items():
+            for related_id, score in entries:
+                if related_id not in folded:
+                    additions.setdefault(related_id, []).append((post_id, score))
+        run.updated += merge_into_lists(additions)
+
+    run.posts = len(ids)
+    run.last_post_id = int(ids[-1]) if len(ids) else 0
+    run.finished_at = timezone.now()
+    run.save()
+    return BuildResult(run, time.perf_counter() - started)
@@ -0,0 +1,135 @@
+"""
+Notification retention: keep the hot Notification table small.
+
+Every operation works in short chunks, each in its own transaction, so no
+statement holds row locks for long:
+
+- archive_read_notifications(): move (or delete) read notifications older than a
+  cutoff into ArchivedNotification. The chunk size adapts so one chunk takes
+  about ``target_seconds``.
+- purge_archived_notifications(): drop archived rows past their retention.
+- mark_all_read(): the batched replacement for one UPDATE over every unread row.
+"""
+
+import logging
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import transaction
+
+from .metrics import registry
+from .models import ArchivedNotification, Notification
+
+logger = logging.getLogger('community.db')
+
+ARCHIVED_FIELDS = ('id', 'user_id', 'notification_type', 'post_id', 'comment_id', 'actor_id', 'read', 'created_at')
+
+RETENTION_ROWS = registry.counter(
+    'katha_retention_rows_total', 'Rows handled by the retention job, by action.', ('action',))
+
+
+def mark_read_batch_size():
+    return getattr(settings, 'NOTIFICATION_MARK_READ_BATCH_SIZE', 500)
+
+
+def mark_all_read(user, batch_size=None):
+    """Mark every unread notification of ``user`` read, ``batch_size`` rows per UPDATE."""
+    batch_size = batch_size or mark_read_batch_size()
+    unread = Notification.objects.filter(user=user, read=False)
+    total = 0
+    while True:
+        ids = list(unread.order_by().values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        # Each UPDATE commits on its own, releasing its locks before the next batch
+        total += Notification.objects.filter(id__in=ids, read=False).update(read=True)
+        if len(ids) < batch_size:
+            break
+    return total
+
+
+@dataclass
+class RetentionResult:
+    rows: int = 0
+    chunks: int = 0
+    seconds: float = 0.0
+
+
+class ChunkSizer:
+    """Grow or shrink the chunk size so each chunk takes about ``target_seconds``."""
+
+    def __init__(self, initial, target_seconds, minimum=50, maximum=10000):
+        self.size = initial
+        self.target_seconds = target_seconds
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def record(self, seconds):
+        if seconds > self.target_seconds:
+            self.size = max(self.minimum, self.size // 2)
+        elif seconds < self.target_seconds / 2:
+            self.size = min(self.maximum, self.size * 2)
+
+
+def run_in_chunks(process_chunk, batch_size, target_seconds, pause, max_seconds=None):
+    """
+    Call ``process_chunk(limit) -> rows handled`` until it handles fewer rows than
+    asked for, sleeping ``pause`` seconds between chunks to let replicas catch up.
+    """
+    sizer = ChunkSizer(batch_size, target_seconds, maximum=max(batch_size, 10000))
+    result = RetentionResult()
+    started = time.monotonic()
+    while True:
+        limit = sizer.size
+        chunk_started = time.monotonic()
+        rows = process_chunk(limit)
+        sizer.record(time.monotonic() - chunk_started)
+        result.rows += rows
+        result.chunks += 1
+        if rows < limit:
+            break
+        if max_seconds is not None and time.monotonic() - started >= max_seconds:
+            logger.info('Retention run stopped after %.0fs with rows left; the next run continues', max_seconds)
+            break
+        if pause:
+            time.sleep(pause)
+    result.seconds = time.monotonic() - started
+    return result
+
+
+def archive_read_notifications(cutoff, archive=True, batch_size=1000, target_seconds=0.5, pause=0.0,
+                               max_seconds=None):
+    """Move read notifications created before ``cutoff`` to the archive (or delete them)."""
+    expired = Notification.objects.filter(read=True, created_at__lt=cutoff).order_by('id')
+    action = 'archived' if archive else 'deleted'
+
+    def process_chunk(limit):
+        with transaction.atomic():
+            if archive:
+                rows = list(expired.values(*ARCHIVED_FIELDS)[:limit])
+                ids = [row['id'] for row in rows]
+                ArchivedNotification.objects.bulk_create(
+                    [ArchivedNotification(**row) for row in rows], ignore_conflicts=True)
+            else:
+                ids = list(expired.values_list('id', flat=True)[:limit])
+            if ids:
+                Notification.objects.filter(id__in=ids).delete()
+        RETENTION_ROWS.inc(len(ids), action=action)
+        return len(ids)
+
+    return run_in_chunks(process_chunk, batch_size, target_seconds, pause, max_seconds)
+
+
+def purge_archived_notifications(cutoff, batch_size=1000, target_seconds=0.5, pause=0.0, max_seconds=None):
+    """Delete archived notifications archived before ``cutoff``."""
+    expired = ArchivedNotification.objects.filter(archived_at__lt=cutoff).order_by('id')
+
+    def process_chunk(limit):
+        ids = list(expired.values_list('id', flat=True)[:limit])
+        if ids:
+            ArchivedNotification.objects.filter(id__in=ids).delete()
+        RETENTION_ROWS.inc(len(ids), action='purged')
+        return len(ids)
+
+    return run_in_chunks(process_chunk, batch_size, target_seconds, pause, max_seconds)
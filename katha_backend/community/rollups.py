@@ -0,0 +1,171 @@
+"""
+Engagement rollups: per-post vote, comment and save counts in hourly and daily
+buckets (PostActivity), so "votes in the last hour" or "comments today" never
+scan Vote, Comment or SavedPost.
+
+- record(): called by the write paths inside their transaction; adds to the row
+  of the current hour with an UPDATE ... SET n = n + delta (INSERT the first time).
+- compact(): folds hourly rows older than ACTIVITY_HOURLY_RETENTION_DAYS into one
+  daily row per post and day, in short chunked transactions.
+- series() / activity(): read API over rollup rows only.
+- backfill(): rebuilds recent rows from the source tables (first deploy, repairs).
+
+Buckets are UTC. Hourly detail is only kept for the retention window; older
+ranges are available per day.
+"""
+
+from collections import defaultdict
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from .exports import ExportFilterError, parse_bound
+from .models import Comment, PostActivity, SavedPost, Vote
+from .retention import run_in_chunks
+
+COUNTERS = ('upvotes', 'downvotes', 'comments', 'saves')
+PERIODS = {'hour': timedelta(hours=1), 'day': timedelta(days=1)}
+# Default window and the most buckets one series may span
+DEFAULT_SPAN = {'hour': 24, 'day': 30}
+MAX_SPAN = {'hour': 24 * 31, 'day': 366 * 2}
+
+
+class ActivityQueryError(ValueError):
+    """The requested period or window is invalid."""
+
+
+def hourly_retention_days():
+    return getattr(settings, 'ACTIVITY_HOURLY_RETENTION_DAYS', 7)
+
+
+def hour_bucket(when):
+    return when.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def day_bucket(when):
+    return hour_bucket(when).replace(hour=0)
+
+
+def truncate(when, period):
+    return hour_bucket(when) if period == 'hour' else day_bucket(when)
+
+
+def vote_deltas(old, new):
+    """Counter changes for a vote going from ``old`` to ``new`` (0 = no vote)."""
+    return {'upvotes': (new == 1) - (old == 1), 'downvotes': (new == -1) - (old == -1)}
+
+
+def add(post_id, period, bucket, deltas):
+    """Add ``deltas`` to one rollup row, creating it if needed."""
+    rows = PostActivity.objects.filter(post_id=post_id, period=period, bucket=bucket)
+    increments = {name: F(name) + value for name, value in deltas.items()}
+    if rows.update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            PostActivity.objects.create(post_id=post_id, period=period, bucket=bucket, **deltas)
+    except IntegrityError:
+        # Another request inserted the row since our UPDATE
+        rows.update(**increments)
+
+
+def record(post_id, when=None, **deltas):
+    """Count engagement on a post in the current hour, e.g. ``record(post.id, comments=1)``."""
+    deltas = {name: value for name, value in deltas.items() if value}
+    if deltas:
+        add(post_id, 'hour', hour_bucket(when or timezone.now()), deltas)
+
+
+def compact(older_than=None, batch_size=1000, target_seconds=0.5, pause=0.0, max_seconds=None):
+    """Fold hourly rows of days before ``older_than`` into daily rows; returns a RetentionResult."""
+    if older_than is None:
+        older_than = timezone.now() - timedelta(days=hourly_retention_days())
+    hourly = PostActivity.objects.filter(period='hour', bucket__lt=day_bucket(older_than)).order_by('bucket', 'id')
+
+    def process_chunk(limit):
+        with transaction.atomic():
+            rows = list(hourly.values('id', 'post_id', 'bucket', *COUNTERS)[:limit])
+            days = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+            for row in rows:
+                counts = days[row['post_id'], day_bucket(row['bucket'])]
+                for name in COUNTERS:
+                    counts[name] += row[name]
+            for (post_id, day), counts in days.items():
+                add(post_id, 'day', day, counts)
+            PostActivity.objects.filter(id__in=[row['id'] for row in rows]).delete()
+        return len(rows)
+
+    return run_in_chunks(process_chunk, batch_size, target_seconds, pause, max_seconds)
+
+
+def backfill(since):
+    """Replace rollup rows from the day of ``since`` on with counts rebuilt from votes, comments and saves."""
+    # Whole days, so no daily row overlaps the rebuilt hours
+    start = day_bucket(since)
+    buckets = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    sources = [
+        (Vote.objects, 'created_at', {'upvotes': Count('id', filter=Q(value=1)),
+                                      'downvotes': Count('id', filter=Q(value=-1))}),
+        (Comment.objects.alive(), 'created_at', {'comments': Count('id')}),
+        (SavedPost.objects, 'saved_at', {'saves': Count('id')}),
+    ]
+    for queryset, field, counts in sources:
+        rows = (queryset.filter(**{f'{field}__gte': start}).order_by()
+                .values('post_id', hour=TruncHour(field)).annotate(**counts))
+        for row in rows:
+            for name in counts:
+                buckets[row['post_id'], hour_bucket(row['hour'])][name] += row[name]
+    with transaction.atomic():
+        PostActivity.objects.filter(bucket__gte=start).delete()
+        PostActivity.objects.bulk_create(
+            [PostActivity(post_id=post_id, period='hour', bucket=bucket, **counts)
+             for (post_id, bucket), counts in buckets.items()],
+            batch_size=1000,
+        )
+    return len(buckets)
+
+
+def window(params):
+    """(period, since, until) from the ?period=, ?since= and ?until= query parameters."""
+    period = params.get('period', 'hour')
+    if period not in PERIODS:
+        raise ActivityQueryError("period must be 'hour' or 'day'.")
+    try:
+        until = parse_bound(params['until'], 'until', end=True) if params.get('until') else timezone.now()
+        since = (parse_bound(params['since'], 'since') if params.get('since')
+                 else until - DEFAULT_SPAN[period] * PERIODS[period])
+    except ExportFilterError as e:
+        raise ActivityQueryError(str(e))
+    since = truncate(since, period)
+    if since >= until:
+        raise ActivityQueryError("'since' must be before 'until'.")
+    if (until - since) / PERIODS[period] > MAX_SPAN[period]:
+        raise ActivityQueryError(f'At most {MAX_SPAN[period]} {period}s per series.')
+    return period, since, until
+
+
+def series(rows, period, since, until):
+    """Summed counters per bucket of ``period`` for rollup ``rows``; empty buckets are left out."""
+    rows = rows.filter(bucket__gte=since, bucket__lt=until)
+    if period == 'hour':
+        rows = rows.filter(period='hour')
+    grouped = rows.order_by().values('bucket').annotate(**{name: Sum(name) for name in COUNTERS})
+    points = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    for row in grouped:
+        # Not yet compacted hours count towards their day
+        point = points[truncate(row['bucket'], period)]
+        for name in COUNTERS:
+            point[name] += row[name]
+    return [{'bucket': bucket, **points[bucket]} for bucket in sorted(points)]
+
+
+def activity(rows, params):
+    """Response body with the series and its totals for the requested window."""
+    period, since, until = window(params)
+    points = series(rows, period, since, until)
+    totals = {name: sum(point[name] for point in points) for name in COUNTERS}
+    return {'period': period, 'since': since, 'until': until, 'totals': totals, 'series': points}
@@ -0,0 +1,199 @@
+"""
+Database router that sends safe-method reads of the community app to read replicas.
+
+Writes always go to the primary ('default'). A request that writes pins its user
+to the primary for REPLICA_PIN_SECONDS so they read their own vote, comment or
+edit right away. Replicas that fail a health check or lag further behind than
+REPLICA_MAX_LAG_SECONDS are skipped until the next check.
+"""
+
+import contextvars
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+
+from .middleware import HybridMiddleware
+
+logger = logging.getLogger('community.db')
+
+PRIMARY = 'default'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Routing state of the request being handled in this thread/task (None outside requests)
+_request_state = contextvars.ContextVar('replica_request_state', default=None)
+
+
+def replica_aliases():
+    return [alias for alias in connections.databases if alias != PRIMARY and alias in getattr(settings, 'REPLICA_DATABASES', ())]
+
+
+def pin_cache():
+    return caches[getattr(settings, 'REPLICA_PIN_CACHE', 'default')]
+
+
+def pin_key(user_id):
+    return f'replica-pin:{user_id}'
+
+
+def pin_to_primary(user_id):
+    """Route this user's reads to the primary for the next REPLICA_PIN_SECONDS."""
+    pin_cache().set(pin_key(user_id), True, getattr(settings, 'REPLICA_PIN_SECONDS', 5))
+
+
+def is_pinned(user_id):
+    return bool(pin_cache().get(pin_key(user_id)))
+
+
+class RequestState:
+    """Per-request routing decisions; the user is resolved lazily because JWT auth runs inside the view."""
+
+    def __init__(self, request):
+        self.request = request
+        self.read_only = request.method in SAFE_METHODS
+        self.wrote = False
+        self._pinned = None
+
+    @property
+    def user_id(self):
+        user = getattr(self.request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return user.pk
+        return None
+
+    @property
+    def pinned(self):
+        if self._pinned is None:
+            user_id = self.user_id
+            if user_id is None:
+                # Not authenticated (yet): decide again on the next query
+                return False
+            self._pinned = is_pinned(user_id)
+        return self._pinned
+
+
+@contextmanager
+def request_routing(request):
+    """Make routing decisions for the duration of one request."""
+    state = RequestState(request)
+    token = _request_state.set(state)
+    try:
+        yield state
+    finally:
+        _request_state.reset(token)
+
+
+class ReplicaHealth:
+    """Caches the health of each replica, re-checking at most every REPLICA_HEALTH_CHECK_INTERVAL seconds."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._status = {}  # alias -> (healthy, checked_at)
+
+    def reset(self):
+        with self._lock:
+            self._status.clear()
+
+    def is_healthy(self, alias):
+        interval = getattr(settings, 'REPLICA_HEALTH_CHECK_INTERVAL', 10)
+        now = time.monotonic()
+        healthy, checked_at = self._status.get(alias, (True, None))
+        if checked_at is not None and now - checked_at < interval:
+            return healthy
+        # Only one thread re-checks; the others keep using the previous answer
+        if not self._lock.acquire(blocking=False):
+            return healthy
+        try:
+            healthy = self.check(alias)
+            self._status[alias] = (healthy, time.monotonic())
+        finally:
+            self._lock.release()
+        return healthy
+
+    def check(self, alias):
+        max_lag = getattr(settings, 'REPLICA_MAX_LAG_SECONDS', 5)
+        try:
+            lag = self.replication_lag(alias)
+        except Exception as exc:
+            logger.warning('Replica %s failed its health check: %s', alias, exc)
+            return False
+        if lag is None or lag > max_lag:
+            logger.warning('Replica %s is lagging (%s s behind, limit %s s)', alias, lag, max_lag)
+            return False
+        return True
+
+    def replication_lag(self, alias):
+        """Seconds the replica is behind the primary; 0 when it is not a MySQL replica."""
+        connection = connections[alias]
+        with connection.cursor() as cursor:
+            if connection.vendor != 'mysql':
+                cursor.execute('SELECT 1')
+                return 0
+            try:
+                cursor.execute('SHOW REPLICA STATUS')
+            except Exception:
+                # MySQL < 8.0.22 / MariaDB
+                cursor.execute('SHOW SLAVE STATUS')
+            row = cursor.fetchone()
+            if row is None:
+                return 0
+            status = dict(zip([col[0] for col in cursor.description], row))
+        return status.get('Seconds_Behind_Source', status.get('Seconds_Behind_Master'))
+
+
+health = ReplicaHealth()
+
+
+class ReplicaRouter:
+    """Routes reads of REPLICA_ROUTED_APPS to a healthy replica during safe-method requests."""
+
+    def routed(self, model):
+        return model._meta.app_label in getattr(settings, 'REPLICA_ROUTED_APPS', ('community',))
+
+    def db_for_read(self, model, **hints):
+        state = _request_state.get()
+        if state is None or not state.read_only or state.wrote or not self.routed(model):
+            return PRIMARY
+        if connections[PRIMARY].in_atomic_block or state.pinned:
+            return PRIMARY
+        replicas = [alias for alias in replica_aliases() if health.is_healthy(alias)]
+        return random.choice(replicas) if replicas else PRIMARY
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
+
+
+class ReplicaRoutingMiddleware(HybridMiddleware):
+    """Exposes the current request to ReplicaRouter and pins users to the primary after they write."""
+
+    def sync_call(self, request):
+        with request_routing(request) as state:
+            response = self.get_response(request)
+            # DRF copies the JWT-authenticated user onto the Django request
+            if state.wrote and state.user_id is not None and response.status_code < 400:
+                pin_to_primary(state.user_id)
+        return response
+
+    async def async_call(self, request):
+        # The state travels to the ORM's threads with the context, so their writes mark it too
+        with request_routing(request) as state:
+            response = await self.get_response(request)
+            if state.wrote and state.user_id is not None and response.status_code < 400:
+                await sync_to_async(pin_to_primary)(state.user_id)
+        return response
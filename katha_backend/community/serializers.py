@@ -1,9 +1,10 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Post, Comment, Vote, SavedPost, Notification, CommentVote, Feedback
+from .models import Post, Comment, Vote, SavedPost, Notification, CommentVote, Feedback, ArchivedNotification, MAX_THREAD_DEPTH
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.contrib.auth.password_validation import validate_password
 from django.core import exceptions as django_exceptions
+from . import passwords
 
 # --- AUTHENTICATION SERIALIZER ---
 class UserSerializer(serializers.ModelSerializer):
@@ -47,11 +48,13 @@ class UserSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         password = validated_data.pop('password', None)
-        user = User.objects.create_user(
-            username=validated_data['username'],
-            email=validated_data.get('email', ''),
-            password=password,
+        # Hashed on the bounded pool (may raise HashingBusy -> 429) rather than in create_user
+        user = User(
+            username=User.normalize_username(validated_data['username']),
+            email=User.objects.normalize_email(validated_data.get('email', '')),
+            password=passwords.make_password(password),
         )
+        user.save()
         return user
     
     def update(self, instance, validated_data):
@@ -88,7 +91,7 @@ class CommentSerializer(serializers.ModelSerializer):
 
     def get_replies(self, obj):
         # Recursively serialize replies for nested comments
-        replies = obj.replies.all()
+        replies = obj.replies.alive()
         return CommentSerializer(replies, many=True, context=self.context).data
     
     def get_user_vote(self, obj):
@@ -102,10 +105,42 @@ class CommentSerializer(serializers.ModelSerializer):
                 return 0
         return 0
     
+    def validate_post(self, value):
+        if value.deleted_at is not None:
+            raise serializers.ValidationError("This post has been deleted.")
+        return value
+
     def validate_parent(self, value):
         # Allow parent to be None for top-level comments
+        if value is not None and (value.deleted_at is not None or not Comment.objects.filter(pk=value.pk)
+                                                                   .without_deleted_ancestors().exists()):
+            raise serializers.ValidationError("This comment has been deleted.")
+        if value is not None and value.depth >= MAX_THREAD_DEPTH:
+            raise serializers.ValidationError("This thread is too deep to reply to.")
         return value
 
+    def validate(self, attrs):
+        # The thread path is fixed at creation, so a comment cannot move to another post or parent
+        if self.instance is not None:
+            for field in ('post', 'parent'):
+                if field in attrs and attrs[field] != getattr(self.instance, field):
+                    raise serializers.ValidationError({field: "A comment cannot be moved."})
+        elif attrs.get('parent') is not None and attrs['parent'].post_id != attrs['post'].pk:
+            raise serializers.ValidationError({'parent': "The parent comment belongs to another post."})
+        return attrs
+
+
+class ThreadCommentSerializer(serializers.ModelSerializer):
+    """Flat, thread-ordered comment row; the client nests by ``parent`` and ``depth``."""
+    author_username = serializers.ReadOnlyField(source='author.username')
+    descendant_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Comment
+        fields = ['id', 'post', 'parent', 'depth', 'author', 'author_username', 'text', 'created_at',
+                  'edited_at', 'is_edited', 'votes', 'descendant_count']
+        read_only_fields = fields
+
 
 class PostSerializer(serializers.ModelSerializer):
     author_username = serializers.ReadOnlyField(source='author.username')
@@ -121,11 +156,11 @@ class PostSerializer(serializers.ModelSerializer):
     
     def get_comment_count(self, obj):
         # Only count top-level comments for the feed
-        return obj.comments.filter(parent__isnull=True).count()
+        return obj.comments.alive().filter(parent__isnull=True).count()
 
     def get_comments(self, obj):
         # Fetch only top-level comments (parent__isnull=True) for the detail view
-        top_level_comments = obj.comments.filter(parent__isnull=True)
+        top_level_comments = obj.comments.alive().filter(parent__isnull=True)
         return CommentSerializer(top_level_comments, many=True).data
 
     def get_user_vote(self, obj):
@@ -158,6 +193,57 @@ class NotificationSerializer(serializers.ModelSerializer):
         fields = ['id', 'notification_type', 'post_id', 'post_title', 'comment_id', 'comment_text', 'actor_username', 'read', 'created_at']
         read_only_fields = ['id', 'read', 'created_at']
 
+NOTIFICATION_EXCERPT_LENGTH = 140
+
+
+def excerpt(text, length=NOTIFICATION_EXCERPT_LENGTH):
+    """``text`` cut to ``length`` characters; given up to one more, it can tell when to add an ellipsis."""
+    if text is None or len(text) <= length:
+        return text
+    return text[:length].rstrip() + '…'
+
+
+class RelatedPostSerializer(serializers.Serializer):
+    """Rows from related.related_posts: the related post's summary and how similar it is."""
+    id = serializers.IntegerField(source='related_id')
+    title = serializers.CharField(source='related__title')
+    author_username = serializers.CharField(source='related__author__username')
+    created_at = serializers.DateTimeField(source='related__created_at')
+    votes = serializers.IntegerField(source='related__votes')
+    score = serializers.FloatField()
+
+
+class NotificationInboxSerializer(serializers.Serializer):
+    """
+    Inbox rows from views.notification_inbox: dicts from one joined query, with
+    the comment text already cut in SQL. Same fields as NotificationSerializer.
+    """
+    id = serializers.IntegerField()
+    notification_type = serializers.CharField()
+    post_id = serializers.IntegerField()
+    post_title = serializers.CharField(source='post__title')
+    comment_id = serializers.IntegerField()
+    comment_text = serializers.SerializerMethodField()
+    actor_username = serializers.CharField(source='actor__username')
+    read = serializers.BooleanField()
+    created_at = serializers.DateTimeField()
+
+    def get_comment_text(self, row):
+        return excerpt(row['comment_excerpt'])
+
+    def to_representation(self, row):
+        data = super().to_representation(row)
+        # Like NotificationSerializer's dotted sources, leave out a post or comment there is none of
+        if row['post_id'] is None:
+            del data['post_id'], data['post_title']
+        if row['comment_id'] is None:
+            del data['comment_id'], data['comment_text']
+        return data
+
+class ArchivedNotificationSerializer(NotificationSerializer):
+    class Meta(NotificationSerializer.Meta):
+        model = ArchivedNotification
+
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     @classmethod
     def get_token(cls, user):
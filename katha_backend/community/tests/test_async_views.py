@@ -0,0 +1,175 @@
+import json
+import threading
+from io import StringIO
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.test import AsyncClient, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from community import async_views
+from community.middleware import REQUEST_QUERIES, QueryCollector, collecting
+from community.models import Comment, Notification, Post, SavedPost, Vote
+from community.feeds import feed_data, post_queryset
+from community.serializers import PostSerializer
+from community.views import NotificationViewSet, PostViewSet
+
+
+def bearer(user):
+    return f'Bearer {RefreshToken.for_user(user).access_token}'
+
+
+class GatherReadsTest(SimpleTestCase):
+    @override_settings(ASYNC_READ_WORKERS=4)
+    def test_independent_reads_overlap(self):
+        # Each read waits for the other: this only finishes if they run at the same time
+        barrier = threading.Barrier(2, timeout=5)
+
+        def read():
+            barrier.wait()
+            return threading.get_ident()
+
+        first, second = async_to_sync(async_views.gather_reads)(read, read)
+        self.assertNotEqual(first, second)
+
+    @override_settings(ASYNC_READ_WORKERS=1)
+    def test_one_worker_runs_reads_in_order(self):
+        order = []
+        results = async_to_sync(async_views.gather_reads)(lambda: order.append(1) or 'a', lambda: order.append(2) or 'b')
+        self.assertEqual((results, order), (['a', 'b'], [1, 2]))
+
+
+class AsyncReadViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user('alice', password='x')
+        cls.bob = User.objects.create_user('bob', password='x')
+        cls.post = Post.objects.create(author=cls.alice, title='Alamat', content='Noong unang panahon')
+        cls.other = Post.objects.create(author=cls.bob, title='Pabula', content='Ang pagong at ang matsing')
+        gone = Post.objects.create(author=cls.bob, title='Binura', content='...')
+        top = Comment.objects.create(post=cls.post, author=cls.bob, text='Ganda!')
+        reply = Comment.objects.create(post=cls.post, author=cls.alice, text='Salamat', parent=top)
+        Comment.objects.create(post=cls.post, author=cls.bob, text='Tunay', parent=reply)
+        hidden = Comment.objects.create(post=cls.post, author=cls.bob, text='Binura rin')
+        Comment.objects.create(post=cls.post, author=cls.alice, text='Sagot sa binura', parent=hidden)
+        Comment.objects.create(post=cls.other, author=cls.alice, text='Haha')
+        Comment.objects.filter(pk=hidden.pk).update(deleted_at=timezone.now())
+        Post.objects.filter(pk=gone.pk).update(deleted_at=timezone.now())
+        Vote.objects.create(user=cls.alice, post=cls.other, value=-1)
+        SavedPost.objects.create(user=cls.alice, post=cls.post)
+        Notification.objects.create(user=cls.alice, notification_type='comment', post=cls.post, comment=top,
+                                    actor=cls.bob)
+        Notification.objects.create(user=cls.alice, notification_type='comment', post=gone, actor=cls.bob)
+        Notification.objects.create(user=cls.alice, notification_type='reply', post=cls.post, actor=cls.bob,
+                                    read=True)
+
+    def drf(self, view, path, user=None, **kwargs):
+        """The sync DRF view's JSON for the same request."""
+        headers = {'HTTP_AUTHORIZATION': bearer(user)} if user else {}
+        response = view(APIRequestFactory().get(path, **headers), **kwargs)
+        response.render()
+        return response.status_code, json.loads(response.content)
+
+    def served(self, path, user=None):
+        headers = {'HTTP_AUTHORIZATION': bearer(user)} if user else {}
+        response = self.client.get(path, **headers)
+        return response.status_code, response.json()
+
+    def test_feed_matches_drf(self):
+        view = PostViewSet.as_view({'get': 'list'})
+        for sort in ('newest', 'oldest', 'most_voted', 'most_comments', 'trending'):
+            for user in (None, self.alice):
+                with self.subTest(sort=sort, user=user):
+                    path = f'/api/v1/posts/?sort={sort}'
+                    self.assertEqual(self.served(path, user), self.drf(view, path, user))
+        status, body = self.served('/api/v1/posts/', self.alice)
+        mine = next(post for post in body if post['id'] == self.post.id)
+        self.assertEqual((mine['comment_count'], mine['is_saved']), (1, True))
+        self.assertEqual(mine['comments'][0]['replies'][0]['replies'][0]['text'], 'Tunay')
+
+    def test_detail_matches_drf(self):
+        view = PostViewSet.as_view({'get': 'retrieve'})
+        for pk in (self.post.id, self.other.id):
+            path = f'/api/v1/posts/{pk}/'
+            self.assertEqual(self.served(path, self.alice), self.drf(view, path, self.alice, pk=pk))
+        self.assertEqual(self.served('/api/v1/posts/999999/'),
+                         (404, {'detail': 'No Post matches the given query.'}))
+
+    def test_sync_viewset_reads_like_the_async_view(self):
+        # User, posts, then comments, votes and saves: one query each whatever the size of the feed
+        for view, path, kwargs in ((PostViewSet.as_view({'get': 'list'}), '/api/v1/posts/', {}),
+                                   (PostViewSet.as_view({'get': 'retrieve'}), f'/api/v1/posts/{self.post.id}/',
+                                    {'pk': self.post.id})):
+            with self.subTest(path=path), self.assertNumQueries(5):
+                self.drf(view, path, self.alice, **kwargs)
+        # The payload is still what PostSerializer, which writes respond with, makes of the same posts
+        request = Request(APIRequestFactory().get('/api/v1/posts/'))
+        request.user = self.alice
+        posts = list(post_queryset({}).select_related('author'))
+        self.assertEqual(feed_data(posts, self.alice),
+                         PostSerializer(posts, many=True, context={'request': request}).data)
+
+    def test_notifications_match_drf(self):
+        view = NotificationViewSet.as_view({'get': 'list'})
+        last = Notification.objects.order_by('id').last().id
+        for query in ('', '?unread=1', f'?limit=1&before={last}', '?limit=many'):
+            path = f'/api/v1/notifications/{query}'
+            self.assertEqual(self.served(path, self.alice), self.drf(view, path, self.alice))
+        # The count leaves out the notification about a deleted post, as the list does
+        view = NotificationViewSet.as_view({'get': 'unread_count'})
+        path = '/api/v1/notifications/unread_count/'
+        self.assertEqual(self.served(path, self.alice), (200, {'count': 1}))
+        self.assertEqual(self.served(path, self.alice), self.drf(view, path, self.alice))
+
+    def test_authentication_errors_match_drf(self):
+        response = self.client.get('/api/v1/notifications/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer realm="api"')
+        self.assertEqual(response.json(), {'detail': 'Authentication credentials were not provided.'})
+        response = self.client.get('/api/v1/posts/', HTTP_AUTHORIZATION='Bearer nope')
+        self.assertEqual((response.status_code, response.json()['code']), (401, 'token_not_valid'))
+
+    @override_settings(THROTTLE_POLICIES={})
+    def test_other_methods_reach_the_viewset(self):
+        response = self.client.post('/api/v1/posts/', {'title': 'Bago', 'content': 'Kuwento'},
+                                    content_type='application/json', HTTP_AUTHORIZATION=bearer(self.bob))
+        self.assertEqual(response.status_code, 201)
+        response = self.client.delete(f'/api/v1/posts/{self.post.id}/', HTTP_AUTHORIZATION=bearer(self.bob))
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.client.head('/api/v1/notifications/unread_count/').status_code, 401)
+
+    async def test_async_stack_counts_queries(self):
+        # The ORM runs on other threads; the middleware still sees the posts and comments queries
+        before = REQUEST_QUERIES.snapshot(view='post-list', method='GET')
+        response = await AsyncClient().get('/api/v1/posts/')
+        self.assertEqual(response.status_code, 200)
+        after = REQUEST_QUERIES.snapshot(view='post-list', method='GET')
+        self.assertEqual((after[0] - before[0], after[1] - before[1]), (1, 2))
+
+        with collecting(QueryCollector()) as collector:
+            await sync_to_async(lambda: list(Post.objects.all()))()
+        self.assertEqual(collector.count, 1)
+
+
+class BenchmarkAsyncCommandTest(TransactionTestCase):
+    def test_compares_both_modes(self):
+        # Committed rows, so the worker threads' connections see them
+        user = User.objects.create_user('bench_viewer', password='x')
+        for i in range(3):
+            post = Post.objects.create(author=user, title=f'Katha {i}', content='...')
+            Comment.objects.create(post=post, author=user, text='Oo')
+        stdout = StringIO()
+        call_command('benchmark_async', username='bench_viewer', workers=2, clients=4, requests=12,
+                     db_latency_ms=1, stdout=stdout)
+        rows = {line.split()[0]: line.split() for line in stdout.getvalue().splitlines() if line.strip()}
+        for mode in ('sync', 'async'):
+            self.assertEqual(rows[mode][1:3], ['12', '0'])
+        # Queries per request: both modes read the same way, so only concurrency differs
+        self.assertEqual(rows['sync'][3], rows['async'][3])
+        self.assertEqual(rows['sync'][3], '5.0')
+        with self.assertRaises(CommandError):
+            call_command('benchmark_async', path='/api/v1/comments/', stdout=stdout)
@@ -0,0 +1,98 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from community import batch
+from community.models import Notification, Post
+
+
+class BatchMixin:
+    def setUp(self):
+        self.client = APIClient()
+        token = RefreshToken.for_user(self.member).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def run_batch(self, *requests, client=None):
+        response = (client or self.client).post('/api/v1/batch/', {'requests': list(requests)}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return {entry['id']: entry for entry in response.json()['responses']}
+
+
+@override_settings(THROTTLE_POLICIES={})
+class BatchViewTest(BatchMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.member = User.objects.create_user('member', password='memberpass123')
+        cls.author = User.objects.create_user('author', password='authorpass123')
+        cls.post = Post.objects.create(author=cls.author, title='Alamat', content='Noong unang panahon')
+        Notification.objects.create(user=cls.member, notification_type='vote', post=cls.post, actor=cls.author)
+
+    def test_reads_share_one_authentication(self):
+        with CaptureQueriesContext(connection) as ctx:
+            results = self.run_batch(
+                {'id': 'me', 'path': 'user/me/'},
+                {'id': 'unread', 'path': '/api/v1/notifications/unread_count/'},
+            )
+        self.assertEqual(results['me']['body']['username'], 'member')
+        self.assertEqual(results['unread']['body'], {'count': 1})
+        auth_queries = [q for q in ctx.captured_queries if 'auth_user' in q['sql'] and 'WHERE' in q['sql']]
+        self.assertEqual(len(auth_queries), 1)
+
+    def test_writes_run_in_order(self):
+        results = self.run_batch(
+            {'id': 'vote', 'method': 'POST', 'path': f'posts/{self.post.id}/vote/', 'body': {'value': 1}},
+            {'id': 'post', 'path': f'posts/{self.post.id}/'},
+            {'id': 'list', 'path': 'posts/?sort=top'},
+        )
+        self.assertEqual(results['vote']['status'], 200)
+        self.assertEqual(results['post']['body']['votes'], 1)
+        self.assertEqual(results['list']['body'][0]['id'], self.post.id)
+
+    def test_sub_requests_keep_their_own_status(self):
+        results = self.run_batch(
+            {'id': 'missing', 'path': 'posts/999999/'},
+            {'id': 'unknown', 'path': 'nowhere/'},
+            {'id': 'nested', 'method': 'POST', 'path': 'batch/', 'body': {'requests': []}},
+            {'id': 'outside', 'path': '/admin/'},
+            {'id': 'invalid', 'method': 'POST', 'path': f'posts/{self.post.id}/vote/', 'body': {'value': 5}},
+        )
+        self.assertEqual({key: entry['status'] for key, entry in results.items()}, {
+            'missing': 404, 'unknown': 404, 'nested': 400, 'outside': 400, 'invalid': 400,
+        })
+
+    def test_anonymous_batch_uses_view_permissions(self):
+        results = self.run_batch(
+            {'id': 'me', 'path': 'user/me/'},
+            {'id': 'posts', 'path': 'posts/'},
+            client=APIClient(),
+        )
+        self.assertEqual(results['me']['status'], 401)
+        self.assertEqual(results['posts']['status'], 200)
+
+    def test_malformed_batches_are_rejected(self):
+        self.assertEqual(self.client.post('/api/v1/batch/', {}, format='json').status_code, 400)
+        bad_method = {'requests': [{'method': 'TRACE', 'path': 'posts/'}]}
+        self.assertEqual(self.client.post('/api/v1/batch/', bad_method, format='json').status_code, 400)
+        with self.settings(BATCH_MAX_REQUESTS=2):
+            too_many = {'requests': [{'path': 'posts/'}] * 3}
+            self.assertEqual(self.client.post('/api/v1/batch/', too_many, format='json').status_code, 400)
+
+
+@override_settings(BATCH_MAX_WORKERS=4)
+class ConcurrentBatchTest(BatchMixin, TransactionTestCase):
+    def setUp(self):
+        self.member = User.objects.create_user('member', password='memberpass123')
+        self.posts = [Post.objects.create(author=self.member, title=f'Kuwento {i}', content='...') for i in range(3)]
+        super().setUp()
+
+    def test_reads_run_on_the_pool(self):
+        with mock.patch.object(batch, 'dispatch_in_worker', wraps=batch.dispatch_in_worker) as worker:
+            results = self.run_batch(*({'id': post.id, 'path': f'posts/{post.id}/'} for post in self.posts))
+        self.assertEqual(worker.call_count, 3)
+        self.assertEqual({key: entry['body']['title'] for key, entry in results.items()},
+                         {post.id: post.title for post in self.posts})
@@ -0,0 +1,79 @@
+import importlib
+
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from community.models import Comment, Post, path_step
+
+
+@override_settings(THROTTLE_POLICIES={})
+class CommentThreadTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('writer', password='writerpass123')
+        cls.post = Post.objects.create(title='Thread', content='...', author=cls.user)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def reply(self, parent=None, text='x'):
+        data = {'post': self.post.pk, 'text': text}
+        if parent is not None:
+            data['parent'] = parent
+        response = self.client.post('/api/v1/comments/', data)
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()['id']
+
+    def build_tree(self):
+        # a ─ b ─ d
+        #   └ c
+        # e
+        a = self.reply(text='a')
+        b = self.reply(a, 'b')
+        e = self.reply(text='e')
+        c = self.reply(a, 'c')
+        d = self.reply(b, 'd')
+        return a, b, c, d, e
+
+    def test_path_is_set_on_insert(self):
+        a, b, *_ = self.build_tree()
+        comment = Comment.objects.get(pk=b)
+        self.assertEqual(comment.path, path_step(a) + path_step(b))
+        self.assertEqual(comment.depth, 1)
+
+    def test_post_thread_is_in_display_order(self):
+        a, b, c, d, e = self.build_tree()
+        rows = self.client.get(f'/api/v1/posts/{self.post.pk}/thread/').json()
+        self.assertEqual([r['id'] for r in rows], [a, b, d, c, e])
+        self.assertEqual([r['depth'] for r in rows], [0, 1, 2, 1, 0])
+        self.assertEqual([r['descendant_count'] for r in rows], [3, 1, 0, 0, 0])
+
+    def test_subtree_with_collapse(self):
+        a, b, c, d, e = self.build_tree()
+        rows = self.client.get(f'/api/v1/comments/{a}/thread/?max_depth=1').json()
+        self.assertEqual([r['id'] for r in rows], [a, b, c])
+        # b's reply was collapsed; its count tells the client there is more
+        self.assertEqual(rows[1]['descendant_count'], 1)
+
+    def test_deleted_subtree_is_left_out(self):
+        a, b, c, d, e = self.build_tree()
+        self.client.delete(f'/api/v1/comments/{b}/')
+        rows = self.client.get(f'/api/v1/posts/{self.post.pk}/thread/').json()
+        self.assertEqual([r['id'] for r in rows], [a, c, e])
+
+    def test_comment_cannot_move(self):
+        a, b, c, d, e = self.build_tree()
+        response = self.client.patch(f'/api/v1/comments/{d}/', {'parent': e})
+        self.assertEqual(response.status_code, 400)
+
+    def test_migration_backfills_paths(self):
+        self.build_tree()
+        expected = dict(Comment.objects.values_list('id', 'path'))
+        Comment.objects.update(path='', depth=0)
+        migration = importlib.import_module('community.migrations.0011_comment_thread_paths')
+        migration.BATCH_SIZE = 2
+        migration.backfill_paths(apps, None)
+        self.assertEqual(dict(Comment.objects.values_list('id', 'path')), expected)
@@ -0,0 +1,83 @@
+import threading
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from community.db.pool import CHECKOUTS, ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.alive = True
+
+    def close(self):
+        self.closed = True
+
+
+def ping(connection):
+    if not connection.alive:
+        raise OSError('gone away')
+
+
+class ConnectionPoolTest(SimpleTestCase):
+    def make_pool(self, **kwargs):
+        self.opened = []
+
+        def connect():
+            connection = FakeConnection()
+            self.opened.append(connection)
+            return connection
+
+        return ConnectionPool('pool-test', connect, ping, **kwargs)
+
+    def test_returned_connection_is_reused(self):
+        pool = self.make_pool(max_size=2)
+        reused_before = CHECKOUTS.value(alias='pool-test', reused='true')
+        first = pool.checkout()
+        pool.checkin(first)
+        self.assertIs(pool.checkout(), first)
+        self.assertEqual(len(self.opened), 1)
+        self.assertEqual(CHECKOUTS.value(alias='pool-test', reused='true'), reused_before + 1)
+
+    def test_checkout_times_out_when_exhausted(self):
+        pool = self.make_pool(max_size=1, timeout=0.05)
+        pool.checkout()
+        with self.assertRaises(PoolTimeout):
+            pool.checkout()
+
+    def test_waiter_gets_connection_on_checkin(self):
+        pool = self.make_pool(max_size=1, timeout=2)
+        held = pool.checkout()
+        result = []
+        waiter = threading.Thread(target=lambda: result.append(pool.checkout()))
+        waiter.start()
+        time.sleep(0.05)
+        pool.checkin(held)
+        waiter.join(1)
+        self.assertEqual(result, [held])
+
+    def test_broken_connection_is_discarded(self):
+        pool = self.make_pool(max_size=1)
+        connection = pool.checkout()
+        pool.checkin(connection, broken=True)
+        self.assertTrue(connection.closed)
+        self.assertIsNot(pool.checkout(), connection)
+
+    def test_dead_idle_connection_is_replaced_after_ping(self):
+        pool = self.make_pool(max_size=1, pre_ping_idle=0)
+        connection = pool.checkout()
+        pool.checkin(connection)
+        connection.alive = False
+        replacement = pool.checkout()
+        self.assertIsNot(replacement, connection)
+        self.assertTrue(connection.closed)
+
+    def test_old_connection_is_recycled(self):
+        pool = self.make_pool(max_size=1, recycle=60)
+        connection = pool.checkout()
+        pool.checkin(connection)
+        with mock.patch('community.db.pool.time.monotonic', return_value=time.monotonic() + 120):
+            self.assertIsNot(pool.checkout(), connection)
+        self.assertTrue(connection.closed)
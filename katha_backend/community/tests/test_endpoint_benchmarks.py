@@ -0,0 +1,319 @@
+"""
+Endpoint benchmark suite with per-endpoint query budgets.
+
+Every API route in config/urls.py is exercised against data generated by the
+seed_benchmark_data command at several sizes. Each case asserts that the number
+of SQL queries stays within its budget, so an N+1 regression fails the build,
+and records the median wall time for the report printed at the end.
+
+Environment:
+    BENCHMARK_SIZES   comma-separated post counts to seed (default "5,20")
+    BENCHMARK_REPEAT  timed runs per case (default 3)
+    BENCHMARK_OUTPUT  optional path; results are written there as JSON
+"""
+
+import json
+import os
+import statistics
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connections, transaction
+from django.db.models import Count
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from community import exports
+from community.models import Post, Comment, Notification, SavedPost
+
+BENCHMARK_SIZES = [int(s) for s in os.environ.get('BENCHMARK_SIZES', '5,20').split(',') if s.strip()]
+BENCHMARK_REPEAT = int(os.environ.get('BENCHMARK_REPEAT', '3'))
+BENCHMARK_OUTPUT = os.environ.get('BENCHMARK_OUTPUT')
+BENCH_PASSWORD = 'benchpass123'
+METRICS_TOKEN = 'bench-metrics-token'
+
+# Routes that are deliberately not benchmarked
+SKIPPED_ROUTES = {
+    'google_oauth': 'calls Google over the network',
+}
+
+
+@dataclass
+class Dataset:
+    """Sizes of the seeded data that budgets scale with, plus ids to address."""
+    posts: int
+    comments: int
+    post_id: int = 0
+    post_comments: int = 0
+    comment_nodes: int = 0
+    comment_id: int = 0
+    comment_descendants: int = 0
+    notification_id: int = 0
+    viewer_notifications: int = 0
+    viewer_saved: int = 0
+    refresh_token: str = ''
+
+
+@dataclass
+class Case:
+    """One request against one route, with its query budget."""
+    route: str
+    method: str
+    path: Callable[[Dataset], str]
+    budget: Callable[[Dataset], int]
+    auth: Optional[str] = 'viewer'  # key of EndpointBenchmarkMixin.users, or None for anonymous
+    data: Callable[[Dataset], dict] = field(default=lambda d: {})
+    headers: dict = field(default_factory=dict)
+    label: str = ''
+
+    @property
+    def name(self):
+        return self.label or f'{self.route} {self.method}'
+
+
+# Budgets are "fixed queries + queries per serialized row", matching what the code does
+# today. Lower them when an N+1 gets fixed; never raise them to make a test pass.
+# Writes include their outbox INSERTs (community.outbox) and, where the write opens its
+# own transaction for them, its SAVEPOINT and RELEASE (inside the test's transaction).
+CASES = [
+    Case('api-root', 'get', lambda d: '/api/v1/', lambda d: 0, auth=None),
+    Case('user_register', 'post', lambda d: '/api/v1/register/', lambda d: 3, auth=None,
+         data=lambda d: {'username': 'fresh_reader', 'password': 'Sapat-na-haba-42', 'email': 'fresh@example.com'}),
+    Case('user_detail', 'get', lambda d: '/api/v1/user/me/', lambda d: 1),
+    Case('user_detail', 'patch', lambda d: '/api/v1/user/me/', lambda d: 2,
+         data=lambda d: {'email': 'viewer@example.com'}),
+    Case('user_profile', 'get', lambda d: '/api/v1/user/bench_viewer/', lambda d: 1, auth=None),
+    Case('feedback', 'get', lambda d: '/api/v1/feedback/', lambda d: 2, auth='staff'),
+    Case('feedback', 'post', lambda d: '/api/v1/feedback/', lambda d: 1, auth=None,
+         data=lambda d: {'type': 'bug', 'subject': 'Slow', 'message': 'Feed is slow'}),
+    # Auth, then one keyset query per export batch (streamed rows are consumed inside the capture)
+    Case('export', 'get', lambda d: '/api/v1/export/feedback/', lambda d: 2, auth='staff',
+         label='export get feedback'),
+    Case('export', 'get', lambda d: '/api/v1/export/posts/?fmt=ndjson',
+         lambda d: 2 + d.posts // exports.BATCH_SIZE, auth='staff', label='export get posts ndjson'),
+    Case('export', 'get', lambda d: '/api/v1/export/comments/',
+         lambda d: 2 + d.comments // exports.BATCH_SIZE, auth='staff', label='export get comments'),
+    # One auth for the whole batch, then only the sub-requests' own queries
+    Case('batch', 'post', lambda d: '/api/v1/batch/', lambda d: 2,
+         data=lambda d: {'requests': [{'id': 'me', 'path': 'user/me/'},
+                                      {'id': 'unread', 'path': 'notifications/unread_count/'}]}),
+
+    *[
+        # Async GETs (community.async_views): user, posts, then comments, votes and saves in one query each
+        Case('post-list', 'get', (lambda sort: lambda d: f'/api/v1/posts/?sort={sort}')(sort),
+             lambda d: 5, label=f'post-list get sort={sort}')
+        for sort in ('newest', 'oldest', 'most_voted', 'most_comments', 'trending')
+    ],
+    Case('post-list', 'post', lambda d: '/api/v1/posts/', lambda d: 10,
+         data=lambda d: {'title': 'Bagong katha', 'content': 'Isang kuwento'}),
+    Case('post-detail', 'get', lambda d: f'/api/v1/posts/{d.post_id}/', lambda d: 5),
+    Case('post-detail', 'patch', lambda d: f'/api/v1/posts/{d.post_id}/', lambda d: 13 + 2 * d.post_comments,
+         auth='author', data=lambda d: {'title': 'Binagong pamagat'}),
+    # Deletes only tombstone the row; purge_deleted removes the tree later
+    Case('post-detail', 'delete', lambda d: f'/api/v1/posts/{d.post_id}/', lambda d: 7,
+         auth='author'),
+    # Vote and save include the rollup upsert (UPDATE, then savepoint + INSERT for a new hour)
+    Case('post-vote', 'post', lambda d: f'/api/v1/posts/{d.post_id}/vote/', lambda d: 14 + 2 * d.post_comments,
+         data=lambda d: {'value': 1}),
+    Case('post-save', 'post', lambda d: f'/api/v1/posts/{d.post_id}/save/', lambda d: 16 + 2 * d.post_comments),
+    # Auth, then one IN query on Vote and one on SavedPost however many ids are asked for
+    Case('post-state', 'get', lambda d: '/api/v1/posts/state/?ids=' + ','.join(map(str, range(1, d.posts + 1))),
+         lambda d: 3),
+    # The post, then one grouped query over its rollup rows
+    Case('post-activity', 'get', lambda d: f'/api/v1/posts/{d.post_id}/activity/?period=day', lambda d: 2, auth=None),
+    # One joined query on the precomputed lists; none are built here, so also the post's existence check
+    Case('post-related', 'get', lambda d: f'/api/v1/posts/{d.post_id}/related/', lambda d: 2, auth=None),
+    # Upper bound: each saved post serializes its own comments, at most all of them
+    Case('post-saved', 'get', lambda d: '/api/v1/posts/saved/', lambda d: 2 + 5 * d.viewer_saved + 2 * d.comments),
+
+    # The list renders every comment plus, nested, its whole subtree
+    Case('comment-list', 'get', lambda d: '/api/v1/comments/', lambda d: 1 + 2 * d.comment_nodes, auth=None),
+    # Includes the UPDATE that stores the new comment's thread path and the rollup upsert
+    Case('comment-list', 'post', lambda d: '/api/v1/comments/', lambda d: 15,
+         data=lambda d: {'post': d.post_id, 'text': 'Magandang kuwento'}),
+    # Auth, then one IN query on CommentVote however many ids are asked for
+    Case('comment-state', 'get',
+         lambda d: '/api/v1/comments/state/?ids=' + ','.join(map(str, range(1, d.comments + 1))), lambda d: 2),
+    # One query for the object, one for the whole thread with descendant counts
+    Case('comment-thread', 'get', lambda d: f'/api/v1/comments/{d.comment_id}/thread/', lambda d: 3),
+    Case('post-thread', 'get', lambda d: f'/api/v1/posts/{d.post_id}/thread/?max_depth=3', lambda d: 3),
+    Case('comment-detail', 'get', lambda d: f'/api/v1/comments/{d.comment_id}/',
+         lambda d: 5 + 3 * d.comment_descendants),
+    Case('comment-detail', 'patch', lambda d: f'/api/v1/comments/{d.comment_id}/',
+         lambda d: 11 + 3 * d.comment_descendants, auth='commenter', data=lambda d: {'text': 'Binago'}),
+    # Deletes only tombstone the row; replies are hidden with it and purge_deleted removes them later
+    Case('comment-detail', 'delete', lambda d: f'/api/v1/comments/{d.comment_id}/',
+         lambda d: 7, auth='commenter'),
+    Case('comment-vote', 'post', lambda d: f'/api/v1/comments/{d.comment_id}/vote/',
+         lambda d: 11 + 3 * d.comment_descendants, data=lambda d: {'value': -1}),
+
+    Case('notification-list', 'get', lambda d: '/api/v1/notifications/', lambda d: 2),
+    Case('notification-detail', 'get', lambda d: f'/api/v1/notifications/{d.notification_id}/', lambda d: 5,
+         auth='recipient'),
+    Case('notification-mark-read', 'post', lambda d: f'/api/v1/notifications/{d.notification_id}/mark_read/',
+         lambda d: 7, auth='recipient'),
+    # Auth, then a select + update per batch of unread rows
+    Case('notification-mark-all-read', 'post', lambda d: '/api/v1/notifications/mark_all_read/',
+         lambda d: 2 + 2 * (d.viewer_notifications // settings.NOTIFICATION_MARK_READ_BATCH_SIZE + 1)),
+    Case('notification-archived', 'get', lambda d: '/api/v1/notifications/archived/?limit=20', lambda d: 2),
+    Case('notification-unread-count', 'get', lambda d: '/api/v1/notifications/unread_count/', lambda d: 2),
+
+    Case('activity_stats', 'get', lambda d: '/api/v1/stats/activity/', lambda d: 1, auth=None),
+
+    Case('token_obtain_pair', 'post', lambda d: '/api/token/', lambda d: 1, auth=None,
+         data=lambda d: {'username': 'bench_viewer', 'password': BENCH_PASSWORD}),
+    Case('token_refresh', 'post', lambda d: '/api/token/refresh/', lambda d: 1, auth=None,
+         data=lambda d: {'refresh': d.refresh_token}),
+    Case('metrics', 'get', lambda d: '/metrics', lambda d: 0, auth=None,
+         headers={'HTTP_AUTHORIZATION': f'Bearer {METRICS_TOKEN}'}),
+]
+
+
+def api_route_names(patterns=None, namespace=None):
+    """Names of every routed view outside the admin site."""
+    names = set()
+    for pattern in get_resolver().url_patterns if patterns is None else patterns:
+        if isinstance(pattern, URLResolver):
+            if pattern.namespace == 'admin':
+                continue
+            names |= api_route_names(pattern.url_patterns, pattern.namespace or namespace)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            names.add(f'{namespace}:{pattern.name}' if namespace else pattern.name)
+    return names
+
+
+def subtree_stats():
+    """{comment id: comments in its subtree, itself included}."""
+    parents = dict(Comment.objects.values_list('id', 'parent_id'))
+    sizes = dict.fromkeys(parents, 0)
+    for pk in parents:
+        while pk is not None:
+            sizes[pk] += 1
+            pk = parents[pk]
+    return sizes
+
+
+class RouteCoverageTest(TestCase):
+    def test_every_route_has_a_benchmark(self):
+        covered = {case.route for case in CASES} | set(SKIPPED_ROUTES)
+        missing = api_route_names() - covered
+        self.assertFalse(missing, f'Routes without a benchmark case and query budget: {sorted(missing)}')
+
+
+class EndpointBenchmarkMixin:
+    """Seeds ``size`` posts once per class, then runs every case inside a rolled-back transaction."""
+    size = None
+    results = []
+
+    @classmethod
+    def setUpTestData(cls):
+        size = cls.size
+        call_command(
+            'seed_benchmark_data', users=max(4, size // 2), posts=size, comments=4 * size,
+            votes=3 * size, comment_votes=3 * size, saves=size, notifications=4 * size,
+            batch_size=500, password=BENCH_PASSWORD, stdout=open(os.devnull, 'w'),
+        )
+        cls.viewer = User.objects.filter(username__startswith='bench_').order_by('id').first()
+        cls.viewer.username = 'bench_viewer'
+        cls.viewer.save()
+        cls.staff = User.objects.create_user('bench_staff', password=BENCH_PASSWORD, is_staff=True)
+
+        # Address the busiest post and thread so per-row budget terms are exercised
+        post = Post.objects.annotate(n=Count('comments')).order_by('-n', 'id').first()
+        subtree = subtree_stats()
+        comment = Comment.objects.get(id=max(subtree, key=lambda pk: (subtree[pk], -pk)))
+        notification = Notification.objects.order_by('id').first()
+        cls.users = {
+            'viewer': cls.viewer,
+            'staff': cls.staff,
+            'author': post.author,
+            'commenter': comment.author,
+            'recipient': notification.user,
+        }
+        cls.dataset = Dataset(
+            posts=Post.objects.count(),
+            comments=Comment.objects.count(),
+            post_id=post.id,
+            post_comments=post.comments.count(),
+            comment_nodes=sum(subtree.values()),
+            comment_id=comment.id,
+            comment_descendants=subtree[comment.id] - 1,
+            notification_id=notification.id,
+            viewer_notifications=Notification.objects.filter(user=cls.viewer).count(),
+            viewer_saved=SavedPost.objects.filter(user=cls.viewer).count(),
+            refresh_token=str(RefreshToken.for_user(cls.viewer)),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        print(f'\nEndpoint benchmark ({cls.size} posts)')
+        for row in cls.results:
+            if row['size'] == cls.size:
+                print(f"  {row['case']:<45} {row['queries']:>5} queries (budget {row['budget']:>5})"
+                      f"  {row['median_ms']:>8.2f} ms")
+        if BENCHMARK_OUTPUT:
+            with open(BENCHMARK_OUTPUT, 'w') as fh:
+                json.dump(cls.results, fh, indent=2)
+
+    def client_for(self, case):
+        client = APIClient()
+        if case.auth:
+            token = RefreshToken.for_user(self.users[case.auth]).access_token
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        return client
+
+    def run_case(self, case):
+        client = self.client_for(case)
+        data = case.data(self.dataset)
+        path = case.path(self.dataset)
+        request = getattr(client, case.method)
+        with transaction.atomic():
+            with CaptureQueriesContext(connections['default']) as ctx:
+                start = time.perf_counter()
+                response = request(path, data, format='json', **case.headers)
+                if response.streaming:
+                    # Streamed bodies run their queries while being read
+                    response = HttpResponse(b''.join(response.streaming_content), status=response.status_code)
+                elapsed = time.perf_counter() - start
+            transaction.set_rollback(True)
+        return response, len(ctx.captured_queries), elapsed
+
+    def test_endpoint_query_budgets(self):
+        for case in CASES:
+            with self.subTest(case=case.name):
+                timings = []
+                for _ in range(BENCHMARK_REPEAT):
+                    response, queries, elapsed = self.run_case(case)
+                    timings.append(elapsed)
+                self.assertLess(response.status_code, 400, f'{case.name}: {response.status_code} {response.content[:300]}')
+                budget = case.budget(self.dataset)
+                type(self).results.append({
+                    'size': self.size,
+                    'case': case.name,
+                    'status': response.status_code,
+                    'queries': queries,
+                    'budget': budget,
+                    'median_ms': statistics.median(timings) * 1000,
+                })
+                self.assertLessEqual(queries, budget, f'{case.name} ran {queries} queries, budget is {budget}')
+
+
+# One TestCase per data size so each seeds its own database state
+for _size in BENCHMARK_SIZES:
+    _name = f'EndpointBenchmark{_size}PostsTest'
+    globals()[_name] = override_settings(
+        PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+        METRICS_TOKEN=METRICS_TOKEN,
+        # Cases repeat the same writes; rate limits are covered in test_throttling
+        THROTTLE_POLICIES={},
+    )(type(_name, (EndpointBenchmarkMixin, TestCase), {'size': _size}))
+del _size, _name
@@ -0,0 +1,68 @@
+import csv
+import io
+import json
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from community.models import Feedback
+
+
+class ExportViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('staff', password='staffpass123', is_staff=True)
+        cls.member = User.objects.create_user('member', password='memberpass123')
+        Feedback.objects.bulk_create(
+            Feedback(type='bug' if i % 2 else 'general', message=f'message {i}', user=cls.member)
+            for i in range(7)
+        )
+        old = Feedback.objects.order_by('id').first()
+        Feedback.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=30))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def fetch(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_export(self):
+        rows = list(csv.DictReader(io.StringIO(self.fetch('/api/v1/export/feedback/'))))
+        self.assertEqual(len(rows), 7)
+        self.assertEqual(rows[0]['user_username'], 'member')
+        self.assertEqual([int(r['id']) for r in rows], sorted(int(r['id']) for r in rows))
+
+    def test_ndjson_export_with_filters(self):
+        since = (timezone.now() - timedelta(days=1)).date().isoformat()
+        body = self.fetch(f'/api/v1/export/feedback/?fmt=ndjson&type=bug&since={since}')
+        records = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(len(records), Feedback.objects.filter(type='bug', created_at__date__gte=since).count())
+        self.assertTrue(all(r['type'] == 'bug' for r in records))
+
+    def test_rows_are_read_in_batches(self):
+        with mock.patch('community.exports.BATCH_SIZE', 3):
+            response = self.client.get('/api/v1/export/feedback/')
+            with CaptureQueriesContext(connection) as ctx:
+                body = b''.join(response.streaming_content).decode()
+        self.assertEqual(len(body.splitlines()), 8)
+        self.assertEqual(len(ctx), 3)
+
+    def test_bad_filters_are_rejected(self):
+        self.assertEqual(self.client.get('/api/v1/export/feedback/?since=yesterday').status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/export/posts/?type=bug').status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/export/feedback/?fmt=xml').status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/export/users/').status_code, 404)
+
+    def test_staff_only(self):
+        self.client.force_authenticate(self.member)
+        self.assertEqual(self.client.get('/api/v1/export/feedback/').status_code, 403)
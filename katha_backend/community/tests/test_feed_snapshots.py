@@ -0,0 +1,185 @@
+import json
+import threading
+import time
+from io import StringIO
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from community import feeds, outbox, routers
+from community.models import Comment, Post, SavedPost, Vote
+from community.views import PostViewSet
+
+SNAPSHOTS = override_settings(FEED_SNAPSHOT_SECONDS=30, FEED_SNAPSHOT_MIN_SECONDS=0, THROTTLE_POLICIES={})
+
+
+def bearer(user):
+    return f'Bearer {RefreshToken.for_user(user).access_token}'
+
+
+@SNAPSHOTS
+class FeedSnapshotTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user('alice', password='x')
+        cls.bob = User.objects.create_user('bob', password='x')
+        cls.post = Post.objects.create(author=cls.alice, title='Alamat', content='Noong unang panahon')
+        cls.other = Post.objects.create(author=cls.bob, title='Pabula', content='Ang pagong at ang matsing')
+        top = Comment.objects.create(post=cls.post, author=cls.bob, text='Ganda!')
+        Comment.objects.create(post=cls.post, author=cls.alice, text='Salamat', parent=top)
+        Vote.objects.create(user=cls.alice, post=cls.other, value=-1)
+        SavedPost.objects.create(user=cls.alice, post=cls.post)
+
+    def setUp(self):
+        cache.clear()
+
+    def live(self, path, user=None):
+        headers = {'HTTP_AUTHORIZATION': bearer(user)} if user else {}
+        with override_settings(FEED_SNAPSHOT_SECONDS=0):
+            response = PostViewSet.as_view({'get': 'list'})(APIRequestFactory().get(path, **headers))
+            response.render()
+        return json.loads(response.content)
+
+    def served(self, path, user=None):
+        headers = {'HTTP_AUTHORIZATION': bearer(user)} if user else {}
+        return self.client.get(path, **headers).json()
+
+    def test_snapshot_matches_live_feed(self):
+        for sort in feeds.SORTS:
+            for user in (None, self.alice):
+                with self.subTest(sort=sort, user=user):
+                    path = f'/api/v1/posts/?sort={sort}'
+                    self.assertEqual(self.served(path, user), self.live(path, user))
+        self.assertIsNotNone(cache.get(feeds.snapshot_key('trending')))
+        # The browsable API and batch sub-requests go through the sync viewset: same snapshot
+        response = PostViewSet.as_view({'get': 'list'})(APIRequestFactory().get('/api/v1/posts/?sort=oldest'))
+        self.assertEqual([post['id'] for post in response.data], [self.post.id, self.other.id])
+
+    def test_snapshot_reads_skip_the_feed_queries(self):
+        feeds.rebuild('newest')
+        with self.assertNumQueries(0):
+            posts = feeds.served_feed({}, AnonymousUser())
+        self.assertEqual([post['id'] for post in posts], [self.other.id, self.post.id])
+        # Only the viewer's votes and saves are queried
+        with self.assertNumQueries(2):
+            posts = feeds.served_feed({'sort': 'newest'}, self.alice)
+        self.assertEqual([(post['user_vote'], post['is_saved']) for post in posts], [(-1, False), (0, True)])
+
+    def test_filtered_and_pinned_feeds_are_live(self):
+        self.assertIsNone(feeds.served_feed({'author': 'ali'}, AnonymousUser()))
+        self.assertIsNone(feeds.served_feed({'date_from': '2020-01-01T00:00:00'}, AnonymousUser()))
+        self.assertEqual(feeds.snapshot_sort({'sort': 'whatever'}), 'newest')
+        routers.pin_to_primary(self.alice.pk)
+        self.assertIsNone(feeds.served_feed({}, self.alice))
+        with override_settings(FEED_SNAPSHOT_SECONDS=0):
+            self.assertIsNone(feeds.served_feed({}, AnonymousUser()))
+
+    @override_settings(FEED_SNAPSHOT_MAX_POSTS=1)
+    def test_long_feeds_keep_the_rest_as_ids(self):
+        built = feeds.rebuild('oldest')
+        self.assertEqual(([post['id'] for post in built['posts']], built['more']), ([self.post.id], [self.other.id]))
+        # No feed query: the rest by id, then its comments
+        with self.assertNumQueries(2):
+            posts = feeds.served_feed({'sort': 'oldest'}, AnonymousUser())
+        self.assertEqual(posts, self.live('/api/v1/posts/?sort=oldest'))
+        for sort in feeds.SORTS:
+            for user in (None, self.alice):
+                with self.subTest(sort=sort, user=user):
+                    path = f'/api/v1/posts/?sort={sort}'
+                    self.assertEqual(self.served(path, user), self.live(path, user))
+
+        # Posts deleted since the build drop out
+        Post.objects.filter(pk=self.other.pk).update(deleted_at=timezone.now())
+        self.assertEqual([post['id'] for post in feeds.served_feed({'sort': 'oldest'}, AnonymousUser())],
+                         [self.post.id])
+        stdout = StringIO()
+        call_command('refresh_feeds', sort=['newest'], stdout=stdout)
+        self.assertIn('newest: 1 posts (', stdout.getvalue())
+
+    def test_writes_mark_snapshots_stale(self):
+        built = feeds.rebuild('newest')
+        self.assertFalse(feeds.is_stale(built, feeds.generation()))
+        response = self.client.post(f'/api/v1/posts/{self.post.id}/vote/', {'value': 1},
+                                    content_type='application/json', HTTP_AUTHORIZATION=bearer(self.bob))
+        self.assertEqual(response.status_code, 200)
+        # The vote's outbox event reaches the feed-snapshots consumer
+        self.assertFalse(feeds.is_stale(built, feeds.generation()))
+        with override_settings(OUTBOX_GAP_SECONDS=0):
+            outbox.run([outbox.get_consumer('feed-snapshots')], once=True)
+        self.assertTrue(feeds.is_stale(built, feeds.generation()))
+        with override_settings(FEED_SNAPSHOT_MIN_SECONDS=60):
+            # Rebuilt at most every FEED_SNAPSHOT_MIN_SECONDS however many writes land
+            self.assertFalse(feeds.is_stale(built, feeds.generation()))
+        self.assertTrue(feeds.is_stale(built, built['generation'], now=built['built_at'] + 30))
+
+    def test_rebuild_is_single_flight(self):
+        token = feeds.acquire('newest')
+        self.assertIsNotNone(token)
+        self.assertIsNone(feeds.rebuild('newest'))
+        self.assertIsNone(feeds.revalidate('newest'))
+        feeds.release('newest', 'not-the-owner')
+        self.assertIsNone(feeds.acquire('newest'))
+        feeds.release('newest', token)
+        self.assertIsNotNone(feeds.rebuild('newest'))
+
+    def test_refresh_command(self):
+        stdout = StringIO()
+        call_command('refresh_feeds', stdout=stdout)
+        for sort in feeds.SORTS:
+            self.assertEqual(len(cache.get(feeds.snapshot_key(sort))['posts']), 2)
+        feeds.acquire('trending')
+        call_command('refresh_feeds', sort=['trending'], stdout=stdout)
+        self.assertIn('trending: skipped', stdout.getvalue())
+        with override_settings(FEED_SNAPSHOT_SECONDS=0), self.assertRaises(CommandError):
+            call_command('refresh_feeds', stdout=stdout)
+
+
+@SNAPSHOTS
+class FeedSnapshotConcurrencyTest(TransactionTestCase):
+    """Committed rows, so rebuilds on other threads see them."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user('manunulat', password='x')
+        self.post = Post.objects.create(author=self.author, title='Katha', content='...')
+
+    def tearDown(self):
+        feeds.shutdown_executor()
+
+    def builds(self):
+        return feeds.FEED_SNAPSHOT_BUILDS.value(sort='newest', trigger='miss')
+
+    def test_cold_snapshot_is_built_once(self):
+        before = self.builds()
+        barrier = threading.Barrier(6, timeout=5)
+        results = []
+
+        def read():
+            barrier.wait()
+            results.append(feeds.snapshot('newest'))
+        threads = [threading.Thread(target=read) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.builds() - before, 1)
+        self.assertEqual({result['posts'][0]['id'] for result in results}, {self.post.id})
+
+    def test_stale_snapshot_is_served_while_rebuilding(self):
+        built = feeds.rebuild('newest')
+        feeds.mark_stale()
+        newer = Post.objects.create(author=self.author, title='Bago', content='...')
+        served = feeds.snapshot('newest')
+        self.assertEqual(served['built_at'], built['built_at'])
+        self.assertEqual([post['id'] for post in served['posts']], [self.post.id])
+        # The background rebuild replaces it
+        deadline = time.monotonic() + 5
+        while cache.get(feeds.snapshot_key('newest'))['built_at'] == built['built_at']:
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+        self.assertEqual([post['id'] for post in feeds.snapshot('newest')['posts']], [newer.id, self.post.id])
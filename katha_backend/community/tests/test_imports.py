@@ -0,0 +1,145 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from community import imports
+from community.models import Comment, CommentVote, ImportedObject, ImportRun, Post, Vote, path_step
+
+
+def ndjson(*records):
+    return ''.join(json.dumps(record) + '\n' for record in records)
+
+
+class ImportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.maria = User.objects.create_user('maria', password='x')
+        cls.juan = User.objects.create_user('juan', password='x')
+        Post.objects.create(author=cls.maria, title='Alamat', content='Noong unang panahon')
+
+    def write(self, text):
+        fd, path = tempfile.mkstemp(suffix='.ndjson')
+        with os.fdopen(fd, 'w') as fh:
+            fh.write(text)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def run_import(self, path, **options):
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_community', path, stdout=stdout, stderr=stderr, **options)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def forum(self):
+        return ndjson(
+            {'type': 'post', 'id': 1, 'author': 'maria', 'title': 'Alamat', 'content': 'Bago',
+             'created_at': '2024-01-02T03:04:05Z'},
+            {'type': 'post', 'id': 2, 'author__username': 'lola', 'title': 'Alamat', 'content': 'Isa pa'},
+            {'type': 'comment', 'id': 'c1', 'post': 1, 'author': 'juan', 'text': 'Ganda'},
+            {'type': 'comment', 'id': 'c2', 'post_id': 1, 'parent_id': 'c1', 'author': 'maria', 'text': 'Salamat'},
+            {'type': 'comment', 'id': 'c3', 'post': 1, 'parent': 'c2', 'author': 'lola', 'text': 'Oo nga'},
+            {'type': 'vote', 'post': 1, 'user': 'juan', 'value': 1},
+            {'type': 'vote', 'post': 1, 'user': 'lola', 'value': 1},
+            {'type': 'vote', 'post': 1, 'user': 'juan', 'value': -1},
+            {'type': 'comment_vote', 'comment': 'c1', 'user': 'maria', 'value': -1},
+        )
+
+    def imported(self, run, kind, source_id):
+        model = Post if kind == 'post' else Comment
+        return model.objects.get(pk=run.imported.get(kind=kind, source_id=source_id).object_id)
+
+    def test_import_maps_ids_threads_and_counters(self):
+        stdout, _ = self.run_import(self.write(self.forum()), name='forum', create_users=True, chunk_size=2)
+        run = ImportRun.objects.get(name='forum')
+        self.assertIsNotNone(run.finished_at)
+        self.assertEqual(run.lines, 9)
+        self.assertIn('Imported 3 comments, 1 comment_votes, 2 posts, 1 users, 3 votes', stdout)
+
+        first, second = self.imported(run, 'post', '1'), self.imported(run, 'post', '2')
+        # Slugs are allocated in bulk, after the one the existing post took
+        self.assertEqual((first.slug, second.slug), ('alamat-1', 'alamat-2'))
+        self.assertEqual(first.created_at.year, 2024)
+        self.assertEqual(second.author.username, 'lola')
+        self.assertFalse(User.objects.get(username='lola').has_usable_password())
+
+        c1, c2, c3 = (self.imported(run, 'comment', ref) for ref in ('c1', 'c2', 'c3'))
+        self.assertEqual((c2.parent_id, c3.parent_id), (c1.id, c2.id))
+        self.assertEqual(c3.path, path_step(c1.id) + path_step(c2.id) + path_step(c3.id))
+        self.assertEqual(c3.depth, 2)
+        # Juan's second vote replaces the first; counters are recomputed from the rows
+        self.assertEqual(Vote.objects.filter(post=first).count(), 2)
+        self.assertEqual((first.votes, c1.votes), (0, -1))
+        self.assertEqual(CommentVote.objects.get().comment, c1)
+
+    def test_bad_records_are_skipped(self):
+        path = self.write(ndjson(
+            {'type': 'post', 'id': 1, 'author': 'maria', 'title': 'A'},
+            {'type': 'post', 'id': 1, 'author': 'maria', 'title': 'Twice'},
+            {'type': 'post', 'id': 2, 'author': 'nobody', 'title': 'B'},
+            {'type': 'comment', 'id': 'c1', 'post': 99, 'author': 'juan', 'text': '?'},
+            {'type': 'vote', 'post': 1, 'user': 'juan', 'value': 5},
+            {'type': 'poll', 'id': 3},
+        ) + 'not json\n\n')
+        _, stderr = self.run_import(path)
+        run = ImportRun.objects.get()
+        self.assertEqual(run.counts['rows'], {'post': 1, 'comment': 0, 'vote': 0, 'comment_vote': 0, 'user': 0})
+        self.assertEqual(run.counts['skipped'], {'post': 2, 'comment': 1, 'vote': 1, 'invalid': 2})
+        self.assertIn("Line 3: skipped post: unknown user 'nobody'", stderr)
+        self.assertIn('Line 7: skipped invalid', stderr)
+
+    def test_default_type_reads_an_export(self):
+        path = self.write(ndjson({'id': 7, 'author__username': 'juan', 'title': 'Pabula', 'content': '...'}))
+        self.run_import(path, type='post')
+        self.assertEqual(Post.objects.get(slug='pabula').author, self.juan)
+
+    def test_deep_threads_are_cut(self):
+        records = [{'type': 'post', 'id': 1, 'author': 'maria', 'title': 'Malalim'}]
+        for i in range(imports.MAX_THREAD_DEPTH + 2):
+            records.append({'type': 'comment', 'id': i, 'post': 1, 'parent': i - 1 if i else None,
+                            'author': 'juan', 'text': str(i)})
+        self.run_import(self.write(ndjson(*records)), chunk_size=3)
+        self.assertEqual(Comment.objects.count(), imports.MAX_THREAD_DEPTH + 1)
+        self.assertEqual(ImportRun.objects.get().counts['skipped'], {'comment': 1})
+
+    def test_resume_after_a_failed_chunk(self):
+        path = self.write(self.forum())
+        real_write = imports.Importer.write
+        calls = []
+
+        def failing_write(importer, chunk, *args):
+            calls.append(1)
+            if len(calls) == 3:
+                raise RuntimeError('connection lost')
+            return real_write(importer, chunk, *args)
+        with mock.patch.object(imports.Importer, 'write', failing_write), self.assertRaises(RuntimeError):
+            self.run_import(path, name='forum', create_users=True, chunk_size=2)
+        run = ImportRun.objects.get(name='forum')
+        self.assertEqual((run.lines, run.finished_at), (4, None))
+        self.assertEqual(Comment.objects.count(), 2)
+
+        stdout, _ = self.run_import(path, name='forum', create_users=True, chunk_size=2)
+        self.assertIn('Resuming forum after line 4.', stdout)
+        # Replies to comments from the first run still find their parents
+        run.refresh_from_db()
+        c3 = self.imported(run, 'comment', 'c3')
+        self.assertEqual(c3.parent, self.imported(run, 'comment', 'c2'))
+        self.assertEqual((Post.objects.count(), Comment.objects.count(), ImportedObject.objects.count()), (3, 3, 5))
+        self.assertEqual(self.imported(run, 'post', '1').votes, 0)
+
+        with self.assertRaises(CommandError):
+            self.run_import(path, name='forum')
+        self.run_import(path, name='forum', restart=True, create_users=True)
+        self.assertEqual(Post.objects.count(), 5)
+
+    def test_allocate_slugs(self):
+        Post.objects.create(author=self.maria, title='Alamat', content='...')  # alamat-1
+        self.assertEqual(imports.allocate_slugs(['Alamat', 'Alamat', '', '!!!', 'Bago']),
+                         ['alamat-2', 'alamat-3', 'post', 'post-1', 'bago'])
+        long = imports.allocate_slugs(['x' * 250] * 2)
+        self.assertEqual([len(slug) for slug in long], [200, 200])
+        self.assertTrue(long[1].endswith('-1'))
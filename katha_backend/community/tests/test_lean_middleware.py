@@ -0,0 +1,62 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from community.models import Post
+
+
+@override_settings(
+    THROTTLE_POLICIES={},
+    # Admin pages reference static files that collectstatic has not hashed here
+    STORAGES={
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    },
+)
+class LeanMiddlewareTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('tagapangasiwa', password='x')
+        cls.post = Post.objects.create(author=cls.admin, title='Alamat', content='Noong unang panahon')
+
+    def test_api_skips_session_and_csrf(self):
+        self.client.force_login(self.admin)
+        with self.assertNumQueries(0):
+            # The session cookie is not even looked up
+            response = self.client.get('/api/v1/posts/?sort=oldest', HTTP_AUTHORIZATION='Bearer x')
+        self.assertEqual(response.status_code, 401)
+        response = self.client.get(f'/api/v1/posts/{self.post.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Cookie', response.get('Vary', ''))
+        self.assertNotIn('csrftoken', response.cookies)
+        self.assertEqual(response['X-Frame-Options'], 'DENY')
+
+        # A session alone does not authenticate API calls; the JWT does
+        csrf_client = self.client_class(enforce_csrf_checks=True)
+        csrf_client.force_login(self.admin)
+        self.assertEqual(csrf_client.post(f'/api/v1/posts/{self.post.id}/save/').status_code, 401)
+        token = RefreshToken.for_user(self.admin).access_token
+        response = csrf_client.post(f'/api/v1/posts/{self.post.id}/save/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.status_code, 200)
+
+    def test_admin_keeps_the_browser_stack(self):
+        response = self.client.get('/admin/login/')
+        self.assertIn('csrftoken', response.cookies)
+        csrf_client = self.client_class(enforce_csrf_checks=True)
+        self.assertEqual(csrf_client.post('/admin/login/', {'username': 'tagapangasiwa', 'password': 'x'})
+                         .status_code, 403)
+        self.client.force_login(self.admin)
+        response = self.client.get('/admin/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['user'], self.admin)
+
+    def test_benchmark_command(self):
+        stdout = StringIO()
+        call_command('benchmark_middleware', requests=20, rounds=1, session_cookie=True, stdout=stdout)
+        output = stdout.getvalue()
+        self.assertIn('with a session cookie', output)
+        self.assertIn('/api/v1/posts/', output)
+        self.assertIn('/admin/', output)
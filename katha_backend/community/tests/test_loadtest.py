@@ -0,0 +1,94 @@
+import asyncio
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import LiveServerTestCase, SimpleTestCase, override_settings
+
+from community.loadtest import Connection, HTTPError, LoadTestConfig, percentile, run_load_test
+from community.models import Post
+
+
+class PercentileTest(SimpleTestCase):
+    def test_percentiles(self):
+        values = list(range(1, 101))
+        self.assertAlmostEqual(percentile(values, 50), 50.5)
+        self.assertAlmostEqual(percentile(values, 99), 99.01)
+        self.assertEqual(percentile([], 95), 0.0)
+        self.assertEqual(percentile([7.0], 95), 7.0)
+
+
+class ConnectionTimeoutTest(SimpleTestCase):
+    def test_timed_out_response_is_not_read_by_the_next_request(self):
+        stalled = []
+
+        async def serve(reader, writer):
+            try:
+                while request := await reader.readuntil(b'\r\n\r\n'):
+                    path = request.split()[1].decode()
+                    if not stalled:
+                        stalled.append(path)
+                        await asyncio.sleep(0.3)  # Answers, but only after the client gave up
+                    body = json.dumps({'path': path}).encode()
+                    writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                                 b'Content-Length: %d\r\n\r\n%s' % (len(body), body))
+                    await writer.drain()
+            except (asyncio.IncompleteReadError, ConnectionError):
+                writer.close()
+
+        async def run():
+            server = await asyncio.start_server(serve, '127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            conn = Connection(f'http://127.0.0.1:{port}', timeout=0.1)
+            try:
+                with self.assertRaisesMessage(HTTPError, 'no response within 0.1s'):
+                    await conn.request('GET', '/slow')
+                await asyncio.sleep(0.3)
+                return await conn.request('GET', '/next')
+            finally:
+                await conn.close()
+                server.close()
+
+        self.assertEqual(asyncio.run(run()), (200, {'path': '/next'}))
+        self.assertEqual(stalled, ['/slow'])
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    THROTTLE_POLICIES={},
+)
+class LoadTestRunTest(LiveServerTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('loader', password='loadpass123')
+        User.objects.create_user('loader2', password='loadpass123')
+        for i in range(3):
+            Post.objects.create(author=self.user, title=f'Kuwento {i}', content='...')
+
+    def test_short_run_against_live_server(self):
+        # Reads only: concurrent writes trip SQLite's shared-cache locking, which MySQL does not have
+        credentials = [('loader', 'loadpass123'), ('loader2', 'loadpass123')]
+        config = LoadTestConfig(base_url=self.live_server_url, credentials=credentials,
+                                users=2, duration=1, ramp_up=0, write_ratio=0, seed=7)
+        report = run_load_test(config)
+        self.assertEqual(report['endpoints']['POST token/']['statuses'], {'200': 2})
+        self.assertGreater(report['total']['requests'], 10)
+        self.assertEqual(report['total']['errors'], 0, report)
+        self.assertTrue(any(label.startswith('GET posts/?sort=') for label in report['endpoints']))
+
+    def test_command_writes_json_report(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, 'run.json')
+            stdout = StringIO()
+            call_command('loadtest', base_url=self.live_server_url, username=['loader'], password='loadpass123',
+                         users=1, duration=0.5, ramp_up=0, write_ratio=0.5, output=output, stdout=stdout)
+            with open(output) as fh:
+                report = json.load(fh)
+            call_command('loadtest', base_url=self.live_server_url, username=['loader'], password='loadpass123',
+                         users=1, duration=0.5, ramp_up=0, baseline=output, stdout=stdout)
+        self.assertIn('p95_ms', report['total'])
+        self.assertEqual(report['total']['errors'], 0, report)
+        self.assertIn('TOTAL', stdout.getvalue())
+        self.assertIn('p95 ', stdout.getvalue().splitlines()[-1])
@@ -0,0 +1,146 @@
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import resolve
+
+from community.metrics import Registry
+from community.middleware import (
+    N_PLUS_ONE_TOTAL, REQUEST_QUERIES, REQUESTS_TOTAL, QueryCollector, QueryInstrumentationMiddleware, fingerprint,
+)
+from community.models import Post
+
+
+class RegistryTest(TestCase):
+    def test_prometheus_text_format(self):
+        registry = Registry()
+        requests = registry.counter('app_requests_total', 'Requests handled.', ('view', 'status'))
+        latency = registry.histogram('app_latency_seconds', 'Request latency.', ('view',), buckets=(0.1, 1.0))
+        registry.gauge('app_in_flight', 'Requests in flight.').set(3)
+        requests.inc(view='post-list', status=200)
+        requests.inc(2, view='post-list', status=200)
+        requests.inc(view='say "hi"\n', status=500)
+        for value in (0.05, 0.1, 0.5, 3.0):
+            latency.observe(value, view='post-list')
+
+        self.assertEqual(registry.render(), '\n'.join([
+            '# HELP app_in_flight Requests in flight.',
+            '# TYPE app_in_flight gauge',
+            'app_in_flight 3',
+            '# HELP app_latency_seconds Request latency.',
+            '# TYPE app_latency_seconds histogram',
+            # Buckets are cumulative; a value on a bound falls in that bucket
+            'app_latency_seconds_bucket{view="post-list",le="0.1"} 2',
+            'app_latency_seconds_bucket{view="post-list",le="1"} 3',
+            'app_latency_seconds_bucket{view="post-list",le="+Inf"} 4',
+            'app_latency_seconds_sum{view="post-list"} 3.65',
+            'app_latency_seconds_count{view="post-list"} 4',
+            '# HELP app_requests_total Requests handled.',
+            '# TYPE app_requests_total counter',
+            'app_requests_total{view="post-list",status="200"} 3',
+            'app_requests_total{view="say \\"hi\\"\\n",status="500"} 1',
+        ]) + '\n')
+        self.assertEqual(latency.snapshot(view='post-list'), (4, 3.65))
+
+    def test_labels_and_types_are_checked(self):
+        registry = Registry()
+        counter = registry.counter('app_total', 'Things.', ('kind',))
+        self.assertIs(registry.counter('app_total', 'Things.', ('kind',)), counter)
+        with self.assertRaises(ValueError):
+            registry.gauge('app_total', 'Things.', ('kind',))
+        with self.assertRaises(ValueError):
+            counter.inc(other='x')
+
+
+class FingerprintTest(TestCase):
+    def test_queries_differing_in_parameters_match(self):
+        self.assertEqual(fingerprint("SELECT * FROM t WHERE id = 12 AND name = 'it''s'"),
+                         'SELECT * FROM t WHERE id = ? AND name = ?')
+        self.assertEqual(fingerprint('SELECT * FROM t WHERE id IN (%s, %s, %s)'),
+                         fingerprint('SELECT  *  FROM t WHERE id IN (%s)'))
+
+    def test_duplicates_past_the_threshold(self):
+        collector = QueryCollector()
+        for pk in range(5):
+            collector.add('default', f'SELECT * FROM t WHERE id = {pk}', 0.001)
+        collector.add('default', 'SELECT COUNT(*) FROM t', 0.002)
+        self.assertEqual(collector.duplicates(5), {'SELECT * FROM t WHERE id = ?': 5})
+        self.assertEqual(collector.duplicates(6), {})
+        self.assertEqual(collector.count, 6)
+        self.assertAlmostEqual(collector.total_time, 0.007)
+
+
+@override_settings(METRICS_ENABLED=True, N_PLUS_ONE_THRESHOLD=5, SLOW_REQUEST_MS=None)
+class QueryInstrumentationMiddlewareTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create_user(f'user{i}', password='x') for i in range(5)]
+
+    def request(self, queries):
+        def view(request):
+            for user in self.users[:queries]:
+                User.objects.get(pk=user.pk)
+            return HttpResponse(status=201)
+
+        request = RequestFactory().get('/api/v1/posts/')
+        request.resolver_match = resolve('/api/v1/posts/')
+        return QueryInstrumentationMiddleware(view)(request)
+
+    def test_records_per_view_metrics(self):
+        labels = {'view': 'post-list', 'method': 'GET'}
+        requests = REQUESTS_TOTAL.value(status='201', **labels)
+        count, total = REQUEST_QUERIES.snapshot(**labels)
+        self.request(queries=3)
+        self.assertEqual(REQUESTS_TOTAL.value(status='201', **labels), requests + 1)
+        self.assertEqual(REQUEST_QUERIES.snapshot(**labels), (count + 1, total + 3))
+
+    def test_flags_repeated_query_shapes(self):
+        labels = {'view': 'post-list', 'method': 'GET'}
+        flagged = N_PLUS_ONE_TOTAL.value(**labels)
+        with self.assertNoLogs('community.perf', 'WARNING'):
+            self.request(queries=4)
+        self.assertEqual(N_PLUS_ONE_TOTAL.value(**labels), flagged)
+
+        with self.assertLogs('community.perf', 'WARNING') as logs:
+            self.request(queries=5)
+        self.assertEqual(N_PLUS_ONE_TOTAL.value(**labels), flagged + 1)
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('Possible N+1 in GET /api/v1/posts/ (post-list): 5x SELECT', logs.output[0])
+
+    @override_settings(SLOW_REQUEST_MS=0)
+    def test_logs_slow_requests_with_their_queries(self):
+        with self.assertLogs('community.perf', 'WARNING') as logs:
+            self.request(queries=2)
+        message, = logs.output
+        self.assertIn('Slow request GET /api/v1/posts/ (post-list):', message)
+        self.assertIn('2 queries', message)
+        self.assertEqual(message.count('[default]'), 2)
+        self.assertIn('FROM "auth_user"', message)
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_disabled(self):
+        requests = REQUESTS_TOTAL.value(view='post-list', method='GET', status='201')
+        self.request(queries=1)
+        self.assertEqual(REQUESTS_TOTAL.value(view='post-list', method='GET', status='201'), requests)
+
+
+@override_settings(THROTTLE_POLICIES={}, METRICS_ENABLED=True, METRICS_TOKEN='scrape-token', DEBUG=False)
+class MetricsEndpointTest(TestCase):
+    def test_views_are_labelled_by_route(self):
+        user = User.objects.create_user('alice', password='x')
+        post = Post.objects.create(author=user, title='Alamat', content='Noong unang panahon')
+        detail = REQUESTS_TOTAL.value(view='post-detail', method='GET', status='200')
+        unresolved = REQUESTS_TOTAL.value(view='unresolved', method='GET', status='404')
+        self.client.get(f'/api/v1/posts/{post.id}/')
+        self.client.get('/no/such/page/')
+        self.assertEqual(REQUESTS_TOTAL.value(view='post-detail', method='GET', status='200'), detail + 1)
+        self.assertEqual(REQUESTS_TOTAL.value(view='unresolved', method='GET', status='404'), unresolved + 1)
+
+    def test_scrape_needs_the_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 404)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-token')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('# TYPE katha_requests_total counter', body)
+        self.assertIn('# TYPE katha_request_db_queries histogram', body)
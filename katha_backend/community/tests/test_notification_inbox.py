@@ -0,0 +1,73 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from community.models import Comment, Notification, Post
+from community.serializers import NOTIFICATION_EXCERPT_LENGTH, excerpt
+
+
+def bearer(user):
+    return f'Bearer {RefreshToken.for_user(user).access_token}'
+
+
+class NotificationInboxTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user('alice', password='x')
+        cls.bob = User.objects.create_user('bob', password='x')
+        cls.post = Post.objects.create(author=cls.alice, title='Alamat', content='Noong unang panahon')
+        cls.long = Comment.objects.create(post=cls.post, author=cls.bob, text='Mahaba ' * 40)
+        cls.short = Comment.objects.create(post=cls.post, author=cls.bob, text='Ganda!')
+        cls.notifications = [
+            Notification.objects.create(user=cls.alice, notification_type='comment', post=cls.post,
+                                        comment=comment, actor=cls.bob, read=read)
+            for comment, read in ((cls.long, True), (cls.short, False), (cls.short, True), (None, False))
+        ]
+        Notification.objects.create(user=cls.bob, notification_type='reply', post=cls.post, actor=cls.alice)
+
+    def inbox(self, query=''):
+        response = self.client.get(f'/api/v1/notifications/{query}', HTTP_AUTHORIZATION=bearer(self.alice),
+                                   HTTP_ACCEPT='application/json')
+        return response.status_code, response.json()
+
+    def ids(self, query=''):
+        return [row['id'] for row in self.inbox(query)[1]]
+
+    def test_one_joined_query_with_an_excerpt(self):
+        # The token's user, then the inbox
+        with self.assertNumQueries(2):
+            status, rows = self.inbox()
+        self.assertEqual(status, 200)
+        self.assertEqual([row['id'] for row in rows], [n.id for n in reversed(self.notifications)])
+        newest, *_, oldest = rows
+        self.assertNotIn('comment_text', newest)
+        self.assertEqual(oldest['comment_text'], self.long.text[:NOTIFICATION_EXCERPT_LENGTH].rstrip() + '…')
+        self.assertEqual((oldest['post_title'], oldest['actor_username']), ('Alamat', 'bob'))
+        self.assertEqual(rows[1]['comment_text'], 'Ganda!')
+
+    def test_unread_and_keyset_pages(self):
+        unread = [n.id for n in self.notifications if not n.read]
+        self.assertEqual(self.ids('?unread=1'), unread[::-1])
+        first = self.ids('?limit=2')
+        self.assertEqual(self.ids(f'?limit=2&before={first[-1]}'), [n.id for n in self.notifications[:2]][::-1])
+        self.assertEqual(self.ids(f'?unread=1&before={unread[-1]}'), unread[:1])
+        self.assertEqual(self.inbox('?before=x'), (400, {'detail': 'limit and before must be integers.'}))
+
+    def test_unpaged_request_returns_the_whole_inbox(self):
+        Notification.objects.bulk_create([Notification(user=self.alice, notification_type='comment', post=self.post,
+                                                        actor=self.bob) for _ in range(60)])
+        everything = list(Notification.objects.filter(user=self.alice).order_by('-id').values_list('id', flat=True))
+        self.assertEqual(self.ids(), everything)
+        # Either paging parameter pages, 50 by default
+        self.assertEqual(self.ids(f'?before={everything[0]}'), everything[1:51])
+        self.assertEqual(self.ids('?limit=200'), everything)
+
+    def test_deleted_posts_and_comments_are_left_out(self):
+        Comment.objects.filter(pk=self.long.pk).update(deleted_at=timezone.now())
+        self.assertNotIn(self.notifications[0].id, self.ids())
+
+    def test_excerpt(self):
+        self.assertEqual(excerpt('x' * NOTIFICATION_EXCERPT_LENGTH), 'x' * NOTIFICATION_EXCERPT_LENGTH)
+        self.assertEqual(excerpt('x' * (NOTIFICATION_EXCERPT_LENGTH + 1)), 'x' * NOTIFICATION_EXCERPT_LENGTH + '…')
+        self.assertIsNone(excerpt(None))
@@ -0,0 +1,180 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from community import outbox, tombstones
+from community.models import ConsumerOffset, OutboxEvent, Post
+
+
+def bearer(user):
+    return f'Bearer {RefreshToken.for_user(user).access_token}'
+
+
+class Recorder:
+    """A consumer handler that keeps what it was given and can be told to fail."""
+
+    def __init__(self):
+        self.batches = []
+        self.fail = False
+        self.resets = 0
+
+    def __call__(self, events):
+        if self.fail:
+            raise RuntimeError('derived store is down')
+        self.batches.append([(event.topic, event.key, event.action) for event in events])
+
+    def reset(self):
+        self.resets += 1
+        self.batches.clear()
+
+    @property
+    def events(self):
+        return [event for batch in self.batches for event in batch]
+
+
+@override_settings(THROTTLE_POLICIES={}, OUTBOX_GAP_SECONDS=0)
+class OutboxTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user('alice', password='x')
+        cls.bob = User.objects.create_user('bob', password='x')
+        cls.post = Post.objects.create(author=cls.alice, title='Alamat', content='Noong unang panahon')
+
+    def setUp(self):
+        # Only the consumers a test registers count (e.g. for the compaction horizon)
+        patcher = mock.patch.dict(outbox.CONSUMERS, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def register(self, name='recorder', topics=()):
+        recorder = Recorder()
+        outbox.consumer(name, topics=topics, reset=recorder.reset)(recorder)
+        return recorder, outbox.get_consumer(name)
+
+    def post_json(self, path, data, user):
+        return self.client.post(path, data, content_type='application/json', HTTP_AUTHORIZATION=bearer(user))
+
+    def events(self):
+        return list(OutboxEvent.objects.values_list('topic', 'key', 'action'))
+
+    def test_write_paths_emit_events(self):
+        post_id = self.post_json('/api/v1/posts/', {'title': 'Bago', 'content': 'Kuwento'}, self.alice).json()['id']
+        self.post_json(f'/api/v1/posts/{self.post.id}/vote/', {'value': 1}, self.bob)
+        self.post_json(f'/api/v1/posts/{self.post.id}/vote/', {'value': 0}, self.bob)
+        self.client.post(f'/api/v1/posts/{self.post.id}/save/', HTTP_AUTHORIZATION=bearer(self.bob))
+        comment_id = self.post_json('/api/v1/comments/', {'post': self.post.id, 'text': 'Ganda'}, self.bob).json()['id']
+        self.client.delete(f'/api/v1/posts/{post_id}/', HTTP_AUTHORIZATION=bearer(self.alice))
+        vote_key = f'{self.bob.id}:{self.post.id}'
+        self.assertEqual(self.events(), [
+            ('post', str(post_id), 'upsert'),
+            ('vote', vote_key, 'upsert'), ('post', str(self.post.id), 'upsert'),
+            ('vote', vote_key, 'delete'), ('post', str(self.post.id), 'upsert'),
+            ('saved_post', vote_key, 'upsert'),
+            ('comment', str(comment_id), 'upsert'),
+            ('post', str(post_id), 'upsert'),
+        ])
+        # Events carry the whole row as it was written
+        created, *_, deleted = OutboxEvent.objects.filter(topic='post', key=str(post_id))
+        self.assertEqual((created.data['title'], created.data['author_id'], created.data['deleted_at']),
+                         ('Bago', self.alice.id, None))
+        self.assertIsNotNone(deleted.data['deleted_at'])
+        self.assertEqual(OutboxEvent.objects.get(topic='comment').data['path'], Post.objects.get(pk=self.post.id)
+                         .comments.get().path)
+
+    def test_events_roll_back_with_the_write(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            outbox.emit(self.post)
+            raise RuntimeError
+        self.assertEqual(self.events(), [])
+
+    def test_purge_emits_deletes(self):
+        tombstones.tombstone(self.post)
+        tombstones.purge_deleted()
+        self.assertEqual(self.events(), [('post', str(self.post.id), 'delete')])
+
+    def test_poll_delivers_in_batches_and_moves_the_offset(self):
+        recorder, consumer = self.register(topics=('post',))
+        for i in range(3):
+            outbox.emit(self.post)
+        vote = self.post.post_votes.create(user=self.bob, value=1)
+        outbox.emit(vote)
+        self.assertEqual(outbox.poll(consumer, limit=2), 2)
+        self.assertEqual(outbox.lag(consumer), 2)
+        self.assertEqual(outbox.run([consumer], limit=2, once=True), 2)
+        # The vote is not a topic it wants, but its offset moves past it
+        self.assertEqual([len(batch) for batch in recorder.batches], [2, 1])
+        self.assertEqual(ConsumerOffset.objects.get(name='recorder').position, OutboxEvent.objects.last().id)
+        self.assertEqual(outbox.poll(consumer), 0)
+
+    def test_failed_batch_is_delivered_again(self):
+        recorder, consumer = self.register()
+        outbox.emit(self.post)
+        recorder.fail = True
+        with self.assertLogs('community.db', 'ERROR'):
+            self.assertEqual(outbox.run([consumer], once=True), 0)
+        self.assertEqual(outbox.lag(consumer), 1)
+        recorder.fail = False
+        outbox.run([consumer], once=True)
+        self.assertEqual(recorder.events, [('post', str(self.post.id), 'upsert')])
+
+    def test_waits_on_recent_id_gaps(self):
+        now = timezone.now()
+        old, recent = now - timedelta(seconds=60), now - timedelta(seconds=1)
+        events = [OutboxEvent(id=1, created_at=old), OutboxEvent(id=3, created_at=recent),
+                  OutboxEvent(id=4, created_at=recent)]
+        with override_settings(OUTBOX_GAP_SECONDS=5):
+            # Event 2 may belong to a transaction that has not committed yet
+            self.assertEqual([e.id for e in outbox.deliverable(events, 0, now)], [1])
+            events[1].created_at = old
+            self.assertEqual([e.id for e in outbox.deliverable(events, 0, now)], [1, 3, 4])
+            self.assertEqual(outbox.deliverable(events[2:], 1, now), [])
+
+    def test_compaction_keeps_the_latest_state_for_replay(self):
+        recorder, consumer = self.register()
+        _, lagging = self.register('lagging')
+        for i in range(3):
+            outbox.emit(self.post)
+        vote = self.post.post_votes.create(user=self.bob, value=1)
+        outbox.emit(vote)
+        outbox.emit(vote, deleted=True)
+        OutboxEvent.objects.filter(action='delete').update(created_at=timezone.now() - timedelta(days=30))
+        outbox.emit(Post.objects.create(author=self.bob, title='Bago', content='...'))
+
+        # Nothing goes while a consumer has not processed it
+        self.assertEqual(outbox.compact().rows, 0)
+        outbox.run([consumer, lagging], once=True)
+        outbox.emit(self.post)
+        self.assertEqual(outbox.compact(tombstone_days=7).rows, 5)
+        self.assertEqual(self.events(), [('post', str(Post.objects.get(title='Bago').id), 'upsert'),
+                                         ('post', str(self.post.id), 'upsert')])
+
+        outbox.replay(consumer)
+        outbox.run([consumer], once=True)
+        self.assertEqual(recorder.resets, 1)
+        self.assertEqual(recorder.events, self.events())
+
+    def test_commands(self):
+        recorder, _ = self.register()
+        outbox.emit(self.post)
+        stdout = StringIO()
+        call_command('run_consumers', status=True, stdout=stdout)
+        self.assertIn('recorder: 1 events behind', stdout.getvalue())
+        call_command('run_consumers', once=True, stdout=stdout)
+        self.assertEqual(len(recorder.events), 1)
+        call_command('run_consumers', replay=['recorder'], once=True, stdout=stdout)
+        self.assertEqual((recorder.resets, len(recorder.events)), (1, 1))
+        with self.assertRaises(CommandError):
+            call_command('run_consumers', consumer=['nope'], once=True, stdout=stdout)
+
+        outbox.emit(self.post)
+        call_command('run_consumers', once=True, stdout=stdout)
+        call_command('compact_outbox', stdout=stdout)
+        self.assertIn('Dropped 1 outbox events', stdout.getvalue())
+        self.assertEqual(OutboxEvent.objects.count(), 1)
@@ -0,0 +1,69 @@
+import threading
+
+from django.contrib.auth import hashers
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from community import passwords
+
+
+@override_settings(THROTTLE_POLICIES={}, PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_QUEUE=0)
+class PasswordHashingTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.maria = User.objects.create_user('maria', password='Kalabaw-123')
+
+    def setUp(self):
+        passwords.shutdown_executor()
+        self.addCleanup(passwords.shutdown_executor)
+
+    def login(self, username='maria', password='Kalabaw-123'):
+        return self.client.post('/api/token/', {'username': username, 'password': password},
+                                content_type='application/json')
+
+    def test_register_and_login_hash_on_the_pool(self):
+        before = passwords.PASSWORD_HASH_SECONDS.snapshot(operation='hash')[0]
+        response = self.client.post('/api/v1/register/', {'username': 'juan_dela', 'password': 'Bahay-kubo-42'},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        user = User.objects.get(username='juan_dela')
+        self.assertTrue(user.password.startswith('scrypt$'))
+        self.assertEqual(passwords.PASSWORD_HASH_SECONDS.snapshot(operation='hash')[0], before + 1)
+        self.assertEqual(self.login('juan_dela', 'Bahay-kubo-42').status_code, 200)
+        self.assertEqual(self.login('juan_dela', 'wrong').status_code, 401)
+        self.assertEqual(self.login('nobody', 'wrong').status_code, 401)
+
+    def test_login_upgrades_an_old_hash(self):
+        User.objects.filter(pk=self.maria.pk).update(
+            password=hashers.make_password('Kalabaw-123', hasher='pbkdf2_sha256'))
+        before = passwords.PASSWORD_REHASHED.value(algorithm='pbkdf2_sha256')
+        self.assertEqual(self.login().status_code, 200)
+        self.maria.refresh_from_db()
+        self.assertTrue(self.maria.password.startswith('scrypt$'))
+        self.assertEqual(passwords.PASSWORD_REHASHED.value(algorithm='pbkdf2_sha256'), before + 1)
+        self.assertEqual(self.login().status_code, 200)
+
+    def test_full_queue_fails_fast(self):
+        started, release = threading.Event(), threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+        holder = threading.Thread(target=passwords.run, args=('hash', slow))
+        holder.start()
+        self.addCleanup(holder.join)
+        self.addCleanup(release.set)
+        started.wait(5)
+        rejected = passwords.PASSWORD_HASH_REJECTED.value(operation='verify')
+        response = self.login()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(passwords.PASSWORD_HASH_REJECTED.value(operation='verify'), rejected + 1)
+        release.set()
+        holder.join()
+        self.assertEqual(self.login().status_code, 200)
+
+    @override_settings(PASSWORD_HASH_WORKERS=0)
+    def test_without_workers_hashes_inline(self):
+        self.assertEqual(passwords.run('hash', threading.current_thread), threading.current_thread())
+        self.assertEqual(self.login().status_code, 200)
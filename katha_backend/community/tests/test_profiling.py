@@ -0,0 +1,81 @@
+import json
+import tempfile
+from collections import Counter
+from io import StringIO
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from community.models import Post
+from community.profiling import format_collapsed, hot_frames, parse_collapsed, sampled_stacks
+
+
+class CollapsedStackTest(SimpleTestCase):
+    def test_round_trip_and_hot_frames(self):
+        stacks = Counter({'a;b;c': 3, 'a;b': 1, 'a;d': 2})
+        self.assertEqual(parse_collapsed(format_collapsed(stacks)), stacks)
+        self.assertEqual(hot_frames(stacks), [('c', 3, 3), ('d', 2, 2), ('b', 1, 4)])
+
+
+class ProfilingMiddlewareTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('staff', password='staffpass123', is_staff=True)
+        cls.member = User.objects.create_user('member', password='memberpass123')
+        Post.objects.create(author=cls.member, title='Alamat', content='...')
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        settings = override_settings(PROFILING_DIR=self.dir, PROFILING_SECRET='s3cret', PROFILING_KEEP=2)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        return client
+
+    def test_staff_cprofile(self):
+        response = self.client_for(self.staff).get('/api/v1/posts/', HTTP_X_PROFILE='cprofile')
+        profile_id = response['X-Profile-Id']
+        meta = json.loads((self.dir / profile_id / 'meta.json').read_text())
+        self.assertEqual((meta['view'], meta['status']), ('post-list', 200))
+        self.assertTrue(meta['queries'])
+        self.assertTrue((self.dir / profile_id / 'profile.pstats').is_file())
+
+        out = StringIO()
+        call_command('profiles', profile_id, stdout=out)
+        self.assertIn('SQL:', out.getvalue())
+        self.assertIn('function calls', out.getvalue())
+
+    def test_only_staff_or_secret(self):
+        response = self.client_for(self.member).get('/api/v1/posts/', HTTP_X_PROFILE='cprofile')
+        self.assertNotIn('X-Profile-Id', response)
+        response = APIClient().get('/api/v1/posts/', HTTP_X_PROFILE='sample', HTTP_X_PROFILE_TOKEN='wrong')
+        self.assertNotIn('X-Profile-Id', response)
+
+        response = APIClient().get('/api/v1/posts/', HTTP_X_PROFILE='sample', HTTP_X_PROFILE_TOKEN='s3cret')
+        self.assertTrue((self.dir / response['X-Profile-Id'] / 'stacks.collapsed').is_file())
+
+    def test_old_profiles_are_pruned(self):
+        client = self.client_for(self.staff)
+        ids = [client.get('/api/v1/posts/', HTTP_X_PROFILE='cprofile')['X-Profile-Id'] for _ in range(3)]
+        self.assertEqual(sorted(p.name for p in self.dir.iterdir()), sorted(ids)[1:])
+
+    @override_settings(PROFILING_SAMPLE_RATE=2, PROFILING_SAMPLE_INTERVAL_MS=0.1)
+    def test_sampling_one_in_n(self):
+        client = APIClient()
+        for _ in range(4):
+            client.get('/api/v1/posts/')
+        files = list((self.dir / 'sampled').glob('post-list.*.collapsed'))
+        self.assertEqual(len(files), 1)
+        self.assertEqual(set(sampled_stacks('post-list')), {'post-list'})
+        out = StringIO()
+        call_command('profiles', hot=True, stdout=out)
+        self.assertIn('post-list', out.getvalue())
@@ -0,0 +1,69 @@
+import os
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from community.query_plans import PLAN_CASES, PlanIssue, format_report, plan_issues, run_cases
+
+# Write the plan report here (e.g. QUERY_PLAN_REPORT=plans.txt)
+QUERY_PLAN_REPORT = os.environ.get('QUERY_PLAN_REPORT')
+
+
+class PlanParsingTest(SimpleTestCase):
+    def test_sqlite(self):
+        plan = [
+            'SCAN community_post',
+            'SEARCH community_vote USING INDEX sqlite_autoindex_community_vote_1 (user_id=? AND post_id=?)',
+            'SCAN community_comment USING INDEX comment_thread_idx',
+            'USE TEMP B-TREE FOR ORDER BY',
+        ]
+        self.assertEqual(plan_issues('sqlite', plan), [
+            PlanIssue('community_post', 'full scan', 'SCAN community_post'),
+            PlanIssue('community_post', 'sort', 'USE TEMP B-TREE FOR ORDER BY'),
+        ])
+
+    def test_mysql(self):
+        plan = [
+            {'table': 'community_post', 'type': 'ALL', 'rows': 5000, 'Extra': 'Using where; Using filesort'},
+            {'table': 'community_vote', 'type': 'eq_ref', 'rows': 1, 'Extra': None},
+        ]
+        self.assertEqual([(i.table, i.kind) for i in plan_issues('mysql', plan)],
+                         [('community_post', 'full scan'), ('community_post', 'sort')])
+
+    def test_postgresql(self):
+        plan = ['Sort  (cost=1.1..1.2 rows=5)', '  ->  Seq Scan on community_post  (cost=0..1 rows=5)']
+        self.assertEqual([(i.table, i.kind) for i in plan_issues('postgresql', plan)],
+                         [('community_post', 'full scan'), ('community_post', 'sort')])
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class QueryPlanRegressionTest(TestCase):
+    """Every hot read query uses an index unless its case says why it cannot."""
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('seed_benchmark_data', users=10, posts=20, comments=80, votes=60, comment_votes=60,
+                     saves=20, notifications=80, batch_size=500, stdout=open(os.devnull, 'w'))
+        call_command('compact_activity', backfill_days=365, stdout=open(os.devnull, 'w'))
+
+    def test_hot_queries_use_indexes(self):
+        results = run_cases()
+        report = format_report(results, connection.vendor)
+        if QUERY_PLAN_REPORT:
+            with open(QUERY_PLAN_REPORT, 'w') as fh:
+                fh.write(report)
+        self.assertEqual(len(results), len(PLAN_CASES))
+        for result in results:
+            with self.subTest(case=result.case.label):
+                self.assertLess(result.status, 400, result.path)
+                self.assertFalse(result.unexpected, f'{result.case.label}: {result.unexpected}')
+
+    def test_command_reports_plans(self):
+        stdout = StringIO()
+        call_command('explain_queries', case='notification', stdout=stdout)
+        self.assertIn('[ok] notification-list', stdout.getvalue())
+        self.assertIn('every hot query uses an index', stdout.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('explain_queries', case='no-such-case', stdout=stdout)
@@ -0,0 +1,98 @@
+import importlib.util
+import os
+from io import StringIO
+from unittest import skipUnless
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from community import related, tombstones
+from community.models import Post, RelatedPost, RelatedPostsBuild
+
+HAS_NUMPY = all(importlib.util.find_spec(name) for name in ('numpy', 'scipy'))
+
+STORIES = [
+    ('Alamat ng pinya', 'Si Pina ay tamad na bata; ang alamat ng pinya at ang mga mata nito'),
+    ('Alamat ng pinya, muling isinalaysay', 'Ang tamad na si Pina at ang pinya na puno ng mata'),
+    ('Ang pagong at ang matsing', 'Naghati ang pagong at ang matsing sa puno ng saging'),
+    ('Si pagong at si matsing', 'Ang matsing ay umakyat sa saging; ang pagong ay naghintay sa ilalim'),
+    ('Recipe: adobong manok', 'Suka, toyo, bawang at paminta; pakuluan ang manok'),
+]
+
+
+def titles(post):
+    return [Post.objects.get(pk=pk).title for pk in
+            RelatedPost.objects.filter(post=post).order_by('rank').values_list('related_id', flat=True)]
+
+
+@override_settings(THROTTLE_POLICIES={}, RELATED_POSTS_K=2, RELATED_POSTS_MIN_SCORE=0.3,
+                   RELATED_POSTS_FEATURES=2 ** 12, RELATED_POSTS_BATCH_CELLS=4)
+class RelatedPostsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user('alice', password='x')
+        cls.posts = [Post.objects.create(author=cls.alice, title=title, content=content) for title, content in STORIES]
+
+    def test_endpoint_serves_the_stored_list(self):
+        pina, retold, pagong = self.posts[:3]
+        RelatedPost.objects.create(post=pina, related=retold, rank=0, score=0.8)
+        RelatedPost.objects.create(post=pina, related=pagong, rank=1, score=0.2)
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/v1/posts/{pina.id}/related/')
+        self.assertEqual([(row['id'], row['title'], row['author_username'], row['score']) for row in response.json()],
+                         [(retold.id, retold.title, 'alice', 0.8), (pagong.id, pagong.title, 'alice', 0.2)])
+        self.assertEqual(len(self.client.get(f'/api/v1/posts/{pina.id}/related/?limit=1').json()), 1)
+
+        # Deleted posts drop out of lists and lose their own
+        tombstones.tombstone(retold)
+        self.assertEqual([row['id'] for row in self.client.get(f'/api/v1/posts/{pina.id}/related/').json()],
+                         [pagong.id])
+        self.assertEqual(self.client.get(f'/api/v1/posts/{retold.id}/related/').status_code, 404)
+        self.assertEqual(self.client.get(f'/api/v1/posts/{pagong.id}/related/').json(), [])
+        self.assertEqual(self.client.get('/api/v1/posts/999999/related/').status_code, 404)
+        self.assertEqual(self.client.get(f'/api/v1/posts/{pina.id}/related/?limit=x').status_code, 400)
+
+        tombstones.purge_deleted()
+        self.assertEqual(RelatedPost.objects.count(), 1)
+
+    @skipUnless(HAS_NUMPY, 'numpy and scipy are not installed')
+    def test_full_and_incremental_builds(self):
+        pina, retold, pagong, matsing, adobo = self.posts
+        stdout = StringIO()
+        call_command('build_related_posts', stdout=stdout)
+        self.assertIn('Full build: 5 related lists written for 5 posts', stdout.getvalue())
+        self.assertEqual(titles(pina), [retold.title])
+        self.assertEqual(titles(pagong), [matsing.title])
+        self.assertEqual(titles(adobo), [])
+        first_score = RelatedPost.objects.get(post=pina).score
+        self.assertGreater(first_score, 0.3)
+        self.assertAlmostEqual(RelatedPost.objects.get(post=retold).score, first_score, places=5)
+
+        # A new post gets its list and joins its matches' lists; nothing else is recomputed
+        third = Post.objects.create(author=self.alice, title='Ang alamat ng pinya',
+                                    content='Tamad si Pina, kaya naging pinya siyang puno ng mata')
+        call_command('build_related_posts', incremental=True, stdout=stdout)
+        build = RelatedPostsBuild.objects.order_by('-started_at').first()
+        self.assertEqual((build.full, build.posts, build.last_post_id), (False, 6, third.id))
+        self.assertEqual(set(titles(third)), {pina.title, retold.title})
+        self.assertIn(third.title, titles(pina))
+        self.assertEqual(titles(pagong), [matsing.title])
+
+        # Nothing new: nothing written
+        self.assertEqual(related.build(full=False).build.updated, 0)
+
+    def test_clearing_benchmark_data_removes_their_lists(self):
+        call_command('seed_benchmark_data', users=3, posts=4, comments=0, votes=0, comment_votes=0, saves=0,
+                     notifications=0, stdout=open(os.devnull, 'w'))
+        bench = list(Post.objects.filter(author__username__startswith='bench_'))
+        pina = self.posts[0]
+        RelatedPost.objects.create(post=bench[0], related=bench[1], rank=0, score=0.9)
+        RelatedPost.objects.create(post=bench[1], related=pina, rank=0, score=0.5)
+        RelatedPost.objects.create(post=pina, related=bench[0], rank=0, score=0.5)
+        RelatedPost.objects.create(post=pina, related=self.posts[1], rank=1, score=0.4)
+
+        call_command('seed_benchmark_data', clear=True, stdout=open(os.devnull, 'w'))
+        connection.check_constraints()  # The deletes are raw; foreign keys are only checked at commit
+        self.assertEqual(list(RelatedPost.objects.values_list('post_id', 'related_id')), [(pina.id, self.posts[1].id)])
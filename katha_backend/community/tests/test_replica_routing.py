@@ -0,0 +1,79 @@
+"""
+Tests for ReplicaRouter. They need at least one replica alias, e.g.:
+
+    DB_ENGINE=sqlite DB_REPLICAS=db_replica.sqlite3 python manage.py test community
+
+TransactionTestCase is used because reads inside an open transaction always go
+to the primary, and the mirrored replica connection must see committed rows.
+"""
+
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import RequestFactory, TransactionTestCase
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from community import routers
+from community.models import Post
+
+
+@skipUnless(settings.REPLICA_DATABASES, 'no read replica configured (set DB_REPLICAS)')
+class ReplicaRouterTest(TransactionTestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        routers.health.reset()
+        self.router = routers.ReplicaRouter()
+        self.factory = RequestFactory()
+        self.user = User.objects.create_user('mambabasa', password='x')
+
+    def route_read(self, method='get', user=None):
+        request = getattr(self.factory, method)('/api/v1/posts/')
+        if user is not None:
+            request.user = user
+        with routers.request_routing(request):
+            return self.router.db_for_read(Post)
+
+    def test_safe_request_reads_from_replica(self):
+        self.assertIn(self.route_read(), settings.REPLICA_DATABASES)
+
+    def test_unsafe_request_reads_from_primary(self):
+        self.assertEqual(self.route_read('post'), 'default')
+
+    def test_reads_outside_requests_use_primary(self):
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_other_apps_are_not_routed(self):
+        request = self.factory.get('/api/v1/user/me/')
+        with routers.request_routing(request):
+            self.assertEqual(self.router.db_for_read(User), 'default')
+
+    def test_writer_is_pinned_to_primary(self):
+        post = Post.objects.create(title='Unang katha', content='...', author=self.user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        response = client.post(f'/api/v1/posts/{post.id}/vote/', {'value': 1}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        self.assertTrue(routers.is_pinned(self.user.pk))
+        self.assertEqual(self.route_read(user=self.user), 'default')
+        other = User.objects.create_user('iba', password='x')
+        self.assertIn(self.route_read(user=other), settings.REPLICA_DATABASES)
+
+    def test_unhealthy_replica_falls_back_to_primary(self):
+        with mock.patch.object(routers.health, 'replication_lag', side_effect=OSError('down')):
+            self.assertEqual(self.route_read(), 'default')
+
+    def test_lagging_replica_falls_back_to_primary(self):
+        with mock.patch.object(routers.health, 'replication_lag', return_value=settings.REPLICA_MAX_LAG_SECONDS + 1):
+            self.assertEqual(self.route_read(), 'default')
+
+    def test_feed_is_served_from_replica(self):
+        Post.objects.create(title='Katha', content='...', author=self.user)
+        response = APIClient().get('/api/v1/posts/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 1)
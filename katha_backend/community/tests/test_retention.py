@@ -0,0 +1,78 @@
+import os
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from community.models import ArchivedNotification, Notification, Post
+from community.retention import ChunkSizer, archive_read_notifications, mark_all_read
+
+
+class RetentionTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reader', password='readerpass123')
+        cls.actor = User.objects.create_user('actor', password='actorpass123')
+        cls.post = Post.objects.create(title='Old news', content='...', author=cls.user)
+        old = timezone.now() - timedelta(days=120)
+        Notification.objects.bulk_create(
+            Notification(user=cls.user, actor=cls.actor, post=cls.post, notification_type='comment', read=i % 3 != 0)
+            for i in range(30)
+        )
+        # Two thirds of the first 24 are read and old enough to expire
+        ids = list(Notification.objects.order_by('id').values_list('id', flat=True)[:24])
+        Notification.objects.filter(id__in=ids).update(created_at=old)
+        cls.expired = set(Notification.objects.filter(id__in=ids, read=True).values_list('id', flat=True))
+
+    def test_archives_expired_rows_in_chunks(self):
+        cutoff = timezone.now() - timedelta(days=90)
+        result = archive_read_notifications(cutoff, batch_size=5, target_seconds=60)
+        self.assertEqual(result.rows, len(self.expired))
+        self.assertGreater(result.chunks, 1)
+        self.assertEqual(set(ArchivedNotification.objects.values_list('id', flat=True)), self.expired)
+        self.assertFalse(Notification.objects.filter(id__in=self.expired).exists())
+        self.assertEqual(Notification.objects.count(), 30 - len(self.expired))
+
+    def test_delete_mode_skips_the_archive(self):
+        out = StringIO()
+        call_command('prune_notifications', days=90, delete=True, pause=0, stdout=out)
+        self.assertIn(f'Deleted {len(self.expired)} notifications', out.getvalue())
+        self.assertFalse(ArchivedNotification.objects.exists())
+
+    def test_dry_run_changes_nothing(self):
+        out = StringIO()
+        call_command('prune_notifications', dry_run=True, stdout=out)
+        self.assertIn(f'Would archive {len(self.expired)}', out.getvalue())
+        self.assertEqual(Notification.objects.count(), 30)
+
+    def test_mark_all_read_in_batches(self):
+        unread = Notification.objects.filter(user=self.user, read=False).count()
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(mark_all_read(self.user, batch_size=4), unread)
+        # A select and an update per batch, plus the final empty select when batches divide evenly
+        self.assertLessEqual(len(ctx), 2 * (unread // 4 + 1))
+        self.assertFalse(Notification.objects.filter(user=self.user, read=False).exists())
+
+    def test_archived_endpoint_pages_by_id(self):
+        archive_read_notifications(timezone.now() - timedelta(days=90))
+        client = APIClient()
+        client.force_authenticate(self.user)
+        first = client.get('/api/v1/notifications/archived/?limit=3').json()
+        self.assertEqual(len(first), 3)
+        rest = client.get(f'/api/v1/notifications/archived/?before={first[-1]["id"]}&limit=200').json()
+        ids = [item['id'] for item in first + rest]
+        self.assertEqual(ids, sorted(self.expired, reverse=True))
+        self.assertEqual(first[0]['actor_username'], 'actor')
+
+    def test_chunk_sizer_tracks_target(self):
+        sizer = ChunkSizer(1000, target_seconds=0.5)
+        sizer.record(2.0)
+        self.assertEqual(sizer.size, 500)
+        sizer.record(0.1)
+        self.assertEqual(sizer.size, 1000)
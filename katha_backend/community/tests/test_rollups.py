@@ -0,0 +1,116 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from community import rollups
+from community.models import Comment, Post, PostActivity, Vote
+
+NOW = datetime(2026, 3, 10, 14, 25, tzinfo=dt_timezone.utc)
+
+
+def counts(row):
+    return {name: getattr(row, name) for name in rollups.COUNTERS}
+
+
+@override_settings(THROTTLE_POLICIES={})
+class RollupWritePathTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.member = User.objects.create_user('member', password='memberpass123')
+        cls.post = Post.objects.create(author=cls.member, title='Alamat', content='...')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.member)
+
+    def test_votes_comments_and_saves_are_counted(self):
+        vote_url = f'/api/v1/posts/{self.post.id}/vote/'
+        self.client.post(vote_url, {'value': 1}, format='json')
+        self.client.post(vote_url, {'value': -1}, format='json')
+        self.client.post('/api/v1/comments/', {'post': self.post.id, 'text': 'Ganda'}, format='json')
+        self.client.post(f'/api/v1/posts/{self.post.id}/save/')
+
+        row = PostActivity.objects.get(post=self.post)
+        self.assertEqual(row.period, 'hour')
+        self.assertEqual(row.bucket, rollups.hour_bucket(row.bucket))
+        # Switching the vote moved it from up to down within the hour
+        self.assertEqual(counts(row), {'upvotes': 0, 'downvotes': 1, 'comments': 1, 'saves': 1})
+
+        self.client.post(vote_url, {'value': 0}, format='json')
+        self.client.post(f'/api/v1/posts/{self.post.id}/save/')
+        row.refresh_from_db()
+        self.assertEqual(counts(row), {'upvotes': 0, 'downvotes': 0, 'comments': 1, 'saves': 0})
+
+
+class RollupTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.member = User.objects.create_user('member', password='memberpass123')
+        cls.post = Post.objects.create(author=cls.member, title='Alamat', content='...')
+        cls.other = Post.objects.create(author=cls.member, title='Kuwento', content='...')
+
+    def test_compact_folds_old_hours_into_days(self):
+        old_day = NOW - timedelta(days=10)
+        for hour in (1, 5, 23):
+            rollups.record(self.post.id, when=old_day.replace(hour=hour), upvotes=2, comments=1)
+        rollups.record(self.other.id, when=old_day, saves=1)
+        rollups.record(self.post.id, when=NOW, upvotes=1)
+
+        result = rollups.compact(older_than=NOW - timedelta(days=7), batch_size=2)
+        self.assertEqual(result.rows, 4)
+        day = PostActivity.objects.get(post=self.post, period='day')
+        self.assertEqual(day.bucket, rollups.day_bucket(old_day))
+        self.assertEqual(counts(day), {'upvotes': 6, 'downvotes': 0, 'comments': 3, 'saves': 0})
+        self.assertEqual(PostActivity.objects.filter(period='hour').count(), 1)
+
+    def test_series_combine_days_and_hours(self):
+        rollups.record(self.post.id, when=NOW - timedelta(days=9), upvotes=4)
+        rollups.compact(older_than=NOW - timedelta(days=7))
+        rollups.record(self.post.id, when=NOW - timedelta(days=9, hours=-1), upvotes=1)
+        rollups.record(self.other.id, when=NOW - timedelta(hours=2), comments=3)
+        params = {'period': 'day', 'since': (NOW - timedelta(days=12)).isoformat(), 'until': NOW.isoformat()}
+
+        with CaptureQueriesContext(connection) as ctx:
+            body = rollups.activity(PostActivity.objects.all(), params)
+        self.assertEqual(len(ctx), 1)
+        self.assertEqual([point['bucket'] for point in body['series']],
+                         [rollups.day_bucket(NOW - timedelta(days=9)), rollups.day_bucket(NOW)])
+        self.assertEqual(body['totals'], {'upvotes': 5, 'downvotes': 0, 'comments': 3, 'saves': 0})
+
+    def test_backfill_rebuilds_from_source_tables(self):
+        Vote.objects.create(user=self.member, post=self.post, value=1)
+        Comment.objects.create(post=self.post, author=self.member, text='Una')
+        PostActivity.objects.create(post=self.post, period='hour', bucket=rollups.hour_bucket(NOW), upvotes=99)
+        with mock.patch('django.utils.timezone.now', return_value=NOW + timedelta(hours=1)):
+            call_command('compact_activity', backfill_days=1, stdout=StringIO())
+        row = PostActivity.objects.get(post=self.post)
+        self.assertEqual((row.upvotes, row.comments), (1, 1))
+
+
+class ActivityApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.member = User.objects.create_user('member', password='memberpass123')
+        cls.post = Post.objects.create(author=cls.member, title='Alamat', content='...')
+
+    def test_post_activity_and_site_stats(self):
+        rollups.record(self.post.id, upvotes=2)
+        response = APIClient().get(f'/api/v1/posts/{self.post.id}/activity/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['totals']['upvotes'], 2)
+        self.assertEqual(len(response.json()['series']), 1)
+        response = APIClient().get('/api/v1/stats/activity/?period=day')
+        self.assertEqual(response.json()['totals']['upvotes'], 2)
+
+    def test_bad_window(self):
+        client = APIClient()
+        self.assertEqual(client.get('/api/v1/stats/activity/?period=week').status_code, 400)
+        self.assertEqual(client.get('/api/v1/stats/activity/?since=yesterday').status_code, 400)
+        self.assertEqual(client.get('/api/v1/stats/activity/?since=2020-01-01').status_code, 400)
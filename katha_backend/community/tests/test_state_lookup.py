@@ -0,0 +1,55 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from community.models import Comment, CommentVote, Post, SavedPost, Vote
+
+
+class StateLookupTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.member = User.objects.create_user('member', password='memberpass123')
+        cls.other = User.objects.create_user('other', password='otherpass123')
+        cls.posts = [Post.objects.create(author=cls.other, title=f'Kuwento {i}', content='...') for i in range(3)]
+        cls.comment = Comment.objects.create(post=cls.posts[0], author=cls.other, text='Salamat')
+        Vote.objects.create(user=cls.member, post=cls.posts[0], value=1)
+        Vote.objects.create(user=cls.other, post=cls.posts[1], value=1)
+        SavedPost.objects.create(user=cls.member, post=cls.posts[1])
+        CommentVote.objects.create(user=cls.member, comment=cls.comment, value=-1)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.member)
+
+    def test_post_state(self):
+        ids = ','.join(str(post.id) for post in self.posts)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(f'/api/v1/posts/state/?ids={ids},999999')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(ctx), 2)
+        self.assertEqual(response['Cache-Control'], 'private, no-store')
+        first, second, third = self.posts
+        self.assertEqual(response.json(), {
+            str(first.id): {'user_vote': 1, 'is_saved': False},
+            str(second.id): {'user_vote': 0, 'is_saved': True},
+            str(third.id): {'user_vote': 0, 'is_saved': False},
+            '999999': {'user_vote': 0, 'is_saved': False},
+        })
+
+    def test_comment_state(self):
+        response = self.client.get(f'/api/v1/comments/state/?ids={self.comment.id}&ids=999999')
+        self.assertEqual(response.json(), {str(self.comment.id): {'user_vote': -1}, '999999': {'user_vote': 0}})
+
+    def test_anonymous_gets_defaults_without_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = APIClient().get(f'/api/v1/posts/state/?ids={self.posts[0].id}')
+        self.assertEqual(len(ctx), 0)
+        self.assertEqual(response.json(), {str(self.posts[0].id): {'user_vote': 0, 'is_saved': False}})
+
+    def test_invalid_ids(self):
+        self.assertEqual(self.client.get('/api/v1/posts/state/').status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/posts/state/?ids=1,abc').status_code, 400)
+        with self.settings(STATE_LOOKUP_MAX_IDS=2):
+            self.assertEqual(self.client.get('/api/v1/comments/state/?ids=1,2,3').status_code, 400)
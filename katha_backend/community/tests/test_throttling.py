@@ -0,0 +1,96 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient, APIRequestFactory
+
+from community.models import Post
+from community.throttling import (
+    THROTTLE_REJECTED, CacheBucketStore, LocalBucketStore, TokenBucketThrottle, reset_store,
+)
+
+
+class BucketStoreTest(SimpleTestCase):
+    def check_store(self, store, clock):
+        with mock.patch(clock) as now:
+            now.return_value = 1000.0
+            # A full bucket allows a burst of 3, then refills at 1 token/second
+            self.assertEqual([store.take('k', 1.0, 3) for _ in range(4)], [0, 0, 0, 1.0])
+            now.return_value = 1000.5
+            self.assertAlmostEqual(store.take('k', 1.0, 3), 0.5)
+            now.return_value = 1001.0
+            self.assertEqual(store.take('k', 1.0, 3), 0)
+            self.assertEqual(store.take('other', 1.0, 3), 0)
+
+    def test_local_store(self):
+        self.check_store(LocalBucketStore(shards=4), 'community.throttling.time.monotonic')
+
+    def test_cache_store(self):
+        store = CacheBucketStore()
+        store.clear()
+        self.check_store(store, 'community.throttling.time.time')
+
+    def test_cache_store_clear_keeps_other_keys(self):
+        store = CacheBucketStore()
+        store.cache.set('feed:unrelated', 'kept')
+        self.addCleanup(store.cache.delete, 'feed:unrelated')
+        store.clear()
+        with mock.patch('community.throttling.time.time', return_value=1000.0):
+            self.assertEqual([store.take('k', 1.0, 1) for _ in range(2)], [0, 1.0])
+            store.clear()
+            self.assertEqual(store.take('k', 1.0, 1), 0)
+        self.assertEqual(store.cache.get('feed:unrelated'), 'kept')
+
+    def test_local_store_evicts_least_recently_used(self):
+        store = LocalBucketStore(shards=1, max_keys=2)
+        store.take('a', 1.0, 1)
+        store.take('b', 1.0, 1)
+        store.take('c', 1.0, 1)
+        self.assertEqual(store.take('a', 1.0, 1), 0)
+        self.assertGreater(store.take('c', 1.0, 1), 0)
+
+
+@override_settings(THROTTLE_POLICIES={
+    'post-vote': {'user': '60/min', 'burst': 2},
+    'feedback': {'anon': '1/hour', 'burst': 1},
+})
+class ThrottledEndpointTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('voter', password='voterpass123')
+        cls.post = Post.objects.create(title='Throttled', content='...', author=cls.user)
+
+    def setUp(self):
+        reset_store()
+        self.addCleanup(reset_store)
+        self.client = APIClient()
+
+    def test_vote_is_rejected_past_the_burst(self):
+        self.client.force_authenticate(self.user)
+        url = f'/api/v1/posts/{self.post.pk}/vote/'
+        rejected = THROTTLE_REJECTED.value(scope='post-vote', kind='user')
+        statuses = [self.client.post(url, {'value': 1}, format='json').status_code for _ in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
+        self.assertEqual(THROTTLE_REJECTED.value(scope='post-vote', kind='user'), rejected + 1)
+
+    def test_anonymous_feedback_is_limited_per_ip(self):
+        data = {'type': 'bug', 'message': 'Broken'}
+        self.assertEqual(self.client.post('/api/v1/feedback/', data, REMOTE_ADDR='10.0.0.1').status_code, 201)
+        response = self.client.post('/api/v1/feedback/', data, REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(self.client.post('/api/v1/feedback/', data, REMOTE_ADDR='10.0.0.2').status_code, 201)
+
+    def test_reads_are_not_throttled(self):
+        for _ in range(5):
+            self.assertEqual(self.client.get(f'/api/v1/posts/{self.post.pk}/').status_code, 200)
+
+    def test_check_runs_no_queries(self):
+        request = APIRequestFactory().post('/')
+        request.user = self.user
+        throttle = TokenBucketThrottle('post-vote')
+        with CaptureQueriesContext(connection) as ctx:
+            throttle.allow_request(request, None)
+        self.assertEqual(len(ctx), 0)
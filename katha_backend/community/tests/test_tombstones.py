@@ -0,0 +1,95 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from community.models import (
+    ArchivedNotification, Comment, CommentVote, Notification, Post, SavedPost, Vote,
+)
+from community.tombstones import purge_deleted
+
+
+class TombstoneTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('author', password='authorpass123')
+        cls.reader = User.objects.create_user('reader', password='readerpass123')
+        cls.post = Post.objects.create(title='Viral', content='...', author=cls.author)
+        cls.other = Post.objects.create(title='Quiet', content='...', author=cls.author)
+        # A reply chain: root <- a <- b <- c, plus a sibling thread
+        cls.chain = [Comment.objects.create(post=cls.post, author=cls.reader, text='root')]
+        for text in 'abc':
+            cls.chain.append(Comment.objects.create(post=cls.post, author=cls.reader, text=text, parent=cls.chain[-1]))
+        cls.sibling = Comment.objects.create(post=cls.post, author=cls.reader, text='sibling')
+        # A reply whose id is lower than its parent's (e.g. imported data)
+        early = Comment.objects.create(post=cls.post, author=cls.reader, text='early')
+        late = Comment.objects.create(post=cls.post, author=cls.reader, text='late', parent=cls.sibling)
+        Comment.objects.filter(pk=early.pk).update(parent=late)
+        for comment in Comment.objects.all():
+            CommentVote.objects.create(user=cls.author, comment=comment, value=1)
+            Notification.objects.create(user=cls.author, actor=cls.reader, post=cls.post, comment=comment,
+                                        notification_type='comment')
+        ArchivedNotification.objects.create(id=10_000, user=cls.author, actor=cls.reader, post=cls.post,
+                                            comment=cls.chain[1], notification_type='reply',
+                                            created_at=cls.post.created_at)
+        Vote.objects.create(user=cls.reader, post=cls.post, value=1)
+        SavedPost.objects.create(user=cls.reader, post=cls.post)
+        Comment.objects.create(post=cls.other, author=cls.reader, text='unrelated')
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_deleted_post_is_hidden_then_purged(self):
+        self.client.force_authenticate(self.author)
+        unread = len(self.client.get('/api/v1/notifications/').json())
+        self.assertEqual(self.client.get('/api/v1/notifications/unread_count/').json(), {'count': unread})
+        self.assertEqual(self.client.delete(f'/api/v1/posts/{self.post.pk}/').status_code, 204)
+        self.assertTrue(Post.objects.filter(pk=self.post.pk).exists())
+        self.assertEqual(self.client.get(f'/api/v1/posts/{self.post.pk}/').status_code, 404)
+        self.assertEqual([p['id'] for p in self.client.get('/api/v1/posts/').json()], [self.other.pk])
+        self.assertEqual(self.client.get('/api/v1/notifications/').json(), [])
+        self.assertEqual(self.client.get('/api/v1/notifications/unread_count/').json(), {'count': 0})
+
+        result = purge_deleted(chunk_size=2)
+        self.assertEqual(result.posts, 1)
+        self.assertFalse(Post.objects.filter(pk=self.post.pk).exists())
+        self.assertEqual(Comment.objects.get().text, 'unrelated')
+        for model in (CommentVote, Notification, ArchivedNotification, Vote, SavedPost):
+            self.assertFalse(model.objects.exists(), model.__name__)
+
+    def test_deleted_comment_hides_its_replies(self):
+        self.client.force_authenticate(self.reader)
+        root = self.chain[0]
+        self.assertEqual(self.client.delete(f'/api/v1/comments/{root.pk}/').status_code, 204)
+        listed = {c['id'] for c in self.client.get('/api/v1/comments/').json()}
+        self.assertNotIn(root.pk, listed)
+        self.assertNotIn(self.chain[1].pk, listed)
+        # Replies to replies are hidden too, however deep
+        self.assertFalse(listed & {c.pk for c in self.chain[2:]})
+        self.assertIn(self.sibling.pk, listed)
+        self.assertEqual(self.client.get(f'/api/v1/comments/{self.chain[3].pk}/').status_code, 404)
+        response = self.client.post('/api/v1/comments/', {'post': self.post.pk, 'parent': self.chain[2].pk,
+                                                          'text': 'late'})
+        self.assertEqual(response.status_code, 400)
+        detail = self.client.get(f'/api/v1/posts/{self.post.pk}/').json()
+        self.assertNotIn(root.pk, [c['id'] for c in detail['comments']])
+        response = self.client.post('/api/v1/comments/', {'post': self.post.pk, 'parent': root.pk, 'text': 'late'})
+        self.assertEqual(response.status_code, 400)
+
+        result = purge_deleted(chunk_size=2)
+        self.assertEqual(result.comments, 1)
+        self.assertFalse(Comment.objects.filter(pk__in=[c.pk for c in self.chain]).exists())
+        self.assertFalse(ArchivedNotification.objects.exists())
+        self.assertTrue(Comment.objects.filter(pk=self.sibling.pk).exists())
+        self.assertTrue(Post.objects.filter(pk=self.post.pk, deleted_at__isnull=True).exists())
+
+    def test_cannot_comment_on_deleted_post(self):
+        Post.objects.filter(pk=self.post.pk).update(deleted_at=self.post.created_at)
+        self.client.force_authenticate(self.reader)
+        response = self.client.post('/api/v1/comments/', {'post': self.post.pk, 'text': 'hello?'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_grace_period_delays_purge(self):
+        self.client.force_authenticate(self.author)
+        self.client.delete(f'/api/v1/posts/{self.post.pk}/')
+        self.assertEqual(purge_deleted(grace_seconds=3600).posts, 0)
+        self.assertTrue(Post.objects.filter(pk=self.post.pk).exists())
@@ -0,0 +1,76 @@
+from io import StringIO
+from unittest import skipUnless
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Sum
+from django.test import TestCase
+
+from community import vote_storage
+from community.models import Comment, CommentVote, Post, Vote
+
+
+class VoteStorageTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user('alice', password='x')
+        cls.bob = User.objects.create_user('bob', password='x')
+        cls.post = Post.objects.create(author=cls.alice, title='Alamat', content='Noong unang panahon')
+        cls.comment = Comment.objects.create(post=cls.post, author=cls.bob, text='Ganda')
+        Vote.objects.create(user=cls.bob, post=cls.post, value=1)
+        CommentVote.objects.create(user=cls.alice, comment=cls.comment, value=-1)
+
+    def indexes(self, model):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, model._meta.db_table)
+        return {tuple(c['columns']): (name, c['unique']) for name, c in constraints.items()
+                if c['index'] or c['unique'] and not c['primary_key']}
+
+    def test_natural_key_and_covering_indexes(self):
+        self.assertEqual(self.indexes(Vote), {
+            ('user_id', 'post_id'): ('vote_user_post_uniq', True),
+            ('user_id', 'post_id', 'value'): ('vote_viewer_idx', False),
+            ('post_id', 'value'): ('vote_post_value_idx', False),
+        })
+        self.assertEqual(self.indexes(CommentVote), {
+            ('user_id', 'comment_id'): ('comment_vote_user_comment_uniq', True),
+            ('user_id', 'comment_id', 'value'): ('comment_vote_viewer_idx', False),
+            ('comment_id', 'value'): ('comment_vote_comment_value_idx', False),
+        })
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Vote.objects.create(user=self.bob, post=self.post, value=-1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            CommentVote.objects.create(user=self.alice, comment=self.comment, value=1)
+
+    @skipUnless(connection.vendor == 'sqlite', 'plan text is SQLite\'s')
+    def test_lookups_read_only_indexes(self):
+        viewer = Vote.objects.filter(user=self.bob, post_id__in=[self.post.id, 0]).values_list('post_id', 'value')
+        self.assertIn('USING COVERING INDEX vote_viewer_idx', viewer.order_by().explain())
+        self.assertIn('USING COVERING INDEX vote_post_value_idx',
+                      Vote.objects.filter(post=self.post).order_by().values('post').annotate(s=Sum('value')).explain())
+        viewer = CommentVote.objects.filter(user=self.alice, comment_id__in=[self.comment.id, 0]).values_list(
+            'comment_id', 'value')
+        self.assertIn('USING COVERING INDEX comment_vote_viewer_idx', viewer.order_by().explain())
+
+    def test_cluster_statements(self):
+        self.assertEqual(
+            vote_storage.cluster_sql(*vote_storage.VOTE_TABLES['vote']),
+            'ALTER TABLE `community_vote` DROP PRIMARY KEY, ADD PRIMARY KEY (`user_id`, `post_id`),'
+            ' ADD UNIQUE INDEX `community_vote_id_uniq` (`id`), DROP INDEX `vote_user_post_uniq`,'
+            ' DROP INDEX `vote_viewer_idx`, ALGORITHM=INPLACE, LOCK=NONE')
+        self.assertIn('ADD UNIQUE INDEX `comment_vote_user_comment_uniq` (`user_id`, `comment_id`)',
+                      vote_storage.uncluster_sql(*vote_storage.VOTE_TABLES['comment_vote']))
+
+    def test_report(self):
+        latency = vote_storage.lookup_latency(Vote, 'post', samples=5)
+        self.assertEqual(set(latency), {'viewer', 'target'})
+
+        stdout = StringIO()
+        call_command('compact_votes', samples=5, stdout=stdout)
+        output = stdout.getvalue()
+        self.assertIn('vote (community_vote), 1 rows', output)
+        self.assertIn('comment_vote (community_commentvote), 1 rows', output)
+        self.assertIn('viewer votes on 25 posts', output)
+        with self.assertRaises(CommandError):
+            call_command('compact_votes', apply=True, stdout=stdout)
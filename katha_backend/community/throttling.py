@@ -0,0 +1,167 @@
+"""
+Token-bucket throttling for write endpoints.
+
+Each (scope, user-or-IP) pair owns a bucket that holds up to ``burst`` tokens and
+refills at the policy's rate; a request spends one token or is rejected with 429
+and a Retry-After header. Policies live in ``settings.THROTTLE_POLICIES``:
+
+    THROTTLE_POLICIES = {
+        'post-vote': {'user': '60/min', 'burst': 20},
+        'feedback': {'user': '10/hour', 'anon': '5/hour', 'burst': 3},
+    }
+
+A scope without a rate for the caller's kind ('user' or 'anon') is not throttled.
+Bucket state never touches the database. It lives in one of two stores, chosen by
+``THROTTLE_STORE``:
+
+  local  sharded in-process dicts; exact, but per worker process (single node)
+  cache  a Django cache (e.g. Redis/Memcached) shared by every worker
+"""
+
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+from .metrics import registry
+
+THROTTLE_REJECTED = registry.counter(
+    'katha_throttle_rejected_total', 'Requests rejected by a token-bucket throttle.', ('scope', 'kind'))
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """'60/min' -> (60, 60.0): requests allowed per period, period in seconds."""
+    num, period = rate.split('/')
+    return int(num), float(PERIODS[period[0]])
+
+
+class LocalBucketStore:
+    """
+    In-process buckets, split across ``shards`` locks so concurrent requests for
+    different keys rarely contend. Each shard keeps at most ``max_keys`` buckets and
+    drops the least recently used one (it has most likely refilled anyway).
+    """
+
+    def __init__(self, shards=16, max_keys=10000):
+        self._shards = [(threading.Lock(), OrderedDict()) for _ in range(shards)]
+        self.max_keys = max_keys
+
+    def take(self, key, rate, capacity):
+        """Spend one token; return 0 if allowed, else the seconds until one is available."""
+        lock, buckets = self._shards[zlib.crc32(key.encode()) % len(self._shards)]
+        now = time.monotonic()
+        with lock:
+            tokens, updated = buckets.pop(key, (capacity, now))
+            tokens, wait = _spend(tokens, now - updated, rate, capacity)
+            buckets[key] = (tokens, now)
+            if len(buckets) > self.max_keys:
+                buckets.popitem(last=False)
+        return wait
+
+    def clear(self):
+        for lock, buckets in self._shards:
+            with lock:
+                buckets.clear()
+
+
+class CacheBucketStore:
+    """
+    Buckets in a shared Django cache: two gets (the generation, then the bucket) and
+    one set per check. Two workers updating the same bucket at the same instant can
+    both spend the last token, so the limit may be exceeded by a request or two under
+    heavy contention.
+
+    Bucket keys carry a generation number; clear() moves to the next one, so the
+    cache's other keys (feed snapshots, ...) stay and the old buckets expire.
+    """
+
+    def __init__(self, alias='default', prefix='throttle'):
+        self.cache = caches[alias]
+        self.prefix = prefix
+        self.generation_key = f'{prefix}:generation'
+
+    def take(self, key, rate, capacity):
+        generation = self.cache.get_or_set(self.generation_key, 0, timeout=None)
+        key = f'{self.prefix}:{generation}:{key}'
+        now = time.time()
+        tokens, updated = self.cache.get(key) or (capacity, now)
+        tokens, wait = _spend(tokens, max(0.0, now - updated), rate, capacity)
+        # An idle bucket is full again after capacity / rate seconds; let it expire then
+        self.cache.set(key, (tokens, now), timeout=int(capacity / rate) + 1)
+        return wait
+
+    def clear(self):
+        try:
+            self.cache.incr(self.generation_key)
+        except ValueError:  # No generation yet: nothing to forget
+            self.cache.add(self.generation_key, 1, timeout=None)
+
+
+def _spend(tokens, elapsed, rate, capacity):
+    """Refill for ``elapsed`` seconds then spend one token: (tokens left, wait)."""
+    tokens = min(capacity, tokens + elapsed * rate)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / rate
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """The process-wide bucket store configured by THROTTLE_STORE."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if getattr(settings, 'THROTTLE_STORE', 'local') == 'cache':
+                    _store = CacheBucketStore(getattr(settings, 'THROTTLE_CACHE', 'default'))
+                else:
+                    _store = LocalBucketStore(getattr(settings, 'THROTTLE_LOCAL_SHARDS', 16))
+    return _store
+
+
+def reset_store():
+    """Forget the configured store (tests, or after changing THROTTLE_STORE)."""
+    global _store
+    with _store_lock:
+        _store = None
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Throttle one scope from THROTTLE_POLICIES, keyed by user id or client IP."""
+
+    def __init__(self, scope):
+        self.scope = scope
+        self._wait = None
+
+    def allow_request(self, request, view):
+        policy = getattr(settings, 'THROTTLE_POLICIES', {}).get(self.scope)
+        if not policy:
+            return True
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            kind, ident = 'user', user.pk
+        else:
+            kind, ident = 'anon', self.get_ident(request)
+        rate = policy.get(kind)
+        if not rate:
+            return True
+
+        num, period = parse_rate(rate)
+        capacity = policy.get('burst', num)
+        self._wait = get_store().take(f'{self.scope}:{kind}:{ident}', num / period, capacity)
+        if self._wait:
+            THROTTLE_REJECTED.inc(scope=self.scope, kind=kind)
+            return False
+        return True
+
+    def wait(self):
+        return self._wait
@@ -0,0 +1,128 @@
+"""
+Soft delete for posts and comments.
+
+Deleting marks the row (deleted_at) with one UPDATE, which hides it and everything
+under it from the API right away. purge_deleted() later removes the row and its
+dependents in small raw DELETEs, children before parents, so neither the request
+nor the purge loads a whole comment tree into memory or locks it in one go:
+
+  per chunk of comments:  notifications, archived notifications, comment votes, comments
+  then for a post:        votes, saved posts, notifications, archived notifications, activity rollups,
+                          related post lists (its own and entries pointing at it)
+
+The tombstoned row itself goes last through the ORM; by then it has (almost) no
+dependents left, so Django's collector is cheap and catches anything created in
+the meantime. Its outbox delete event stands for the rows removed with it.
+"""
+
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import outbox
+from .metrics import registry
+from .models import (
+    ArchivedNotification, Comment, CommentVote, Notification, Post, PostActivity, RelatedPost, SavedPost, Vote,
+)
+
+logger = logging.getLogger('community.db')
+
+PURGED_ROWS = registry.counter('katha_purged_rows_total', 'Rows removed by the tombstone purger.', ('model',))
+
+
+def tombstone(instance):
+    """Hide a post or comment immediately; the row is purged later."""
+    instance.deleted_at = timezone.now()
+    type(instance).objects.filter(pk=instance.pk).update(deleted_at=instance.deleted_at)
+
+
+@dataclass
+class PurgeResult:
+    posts: int = 0
+    comments: int = 0
+    rows: dict = field(default_factory=dict)
+
+
+class Purger:
+    def __init__(self, chunk_size=500, pause=0.0):
+        self.chunk_size = chunk_size
+        self.pause = pause
+        self.result = PurgeResult()
+
+    def raw_delete(self, queryset):
+        deleted = queryset._raw_delete(queryset.db)
+        label = queryset.model._meta.model_name
+        self.result.rows[label] = self.result.rows.get(label, 0) + deleted
+        PURGED_ROWS.inc(deleted, model=label)
+        return deleted
+
+    def delete_in_chunks(self, queryset):
+        """Delete every row of ``queryset`` (no dependents of its own) one chunk per transaction."""
+        while True:
+            with transaction.atomic():
+                ids = list(queryset.order_by().values_list('id', flat=True)[:self.chunk_size])
+                if ids:
+                    self.raw_delete(queryset.model.objects.filter(id__in=ids))
+            if len(ids) < self.chunk_size:
+                return
+            self.sleep()
+
+    def delete_comment_chunk(self, ids):
+        """Delete these comments together with their notifications and votes."""
+        with transaction.atomic():
+            self.raw_delete(Notification.objects.filter(comment_id__in=ids))
+            self.raw_delete(ArchivedNotification.objects.filter(comment_id__in=ids))
+            self.raw_delete(CommentVote.objects.filter(comment_id__in=ids))
+            # Unlink replies still pointing at these rows (none when going leaves-first)
+            Comment.objects.filter(parent_id__in=ids).update(parent=None)
+            self.raw_delete(Comment.objects.filter(id__in=ids))
+        self.sleep()
+
+    def sleep(self):
+        if self.pause:
+            time.sleep(self.pause)
+
+    def delete_comments(self, comments):
+        # Descending path order puts every reply before its parent, so chunks go leaves-first
+        ids = comments.order_by('-path').values_list('id', flat=True)
+        while chunk := list(ids[:self.chunk_size]):
+            self.delete_comment_chunk(chunk)
+
+    def purge_post(self, post):
+        self.delete_comments(Comment.objects.filter(post=post))
+        for model in (Vote, SavedPost, Notification, ArchivedNotification, PostActivity, RelatedPost):
+            self.delete_in_chunks(model.objects.filter(post=post))
+        self.delete_in_chunks(RelatedPost.objects.filter(related=post))
+        with transaction.atomic():
+            outbox.emit(post, deleted=True)
+            post.delete()
+        self.result.posts += 1
+
+    def purge_comment(self, comment):
+        self.delete_comments(Comment.objects.subtree(comment, include_self=False))
+        with transaction.atomic():
+            outbox.emit(comment, deleted=True)
+            comment.delete()
+        self.result.comments += 1
+
+
+def purge_deleted(chunk_size=500, pause=0.0, grace_seconds=None, limit=None):
+    """Purge tombstoned posts and comments older than the grace period; returns a PurgeResult."""
+    if grace_seconds is None:
+        grace_seconds = getattr(settings, 'TOMBSTONE_GRACE_SECONDS', 0)
+    cutoff = timezone.now() - timedelta(seconds=grace_seconds)
+    purger = Purger(chunk_size, pause)
+
+    for post in Post.objects.tombstoned().filter(deleted_at__lte=cutoff).order_by('deleted_at')[:limit]:
+        logger.info('Purging deleted post %s', post.pk)
+        purger.purge_post(post)
+    # Comments of purged posts are gone already; what is left are deleted threads on live posts
+    for comment in Comment.objects.tombstoned().filter(deleted_at__lte=cutoff).order_by('deleted_at')[:limit]:
+        logger.info('Purging deleted comment %s', comment.pk)
+        purger.purge_comment(comment)
+    return purger.result
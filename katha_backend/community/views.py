@@ -1,15 +1,32 @@
 from rest_framework import viewsets, generics, status
 from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import NotFound, ParseError
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticatedOrReadOnly, AllowAny, IsAuthenticated
+from rest_framework.permissions import IsAuthenticatedOrReadOnly, AllowAny, IsAuthenticated, IsAdminUser
+from rest_framework.negotiation import BaseContentNegotiation
+from rest_framework.views import APIView
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.db import transaction
-from django.db.models import Q, Count, F, Case, When, IntegerField
+from django.db import router as db_router, transaction
+from django.http import HttpResponse, HttpResponseNotFound, StreamingHttpResponse
+from django.utils.crypto import constant_time_compare
+from django.db.models import Q
+from django.db.models.functions import Substr
 from django.utils import timezone
-from datetime import timedelta
 from rest_framework_simplejwt.tokens import RefreshToken
-from .models import Post, Comment, Vote, SavedPost, Notification, CommentVote, Feedback
-from .serializers import PostSerializer, CommentSerializer, UserSerializer, NotificationSerializer, FeedbackSerializer
+from .models import (
+    Post, Comment, Vote, SavedPost, Notification, CommentVote, Feedback, ArchivedNotification, PostActivity,
+)
+from .serializers import (
+    PostSerializer, CommentSerializer, ThreadCommentSerializer, UserSerializer, NotificationSerializer,
+    NotificationInboxSerializer, ArchivedNotificationSerializer, FeedbackSerializer, RelatedPostSerializer,
+    NOTIFICATION_EXCERPT_LENGTH,
+)
+from . import batch, exports, feeds, outbox, retention, rollups, tombstones
+from .feeds import post_queryset
+from .metrics import registry
+from .related import related_posts
+from .throttling import TokenBucketThrottle
 
 # --- AUTHENTICATION VIEW ---
 class UserRegistrationView(generics.CreateAPIView):
@@ -46,6 +63,12 @@ class FeedbackView(generics.ListCreateAPIView):
             return [IsAuthenticated(),]
         return [AllowAny(),]
 
+    def get_throttles(self):
+        # Anonymous POSTs are open to anyone, so rate limit them per IP
+        if self.request.method == 'POST':
+            return [TokenBucketThrottle('feedback')]
+        return super().get_throttles()
+
     def list(self, request, *args, **kwargs):
         # Only allow staff/admin to list feedback
         if not request.user.is_staff:
@@ -53,6 +76,93 @@ class FeedbackView(generics.ListCreateAPIView):
         return super().list(request, *args, **kwargs)
 
 
+# --- EXPORT VIEW ---
+class FirstRendererNegotiation(BaseContentNegotiation):
+    """Skip Accept-header negotiation: exports pick their format with ?fmt=, errors render as JSON."""
+
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+class ExportView(APIView):
+    """Stream feedback, posts or comments to staff as CSV (default) or NDJSON.
+
+    Filters: ?since= and ?until= (ISO date or datetime, on created_at), ?type= (feedback only).
+    """
+    permission_classes = [IsAdminUser]
+    content_negotiation_class = FirstRendererNegotiation
+
+    def get(self, request, dataset):
+        if dataset not in exports.DATASETS:
+            return Response({'error': f'Unknown export {dataset!r}.'}, status=status.HTTP_404_NOT_FOUND)
+        fmt = request.query_params.get('fmt', 'csv')
+        if fmt not in exports.FORMATS:
+            return Response({'error': 'fmt must be csv or ndjson.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        model, _ = exports.DATASETS[dataset]
+        # Rows are read after the view returns, so pick the database (replica or primary) now
+        using = db_router.db_for_read(model)
+        try:
+            queryset = exports.filtered_queryset(dataset, request.query_params, using)
+        except exports.ExportFilterError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(
+            exports.stream_export(dataset, fmt, queryset), content_type=exports.FORMATS[fmt])
+        stamp = timezone.now().strftime('%Y%m%d-%H%M%S')
+        response['Content-Disposition'] = f'attachment; filename="{dataset}-{stamp}.{fmt}"'
+        return response
+
+
+# --- BATCH VIEW ---
+class BatchView(APIView):
+    """Run several API requests in one round-trip; see community.batch for the payload.
+
+    Each sub-request goes through its own view's permissions, so the batch itself is open.
+    """
+    permission_classes = [AllowAny]
+
+    def post(self, request):
+        try:
+            subrequests = batch.parse(request.data)
+        except batch.BatchError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'responses': batch.run_batch(request, subrequests)})
+
+
+# --- ACTIVITY STATS VIEW ---
+class ActivityStatsView(APIView):
+    """Site-wide votes, comments and saves per hour or day; reads only rollup rows.
+
+    Same parameters as posts/<id>/activity/.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        try:
+            body = rollups.activity(PostActivity.objects.all(), request.query_params)
+        except rollups.ActivityQueryError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(body, status=status.HTTP_200_OK)
+
+
+# --- METRICS VIEW ---
+def metrics(request):
+    """Expose request/query metrics in the Prometheus text format.
+
+    Open in DEBUG; otherwise requires `Authorization: Bearer <METRICS_TOKEN>`.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if not settings.DEBUG:
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        if not token or not constant_time_compare(supplied, token):
+            return HttpResponseNotFound()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 # --- SSO/OAuth Views ---
 @api_view(['POST'])
 @permission_classes([AllowAny])
@@ -191,6 +301,63 @@ def google_oauth(request):
 
 
 # --- POST AND COMMENT VIEWS ---
+def thread_response(queryset, request, min_depth=0):
+    """Serialize a thread-ordered comment queryset, leaving out deleted comments and their replies.
+
+    ``?max_depth=N`` keeps N levels below ``min_depth``; ``descendant_count`` on the
+    last level tells the client how many replies were collapsed.
+    """
+    max_depth = request.query_params.get('max_depth')
+    if max_depth is not None:
+        try:
+            queryset = queryset.filter(depth__lte=min_depth + int(max_depth))
+        except ValueError:
+            return Response({'error': 'max_depth must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+    comments = []
+    hidden_prefix = None
+    for comment in queryset.select_related('author').with_descendant_counts():
+        # Rows come in path order, so a deleted comment's replies directly follow it
+        if hidden_prefix is not None and comment.path.startswith(hidden_prefix):
+            continue
+        if comment.deleted_at is not None:
+            hidden_prefix = comment.path
+            continue
+        hidden_prefix = None
+        comments.append(comment)
+    return Response(ThreadCommentSerializer(comments, many=True).data, status=status.HTTP_200_OK)
+
+
+class StateLookupError(ValueError):
+    pass
+
+
+def state_ids(request):
+    """Distinct ids from ``?ids=1,2,3`` (or repeated ``?ids=``), at most STATE_LOOKUP_MAX_IDS."""
+    ids = []
+    for value in request.query_params.getlist('ids'):
+        for part in value.split(','):
+            part = part.strip()
+            if not part:
+                continue
+            if not part.isdigit():
+                raise StateLookupError(f'Invalid id {part!r}.')
+            ids.append(int(part))
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        raise StateLookupError('Pass the ids to look up as ?ids=1,2,3.')
+    limit = getattr(settings, 'STATE_LOOKUP_MAX_IDS', 500)
+    if len(ids) > limit:
+        raise StateLookupError(f'At most {limit} ids per request.')
+    return ids
+
+
+def state_response(state):
+    """The viewer's overlay; never cached by shared caches, unlike the public bodies."""
+    response = Response(state, status=status.HTTP_200_OK)
+    response['Cache-Control'] = 'private, no-store'
+    return response
+
+
 class PostViewSet(viewsets.ModelViewSet):
     """Provides standard CRUD operations for Post (Katha)."""
     queryset = Post.objects.all()
@@ -205,65 +372,23 @@ class PostViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         """Override queryset to support sorting and filtering."""
-        queryset = Post.objects.all().annotate(
-            comment_count=Count('comments', filter=Q(comments__parent__isnull=True))
-        )
+        return post_queryset(self.request.query_params).select_related('author')
 
-        # Filtering
-        author = self.request.query_params.get('author', None)
-        if author:
-            queryset = queryset.filter(author__username__icontains=author)
-
-        date_from = self.request.query_params.get('date_from', None)
-        if date_from:
-            try:
-                from datetime import datetime
-                date_from = datetime.fromisoformat(date_from.replace('Z', '+00:00'))
-                queryset = queryset.filter(created_at__gte=date_from)
-            except (ValueError, AttributeError):
-                pass
-
-        date_to = self.request.query_params.get('date_to', None)
-        if date_to:
-            try:
-                from datetime import datetime
-                date_to = datetime.fromisoformat(date_to.replace('Z', '+00:00'))
-                queryset = queryset.filter(created_at__lte=date_to)
-            except (ValueError, AttributeError):
-                pass
-
-        # Sorting
-        sort_by = self.request.query_params.get('sort', 'newest')
-        
-        if sort_by == 'oldest':
-            queryset = queryset.order_by('created_at')
-        elif sort_by == 'most_voted':
-            queryset = queryset.order_by('-votes', '-created_at')
-        elif sort_by == 'most_comments':
-            queryset = queryset.order_by('-comment_count', '-created_at')
-        elif sort_by == 'trending':
-            # Trending: combination of votes, comments, and recency
-            # Weight recent posts more heavily (posts from last 7 days get bonus)
-            week_ago = timezone.now() - timedelta(days=7)
-            queryset = queryset.annotate(
-                trending_score=(
-                    F('votes') * 2 + 
-                    F('comment_count') * 3 + 
-                    Case(
-                        When(created_at__gte=week_ago, then=5),
-                        default=0,
-                        output_field=IntegerField()
-                    )
-                )
-            ).order_by('-trending_score', '-created_at')
-        else:  # 'newest' or default
-            queryset = queryset.order_by('-created_at')
+    def list(self, request, *args, **kwargs):
+        # The unfiltered feed comes from its precomputed snapshot when that is enabled
+        posts = feeds.served_feed(request.query_params, request.user)
+        if posts is None:
+            # PostSerializer's output, with a query per relation rather than per post and comment
+            posts = feeds.feed_data(list(self.filter_queryset(self.get_queryset())), request.user)
+        return Response(posts)
 
-        return queryset
+    def retrieve(self, request, *args, **kwargs):
+        return Response(feeds.feed_data([self.get_object()], request.user)[0])
 
     def perform_create(self, serializer):
         # Automatically set the author of the post to the current logged-in user
-        serializer.save(author=self.request.user)
+        with transaction.atomic():
+            outbox.emit(serializer.save(author=self.request.user))
 
     def perform_update(self, serializer):
         # Only allow the author to update their own post
@@ -272,14 +397,23 @@ class PostViewSet(viewsets.ModelViewSet):
             from rest_framework.exceptions import PermissionDenied
             raise PermissionDenied("You can only edit your own posts.")
         from django.utils import timezone
-        serializer.save(edited_at=timezone.now(), is_edited=True)
+        with transaction.atomic():
+            outbox.emit(serializer.save(edited_at=timezone.now(), is_edited=True))
 
     def perform_destroy(self, instance):
         # Only allow the author to delete their own post
         if instance.author != self.request.user:
             from rest_framework.exceptions import PermissionDenied
             raise PermissionDenied("You can only delete your own posts.")
-        instance.delete()
+        # Hide now; purge_deleted removes the post and its comment tree in small chunks later
+        with transaction.atomic():
+            tombstones.tombstone(instance)
+            outbox.emit(instance)
+
+    def get_throttles(self):
+        if self.action == 'vote':
+            return [TokenBucketThrottle('post-vote')]
+        return super().get_throttles()
 
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def vote(self, request, pk=None):
@@ -306,6 +440,7 @@ class PostViewSet(viewsets.ModelViewSet):
                 if value == 0:
                     # Remove vote
                     old_value = vote.value
+                    outbox.emit(vote, deleted=True)
                     vote.delete()
                     post.votes -= old_value
                 else:
@@ -313,12 +448,17 @@ class PostViewSet(viewsets.ModelViewSet):
                     old_value = vote.value
                     vote.value = value
                     vote.save()
+                    outbox.emit(vote)
                     post.votes = post.votes - old_value + value
             else:
                 # New vote
+                old_value = 0
+                outbox.emit(vote)
                 post.votes += value
             
             post.save()
+            outbox.emit(post)
+            rollups.record(post.id, **rollups.vote_deltas(old_value, value))
             
             # Return updated post data
             serializer = self.get_serializer(post)
@@ -329,17 +469,21 @@ class PostViewSet(viewsets.ModelViewSet):
         """Save or unsave a post."""
         post = self.get_object()
         
-        saved_post, created = SavedPost.objects.get_or_create(
-            user=request.user,
-            post=post
-        )
-        
-        if not created:
-            # Already saved, so unsave it
-            saved_post.delete()
-            is_saved = False
-        else:
-            is_saved = True
+        with transaction.atomic():
+            saved_post, created = SavedPost.objects.get_or_create(
+                user=request.user,
+                post=post
+            )
+            
+            if not created:
+                # Already saved, so unsave it
+                outbox.emit(saved_post, deleted=True)
+                saved_post.delete()
+                is_saved = False
+            else:
+                outbox.emit(saved_post)
+                is_saved = True
+            rollups.record(post.id, saves=1 if is_saved else -1)
         
         # Return updated post data
         serializer = self.get_serializer(post)
@@ -348,14 +492,68 @@ class PostViewSet(viewsets.ModelViewSet):
             'post': serializer.data
         }, status=status.HTTP_200_OK)
 
+    @action(detail=True, methods=['get'])
+    def thread(self, request, pk=None):
+        """All comments of the post as one flat list in thread order, with depth and descendant counts."""
+        post = self.get_object()
+        return thread_response(Comment.objects.filter(post=post).order_by('path'), request)
+
+    @action(detail=True, methods=['get'])
+    def activity(self, request, pk=None):
+        """Votes, comments and saves on the post per hour or day, from the rollup table.
+
+        ?period=hour|day (default hour), ?since= / ?until= (ISO date or datetime).
+        """
+        post = self.get_object()
+        try:
+            body = rollups.activity(PostActivity.objects.filter(post=post), request.query_params)
+        except rollups.ActivityQueryError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(body, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['get'])
+    def related(self, request, pk=None):
+        """Posts most similar to this one in text, best first, precomputed by build_related_posts.
+
+        ?limit= (at most RELATED_POSTS_K). A post the index has not reached yet has none.
+        """
+        try:
+            limit = request.query_params.get('limit')
+            limit = int(limit) if limit else None
+        except ValueError:
+            raise ParseError('limit must be an integer.')
+        if not pk.isdigit():
+            raise NotFound()
+        rows = related_posts(int(pk), limit)
+        # Only an empty list costs a second query, to tell a missing post from one without matches
+        if not rows and not Post.objects.alive().filter(pk=pk).exists():
+            raise NotFound()
+        return Response(RelatedPostSerializer(rows, many=True).data)
+
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def saved(self, request):
         """Get all posts saved by the current user."""
-        saved_posts = SavedPost.objects.filter(user=request.user).select_related('post')
+        saved_posts = SavedPost.objects.filter(user=request.user, post__deleted_at__isnull=True).select_related('post')
         posts = [saved_post.post for saved_post in saved_posts]
         serializer = self.get_serializer(posts, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=['get'])
+    def state(self, request):
+        """The viewer's vote and saved flag for ``?ids=``: {id: {user_vote, is_saved}}.
+
+        One indexed IN query per table; ids of missing posts get the defaults.
+        """
+        try:
+            ids = state_ids(request)
+        except StateLookupError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        votes, saved = {}, set()
+        if request.user.is_authenticated:
+            votes = dict(Vote.objects.filter(user=request.user, post_id__in=ids).order_by().values_list('post_id', 'value'))
+            saved = set(SavedPost.objects.filter(user=request.user, post_id__in=ids).order_by().values_list('post_id', flat=True))
+        return state_response({pk: {'user_vote': votes.get(pk, 0), 'is_saved': pk in saved} for pk in ids})
+
     
 class CommentViewSet(viewsets.ModelViewSet):
     """Provides standard CRUD operations for Comment (Salaysay)."""
@@ -363,43 +561,61 @@ class CommentViewSet(viewsets.ModelViewSet):
     serializer_class = CommentSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
+    def get_queryset(self):
+        # Hide deleted comments, replies to them at any depth and comments on deleted posts until they are purged
+        return Comment.objects.alive().without_deleted_ancestors().filter(post__deleted_at__isnull=True)
+
     def get_serializer_context(self):
         """Pass request context to serializer for user_vote calculation."""
         context = super().get_serializer_context()
         context['request'] = self.request
         return context
 
+    def get_throttles(self):
+        if self.action in ('create', 'vote'):
+            return [TokenBucketThrottle(f'comment-{self.action}')]
+        return super().get_throttles()
+
+    @action(detail=True, methods=['get'])
+    def thread(self, request, pk=None):
+        """The comment and its replies at any depth as one flat list in thread order."""
+        comment = self.get_object()
+        return thread_response(Comment.objects.subtree(comment), request, min_depth=comment.depth)
+
     def perform_create(self, serializer):
         # Automatically set the author of the comment to the current logged-in user
         # The post is already included in the request data, so we just need to save the author
-        comment = serializer.save(author=self.request.user)
+        with transaction.atomic():
+            comment = serializer.save(author=self.request.user)
+            outbox.emit(comment)
+            rollups.record(comment.post_id, comments=1)
         
-        # Create notifications
-        post = comment.post
-        parent = comment.parent
+            # Create notifications
+            post = comment.post
+            parent = comment.parent
         
-        if parent:
-            # This is a reply to a comment
-            # Notify the parent comment author (unless they're replying to themselves)
-            if parent.author != self.request.user:
-                Notification.objects.create(
-                    user=parent.author,
-                    notification_type='reply',
-                    post=post,
-                    comment=comment,
-                    actor=self.request.user
-                )
-        else:
-            # This is a top-level comment
-            # Notify the post author (unless they're commenting on their own post)
-            if post.author != self.request.user:
-                Notification.objects.create(
-                    user=post.author,
-                    notification_type='comment',
-                    post=post,
-                    comment=comment,
-                    actor=self.request.user
-                )
+            if parent:
+                # This is a reply to a comment
+                # Notify the parent comment author (unless they're replying to themselves)
+                if parent.author != self.request.user:
+                    Notification.objects.create(
+                        user=parent.author,
+                        notification_type='reply',
+                        post=post,
+                        comment=comment,
+                        actor=self.request.user
+                    )
+            else:
+                # This is a top-level comment
+                # Notify the post author (unless they're commenting on their own post)
+                if post.author != self.request.user:
+                    Notification.objects.create(
+                        user=post.author,
+                        notification_type='comment',
+                        post=post,
+                        comment=comment,
+                        actor=self.request.user
+                    )
 
     def perform_update(self, serializer):
         # Only allow the author to update their own comment
@@ -408,14 +624,31 @@ class CommentViewSet(viewsets.ModelViewSet):
             from rest_framework.exceptions import PermissionDenied
             raise PermissionDenied("You can only edit your own comments.")
         from django.utils import timezone
-        serializer.save(edited_at=timezone.now(), is_edited=True)
+        with transaction.atomic():
+            outbox.emit(serializer.save(edited_at=timezone.now(), is_edited=True))
 
     def perform_destroy(self, instance):
         # Only allow the author to delete their own comment
         if instance.author != self.request.user:
             from rest_framework.exceptions import PermissionDenied
             raise PermissionDenied("You can only delete your own comments.")
-        instance.delete()
+        # Hide now (replies are reached through it, so they disappear too); purged later
+        with transaction.atomic():
+            tombstones.tombstone(instance)
+            outbox.emit(instance)
+
+    @action(detail=False, methods=['get'])
+    def state(self, request):
+        """The viewer's vote on each comment in ``?ids=``: {id: {user_vote}}, from one IN query."""
+        try:
+            ids = state_ids(request)
+        except StateLookupError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        votes = {}
+        if request.user.is_authenticated:
+            votes = dict(
+                CommentVote.objects.filter(user=request.user, comment_id__in=ids).order_by().values_list('comment_id', 'value'))
+        return state_response({pk: {'user_vote': votes.get(pk, 0)} for pk in ids})
 
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def vote(self, request, pk=None):
@@ -455,12 +688,53 @@ class CommentViewSet(viewsets.ModelViewSet):
                 comment.votes += value
             
             comment.save()
+            outbox.emit(comment)
             
             # Return updated comment data
             serializer = self.get_serializer(comment)
             return Response(serializer.data, status=status.HTTP_200_OK)
 
 
+def notification_queryset(user):
+    """The user's notifications, leaving out those about deleted posts or comments."""
+    return Notification.objects.filter(user=user).filter(
+        Q(post__isnull=True) | Q(post__deleted_at__isnull=True),
+        Q(comment__isnull=True) | Q(comment__deleted_at__isnull=True),
+    )
+
+
+def notification_inbox(user, params):
+    """
+    One page of the user's inbox, newest first, as dicts from a single joined query
+    of just the columns NotificationInboxSerializer needs.
+
+    ?unread=1 keeps unread ones (notification_user_read_idx). Without ?limit= or
+    ?before= it is the whole inbox, as clients that never page expect; with either,
+    ?before=<id of the last item> pages on and ?limit= sets the page size (default
+    50, max 200).
+    """
+    try:
+        limit = params.get('limit')
+        before = params.get('before')
+        before = int(before) if before else None
+        paged = bool(limit) or before is not None
+        limit = min(int(limit or 50), 200)
+    except ValueError:
+        raise ParseError('limit and before must be integers.')
+    queryset = notification_queryset(user)
+    if params.get('unread') in ('1', 'true'):
+        queryset = queryset.filter(read=False)
+    if before is not None:
+        queryset = queryset.filter(id__lt=before)
+    rows = (queryset
+            .order_by('-id')
+            .values('id', 'notification_type', 'post_id', 'post__title', 'comment_id', 'actor__username', 'read',
+                    'created_at',
+                    # One character over the excerpt tells excerpt() the text went on
+                    comment_excerpt=Substr('comment__text', 1, NOTIFICATION_EXCERPT_LENGTH + 1)))
+    return rows[:max(limit, 1)] if paged else rows
+
+
 class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     """ViewSet for notifications."""
     serializer_class = NotificationSerializer
@@ -468,7 +742,12 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
 
     def get_queryset(self):
         """Return notifications for the current user."""
-        return Notification.objects.filter(user=self.request.user)
+        return notification_queryset(self.request.user)
+
+    def list(self, request, *args, **kwargs):
+        """The inbox, all of it or paged with ?before= and ?limit=; ?unread=1 (see notification_inbox)."""
+        rows = notification_inbox(request.user, request.query_params)
+        return Response(NotificationInboxSerializer(rows, many=True).data)
 
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def mark_read(self, request, pk=None):
@@ -487,11 +766,33 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
     def mark_all_read(self, request):
         """Mark all notifications as read for the current user."""
-        Notification.objects.filter(user=request.user, read=False).update(read=True)
-        return Response({'message': 'All notifications marked as read.'}, status=status.HTTP_200_OK)
+        # Batched so a user with thousands of unread rows does not lock them all in one statement
+        count = retention.mark_all_read(request.user)
+        return Response({'message': 'All notifications marked as read.', 'count': count}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def archived(self, request):
+        """Older notifications moved out by the retention job, newest first.
+
+        Pages with ?before=<id of the last item> and ?limit= (default 50, max 200).
+        """
+        try:
+            limit = min(int(request.query_params.get('limit', 50)), 200)
+            before = request.query_params.get('before')
+            before = int(before) if before else None
+        except ValueError:
+            return Response({'error': 'limit and before must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = (ArchivedNotification.objects
+                    .filter(user=request.user)
+                    .select_related('actor', 'post', 'comment')
+                    .order_by('-id'))
+        if before is not None:
+            queryset = queryset.filter(id__lt=before)
+        serializer = ArchivedNotificationSerializer(queryset[:max(limit, 1)], many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
 
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def unread_count(self, request):
-        """Get count of unread notifications."""
-        count = Notification.objects.filter(user=request.user, read=False).count()
+        """Get count of unread notifications, of those the inbox lists."""
+        count = notification_queryset(request.user).filter(read=False).count()
         return Response({'count': count}, status=status.HTTP_200_OK)
\ No newline at end of file
@@ -0,0 +1,145 @@
+"""
+Storage of the vote tables: what their indexes cost, how fast the lookups are, and
+(on MySQL) clustering the rows by their natural key.
+
+Votes are read two ways: a viewer's votes on a page of posts or comments
+(``user = ? AND post_id IN (...)``), and the votes on one post or comment (counter
+recounts, cascades). Migration 0017 serves both from covering indexes, (user,
+target, value) and (target, value), and drops the single-column indexes these make
+redundant. The unique (user, target) key stays to enforce one vote per user:
+neither MySQL nor SQLite can carry value in a unique index without making it part
+of the key. So the migrated tables are a little larger than before 0017 (4-5%
+on seeded data), not smaller; the indexes buy latency, not space.
+
+Only clustering shrinks them. InnoDB stores each table in its primary key, here
+the surrogate id nothing reads by. ``rebuild(name, clustered=True)`` rebuilds a
+table with (user, target) as the primary key instead, online, keeping id unique
+for the admin, the outbox and the rollups. The clustered rows carry value, so the
+unique key and the (user, target, value) index both go. This is outside the
+migrations and Django's migration state does not know: run
+``rebuild(name, clustered=False)`` before a migration that changes the vote
+tables' keys, and cluster again after it.
+"""
+
+import random
+import time
+
+from django.db import DatabaseError, connections
+from django.db.models import Sum
+
+from .loadtest import percentile
+from .models import CommentVote, Vote
+
+# name -> (model, the field voted on, the unique constraint on (user, field), the (user, field, value) index)
+VOTE_TABLES = {
+    'vote': (Vote, 'post', 'vote_user_post_uniq', 'vote_viewer_idx'),
+    'comment_vote': (CommentVote, 'comment', 'comment_vote_user_comment_uniq', 'comment_vote_viewer_idx'),
+}
+
+
+# --- Sizes ---
+def storage_sizes(model, using='default'):
+    """``{index name: bytes}`` for the table and its indexes, or None if unavailable.
+
+    On MySQL the table is its primary key, reported as PRIMARY; on SQLite it is
+    reported under the table's name.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'mysql':
+                cursor.execute(
+                    'SELECT index_name, stat_value * @@innodb_page_size FROM mysql.innodb_index_stats'
+                    " WHERE database_name = DATABASE() AND table_name = %s AND stat_name = 'size'", [table])
+            elif connection.vendor == 'sqlite':
+                cursor.execute(
+                    'SELECT s.name, SUM(s.pgsize) FROM dbstat s JOIN sqlite_master m ON m.name = s.name'
+                    ' WHERE m.tbl_name = %s GROUP BY s.name', [table])
+            else:
+                return None
+            return {name: int(size) for name, size in cursor.fetchall()}
+    except DatabaseError:
+        return None  # No access to mysql.*, or SQLite built without dbstat
+
+
+def primary_key_columns(model, using='default'):
+    """Columns of the table's primary key as the database has it (MySQL only)."""
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            'SELECT column_name FROM information_schema.statistics WHERE table_schema = DATABASE()'
+            " AND table_name = %s AND index_name = 'PRIMARY' ORDER BY seq_in_index", [model._meta.db_table])
+        return [column for (column,) in cursor.fetchall()]
+
+
+# --- Lookups ---
+def lookup_latency(model, target, samples=200, page_size=25, using='default'):
+    """Median and p95 milliseconds of the two vote lookups, over existing votes.
+
+    Returns ``{'viewer': (p50, p95), 'target': (p50, p95)}``, or None without votes.
+    """
+    column = f'{target}_id'
+    recent = list(model.objects.using(using).order_by('-id').values_list('user_id', column)[:samples * page_size])
+    if not recent:
+        return None
+    rng = random.Random(0)
+    targets = sorted({target_id for _, target_id in recent})
+    queryset = model.objects.using(using).order_by()
+    timings = {'viewer': [], 'target': []}
+    for _ in range(samples):
+        user_id, target_id = rng.choice(recent)
+        start = rng.randrange(max(len(targets) - page_size, 0) + 1)
+        page = targets[start:start + page_size]
+        started = time.perf_counter()
+        list(queryset.filter(user_id=user_id, **{f'{column}__in': page}).values_list(column, 'value'))
+        timings['viewer'].append(time.perf_counter() - started)
+        started = time.perf_counter()
+        queryset.filter(**{column: target_id}).aggregate(total=Sum('value'))
+        timings['target'].append(time.perf_counter() - started)
+    return {name: (percentile(values, 50) * 1000, percentile(values, 95) * 1000)
+            for name, values in timings.items()}
+
+
+# --- Clustering (MySQL) ---
+def cluster_sql(model, target, unique_name, viewer_index):
+    """ALTER making (user, target) the primary key of a vote table, online."""
+    table = model._meta.db_table
+    return (f'ALTER TABLE `{table}` DROP PRIMARY KEY, ADD PRIMARY KEY (`user_id`, `{target}_id`),'
+            f' ADD UNIQUE INDEX `{table}_id_uniq` (`id`), DROP INDEX `{unique_name}`, DROP INDEX `{viewer_index}`,'
+            ' ALGORITHM=INPLACE, LOCK=NONE')
+
+
+def uncluster_sql(model, target, unique_name, viewer_index):
+    """ALTER putting back the schema the migrations created."""
+    table = model._meta.db_table
+    return (f'ALTER TABLE `{table}` DROP PRIMARY KEY, ADD PRIMARY KEY (`id`),'
+            f' ADD UNIQUE INDEX `{unique_name}` (`user_id`, `{target}_id`),'
+            f' ADD INDEX `{viewer_index}` (`user_id`, `{target}_id`, `value`), DROP INDEX `{table}_id_uniq`,'
+            ' ALGORITHM=INPLACE, LOCK=NONE')
+
+
+def is_clustered(model, target, using='default'):
+    return primary_key_columns(model, using) == ['user_id', f'{target}_id']
+
+
+def rebuild(name, clustered, lock_wait_timeout=5, using='default', dry_run=False):
+    """Cluster (or uncluster) one vote table; returns the statement, or None if already so.
+
+    The rebuild copies the table in the background while writes go on; only its
+    start and end take a metadata lock, waiting at most ``lock_wait_timeout``
+    seconds for running transactions so the queries behind it are not held longer.
+    """
+    connection = connections[using]
+    if connection.vendor != 'mysql':
+        raise NotImplementedError(f'{connection.vendor} does not cluster tables by their primary key')
+    model, target, *index_names = VOTE_TABLES[name]
+    if is_clustered(model, target, using) == clustered:
+        return None
+    sql = (cluster_sql if clustered else uncluster_sql)(model, target, *index_names)
+    if not dry_run:
+        with connection.cursor() as cursor:
+            cursor.execute('SET SESSION lock_wait_timeout = %s', [lock_wait_timeout])
+            cursor.execute(sql)
+            cursor.execute(f'ANALYZE TABLE `{model._meta.db_table}`')
+            cursor.fetchall()
+    return sql
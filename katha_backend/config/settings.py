@@ -38,16 +38,23 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'community.middleware.QueryInstrumentationMiddleware',  # Outermost app-level layer: times the full stack
+    'community.routers.ReplicaRoutingMiddleware',  # Lets the DB router see the request (replica reads, pinning)
+    'community.profiling.ProfilingMiddleware',  # Opt-in (staff / X-Profile-Token) and 1-in-N sampled profiles
+    'community.middleware.StaticFilesMiddleware',  # WhiteNoise that also runs natively under ASGI
+    'community.middleware.SessionMiddleware',  # This and the other community.* below: skipped under /api/
     'corsheaders.middleware.CorsMiddleware', # Must be high up
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
+    'community.middleware.CsrfViewMiddleware',
+    'community.middleware.AuthenticationMiddleware',
+    'community.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Paths that skip the session, CSRF, auth and messages middleware (community.middleware):
+# the API authenticates with JWT only. X-Frame-Options still covers the browsable API.
+LEAN_MIDDLEWARE_PATHS = ('/api/', '/metrics')
+
 ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
@@ -72,20 +79,73 @@ WSGI_APPLICATION = 'config.wsgi.application'
 SITE_ID = int(os.environ.get('SITE_ID', '1'))
 
 # Database
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.mysql',
-        'NAME': os.environ.get('DB_NAME', ''),
-        'USER': os.environ.get('DB_USER', ''),
-        'PASSWORD': os.environ.get('DB_PASSWORD', ''),
-        'HOST': os.environ.get('DB_HOST', ''),
-        'PORT': os.environ.get('DB_PORT', '3306'),
-        'OPTIONS': {
-            'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
-            'charset': 'utf8mb4',
+# DB_ENGINE=sqlite runs everything on local SQLite files (handy for tests and
+# trying out replica routing without MySQL)
+DB_ENGINE = os.environ.get('DB_ENGINE', 'mysql').lower()
+
+if DB_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME') or BASE_DIR / 'db.sqlite3',
         }
     }
-}
+else:
+    # Pool size > 0 switches to the pooled MySQL backend (for ASGI, where threads come and go);
+    # otherwise each worker thread keeps a persistent connection for DB_CONN_MAX_AGE seconds.
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '0'))
+    DATABASES = {
+        'default': {
+            'ENGINE': 'community.db.backends.mysql' if DB_POOL_SIZE else 'django.db.backends.mysql',
+            'NAME': os.environ.get('DB_NAME', ''),
+            'USER': os.environ.get('DB_USER', ''),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', ''),
+            'PORT': os.environ.get('DB_PORT', '3306'),
+            'OPTIONS': {
+                'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
+                'charset': 'utf8mb4',
+            },
+            # Pooled connections are returned to the pool at the end of every request
+            'CONN_MAX_AGE': 0 if DB_POOL_SIZE else int(os.environ.get('DB_CONN_MAX_AGE', '60')),
+            # Ping a reused connection before the first query of a request
+            'CONN_HEALTH_CHECKS': True,
+            'POOL': {
+                'MAX_SIZE': DB_POOL_SIZE,
+                # Seconds a request waits for a free connection before failing
+                'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', '5')),
+                # Close connections older than this (stay below MySQL's wait_timeout)
+                'RECYCLE': int(os.environ.get('DB_POOL_RECYCLE', '1800')),
+                # Ping connections that sat idle longer than this before handing them out
+                'PRE_PING_IDLE': int(os.environ.get('DB_POOL_PRE_PING_IDLE', '30')),
+            },
+        }
+    }
+
+# Read replicas: comma-separated hosts (MySQL) or database files (SQLite).
+# Each becomes an alias replica_1, replica_2, ... sharing the primary's settings.
+# In tests they mirror 'default', so no separate test database is created.
+REPLICA_DATABASES = []
+for _index, _replica in enumerate([r.strip() for r in os.environ.get('DB_REPLICAS', '').split(',') if r.strip()], start=1):
+    _alias = f'replica_{_index}'
+    DATABASES[_alias] = {
+        **DATABASES['default'],
+        ('NAME' if DB_ENGINE == 'sqlite' else 'HOST'): _replica,
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(_alias)
+
+DATABASE_ROUTERS = ['community.routers.ReplicaRouter']
+
+# Apps whose reads may be served by replicas during GET/HEAD/OPTIONS requests
+REPLICA_ROUTED_APPS = ['community']
+# After a write, the user reads from the primary for this many seconds (read-your-writes)
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', '5'))
+# Cache alias storing those pins; must be shared between workers (e.g. Redis/Memcached) in production
+REPLICA_PIN_CACHE = os.environ.get('REPLICA_PIN_CACHE', 'default')
+# Replicas are re-checked this often and skipped while failing or lagging too far behind
+REPLICA_HEALTH_CHECK_INTERVAL = int(os.environ.get('REPLICA_HEALTH_CHECK_INTERVAL', '10'))
+REPLICA_MAX_LAG_SECONDS = int(os.environ.get('REPLICA_MAX_LAG_SECONDS', '5'))
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -95,6 +155,27 @@ AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',},
 ]
 
+# Password hashing. PASSWORD_HASHER picks the hasher new hashes use: scrypt (memory-hard,
+# standard library), argon2 (memory-hard, needs argon2-cffi) or pbkdf2. Hashes made by
+# the others still verify and are stored again with it on the next login.
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'scrypt')
+_PASSWORD_HASHERS = {
+    'scrypt': 'django.contrib.auth.hashers.ScryptPasswordHasher',
+    'argon2': 'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'pbkdf2_sha1': 'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+}
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[PASSWORD_HASHER]] + [
+    path for name, path in _PASSWORD_HASHERS.items() if name != PASSWORD_HASHER
+]
+# Logins and registrations hash on PASSWORD_HASH_WORKERS threads per process (0 = on the
+# request thread) with at most PASSWORD_HASH_QUEUE more waiting; beyond that they get a
+# 429 asking to retry after PASSWORD_HASH_RETRY_AFTER seconds (community.passwords)
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', '2'))
+PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', '8'))
+PASSWORD_HASH_RETRY_AFTER = int(os.environ.get('PASSWORD_HASH_RETRY_AFTER', '1'))
+AUTHENTICATION_BACKENDS = ['community.passwords.PooledPasswordBackend']
+
 # Internationalization
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
@@ -139,6 +220,79 @@ REST_FRAMEWORK = {
     )
 }
 
+# Token-bucket limits on write endpoints (community.throttling). Per scope: sustained
+# rate for authenticated users ('user', keyed by id) and anonymous clients ('anon',
+# keyed by IP), and the burst a full bucket allows. A missing rate means unthrottled.
+THROTTLE_POLICIES = {
+    'post-vote': {'user': '120/min', 'burst': 30},
+    'comment-vote': {'user': '120/min', 'burst': 30},
+    'comment-create': {'user': '20/min', 'burst': 10},
+    'feedback': {'user': '10/hour', 'anon': '5/hour', 'burst': 3},
+}
+# 'local' = sharded in-process buckets (per worker), 'cache' = shared Django cache
+THROTTLE_STORE = os.environ.get('THROTTLE_STORE', 'local')
+THROTTLE_CACHE = os.environ.get('THROTTLE_CACHE', 'default')
+
+# Batch endpoint (community.batch): sub-requests per batch, and threads running
+# consecutive reads concurrently (1 = run everything in order on the request thread)
+BATCH_MAX_REQUESTS = int(os.environ.get('BATCH_MAX_REQUESTS', '20'))
+BATCH_MAX_WORKERS = int(os.environ.get('BATCH_MAX_WORKERS', '4'))
+
+# Async read views (community.async_views): threads, each with its own connection, that
+# run a request's independent queries concurrently (1 = one after another)
+ASYNC_READ_WORKERS = int(os.environ.get('ASYNC_READ_WORKERS', '8'))
+
+# Feed snapshots (community.feeds): the unfiltered feed of each sort is served from a
+# precomputed snapshot that is fresh for FEED_SNAPSHOT_SECONDS (0 = always query the
+# database), then served stale while one worker rebuilds it. Writes mark snapshots stale;
+# they are rebuilt at most every FEED_SNAPSHOT_MIN_SECONDS and dropped after
+# FEED_SNAPSHOT_STALE_SECONDS. Snapshots keep the payload of the first FEED_SNAPSHOT_MAX_POSTS
+# posts and only the ids of the rest, which readers fetch by id.
+FEED_SNAPSHOT_SECONDS = int(os.environ.get('FEED_SNAPSHOT_SECONDS', '0'))
+FEED_SNAPSHOT_MIN_SECONDS = float(os.environ.get('FEED_SNAPSHOT_MIN_SECONDS', '2'))
+FEED_SNAPSHOT_STALE_SECONDS = int(os.environ.get('FEED_SNAPSHOT_STALE_SECONDS', '600'))
+FEED_SNAPSHOT_MAX_POSTS = int(os.environ.get('FEED_SNAPSHOT_MAX_POSTS', '1000'))
+# Longest a rebuild may hold its single-flight lock (and readers wait for a missing snapshot)
+FEED_SNAPSHOT_LOCK_SECONDS = int(os.environ.get('FEED_SNAPSHOT_LOCK_SECONDS', '30'))
+# A cache every worker shares (e.g. Redis) makes the lock and the snapshots cluster-wide
+FEED_SNAPSHOT_CACHE = os.environ.get('FEED_SNAPSHOT_CACHE', 'default')
+
+# Transactional outbox (community.outbox, run_consumers / compact_outbox commands):
+# events per consumer batch, seconds between polls when idle, how long a gap in event
+# ids is waited on (its transaction may still commit), and days delete events are kept
+OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', '500'))
+OUTBOX_POLL_SECONDS = float(os.environ.get('OUTBOX_POLL_SECONDS', '1'))
+OUTBOX_GAP_SECONDS = int(os.environ.get('OUTBOX_GAP_SECONDS', '5'))
+OUTBOX_TOMBSTONE_RETENTION_DAYS = int(os.environ.get('OUTBOX_TOMBSTONE_RETENTION_DAYS', '7'))
+
+# Engagement rollups (community.rollups): hourly rows older than this many days are
+# folded into daily rows by the compact_activity command
+ACTIVITY_HOURLY_RETENTION_DAYS = int(os.environ.get('ACTIVITY_HOURLY_RETENTION_DAYS', '7'))
+
+# Most ids one posts/state/ or comments/state/ lookup accepts
+STATE_LOOKUP_MAX_IDS = int(os.environ.get('STATE_LOOKUP_MAX_IDS', '500'))
+
+# Notification retention (community.retention, prune_notifications command): read
+# notifications older than this move to the archive table; archived rows are dropped
+# after NOTIFICATION_ARCHIVE_RETENTION_DAYS (unset = kept)
+NOTIFICATION_RETENTION_DAYS = int(os.environ.get('NOTIFICATION_RETENTION_DAYS', '90'))
+NOTIFICATION_ARCHIVE_RETENTION_DAYS = (
+    int(os.environ['NOTIFICATION_ARCHIVE_RETENTION_DAYS']) if os.environ.get('NOTIFICATION_ARCHIVE_RETENTION_DAYS') else None
+)
+# Rows per UPDATE when marking all of a user's notifications read
+NOTIFICATION_MARK_READ_BATCH_SIZE = int(os.environ.get('NOTIFICATION_MARK_READ_BATCH_SIZE', '500'))
+
+# Deleted posts/comments stay hidden for this many seconds before purge_deleted removes them
+TOMBSTONE_GRACE_SECONDS = int(os.environ.get('TOMBSTONE_GRACE_SECONDS', '0'))
+
+# Related posts (community.related, build_related_posts command; building needs numpy
+# and scipy): posts kept per list, the lowest cosine similarity kept, hashed term
+# buckets, and similarities (posts x corpus) computed per batch, which bounds memory
+RELATED_POSTS_K = int(os.environ.get('RELATED_POSTS_K', '10'))
+RELATED_POSTS_MIN_SCORE = float(os.environ.get('RELATED_POSTS_MIN_SCORE', '0.05'))
+RELATED_POSTS_FEATURES = int(os.environ.get('RELATED_POSTS_FEATURES', str(2 ** 18)))
+RELATED_POSTS_BATCH_CELLS = int(os.environ.get('RELATED_POSTS_BATCH_CELLS', str(2 ** 24)))
+
 # Simple JWT Configuration
 SIMPLE_JWT = {
     # Shorter access token lifetime for security (used for API requests)
@@ -164,3 +318,47 @@ SIMPLE_JWT = {
 # Google OAuth Configuration (for SSO)
 # Note: Google OAuth is handled via custom view, not social-auth
 # Set REACT_APP_GOOGLE_CLIENT_ID in frontend environment variables
+
+# --- Performance instrumentation ---
+# Per-view query counts, DB time and wall time, scraped from /metrics
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'True').lower() in ['1', 'true', 'yes']
+# Bearer token required to scrape /metrics when DEBUG is off (endpoint is hidden if unset)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+# Log requests slower than this many milliseconds together with their queries (unset = off)
+SLOW_REQUEST_MS = int(os.environ['SLOW_REQUEST_MS']) if os.environ.get('SLOW_REQUEST_MS') else None
+# Flag a request as N+1 when the same query shape runs at least this many times
+N_PLUS_ONE_THRESHOLD = int(os.environ.get('N_PLUS_ONE_THRESHOLD', '5'))
+
+# Request profiling (community.profiling): staff JWTs, or this secret in X-Profile-Token,
+# may send X-Profile: cprofile|sample. Profiles are stored in PROFILING_DIR (newest
+# PROFILING_KEEP kept); PROFILING_SAMPLE_RATE = N also samples 1 in N requests per endpoint
+PROFILING_SECRET = os.environ.get('PROFILING_SECRET', '')
+PROFILING_DIR = os.environ.get('PROFILING_DIR') or BASE_DIR / 'profiles'
+PROFILING_KEEP = int(os.environ.get('PROFILING_KEEP', '100'))
+PROFILING_SAMPLE_RATE = int(os.environ.get('PROFILING_SAMPLE_RATE', '0'))
+PROFILING_SAMPLE_INTERVAL_MS = float(os.environ.get('PROFILING_SAMPLE_INTERVAL_MS', '5'))
+
+# Admin changelists (community.admin_performance): unfiltered lists show the table's row
+# estimate once it reaches this size; filtered lists count at most ADMIN_COUNT_CAP rows
+ADMIN_ESTIMATED_COUNT_THRESHOLD = int(os.environ.get('ADMIN_ESTIMATED_COUNT_THRESHOLD', '100000'))
+ADMIN_COUNT_CAP = int(os.environ.get('ADMIN_COUNT_CAP', '10000'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'community.perf': {
+            'handlers': ['console'],
+            'level': os.environ.get('PERF_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+        'community.db': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
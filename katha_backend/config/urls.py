@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from community import views as community_views
+from community import async_views, views as community_views
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
@@ -28,11 +28,27 @@ urlpatterns = [
     path('api/v1/auth/google/', community_views.google_oauth, name='google_oauth'),
     # Feedback endpoints (POST for anyone, GET list for staff)
     path('api/v1/feedback/', community_views.FeedbackView.as_view(), name='feedback'),
+    # Staff exports streamed as CSV/NDJSON (feedback, posts, comments)
+    path('api/v1/export/<str:dataset>/', community_views.ExportView.as_view(), name='export'),
+    # Several API calls in one round-trip (sub-requests run in-process)
+    path('api/v1/batch/', community_views.BatchView.as_view(), name='batch'),
+    # Site-wide engagement per hour/day from the rollup table
+    path('api/v1/stats/activity/', community_views.ActivityStatsView.as_view(), name='activity_stats'),
     
+    # Async GET for the hottest reads; other methods fall through to the same viewsets
+    path('api/v1/posts/', async_views.post_list, name='post-list'),
+    path('api/v1/posts/<int:pk>/', async_views.post_detail, name='post-detail'),
+    path('api/v1/notifications/', async_views.notification_list, name='notification-list'),
+    path('api/v1/notifications/unread_count/', async_views.notification_unread_count,
+         name='notification-unread-count'),
+
     # Includes all posts/comments URLs generated by the router
     path('api/v1/', include(router.urls)),
     
     # JWT Authentication Endpoints
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+
+    # Prometheus scrape endpoint (per-view latency, query counts, N+1 flags)
+    path('metrics', community_views.metrics, name='metrics'),
 ]
\ No newline at end of file
@@ -76,6 +76,20 @@ const APIService = {
 
         return response;
     },
+
+    // Runs several API calls in one round-trip: requests = [{ id, method, path, body }],
+    // paths relative to the API base. Resolves to { [id]: { status, body } }.
+    batch: async (requests) => {
+        const response = await APIService.fetch('batch/', {
+            method: 'POST',
+            body: JSON.stringify({ requests }),
+        });
+        if (!response.ok) {
+            throw new Error(`Batch request failed: ${response.status}`);
+        }
+        const data = await response.json();
+        return Object.fromEntries(data.responses.map((entry) => [entry.id, entry]));
+    },
 };
 
 export default APIService;
\ No newline at end of file